@@ -1,16 +1,17 @@
 # APP.PY
 from flask import Flask, render_template, redirect, url_for, request, jsonify, send_file, session, flash
-from module import usuarios, chatbot, clima, sensores, cultivos, tecnicos, alertas, datos_avanzados
+from module import usuarios, chatbot, clima, sensores, cultivos, tecnicos, alertas, datos_avanzados, base_datos, migraciones, particiones, agregados, comandos, retencion, archivo, pasarela, binario, eventos, motor, generacion, muestreo
 from module.clima import get_weather # Asegúrate de que esta función exista si la usas en otras partes.
 from module.tecnicos import tecnicos_bp
+import asyncio
+import atexit
 import os
 import sqlite3
 from datetime import timedelta, datetime
 import secrets
+import time
 import requests
 import json
-import threading
-import time
 import pytz
 
 DATABASE = "users.db"
@@ -25,6 +26,8 @@ app.permanent_session_lifetime = timedelta(minutes=30)
 
 # Registrar el blueprint para las rutas de gestión de usuarios comunes y técnicos
 app.register_blueprint(tecnicos_bp)
+# Comandos de mantenimiento: flask --app app <comando>
+comandos.registrar_comandos(app)
 
 # Crear la tabla 'usuarios' si no existe al iniciar la aplicación
 usuarios.crear_base_datos()
@@ -41,9 +44,36 @@ alertas.crear_tabla_alertas()
 alertas.crear_tabla_historial_alertas()
 #crea la tabla de datos avanzados si no existe
 datos_avanzados.crear_tabla_datos_avanzados()
-
-# Diccionario para almacenar los hilos de generación continua de datos
-data_generation_threads = {}
+# Crea las tablas de agregados por hora y día si no existen
+agregados.crear_tablas_agregados()
+# Crea la tabla de dispositivos de campo (tokens de la pasarela) si no existe
+pasarela.crear_tabla_dispositivos()
+# Aplica las migraciones de esquema pendientes (índices, columnas nuevas...)
+migraciones.aplicar_migraciones()
+# Purga periódica de datos antiguos según retencion.RETENCION_DIAS
+# (ECOSMART_RETENCION_HORAS=0 la desactiva)
+retencion.iniciar_tarea_periodica()
+# Commit agrupado de las lecturas de los generadores
+# (ECOSMART_ESCRITOR_MS=<milisegundos> lo activa; por defecto, un commit por lectura)
+sensores.iniciar_escritor()
+# Pasarela TCP/UDP para sensores de campo
+# (ECOSMART_PASARELA=host:puerto[:puerto_udp] la activa; por defecto, apagada)
+pasarela.iniciar_en_segundo_plano()
+
+# Generación continua de datos: todos los cultivos son corrutinas de un solo
+# bucle de eventos (module/motor.py); la base de datos usa un grupo fijo de
+# hilos (ECOSMART_GENERACION_HILOS, 8) y a lo más ECOSMART_CLIMA_SIMULTANEAS
+# consultas del clima van en vuelo a la vez. Qué cultivos generan y en qué
+# proceso lo decide el registro compartido de module/generacion.py.
+GENERACION_INTERVALO_S = muestreo.INTERVALO_S  # cada cultivo puede tener el suyo (module/muestreo.py)
+generadores = motor.Motor(nombre="generacion")
+limite_clima = asyncio.Semaphore(sensores.CLIMA_SIMULTANEAS)
+# Configuración ya autorizada de cada cultivo en generación en este proceso:
+# numero_cultivo -> (usuario_id, tipo_usuario, intervalo, adaptativo, expira).
+# Los cambios de dueño la invalidan por eventos; la expiración solo recoge los
+# cambios de muestreo hechos desde otro proceso.
+GENERACION_CACHE_S = 300
+configuraciones_generacion = {}
 
 # Antes de cada solicitud, se verifica si la sesión debe ser permanente
 @app.before_request
@@ -84,7 +114,7 @@ def login():
         if not nombre or not contrasena:
             return render_template('login.html', error="Debes ingresar nombre y contraseña.")
 
-        conn = sqlite3.connect("users.db")
+        conn = base_datos.obtener_conexion("users.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         # Consulta para verificar las credenciales del usuario (nombre o correo)
@@ -124,7 +154,7 @@ def api_login():
     if not nombre or not contrasena:
         return jsonify({"message": "Faltan datos"}), 400
 
-    conn = sqlite3.connect("users.db")
+    conn = base_datos.obtener_conexion("users.db")
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     # Consulta para verificar las credenciales del usuario (nombre o correo)
@@ -166,7 +196,7 @@ def register():
         if not nombre or not correo or not contrasena:
             return render_template('register.html', error="Todos los campos son obligatorios")
 
-        conn = sqlite3.connect("users.db")
+        conn = base_datos.obtener_conexion("users.db")
         cursor = conn.cursor()
 
         # Verifica si el correo ya está registrado en la base de datos
@@ -233,34 +263,16 @@ def chat_endpoint():
     return respuesta_json # <--- Removed the redundant save here
 
 # Endpoint para obtener historial completo
+# (las rutas GET que solo consultan llevan @base_datos.solo_lectura(): leen por
+# conexiones de solo lectura y no compiten con los commits de los generadores)
 @app.route('/chat/historial/todo', methods=['GET'])
+@base_datos.solo_lectura()
 def historial_todo():
-    activa = 1
     if 'usuario' not in session:
         return jsonify({'error': 'No has iniciado sesión'}), 401
 
     user_id = session['usuario']['id']
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT conversacion_id, pregunta, respuesta, fecha, estado
-        FROM historial_chat
-        WHERE user_id = ? AND estado = ?
-        ORDER BY conversacion_id, fecha ASC
-    ''', (user_id, activa))
-    rows = cursor.fetchall()
-    conn.close()
-
-    conversations = {}
-    for conversacion_id, pregunta, respuesta, fecha, estado in rows:
-        if conversacion_id not in conversations:
-            conversations[conversacion_id] = []
-        conversations[conversacion_id].append({
-            'pregunta': pregunta,
-            'respuesta': respuesta,
-            'fecha': fecha,
-            'estado': estado
-        })
+    conversations = chatbot.obtener_conversaciones_usuario(user_id)
 
     return jsonify({'conversations': conversations})
 
@@ -343,18 +355,13 @@ def cultivos_route():
     has_cultivos = False
 
     # Dependiendo del tipo de usuario, obtenemos los cultivos específicos
-    if tipo_usuario == 'agricultor':
-        # Los agricultores solo ven sus propios cultivos
-        cultivos_list = cultivos.obtener_cultivos_por_usuario(user_id).json
-        has_cultivos = len(cultivos_list) > 0
-    elif tipo_usuario == 'agronomo':
-        # Los agrónomos solo ven los cultivos que ellos agregaron
-        cultivos_list = cultivos.obtener_cultivos_por_agronomo(user_id).json
-        has_cultivos = len(cultivos_list) > 0
+    if tipo_usuario in ('agricultor', 'agronomo'):
+        # Los agricultores ven sus propios cultivos; los agrónomos, los que ellos agregaron
+        cultivos_list = cultivos.listar_cultivos(user_id, tipo_usuario)
     else: # admin o cualquier otro
         # Administradores o cualquier otro tipo de usuario ve todos los cultivos (o según su rol)
-        cultivos_list = cultivos.obtener_cultivos().json
-        has_cultivos = len(cultivos_list) > 0
+        cultivos_list = cultivos.listar_cultivos()
+    has_cultivos = len(cultivos_list) > 0
     
     return render_template('cultivos.html', cultivos=cultivos_list, has_cultivos=has_cultivos, tipo_usuario=tipo_usuario)
 
@@ -402,7 +409,7 @@ def editar_cultivo_api(numero_cultivo):
     tipo_usuario = user_info['tipo_usuario']
 
     # Verificar si el usuario tiene permiso para editar este cultivo
-    conn = sqlite3.connect(cultivos.DATABASE)
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -433,7 +440,7 @@ def eliminar_cultivo_api(numero_cultivo):
     tipo_usuario = user_info['tipo_usuario']
 
     # Verificar si el usuario tiene permiso para eliminar este cultivo
-    conn = sqlite3.connect(cultivos.DATABASE)
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -459,7 +466,7 @@ def obtener_usuarios_api():
     if 'usuario' not in session:
         return jsonify({"message": "No autorizado"}), 401
     DATABASE = "users.db"
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     # Se filtra para obtener solo los usuarios con tipo_usuario "agricultor"
@@ -469,33 +476,96 @@ def obtener_usuarios_api():
     return jsonify(usuarios)
 
 
-# Función para ejecutar la generación de datos de forma continua
-def run_continuous_generation(numero_cultivo, user_id, tipo_usuario):
-    while sensores.get_data_generation_status(numero_cultivo) == 'running':
-        with app.app_context(): # Esencial para el contexto de Flask
-            # Volver a verificar la autorización dentro del bucle para asegurar que sigue siendo válida
-            conn = sqlite3.connect(cultivos.DATABASE)
-            cursor = conn.cursor()
-            authorized = False
-            if tipo_usuario == 'agronomo':
-                cursor.execute("SELECT id FROM cultivos WHERE numero = ? AND agronomist_id = ?", (numero_cultivo, user_id))
-                if cursor.fetchone(): authorized = True
-            elif tipo_usuario == 'agricultor':
-                cursor.execute("SELECT id FROM cultivos WHERE numero = ? AND usuario_id = ?", (numero_cultivo, user_id))
-                if cursor.fetchone(): authorized = True
-            elif tipo_usuario == 'admin':
-                authorized = True
-            conn.close()
+# Autorización del usuario que inició la generación y muestreo del cultivo, en
+# una sola consulta. None si el cultivo no existe o el usuario no está autorizado.
+def configuracion_generacion(numero_cultivo, user_id, tipo_usuario):
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT usuario_id, agronomist_id, intervalo_muestreo, muestreo_adaptativo FROM cultivos WHERE numero = ?
+    """, (numero_cultivo,))
+    cultivo = cursor.fetchone()
+    conn.close()
+    if cultivo is None:
+        return None
+    usuario_id, agronomist_id, intervalo, adaptativo = cultivo
+    authorized = (tipo_usuario == 'admin'
+                  or (tipo_usuario == 'agronomo' and agronomist_id == user_id)
+                  or (tipo_usuario == 'agricultor' and usuario_id == user_id))
+    if not authorized:
+        return None
+    return intervalo, bool(adaptativo)
+
+
+# Un ciclo de la generación continua. Devuelve el intervalo hasta el siguiente
+# (el del cultivo, o el que elige el muestreo adaptativo) o False si se perdió
+# la autorización, y el motor lo da de baja. La autorización no se consulta en
+# cada ciclo: se comprueba al cargar la configuración y los cambios de dueño
+# detienen la generación por eventos (revisar_generacion).
+async def generar_ciclo(numero_cultivo, user_id, tipo_usuario):
+    guardada = configuraciones_generacion.get(numero_cultivo)
+    if guardada is not None and guardada[:2] == (user_id, tipo_usuario) and guardada[4] > time.monotonic():
+        configuracion = guardada[2:4]
+    else:
+        configuracion = await asyncio.to_thread(configuracion_generacion, numero_cultivo, user_id, tipo_usuario)
+        if configuracion is not None:
+            configuraciones_generacion[numero_cultivo] = (user_id, tipo_usuario) + configuracion + (
+                time.monotonic() + GENERACION_CACHE_S,)
+    if configuracion is not None:
+        intervalo, adaptativo = configuracion
+        # Los umbrales de las alertas se leen fuera del bucle de eventos (están en caché casi siempre)
+        umbrales = await asyncio.to_thread(muestreo.umbrales) if adaptativo else []
+        datos = await sensores.generar_datos_async(numero_cultivo, limite_clima)
+        print(f"Datos generados para el cultivo {numero_cultivo}")
+        return muestreo.registrar(numero_cultivo, datos, intervalo, adaptativo, umbrales)
+    # Si se pierde la autorización, detener la generación
+    await asyncio.to_thread(coordinador_generacion.detener_cultivo, numero_cultivo)
+    olvidar_generacion(numero_cultivo)
+    print(f"Generación de datos detenida para el cultivo {numero_cultivo} por pérdida de autorización.")
+    return False
+
+
+def olvidar_generacion(numero_cultivo):
+    configuraciones_generacion.pop(numero_cultivo, None)
+    muestreo.olvidar(numero_cultivo)
+
+
+# Cambios de dueño: un cultivo eliminado o reasignado, o un usuario eliminado,
+# detienen en el acto (en todos los procesos, vía el registro compartido) la
+# generación que ya no esté autorizada. Cualquier edición invalida la
+# configuración guardada del cultivo.
+def revisar_generacion(evento):
+    if evento["evento"] == eventos.USUARIO_ELIMINADO:
+        detenidos = coordinador_generacion.detener_iniciados(usuario_id=evento["usuario_id"])
+    else:
+        numero_cultivo = evento["numero_cultivo"]
+        configuraciones_generacion.pop(numero_cultivo, None)
+        if evento["accion"] == "eliminado":
+            detenidos = coordinador_generacion.detener_iniciados(numero_cultivo=numero_cultivo)
+        elif evento["accion"] == "editado" and "usuario_id" in evento["campos"]:
+            detenidos = coordinador_generacion.detener_iniciados(
+                numero_cultivo=numero_cultivo,
+                sigue=lambda numero, user_id, tipo: configuracion_generacion(numero, user_id, tipo) is not None,
+            )
+        else:
+            return
+    for numero_cultivo in detenidos:
+        olvidar_generacion(numero_cultivo)
+        print(f"Generación de datos detenida para el cultivo {numero_cultivo} por cambio de dueño.")
+
+
+eventos.suscribir(eventos.CULTIVO_CAMBIADO, revisar_generacion)
+eventos.suscribir(eventos.USUARIO_ELIMINADO, revisar_generacion)
 
-            if authorized:
-                sensores.generate_data(numero_cultivo)
-                print(f"Datos generados para el cultivo {numero_cultivo}")
-            else:
-                # Si se pierde la autorización, detener la generación
-                sensores.set_data_generation_status(numero_cultivo, 'stopped')
-                print(f"Generación de datos detenida para el cultivo {numero_cultivo} por pérdida de autorización.")
-                break
-        time.sleep(30) # Generar datos cada 30 segundos (AJUSTAR SI ES NECESARIO)
+
+# Registro compartido: cada proceso toma su parte de los cultivos en generación
+# y al arrancar retoma los que quedaron sin dueño (p. ej. tras un reinicio).
+# ECOSMART_GENERACION_CONTINUA=0 deja fuera a este proceso (p. ej. uno que solo
+# corre comandos de mantenimiento); igual puede iniciar y detener cultivos.
+coordinador_generacion = generacion.Coordinador(generadores, generar_ciclo, GENERACION_INTERVALO_S)
+if os.environ.get("ECOSMART_GENERACION_CONTINUA", "1") != "0":
+    coordinador_generacion.arrancar()
+    atexit.register(coordinador_generacion.cerrar)
 
 
 # Ruta principal para mostrar la vista de sensores (se pasa la lista de cultivos a la plantilla)
@@ -511,25 +581,14 @@ def sensores_route():
     cultivos_del_usuario = []
     has_cultivos = False
 
-    if tipo_usuario == 'agricultor':
-        # Obtener los cultivos asociados al agricultor
-        cultivos_data = cultivos.obtener_cultivos_por_usuario(user_id).json
-        cultivos_del_usuario = cultivos_data
-        has_cultivos = len(cultivos_del_usuario) > 0
-    elif tipo_usuario == 'agronomo':
-        # Los agrónomos pueden ver los sensores de los cultivos que ellos agregaron.
-        cultivos_data = cultivos.obtener_cultivos_por_agronomo(user_id).json
-        cultivos_del_usuario = cultivos_data
-        has_cultivos = len(cultivos_del_usuario) > 0
-    elif tipo_usuario == 'admin':
-        # Los administradores ven todos los cultivos.
-        cultivos_data = cultivos.obtener_cultivos().json
-        cultivos_del_usuario = cultivos_data
-        has_cultivos = len(cultivos_del_usuario) > 0
+    # Agricultor: sus cultivos; agrónomo: los que agregó; admin: todos
+    cultivos_del_usuario = cultivos.listar_cultivos(user_id, tipo_usuario)
+    has_cultivos = len(cultivos_del_usuario) > 0
     
     # Pasar el estado actual de la generación para cada cultivo a la plantilla
+    estados = coordinador_generacion.estados(crop['numero'] for crop in cultivos_del_usuario)
     for crop in cultivos_del_usuario:
-        crop['generation_status'] = sensores.get_data_generation_status(crop['numero'])
+        crop['generation_status'] = estados[crop['numero']]
 
     return render_template('sensores.html', cultivos=cultivos_del_usuario, has_cultivos=has_cultivos, tipo_usuario=tipo_usuario, active='sensores_route')
 
@@ -557,7 +616,7 @@ def control_generacion_datos():
 
     # Verificar la autorización del usuario para el cultivo dado
     authorized = False
-    conn = sqlite3.connect(cultivos.DATABASE)
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
     cursor = conn.cursor()
     if tipo_usuario == 'agronomo':
         cursor.execute("SELECT id FROM cultivos WHERE numero = ? AND agronomist_id = ?", (numero_cultivo, user_id))
@@ -573,20 +632,15 @@ def control_generacion_datos():
         return jsonify({"message": "No tiene permiso para controlar la generación de datos para este cultivo."}), 403
 
     if action == 'start':
-        if sensores.get_data_generation_status(numero_cultivo) == 'stopped':
-            sensores.set_data_generation_status(numero_cultivo, 'running')
-            # Iniciar un nuevo hilo para la generación continua
-            thread = threading.Thread(target=run_continuous_generation, args=(numero_cultivo, user_id, tipo_usuario))
-            thread.daemon = True # Permite que el programa principal se cierre incluso si los hilos están corriendo
-            thread.start()
-            data_generation_threads[numero_cultivo] = thread
+        # El primer ciclo corre de inmediato en este proceso; después, al intervalo de muestreo del cultivo
+        if coordinador_generacion.iniciar_cultivo(numero_cultivo, user_id, tipo_usuario):
             return jsonify({"message": f"Generación de datos iniciada para el cultivo {numero_cultivo}"}), 200
         else:
             return jsonify({"message": f"La generación de datos ya está en marcha para el cultivo {numero_cultivo}"}), 200
     elif action == 'stop':
-        if sensores.get_data_generation_status(numero_cultivo) == 'running':
-            sensores.set_data_generation_status(numero_cultivo, 'stopped')
-            # El hilo se detendrá naturalmente después de la próxima iteración de su bucle
+        # Se da de baja ya, en el proceso que sea; un ciclo que esté corriendo termina pero no se repite
+        olvidar_generacion(numero_cultivo)
+        if coordinador_generacion.detener_cultivo(numero_cultivo):
             return jsonify({"message": f"Generación de datos detenida para el cultivo {numero_cultivo}"}), 200
         else:
             return jsonify({"message": f"La generación de datos ya está detenida para el cultivo {numero_cultivo}"}), 200
@@ -594,6 +648,63 @@ def control_generacion_datos():
         return jsonify({"message": "Acción no válida. Use 'start' o 'stop'."}), 400
 
 
+# Carga de un lote de lecturas de varios cultivos (p. ej. desde una pasarela de campo
+# con datos acumulados): una sola transacción y una evaluación de alertas por lote.
+# Acepta JSON o registros binarios de 36 bytes (application/octet-stream, ver module/binario.py)
+@app.route('/api/sensores/batch', methods=['POST'])
+def guardar_lote_sensores():
+    if 'usuario' not in session:
+        return jsonify({"message": "No autorizado"}), 401
+
+    user_info = session['usuario']
+    permitidos = None
+    if user_info['tipo_usuario'] != 'admin':
+        permitidos = {c['numero'] for c in cultivos.listar_cultivos(user_info['id'], user_info['tipo_usuario'])}
+    if request.mimetype == binario.TIPO_CONTENIDO:
+        return sensores.guardar_lote_binario_api(request.get_data(), permitidos)
+    return sensores.guardar_lote_api(request.get_json(silent=True), permitidos)
+
+
+# Igual que /api/sensores/batch pero en NDJSON (una lectura por línea) leído del
+# cuerpo a medida que llega: para subir respaldos grandes sin cargarlos en memoria.
+# Responde un acuse NDJSON por cada bloque confirmado.
+@app.route('/api/sensores/stream', methods=['POST'])
+def guardar_flujo_sensores():
+    if 'usuario' not in session:
+        return jsonify({"message": "No autorizado"}), 401
+
+    user_info = session['usuario']
+    permitidos = None
+    if user_info['tipo_usuario'] != 'admin':
+        permitidos = {c['numero'] for c in cultivos.listar_cultivos(user_info['id'], user_info['tipo_usuario'])}
+    return sensores.guardar_flujo_api(request.stream, permitidos)
+
+
+# Estado de la ingesta para monitoreo (solo admin): lecturas pendientes en la cola
+# del escritor, si está saturado, cargas en curso, lecturas rechazadas o descartadas,
+# eventos pendientes en el bus, generación continua y consultas del clima
+@app.route('/api/ingesta/estado', methods=['GET'])
+def estado_ingesta():
+    if 'usuario' not in session:
+        return jsonify({"message": "No autorizado"}), 401
+    if session['usuario']['tipo_usuario'] != 'admin':
+        return jsonify({"message": "Acceso denegado"}), 403
+    return jsonify(dict(sensores.estado_ingesta(), pasarela=pasarela.estadisticas(), eventos=eventos.estadisticas(),
+                        generacion=coordinador_generacion.estadisticas(), clima=sensores.estado_clima())), 200
+
+
+# Última lectura de todos los cultivos visibles para el usuario, en una sola petición
+@app.route('/api/sensores/ultimas', methods=['GET'])
+@base_datos.solo_lectura()
+def obtener_ultimas_lecturas_api():
+    if 'usuario' not in session:
+        return jsonify({"message": "No autorizado"}), 401
+
+    user_info = session['usuario']
+    visibles = cultivos.listar_cultivos(user_info['id'], user_info['tipo_usuario'])
+    return jsonify(sensores.obtener_ultimas_lecturas([c['numero'] for c in visibles]))
+
+
 # Endpoint para obtener el histórico de datos para un cultivo específico
 # NOTA: Este endpoint originalmente devolvía solo el último dato.
 # La función obtener_datos_sensores de app.py llama a sensores.obtener_datos_por_cultivo.
@@ -608,7 +719,7 @@ def obtener_datos_sensores(numero_cultivo):
     tipo_usuario = user_info['tipo_usuario']
 
     # Verificar permisos según el tipo de usuario
-    conn = sqlite3.connect(cultivos.DATABASE)
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     authorized = False
@@ -646,6 +757,7 @@ def obtener_datos_sensores(numero_cultivo):
 
 # --- NUEVA RUTA PARA OBTENER DATOS HISTÓRICOS DE SENSORES ---
 @app.route('/api/sensores/<numero_cultivo>/historial', methods=['GET'])
+@base_datos.solo_lectura()
 def obtener_historial_sensores_api(numero_cultivo):
     if 'usuario' not in session:
         return jsonify({"message": "No autorizado"}), 401
@@ -655,7 +767,7 @@ def obtener_historial_sensores_api(numero_cultivo):
     tipo_usuario = user_info['tipo_usuario']
 
     # Verificar si el usuario tiene permiso para ver el historial de este cultivo
-    conn = sqlite3.connect(cultivos.DATABASE)
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -675,8 +787,63 @@ def obtener_historial_sensores_api(numero_cultivo):
     if not authorized:
         return jsonify({"message": "No tiene permiso para ver el historial de este cultivo."}), 403
 
+    # Rango opcional: ?desde=<ms>&hasta=<ms>&limite=N (los días antiguos salen del archivo columnar)
+    try:
+        desde = int(request.args['desde']) if 'desde' in request.args else None
+        hasta = int(request.args['hasta']) if 'hasta' in request.args else None
+        limite = int(request.args.get('limite', 20))
+    except ValueError:
+        return jsonify({"message": "Los parámetros desde, hasta y limite deben ser enteros."}), 400
+
     # Llama a la nueva función de sensores.py para obtener el historial
-    return sensores.obtener_historial_datos_cultivo_api(numero_cultivo)
+    return sensores.obtener_historial_datos_cultivo_api(numero_cultivo, limit=limite, desde=desde, hasta=hasta)
+
+
+# Estadísticas de una ventana larga (por defecto los últimos 30 días) leídas
+# de los agregados por hora y día, sin recorrer las lecturas una a una.
+# Parámetros opcionales: ?dias=N o ?desde=<ms>&hasta=<ms>
+@app.route('/api/sensores/<numero_cultivo>/estadisticas', methods=['GET'])
+@base_datos.solo_lectura()
+def obtener_estadisticas_sensores_api(numero_cultivo):
+    if 'usuario' not in session:
+        return jsonify({"message": "No autorizado"}), 401
+
+    user_info = session['usuario']
+    user_id = user_info['id']
+    tipo_usuario = user_info['tipo_usuario']
+
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
+    cursor = conn.cursor()
+    authorized = False
+    if tipo_usuario == 'agricultor':
+        cursor.execute("SELECT id FROM cultivos WHERE numero = ? AND usuario_id = ?", (numero_cultivo, user_id))
+        if cursor.fetchone():
+            authorized = True
+    elif tipo_usuario == 'agronomo':
+        cursor.execute("SELECT id FROM cultivos WHERE numero = ? AND agronomist_id = ?", (numero_cultivo, user_id))
+        if cursor.fetchone():
+            authorized = True
+    elif tipo_usuario == 'admin':
+        authorized = True
+    conn.close()
+
+    if not authorized:
+        return jsonify({"message": "No tiene permiso para ver las estadísticas de este cultivo."}), 403
+
+    try:
+        hasta = int(request.args.get('hasta', base_datos.epoch_ms()))
+        if 'desde' in request.args:
+            desde = int(request.args['desde'])
+        else:
+            desde = hasta - int(request.args.get('dias', 30)) * 24 * 3600 * 1000
+    except ValueError:
+        return jsonify({"message": "Los parámetros desde, hasta y dias deben ser enteros."}), 400
+
+    return jsonify({
+        "desde": desde,
+        "hasta": hasta,
+        "estadisticas": agregados.obtener_estadisticas(numero_cultivo, desde, hasta)
+    })
 
 
 # El endpoint /generar_datos ya no es estrictamente necesario para la generación continua,
@@ -705,13 +872,13 @@ def generar_datos():
         return jsonify({"message": "Falta el parámetro: numero_cultivo"}), 400
 
     # Evitar la generación manual si la generación continua ya está en ejecución
-    if sensores.get_data_generation_status(numero_cultivo) == 'running':
+    if coordinador_generacion.estado(numero_cultivo) == 'running':
         return jsonify({"message": f"La generación continua de datos ya está activa para el cultivo {numero_cultivo}. Deténgala para generar datos manualmente."}), 409
 
 
     # Verificar si el usuario tiene permiso para generar datos para este cultivo
     authorized = False
-    conn = sqlite3.connect(cultivos.DATABASE)
+    conn = base_datos.obtener_conexion(cultivos.DATABASE)
     cursor = conn.cursor()
     if tipo_usuario == 'agronomo':
         cursor.execute("SELECT id FROM cultivos WHERE numero = ? AND agronomist_id = ?", (numero_cultivo, user_id))
@@ -739,7 +906,7 @@ def login_admin():
         if not nombre or not contrasena:
             return render_template('login_admin.html', error="Debes ingresar nombre y contraseña.")
 
-        conn = sqlite3.connect("users.db")
+        conn = base_datos.obtener_conexion("users.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         # Se selecciona el usuario que tenga tipo 'ADMIN' y la contraseña se compara como texto plano
@@ -785,7 +952,7 @@ def register_admin():
         if not nombre or not contrasena or not correo:
             return render_template('register_admin.html', error="Faltan datos")
 
-        conn = sqlite3.connect("users.db")
+        conn = base_datos.obtener_conexion("users.db")
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         # Se verifica que el correo no esté ya registrado
@@ -839,7 +1006,7 @@ def editar_perfil():
     if not nombre or not correo or not contrasena_actual:
         return jsonify({"message": "Todos los campos son obligatorios"}), 400
 
-    conn = sqlite3.connect("users.db")
+    conn = base_datos.obtener_conexion("users.db")
     cursor = conn.cursor()
 
     cursor.execute("SELECT contrasena FROM usuarios WHERE id = ?", (usuario['id'],))
@@ -890,7 +1057,7 @@ def cambiar_password():
     if nueva_contrasena != confirmar_contrasena:
         return jsonify({"message": "Las contraseñas no coinciden"}), 400
 
-    conn = sqlite3.connect("users.db")
+    conn = base_datos.obtener_conexion("users.db")
     cursor = conn.cursor()
 
     cursor.execute("SELECT contrasena FROM usuarios WHERE id = ?", (usuario['id'],))
@@ -950,7 +1117,7 @@ def gestionar_alertas():
             except ValueError:
                 return jsonify({"message": "El umbral debe ser un número"}), 400
 
-            conn = sqlite3.connect("users.db")
+            conn = base_datos.obtener_conexion("users.db")
             cursor = conn.cursor()
             try:
                 # Se elimina usuario_id ya que las alertas son globales
@@ -959,6 +1126,7 @@ def gestionar_alertas():
                     VALUES (?, ?, ?, ?)
                 ''', (tipo_alerta, umbral, condicion, True))
                 conn.commit()
+                eventos.publicar(eventos.REGLA_CAMBIADA, alerta_id=cursor.lastrowid, accion="creada")
                 return jsonify({"message": "Alerta agregada exitosamente"}), 201  # 201 Created
             except sqlite3.Error as e:
                 conn.rollback()
@@ -966,36 +1134,19 @@ def gestionar_alertas():
             finally:
                 conn.close()
         # Método GET: Se obtienen todas las alertas de forma global
-        conn = sqlite3.connect("users.db")
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM alertas')
-        alertas = cursor.fetchall()
-        conn.close()
-
-        return render_template('alertas.html', alertas=alertas)
+        return render_template('alertas.html', alertas=alertas.obtener_reglas())
 
 
 # Ruta para ver el historial de alertas (Jinja2 template)
 @app.route('/historial_alertas')
+@base_datos.solo_lectura()
 def historial_alertas():
     if 'usuario' not in session:
         return redirect(url_for('login'))
 
     user_id = session['usuario']['id']
-    conn = sqlite3.connect("users.db")
-    conn.row_factory = sqlite3.Row  # Permite acceder a columnas por nombre
-    cursor = conn.cursor()
     # Se filtra el historial por usuario_id o agronomist_id
-    cursor.execute('''
-        SELECT ha.fecha, a.tipo_alerta, a.umbral
-        FROM historial_alertas ha
-        JOIN alertas a ON ha.alerta_id = a.id
-        WHERE ha.usuario_id = ? OR ha.agronomist_id = ?
-        ORDER BY ha.fecha DESC
-    ''', (user_id, user_id))
-    historial = cursor.fetchall()
-    conn.close()
+    historial = alertas.obtener_historial_usuario(user_id)
 
     return render_template('historial_alertas.html', historial=historial, active='historial_alertas')
 
@@ -1010,7 +1161,7 @@ def preferencias_notificacion():
     email_preferencia = data.get('email')
     notificaciones_activas = data.get('notificaciones')
     DATABASE = "users.db"
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     try:
         cursor.execute("""
@@ -1029,70 +1180,43 @@ def preferencias_notificacion():
 
 # Endpoint para obtener notificaciones (para el centro de notificaciones JS)
 @app.route('/api/notificaciones', methods=['GET'])
+@base_datos.solo_lectura()
 def obtener_notificaciones():
     if 'usuario' not in session:
         return jsonify({"message": "No autorizado"}), 401
 
     user_id = session['usuario']['id']
-    conn = sqlite3.connect("users.db")
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    # Se modificó para incluir la verificación tanto de usuario_id como de agronomist_id
-    cursor.execute('''
-        SELECT ha.fecha, a.tipo_alerta, a.umbral
-        FROM historial_alertas ha
-        JOIN alertas a ON ha.alerta_id = a.id
-        WHERE ha.usuario_id = ? OR ha.agronomist_id = ?
-        ORDER BY ha.fecha DESC
-        LIMIT 10
-    ''', (user_id, user_id))
-    notificaciones = cursor.fetchall()
-    conn.close()
+    # Las 10 más recientes, tanto por usuario_id como por agronomist_id
+    notificaciones = alertas.obtener_notificaciones(user_id, 10)
 
-    return jsonify([dict(row) for row in notificaciones]), 200
+    return jsonify(notificaciones), 200
 
 
 # Endpoint API para obtener historial de alertas en formato JSON (para la tabla JS)
 # Endpoint API para obtener historial de alertas en formato JSON (para la tabla JS)
 @app.route('/api/historial_alertas', methods=['GET'])
+@base_datos.solo_lectura()
 def api_historial_alertas():
     if 'usuario' not in session:
         return jsonify({"message": "No autorizado"}), 401
 
     user_id = session['usuario']['id']
-    conn = sqlite3.connect("users.db")
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
     try:
-        # Depuración: Mostrar la estructura de la tabla 'alertas'
-        cursor.execute("PRAGMA table_info(alertas)")
-        columnas_alertas = [row["name"] for row in cursor.fetchall()]
-        print("Columnas en 'alertas':", columnas_alertas)
-
-        # Depuración: Mostrar la estructura de la tabla 'historial_alertas'
-        cursor.execute("PRAGMA table_info(historial_alertas)")
-        columnas_historial = [row["name"] for row in cursor.fetchall()]
-        print("Columnas en 'historial_alertas':", columnas_historial)
-
-        # Ejecutar la consulta SQL
-        cursor.execute('''
-            SELECT ha.fecha, a.tipo_alerta, a.umbral,a.condicion, ha.valor_sensor, ha.numero_cultivo
-            FROM historial_alertas ha
-            JOIN alertas a ON ha.alerta_id = a.id
-            WHERE ha.usuario_id = ? OR ha.agronomist_id = ?
-            ORDER BY ha.fecha DESC
-        ''', (user_id, user_id))
-        historial = cursor.fetchall()
+        historial_list = alertas.obtener_historial_usuario(user_id)
     except Exception as e:
         print("Error en la consulta SQL:", e)
-        conn.close()
         return jsonify({"message": "Error en la consulta SQL", "error": str(e)}), 500
 
-    conn.close()
-    historial_list = [dict(row) for row in historial]
     return jsonify(historial_list)
 
+# Alertas en vivo (Server-Sent Events) de los cultivos del usuario, sin consultar el historial
+@app.route('/api/alertas/stream', methods=['GET'])
+def flujo_alertas():
+    if 'usuario' not in session:
+        return jsonify({"message": "No autorizado"}), 401
+    user_info = session['usuario']
+    return alertas.flujo_alertas_api(user_info['id'], user_info['tipo_usuario'] == 'admin')
+
 @app.route('/alertas/eliminar/<int:alerta_id>', methods=['POST'])
 def eliminar_alerta(alerta_id):
     # Verificar si el usuario está autenticado
@@ -1105,13 +1229,14 @@ def eliminar_alerta(alerta_id):
         return jsonify({"message": "Acceso denegado"}), 403
     
     try:
-        conn = sqlite3.connect("users.db")
+        conn = base_datos.obtener_conexion("users.db")
         cursor = conn.cursor()
         cursor.execute("DELETE FROM alertas WHERE id = ?", (alerta_id,))
         if cursor.rowcount == 0:
             # Si no se encontró la alerta
             return jsonify({"message": "Alerta no encontrada"}), 404
         conn.commit()
+        eventos.publicar(eventos.REGLA_CAMBIADA, alerta_id=alerta_id, accion="eliminada")
         return jsonify({"message": "Alerta eliminada correctamente"}), 200
     except sqlite3.Error as e:
         conn.rollback()
@@ -1121,6 +1246,7 @@ def eliminar_alerta(alerta_id):
 
 # Ruta principal para mostrar datos avanzados
 @app.route('/datos_avanzados', methods=['GET'])
+@base_datos.solo_lectura()
 def mostrar_datos_avanzados():
     if 'usuario' not in session:
         return redirect(url_for('login'))
@@ -1133,19 +1259,7 @@ def mostrar_datos_avanzados():
         flash('Acceso denegado: Esta sección es exclusiva para agrónomos y administradores.', 'error')
         return redirect(url_for('sensores_route'))  # O cualquier otra página que tengas
 
-    user_id = user_info['id']
-    
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    if tipo_usuario == 'agronomo':
-        cursor.execute("SELECT numero, tipo, ciudad FROM cultivos WHERE agronomist_id = ?", (user_id,))
-    else:  # admin
-        cursor.execute("SELECT numero, tipo, ciudad FROM cultivos")
-    
-    cultivos_disponibles = cursor.fetchall()
-    conn.close()
+    cultivos_disponibles = cultivos.listar_cultivos(user_info['id'], tipo_usuario)
 
     selected_cultivo = request.args.get('cultivo') or (cultivos_disponibles[0]['numero'] if cultivos_disponibles else None)
 
@@ -1156,6 +1270,7 @@ def mostrar_datos_avanzados():
 
 # API para obtener datos avanzados
 @app.route('/api/datos_avanzados/<numero_cultivo>', methods=['GET'])
+@base_datos.solo_lectura()
 def obtener_datos_avanzados_api(numero_cultivo):
     if 'usuario' not in session:
         return jsonify({"error": "No autorizado"}), 401
@@ -1165,7 +1280,7 @@ def obtener_datos_avanzados_api(numero_cultivo):
     tipo_usuario = user_info['tipo_usuario']
     user_id = user_info['id']
     
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     
     authorized = False
@@ -1236,7 +1351,7 @@ def generar_datos_avanzados_api(numero_cultivo):
     tipo_usuario = user_info['tipo_usuario']
     user_id = user_info['id']
     
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     
     authorized = False
@@ -1259,27 +1374,21 @@ def generar_datos_avanzados_api(numero_cultivo):
 
 # TENDENCIA HUMEDAD
 @app.route('/api/datos_avanzados/historial_humedad/<numero_cultivo>', methods=['GET'])
+@base_datos.solo_lectura()
 def obtener_historial_humedad(numero_cultivo):
     if 'usuario' not in session:
         return jsonify({"error": "No autorizado"}), 401
     
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT humedad_suelo, timestamp 
-        FROM datos_sensores 
-        WHERE numero_cultivo = ? 
-        AND humedad_suelo IS NOT NULL
-        ORDER BY timestamp DESC
-        LIMIT 30
-    """, (numero_cultivo,))
-    
-    historial = cursor.fetchall()
+    historial = archivo.consultar_lecturas(
+        cursor, numero_cultivo, ("humedad_suelo",),
+        descendente=True, limite=30, no_nulo="humedad_suelo"
+    )
     conn.close()
     
-    return jsonify([{"valor": row["humedad_suelo"], "fecha": row["timestamp"]} for row in historial])
+    return jsonify([{"valor": valor, "fecha": base_datos.formatear_epoch_ms(ts)} for ts, valor in historial])
 
 # NUEVA RUTA PARA ELIMINAR CHAT 
 @app.route('/chat/eliminar/<conversacion_id>', methods=['POST'])
@@ -0,0 +1,79 @@
+# benchmarks/bench_binario.py
+#----> TERMINAL: python benchmarks/bench_binario.py [lecturas]
+"""
+Interpretación de un lote de lecturas: JSON frente al formato binario.
+
+Ambos caminos parten del cuerpo de la petición y terminan en las filas que
+insertan las rutas de lote, (cultivo_id, ts, valores):
+  - JSON: json.loads del cuerpo con la forma de generate_data (dict
+    'nutrientes' anidado, números en texto) y sensores._validar_lectura.
+  - binario: binario.decodificar (struct.iter_unpack, o numpy.frombuffer si
+    está instalado) y el dict de valores por parámetro.
+No toca la base de datos; se informa el tamaño del cuerpo y lecturas/s.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import agregados, binario, sensores  # noqa: E402
+
+REPETICIONES = 5
+
+
+def generar(lecturas, cultivos=100):
+    aleatorio = random.Random(3)
+    ts = 1717250000000
+    filas = []
+    for i in range(lecturas):
+        filas.append((i % cultivos + 1, ts + i, round(aleatorio.uniform(20, 80), 2), round(aleatorio.uniform(5, 8), 2),
+                      round(aleatorio.uniform(5, 35), 2), round(aleatorio.uniform(0, 200), 1),
+                      round(aleatorio.uniform(0, 200), 1), round(aleatorio.uniform(0, 200), 1)))
+    cuerpo_json = json.dumps([{
+        "numero_cultivo": f"AGRO-1-{c}", "ts": ts, "humedad_suelo": h, "ph_suelo": ph,
+        "temperatura_ambiente": t, "nutrientes": {"N": n, "P": p, "K": k},
+    } for c, ts, h, ph, t, n, p, k in filas]).encode()
+    return cuerpo_json, binario.empaquetar(filas), {f"AGRO-1-{c}": c for c in range(1, cultivos + 1)}
+
+
+def filas_json(cuerpo, ids):
+    ahora = int(time.time() * 1000)
+    return [sensores._validar_lectura(l, ids, None, {}, ahora) for l in json.loads(cuerpo)]
+
+
+def filas_binario(cuerpo):
+    return [(c, ts, dict(zip(agregados.PARAMETROS, valores))) for c, ts, valores in binario.decodificar(cuerpo)]
+
+
+def medir(funcion, *argumentos):
+    mejor = float("inf")
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion(*argumentos)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    lecturas = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cuerpo_json, cuerpo_binario, ids = generar(lecturas)
+    assert [f[:2] for f in filas_json(cuerpo_json, ids)] == [f[:2] for f in filas_binario(cuerpo_binario)]
+
+    casos = {
+        "JSON (json.loads + validación)": (len(cuerpo_json), medir(filas_json, cuerpo_json, ids)),
+        "binario, solo decodificar": (len(cuerpo_binario), medir(binario.decodificar, cuerpo_binario)),
+        "binario (decodificar + filas)": (len(cuerpo_binario), medir(filas_binario, cuerpo_binario)),
+    }
+    print(f"{lecturas} lecturas, mejor de {REPETICIONES}; decodificador binario: "
+          f"{'numpy.frombuffer' if binario.np is not None else 'struct.iter_unpack'}")
+    print(f"{'camino':<34}{'bytes/lectura':>14}{'ms':>10}{'lecturas/s':>14}")
+    for camino, (tamano, segundos) in casos.items():
+        print(f"{camino:<34}{tamano / lecturas:>14.1f}{segundos * 1000:>10.1f}{lecturas / segundos:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_conexiones.py
+#----> TERMINAL: python benchmarks/bench_conexiones.py [lecturas]
+"""
+Compara cuántas conexiones SQLite cuesta cada lectura de sensor con el
+comportamiento original (una conexión nueva por función) y con el pool de
+module/base_datos.py.
+
+Cada "lectura" es lo que hace el sistema en producción: guardar_datos()
+(inserción + verificar_alertas) seguido del sondeo del panel
+(último dato + historial). Se ejecuta sobre una base temporal.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, alertas  # noqa: E402
+
+NUMERO_CULTIVO = "AGRO-1-1"
+
+
+def preparar_base():
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    alertas.crear_tabla_alertas()
+    alertas.crear_tabla_historial_alertas()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agro', 'b@x.cl', 'agronomo', 'b@x.cl')")
+    conn.execute("""
+        INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id, agronomist_id)
+        VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1, 2)
+    """, (NUMERO_CULTIVO,))
+    # Regla activa que nunca se cumple: se evalúa en cada lectura sin enviar correos
+    conn.execute("INSERT INTO alertas (tipo_alerta, umbral, condicion, activa) VALUES ('temperatura_ambiente', 1000, '>', 1)")
+    conn.commit()
+    conn.close()
+
+
+def una_lectura(i):
+    datos = {
+        "humedad_suelo": 40.0 + i % 10,
+        "ph_suelo": 6.5,
+        "temperatura_ambiente": 20.0 + i % 5,
+        "nutrientes": {"N": 60.0, "P": 35.0, "K": 90.0},
+    }
+    sensores.guardar_datos(datos, NUMERO_CULTIVO)
+    sensores.obtener_datos_por_cultivo_raw(NUMERO_CULTIVO)
+    sensores.obtener_historial_datos_sensores(NUMERO_CULTIVO)
+
+
+def medir(perfil, pool, lecturas):
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.chdir(carpeta)
+        base_datos.configurar(perfil=perfil, pool=pool)
+        preparar_base()
+        base_datos.reiniciar_estadisticas()
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(lecturas):
+                una_lectura(i)
+        duracion = time.perf_counter() - inicio
+        base_datos.cerrar_conexiones()
+        os.chdir(RAIZ)
+    stats = base_datos.estadisticas()
+    return {
+        "conexiones_por_lectura": stats["conexiones_abiertas"] / lecturas,
+        "prestamos_por_lectura": stats["prestamos"] / lecturas,
+        "lecturas_por_segundo": lecturas / duracion,
+    }
+
+
+def main():
+    lecturas = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    resultados = {
+        "antes (legado, sin pool)": medir("legado", False, lecturas),
+        "después (rendimiento, pool)": medir("rendimiento", True, lecturas),
+    }
+
+    print(f"{lecturas} lecturas (guardar_datos + sondeo del panel)")
+    print(f"{'modo':<30}{'conexiones/lectura':>20}{'préstamos/lectura':>20}{'lecturas/s':>14}")
+    for modo, r in resultados.items():
+        print(f"{modo:<30}{r['conexiones_por_lectura']:>20.2f}{r['prestamos_por_lectura']:>20.2f}{r['lecturas_por_segundo']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_escritor.py
+#----> TERMINAL: python benchmarks/bench_escritor.py [segundos] [perfil] [intervalo_ms]
+"""
+Lecturas por segundo y latencia de commit con y sin el escritor agrupado.
+
+Un hilo por cultivo llama a guardar_datos() en bucle (10, 100 y 1000
+cultivos). Sin escritor cada lectura hace su propio commit y los hilos se
+disputan el bloqueo de escritura; con él cada hilo espera el Future de su
+lectura y un solo hilo confirma todo el lote. Se ejecuta sobre una base
+temporal; con el perfil "seguro" (synchronous=FULL) se ve el costo del fsync.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, alertas  # noqa: E402
+
+
+def preparar_base(cultivos_totales):
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    alertas.crear_tabla_alertas()
+    alertas.crear_tabla_historial_alertas()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.executemany("""
+        INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+        VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+    """, [(f"AGRO-1-{i}",) for i in range(1, cultivos_totales + 1)])
+    conn.commit()
+    conn.close()
+
+
+def generador(numero_cultivo, fin, latencias, errores):
+    datos = {"humedad_suelo": 40.0, "ph_suelo": 6.5, "temperatura_ambiente": 20.0,
+             "nutrientes": {"N": 60.0, "P": 35.0, "K": 90.0}}
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        try:
+            resultado = sensores.guardar_datos(datos, numero_cultivo)
+            if hasattr(resultado, "result"):
+                resultado.result()
+        except Exception:  # database is locked: lectura perdida
+            errores.append(1)
+            continue
+        # Con el escritor, incluye la espera hasta el commit del lote
+        latencias.append(time.perf_counter() - inicio)
+
+
+def percentil(valores, p):
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(perfil, intervalo_ms, segundos, total_cultivos):
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.chdir(carpeta)
+        base_datos.configurar(perfil=perfil, pool=True)
+        preparar_base(total_cultivos)
+        escritor = sensores.iniciar_escritor(intervalo_ms=intervalo_ms)
+        latencias, errores = [], []
+        fin = time.perf_counter() + segundos
+        hilos = [threading.Thread(target=generador, args=(f"AGRO-1-{i}", fin, latencias, errores))
+                 for i in range(1, total_cultivos + 1)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            sensores.detener_escritor()
+        base_datos.cerrar_conexiones()
+        os.chdir(RAIZ)
+    estadisticas = escritor.estadisticas() if escritor else {}
+    return {
+        "lecturas_s": len(latencias) / segundos,
+        "p50_ms": percentil(latencias, 0.50) * 1000,
+        "p99_ms": percentil(latencias, 0.99) * 1000,
+        "errores": len(errores),
+        "lotes": estadisticas.get("lotes", len(latencias)),
+        "commit_ms": estadisticas.get("ms_commit_promedio", float("nan")),
+    }
+
+
+def main():
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    perfil = sys.argv[2] if len(sys.argv) > 2 else "seguro"
+    intervalo_ms = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    print(f"{segundos:g} s por caso, perfil '{perfil}', escritor cada {intervalo_ms} ms")
+    print(f"{'cultivos':>9}  {'modo':<12}{'lecturas/s':>12}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'errores':>9}{'commits':>9}{'ms/commit':>11}")
+    for total in (10, 100, 1000):
+        for modo, intervalo in (("directo", 0), ("agrupado", intervalo_ms)):
+            r = medir(perfil, intervalo, segundos, total)
+            print(f"{total:>9}  {modo:<12}{r['lecturas_s']:>12.0f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                  f"{r['errores']:>9}{r['lotes']:>9}{r['commit_ms']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
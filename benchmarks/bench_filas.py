@@ -0,0 +1,99 @@
+# benchmarks/bench_filas.py
+#----> TERMINAL: python benchmarks/bench_filas.py [repeticiones]
+"""
+Mide cuánto tiempo se va en construir filas a partir de las tuplas de SQLite,
+separado del tiempo de la consulta.
+
+Compara las formas que usaba el código (sqlite3.Row + dict(), copiar campo a
+campo, dict(zip(...))) con los mapeadores compilados de module/repositorios.py,
+sobre las lecturas de sensores (8 columnas planas) y los datos avanzados
+(38 columnas en diccionarios anidados).
+"""
+import os
+import sqlite3
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import repositorios  # noqa: E402
+
+FILAS = 1000
+
+
+def preparar(columnas):
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE t ({', '.join(columnas)})")
+    conn.executemany(
+        f"INSERT INTO t VALUES ({', '.join('?' * len(columnas))})",
+        [tuple(float(i + j) for j in range(len(columnas))) for i in range(FILAS)],
+    )
+    return conn, f"SELECT {', '.join(columnas)} FROM t"
+
+
+def medir(conn, sql, construir, row_factory, repeticiones):
+    conn.row_factory = row_factory
+    # Solo la consulta, para descontarla del total
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        conn.execute(sql).fetchall()
+    base = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        list(map(construir, conn.execute(sql).fetchall()))
+    total = time.perf_counter() - inicio
+    return max(total - base, 0.0) / (repeticiones * FILAS) * 1e9, total / (repeticiones * FILAS) * 1e9
+
+
+def casos_lecturas():
+    columnas = repositorios.RepositorioLecturas.COLUMNAS
+
+    def campo_a_campo(fila):
+        return {c: fila[c] for c in columnas}
+
+    return columnas, {
+        "sqlite3.Row + dict()": (dict, sqlite3.Row),
+        "campo a campo (Row)": (campo_a_campo, sqlite3.Row),
+        "dict(zip(...))": (lambda fila: dict(zip(columnas, fila)), None),
+        "mapeador compilado": (repositorios.compilar_mapeador(columnas), None),
+    }
+
+
+def casos_avanzados():
+    columnas = repositorios.RepositorioDatosAvanzados.COLUMNAS
+    estructura = repositorios._ESTRUCTURA_AVANZADOS
+
+    def a_mano(fila):
+        # Lo que hacía obtener_datos_avanzados: un bucle por parámetro y estadística
+        resultado = {}
+        for clave, valor in estructura.items():
+            if isinstance(valor, dict):
+                resultado[clave] = {e: fila[c] for e, c in valor.items()}
+            else:
+                resultado[clave] = fila[valor]
+        return resultado
+
+    return columnas, {
+        "a mano (Row)": (a_mano, sqlite3.Row),
+        "mapeador compilado": (repositorios.compilar_mapeador_anidado(estructura, columnas), None),
+    }
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for titulo, (columnas, casos) in (("lecturas_sensores", casos_lecturas()),
+                                      ("datos_avanzados", casos_avanzados())):
+        conn, sql = preparar(columnas)
+        print(f"{titulo}: {FILAS} filas x {repeticiones} repeticiones, {len(columnas)} columnas")
+        print(f"{'método':<26}{'ns/fila (filas)':>18}{'ns/fila (total)':>18}")
+        for nombre, (construir, row_factory) in casos.items():
+            filas, total = medir(conn, sql, construir, row_factory, repeticiones)
+            print(f"{nombre:<26}{filas:>18.0f}{total:>18.0f}")
+        conn.close()
+        print()
+
+
+if __name__ == "__main__":
+    main()
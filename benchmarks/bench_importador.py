@@ -0,0 +1,86 @@
+# benchmarks/bench_importador.py
+#----> TERMINAL: python benchmarks/bench_importador.py [lineas] [tamano_lote]
+"""
+Líneas por segundo al importar un volcado grande de datos_sensores.txt.
+
+Genera un archivo con el formato heredado (mezclando líneas UTF-8 y Latin-1,
+como el original) y lo importa con importador.importar_sensores sobre una base
+temporal. Se mide por separado la interpretación (lectura, decodificación y
+expresión regular) y la importación completa con escritura en SQLite.
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, importador  # noqa: E402
+
+
+def generar_archivo(ruta, lineas):
+    aleatorio = random.Random(7)
+    with open(ruta, "wb") as f:
+        for i in range(lineas):
+            grados = "°C".encode("latin-1" if i % 10 == 0 else "utf-8")
+            f.write(
+                f"Humedad: {aleatorio.uniform(20, 80):.2f}%, pH: {aleatorio.uniform(5, 8):.2f}, "
+                f"Temperatura: {aleatorio.uniform(5, 35):.2f}".encode() + grados +
+                f", Nutrientes - N: {aleatorio.uniform(0, 200):.1f}, P: {aleatorio.uniform(0, 200):.1f}, "
+                f"K: {aleatorio.uniform(0, 200):.1f}\n".encode()
+            )
+
+
+def preparar_base():
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.execute("""
+        INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+        VALUES ('AGRO-1-1', 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+    """)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    lineas = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    tamano_lote = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.chdir(carpeta)
+        base_datos.configurar(perfil="rendimiento", pool=True)
+        preparar_base()
+        ruta = os.path.join(carpeta, "datos_sensores.txt")
+        generar_archivo(ruta, lineas)
+        megabytes = os.path.getsize(ruta) / 1e6
+
+        inicio = time.perf_counter()
+        for _, _, texto, _ in importador.leer_lineas(ruta):
+            importador.interpretar_sensor(texto)
+        solo_interpretar = time.perf_counter() - inicio
+
+        desde = base_datos.epoch_ms() - lineas * 1000
+        inicio = time.perf_counter()
+        resultado = importador.importar_sensores(ruta, "AGRO-1-1", desde, intervalo_s=1, tamano_lote=tamano_lote)
+        completa = time.perf_counter() - inicio
+        base_datos.cerrar_conexiones()
+        os.chdir(RAIZ)
+
+    print(f"{lineas} líneas ({megabytes:.1f} MB), lote de {tamano_lote or importador.TAMANO_LOTE} líneas")
+    print(f"{'etapa':<34}{'segundos':>10}{'líneas/s':>12}")
+    print(f"{'leer + decodificar + interpretar':<34}{solo_interpretar:>10.2f}{lineas / solo_interpretar:>12.0f}")
+    print(f"{'importación completa (SQLite)':<34}{completa:>10.2f}{lineas / completa:>12.0f}")
+    print(f"insertadas: {resultado['insertadas']}, errores: {resultado['errores']}, "
+          f"codificaciones: {resultado['codificaciones']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_lecturas.py
+#----> TERMINAL: python benchmarks/bench_lecturas.py [segundos] [escritores] [lectores]
+"""
+Latencia de las lecturas del panel mientras los generadores escriben sin pausa.
+
+Cada escritor llama a guardar_datos() en bucle sobre su propio cultivo; cada
+lector pide el historial (la consulta de /api/sensores/<n>/historial) y se
+mide cuánto tarda cada petición. Se compara el perfil original sin WAL, WAL con
+las conexiones normales y WAL con el carril de solo lectura
+(base_datos.solo_lectura). Se ejecuta sobre una base temporal.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, alertas  # noqa: E402
+
+
+def preparar_base(cultivos_totales):
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    alertas.crear_tabla_alertas()
+    alertas.crear_tabla_historial_alertas()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.executemany("""
+        INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+        VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+    """, [(f"AGRO-1-{i}",) for i in range(1, cultivos_totales + 1)])
+    conn.commit()
+    conn.close()
+
+
+def escritor(numero_cultivo, fin, contador):
+    datos = {"humedad_suelo": 40.0, "ph_suelo": 6.5, "temperatura_ambiente": 20.0,
+             "nutrientes": {"N": 60.0, "P": 35.0, "K": 90.0}}
+    while time.perf_counter() < fin:
+        try:
+            sensores.guardar_datos(datos, numero_cultivo)
+            contador.append(1)
+        except Exception:  # database is locked: cuenta como escritura perdida
+            pass
+
+
+def lector(numero_cultivo, fin, latencias, errores, carril):
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        try:
+            with carril():
+                sensores.obtener_historial_datos_sensores(numero_cultivo, limit=50)
+        except Exception:
+            errores.append(1)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+
+
+def percentil(valores, p):
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(perfil, carril, segundos, escritores, lectores):
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.chdir(carpeta)
+        base_datos.configurar(perfil=perfil, pool=True)
+        preparar_base(escritores)
+        latencias, errores, escrituras = [], [], []
+        fin = time.perf_counter() + segundos
+        hilos = [threading.Thread(target=escritor, args=(f"AGRO-1-{i + 1}", fin, escrituras))
+                 for i in range(escritores)]
+        hilos += [threading.Thread(target=lector, args=(f"AGRO-1-{i % escritores + 1}", fin, latencias, errores, carril))
+                  for i in range(lectores)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        base_datos.cerrar_conexiones()
+        os.chdir(RAIZ)
+    return {
+        "p50_ms": percentil(latencias, 0.50) * 1000,
+        "p99_ms": percentil(latencias, 0.99) * 1000,
+        "max_ms": max(latencias, default=float("nan")) * 1000,
+        "lecturas_s": len(latencias) / segundos,
+        "errores": len(errores),
+        "escrituras_s": len(escrituras) / segundos,
+    }
+
+
+def main():
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    escritores = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    lectores = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    resultados = {
+        "legado (sin WAL)": medir("legado", contextlib.nullcontext, segundos, escritores, lectores),
+        "WAL, conexiones normales": medir("rendimiento", contextlib.nullcontext, segundos, escritores, lectores),
+        "WAL, solo lectura": medir("rendimiento", base_datos.solo_lectura, segundos, escritores, lectores),
+    }
+
+    print(f"{segundos:g} s, {escritores} escritores (guardar_datos en bucle), {lectores} lectores (historial)")
+    print(f"{'modo':<28}{'p50 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'lecturas/s':>12}{'errores':>9}{'escrituras/s':>14}")
+    for modo, r in resultados.items():
+        print(f"{modo:<28}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}"
+              f"{r['lecturas_s']:>12.0f}{r['errores']:>9}{r['escrituras_s']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/bench_motor.py
+#----> TERMINAL: python benchmarks/bench_motor.py [cultivos] [intervalo_s] [plazo_s]
+"""
+Generación continua de 5.000 cultivos con una API del clima lenta: el
+planificador de hilos frente al motor asíncrono (module/motor.py).
+
+La API se simula: el 90 % de las consultas tarda entre 50 y 300 ms y el 10 %
+se cuelga hasta el timeout de requests. Cada ciclo hace lo mismo que la
+aplicación (coordenadas, clima, valores, guardar_datos) sobre una base
+temporal. Se mide, durante tres intervalos: ciclos terminados, atraso máximo
+respecto de su hora, duración máxima de un ciclo, ejecuciones omitidas por
+atraso, cuántos ciclos usaron el clima real y los hilos vivos.
+"""
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, alertas, eventos, motor, planificador, simulador  # noqa: E402
+
+
+def preparar_base():
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    alertas.crear_tabla_alertas()
+    alertas.crear_tabla_historial_alertas()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.commit()
+    conn.close()
+
+
+def api_lenta(lat, lon, timeout=None):
+    if random.random() < 0.1:
+        time.sleep(timeout or sensores.CLIMA_TIMEOUT_S)  # requests.Timeout
+        return None, None, None
+    time.sleep(random.uniform(0.05, 0.3))
+    return 18.0, 60.0, 0.0
+
+
+def medir(caso, numeros, intervalo):
+    reales = [0]
+
+    def ciclo_hilos(numero):
+        # generate_data sin la respuesta de Flask
+        lat, lon = sensores.obtener_coordenadas_cultivo(numero)
+        clima = sensores.get_real_time_weather(lat, lon)
+        reales[0] += clima[0] is not None
+        sensores.guardar_datos(sensores._datos_simulados(*clima), numero)
+
+    if caso == "planificador":
+        ejecutor, funcion = planificador.Planificador(nombre="bench"), ciclo_hilos
+    else:
+        ejecutor, limite = motor.Motor(nombre="bench"), asyncio.Semaphore(sensores.CLIMA_SIMULTANEAS)
+
+        async def funcion(numero):
+            datos = await sensores.generar_datos_async(numero, limite)
+            reales[0] += datos is not None and datos["temperatura_ambiente"] == 18.0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Repartidos en el intervalo, como cultivos iniciados en distintos momentos
+        for i, numero in enumerate(numeros):
+            ejecutor.programar(numero, funcion, intervalo, args=(numero,), retraso=i * intervalo / len(numeros))
+        time.sleep(3 * intervalo)
+        hilos = threading.active_count()
+        estadisticas = ejecutor.estadisticas()
+        ejecutor.detener()
+    estadisticas.update(hilos=hilos, reales=reales[0])
+    return estadisticas
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    intervalo = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    if len(sys.argv) > 3:
+        sensores.CLIMA_TIMEOUT_S = float(sys.argv[3])
+    sensores.get_real_time_weather = api_lenta
+    print(f"{cantidad} cultivos, un ciclo cada {intervalo:g} s durante {3 * intervalo:g} s; "
+          f"plazo del clima {sensores.CLIMA_TIMEOUT_S:g} s, {sensores.CLIMA_SIMULTANEAS} consultas en vuelo")
+    print(f"{'caso':<14}{'ciclos':>9}{'atraso ms':>11}{'ciclo ms':>10}{'omitidas':>10}{'clima real':>12}{'hilos':>7}")
+    for caso in ("planificador", "motor"):
+        with tempfile.TemporaryDirectory() as carpeta:
+            os.chdir(carpeta)
+            base_datos.configurar(perfil="rendimiento", pool=True)
+            preparar_base()
+            simulador.crear_cultivos_simulados(cantidad, 1)
+            m = medir(caso, [f"{simulador.PREFIJO}-1-{i}" for i in range(1, cantidad + 1)], intervalo)
+            eventos.esperar()
+            base_datos.cerrar_conexiones()
+            os.chdir(RAIZ)
+        duracion = f"{m['max_duracion_ms']:.0f}" if "max_duracion_ms" in m else "-"
+        print(f"{caso:<14}{m['ejecuciones']:>9}{m['max_atraso_ms']:>11.0f}{duracion:>10}{m['omitidas']:>10}"
+              f"{m['reales']:>12}{m['hilos']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_muestreo.py
+#----> TERMINAL: python benchmarks/bench_muestreo.py [cultivos] [dias]
+"""
+Muestreo fijo cada 30 s frente al muestreo adaptativo (module/muestreo.py).
+
+La "realidad" de cada cultivo es la serie del relleno (module/relleno.py) con
+una lectura cada 10 s: ciclo diario, lluvias, secado del suelo. Cada modo
+toma de ella las lecturas que le tocan según su intervalo y se mide cuántas
+escribe por cultivo y día, y con qué retardo ve cada episodio de alerta (el
+tramo en que una regla se cumple en la serie real, uniendo los separados por
+menos de 10 minutos) de tres reglas: humedad del suelo > 70, temperatura > 28
+y pH < 6.5. Un episodio que termina antes de que lo vea ninguna lectura queda
+como perdido.
+"""
+import math
+import os
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import alertas, muestreo, relleno  # noqa: E402
+
+PASO_S = 10
+PAUSA_S = 600  # el ruido hace que un valor junto al umbral entre y salga
+CAMPOS = ("humedad_suelo", "ph_suelo", "temperatura_ambiente", "N", "P", "K")
+REGLAS = [("humedad_suelo", ">", 70.0), ("temperatura_ambiente", ">", 28.0), ("ph_suelo", "<", 6.5)]
+
+
+def muestras(lecturas, adaptativo):
+    """Índices de la serie que lee cada modo."""
+    umbrales = [(campo, umbral) for campo, _, umbral in REGLAS]
+    indices = []
+    i, intervalo, previo = 0, muestreo.INTERVALO_S, None
+    while i < len(lecturas):
+        indices.append(i)
+        if adaptativo:
+            nuevo = (i * PASO_S, lecturas[i])
+            intervalo = muestreo.siguiente_intervalo(intervalo, muestreo.INTERVALO_S, previo, nuevo, umbrales)
+            previo = nuevo
+        i += max(1, math.ceil(intervalo / PASO_S))
+    return indices
+
+
+def episodios(cumple):
+    """[(inicio, fin)] de los tramos en que se cumple, uniendo los separados por menos de PAUSA_S."""
+    tramos = []
+    i = 1
+    while i < len(cumple):
+        if cumple[i] and not cumple[i - 1]:
+            fin = i
+            while fin < len(cumple) and cumple[fin]:
+                fin += 1
+            if tramos and i - tramos[-1][1] < PAUSA_S // PASO_S:
+                tramos[-1] = (tramos[-1][0], fin)
+            else:
+                tramos.append((i, fin))
+            i = fin
+        i += 1
+    return tramos
+
+
+def deteccion(cumple, tramos, indices):
+    """Para cada episodio, la primera lectura que lo ve (None si ninguna)."""
+    vistas = []
+    siguiente = 0
+    for inicio, fin in tramos:
+        while siguiente < len(indices) and indices[siguiente] < inicio:
+            siguiente += 1
+        j = siguiente
+        while j < len(indices) and indices[j] < fin and not cumple[indices[j]]:
+            j += 1
+        vistas.append(indices[j] if j < len(indices) and indices[j] < fin else None)
+    return vistas
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    desde = relleno.MS_DIA * 20000  # 4 de octubre de 2024
+    hasta = desde + dias * relleno.MS_DIA
+    print(f"{cantidad} cultivos x {dias} días; serie real cada {PASO_S} s")
+
+    lecturas_fijo = lecturas_adaptativo = 0
+    episodios_totales = perdidos_fijo = perdidos_adaptativo = 0
+    atrasos = []  # lo que el adaptativo ve después que el fijo, por episodio, en s
+    inicio = time.perf_counter()
+    for c in range(cantidad):
+        lecturas = [dict(zip(CAMPOS, valores)) for _, valores in
+                    relleno.serie(f"SIM-1-{c}", desde, hasta, PASO_S, semilla=1)]
+        fijo, adaptativo = muestras(lecturas, False), muestras(lecturas, True)
+        lecturas_fijo += len(fijo)
+        lecturas_adaptativo += len(adaptativo)
+        for campo, condicion, umbral in REGLAS:
+            cumple = [alertas.cumple_condicion(condicion, lectura[campo], umbral) for lectura in lecturas]
+            tramos = episodios(cumple)
+            episodios_totales += len(tramos)
+            for vista_fijo, vista_adaptativo in zip(deteccion(cumple, tramos, fijo), deteccion(cumple, tramos, adaptativo)):
+                perdidos_fijo += vista_fijo is None
+                perdidos_adaptativo += vista_adaptativo is None
+                if vista_fijo is not None and vista_adaptativo is not None:
+                    atrasos.append((vista_adaptativo - vista_fijo) * PASO_S)
+
+    print(f"{'caso':<12}{'lecturas/día':>14}{'episodios':>11}{'no vistos':>11}")
+    print(f"{'fijo 30 s':<12}{lecturas_fijo / cantidad / dias:>14.0f}{episodios_totales:>11}{perdidos_fijo:>11}")
+    print(f"{'adaptativo':<12}{lecturas_adaptativo / cantidad / dias:>14.0f}{episodios_totales:>11}{perdidos_adaptativo:>11}")
+    print(f"lecturas escritas: -{100 * (1 - lecturas_adaptativo / lecturas_fijo):.0f} %")
+    atrasados = sorted(a for a in atrasos if a > 0)
+    print(f"episodios vistos por ambos: {len(atrasos)}; el adaptativo los ve igual o antes en "
+          f"{len(atrasos) - len(atrasados)}, después en {len(atrasados)}"
+          + (f" (mediana {statistics.median(atrasados):.0f} s, máx {atrasados[-1]} s)" if atrasados else ""))
+    print(f"({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
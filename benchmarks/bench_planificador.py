@@ -0,0 +1,110 @@
+# benchmarks/bench_planificador.py
+#----> TERMINAL: python benchmarks/bench_planificador.py [cultivos] [intervalo_s]
+"""
+Generación continua de 10.000 cultivos: un hilo por cultivo frente al planificador.
+
+Cada caso corre en su propio proceso para que la memoria de uno no se mezcle
+con la del otro. Se programa una tarea trivial por cultivo (el costo de
+generate_data es el mismo en ambos casos) y se mide: hilos vivos, memoria
+residente agregada, tiempo para arrancar todo, atraso máximo de las
+ejecuciones y cuánto tarda en detenerse la generación de todos los cultivos.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import planificador  # noqa: E402
+
+
+def memoria_kb():
+    with open("/proc/self/status") as estado:
+        for linea in estado:
+            if linea.startswith("VmRSS:"):
+                return int(linea.split()[1])
+    return 0
+
+
+def hilo_por_cultivo(cantidad, intervalo, trabajo):
+    # Lo que hacía run_continuous_generation: un hilo con su propio sleep
+    estado = {}
+    atrasos = []
+
+    def bucle(numero, inicio):
+        proximo = inicio
+        while estado[numero] == "running":
+            atrasos.append(time.monotonic() - proximo)
+            trabajo()
+            proximo += intervalo
+            time.sleep(intervalo)
+
+    hilos = []
+    inicio = time.perf_counter()
+    for i in range(cantidad):
+        numero = f"SIM-1-{i}"
+        estado[numero] = "running"
+        hilo = threading.Thread(target=bucle, args=(numero, time.monotonic()), daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+    arranque = time.perf_counter() - inicio
+    time.sleep(3 * intervalo)
+    medicion = {"hilos": threading.active_count(), "memoria_kb": memoria_kb(), "arranque_s": arranque,
+                "ejecuciones": len(atrasos), "max_atraso_ms": max(atrasos) * 1000}
+    inicio = time.perf_counter()
+    for numero in estado:
+        estado[numero] = "stopped"
+    for hilo in hilos:
+        hilo.join()
+    medicion["detencion_s"] = time.perf_counter() - inicio
+    return medicion
+
+
+def con_planificador(cantidad, intervalo, trabajo):
+    plan = planificador.Planificador()
+    inicio = time.perf_counter()
+    for i in range(cantidad):
+        plan.programar(f"SIM-1-{i}", trabajo, intervalo)
+    arranque = time.perf_counter() - inicio
+    time.sleep(3 * intervalo)
+    estadisticas = plan.estadisticas()
+    medicion = {"hilos": threading.active_count(), "memoria_kb": memoria_kb(), "arranque_s": arranque,
+                "ejecuciones": estadisticas["ejecuciones"], "max_atraso_ms": estadisticas["max_atraso_ms"]}
+    inicio = time.perf_counter()
+    for i in range(cantidad):
+        plan.cancelar(f"SIM-1-{i}")
+    medicion["detencion_s"] = time.perf_counter() - inicio
+    plan.detener()
+    return medicion
+
+
+def medir(caso, cantidad, intervalo):
+    base = memoria_kb()
+    funcion = hilo_por_cultivo if caso == "hilos" else con_planificador
+    medicion = funcion(cantidad, intervalo, lambda: sum(range(100)))
+    medicion["memoria_kb"] -= base
+    print(json.dumps(medicion))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("hilos", "planificador"):
+        medir(sys.argv[1], int(sys.argv[2]), float(sys.argv[3]))
+        return
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    intervalo = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    print(f"{cantidad} cultivos, una ejecución cada {intervalo:g} s durante {3 * intervalo:g} s")
+    print(f"{'caso':<18}{'hilos':>8}{'MB':>8}{'arranque s':>12}{'ejecuciones':>13}{'atraso ms':>11}{'detención s':>13}")
+    for caso in ("hilos", "planificador"):
+        salida = subprocess.run([sys.executable, __file__, caso, str(cantidad), str(intervalo)],
+                                capture_output=True, text=True, check=True).stdout
+        m = json.loads(salida.strip().splitlines()[-1])
+        print(f"{caso:<18}{m['hilos']:>8}{m['memoria_kb'] / 1024:>8.1f}{m['arranque_s']:>12.2f}"
+              f"{m['ejecuciones']:>13}{m['max_atraso_ms']:>11.0f}{m['detencion_s']:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
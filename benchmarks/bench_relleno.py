@@ -0,0 +1,77 @@
+# benchmarks/bench_relleno.py
+#----> TERMINAL: python benchmarks/bench_relleno.py [cultivos] [dias] [intervalo_s] [destino.db]
+"""
+Base de unos 10 millones de lecturas con el relleno de historia (module/relleno.py).
+
+Por defecto 100 cultivos x 70 días con una lectura por minuto. Se mide la
+generación de la serie sola y el relleno completo (inserción, particiones y
+agregados en la misma pasada). Con 'destino.db' la base se conserva ahí para
+usarla en otras mediciones; si no, se crea en una carpeta temporal.
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, alertas, relleno, simulador  # noqa: E402
+
+
+def preparar_base():
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    alertas.crear_tabla_alertas()
+    alertas.crear_tabla_historial_alertas()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 70
+    intervalo = float(sys.argv[3]) if len(sys.argv) > 3 else 60
+    destino = os.path.abspath(sys.argv[4]) if len(sys.argv) > 4 else None
+    hasta = relleno.MS_DIA * (base_datos.epoch_ms() // relleno.MS_DIA)
+    desde = hasta - dias * relleno.MS_DIA
+    total = cantidad * int(dias * relleno.MS_DIA // (intervalo * 1000))
+    print(f"{cantidad} cultivos x {dias} días cada {intervalo:g} s = {total} lecturas")
+
+    inicio = time.perf_counter()
+    por_cultivo = sum(1 for _ in relleno.serie("SIM-1-1", desde, hasta, intervalo, 1))
+    generacion = (time.perf_counter() - inicio) * cantidad
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.chdir(carpeta)
+        base_datos.configurar(perfil="rendimiento", pool=True)
+        preparar_base()
+        ids = simulador.crear_cultivos_simulados(cantidad, 1)
+        resultado = relleno.rellenar(ids, desde, hasta, intervalo, semilla=1)
+        assert resultado["insertadas"] == por_cultivo * cantidad == total
+        conn = base_datos.obtener_conexion()
+        filas_hora = conn.execute("SELECT COUNT(*) FROM agregados_hora").fetchone()[0]
+        conn.close()
+        base_datos.cerrar_conexiones()
+        tamano = os.path.getsize("users.db") / 1e6
+        if destino:
+            shutil.copy("users.db", destino)
+        os.chdir(RAIZ)
+
+    print(f"{'caso':<34}{'s':>8}{'lecturas/s':>14}")
+    print(f"{'generación de la serie':<34}{generacion:>8.1f}{total / generacion:>14.0f}")
+    print(f"{'relleno completo':<34}{resultado['segundos']:>8.1f}{total / resultado['segundos']:>14.0f}")
+    print(f"  {filas_hora} filas de agregados por hora, base de {tamano:.0f} MB"
+          + (f", guardada en {destino}" if destino else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_simulador.py
+#----> TERMINAL: python benchmarks/bench_simulador.py [cultivos] [ticks]
+"""
+Un millón de lecturas con el simulador de flota (module/simulador.py).
+
+Por defecto 10.000 cultivos x 100 ticks. Se mide por separado la generación
+(con NumPy si está instalado y cultivo por cultivo con random) y la corrida
+completa con --rapido sobre una base temporal: generación, inserción por el
+camino de los lotes, agregados y alertas (una regla activa que no se cumple).
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, alertas, eventos, simulador  # noqa: E402
+
+
+def preparar_base():
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    alertas.crear_tabla_alertas()
+    alertas.crear_tabla_historial_alertas()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.execute("INSERT INTO alertas (tipo_alerta, umbral, condicion, activa) VALUES ('humedad_suelo', 1000, '>', 1)")
+    conn.commit()
+    conn.close()
+
+
+def medir_generacion(cantidad, ticks):
+    inicio = time.perf_counter()
+    for tick in range(ticks):
+        simulador.simular_valores(cantidad, tick)
+    return time.perf_counter() - inicio
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    total = cantidad * ticks
+    print(f"{cantidad} cultivos x {ticks} ticks = {total} lecturas")
+
+    casos = {}
+    if simulador.np is not None:
+        casos["generación con NumPy"] = medir_generacion(cantidad, ticks)
+    numpy = simulador.np
+    simulador.np = None
+    # Cultivo por cultivo es mucho más lento: se mide una décima parte y se escala
+    casos["generación cultivo por cultivo"] = medir_generacion(cantidad, max(1, ticks // 10)) * ticks / max(1, ticks // 10)
+    simulador.np = numpy
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        os.chdir(carpeta)
+        base_datos.configurar(perfil="rendimiento", pool=True)
+        preparar_base()
+        ids = simulador.crear_cultivos_simulados(cantidad, 1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            estadisticas = simulador.Simulador(ids, semilla=1).ejecutar(ticks, tiempo_real=False)
+            eventos.esperar()
+        conn = base_datos.obtener_conexion()
+        assert conn.execute("SELECT COUNT(*) FROM lecturas_sensores").fetchone()[0] == total
+        conn.close()
+        os.chdir(RAIZ)
+    casos["corrida completa (--rapido)"] = estadisticas["segundos_generacion"] + estadisticas["segundos_escritura"]
+
+    print(f"{'caso':<34}{'s':>8}{'lecturas/s':>14}")
+    for caso, segundos in casos.items():
+        print(f"{caso:<34}{segundos:>8.2f}{total / segundos:>14.0f}")
+    print(f"  de la corrida completa: generación {estadisticas['segundos_generacion']:.2f} s, "
+          f"escritura {estadisticas['segundos_escritura']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
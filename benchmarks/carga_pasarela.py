@@ -0,0 +1,134 @@
+# benchmarks/carga_pasarela.py
+#----> TERMINAL: python benchmarks/carga_pasarela.py [conexiones] [lineas_por_conexion] [host:puerto token]
+"""
+Generador de carga para la pasarela de sensores (module/pasarela.py).
+
+Abre 'conexiones' conexiones TCP a la vez, cada una se autentica, envía sus
+lecturas en ráfagas de 100 líneas y termina con SYNC; el tiempo se mide hasta
+que la última conexión recibe "OK" (todas las lecturas confirmadas en SQLite).
+
+Sin dirección levanta una pasarela propia en un hilo, sobre una base temporal
+con un cultivo por conexión; con "host:puerto token" mide una pasarela ya en
+marcha (el token debe ver los cultivos AGRO-1-1 .. AGRO-1-<conexiones>).
+"""
+import asyncio
+import contextlib
+import io
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from module import base_datos, migraciones, usuarios, cultivos, sensores, alertas, pasarela  # noqa: E402
+
+RAFAGA = 100
+
+
+def preparar_base(total_cultivos):
+    usuarios.crear_base_datos()
+    cultivos.crear_tabla_cultivos()
+    sensores.crear_tabla_datos_sensores()
+    alertas.crear_tabla_alertas()
+    alertas.crear_tabla_historial_alertas()
+    pasarela.crear_tabla_dispositivos()
+    with contextlib.redirect_stdout(io.StringIO()):
+        migraciones.aplicar_migraciones()
+    conn = base_datos.obtener_conexion()
+    conn.execute("INSERT INTO usuarios (nombre, correo, tipo_usuario, email) VALUES ('agri', 'a@x.cl', 'agricultor', 'a@x.cl')")
+    conn.executemany("""
+        INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+        VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+    """, [(f"AGRO-1-{i}",) for i in range(1, total_cultivos + 1)])
+    conn.commit()
+    conn.close()
+    return pasarela.registrar_dispositivo("carga", 1)
+
+
+def pasarela_local(total_cultivos):
+    """Pasarela en un hilo propio; devuelve (puerto, token, pasarela)."""
+    token = preparar_base(total_cultivos)
+    listo = threading.Event()
+    estado = {}
+
+    def bucle():
+        async def principal():
+            estado["pasarela"] = await pasarela.Pasarela("127.0.0.1", 0).iniciar()
+            listo.set()
+            await asyncio.Event().wait()
+        asyncio.run(principal())
+
+    threading.Thread(target=bucle, daemon=True).start()
+    listo.wait()
+    return estado["pasarela"].puerto, token, estado["pasarela"]
+
+
+async def dispositivo(host, puerto, token, numero_cultivo, lineas, ts_inicial):
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    escritor.write(f"AUTH {token}\n".encode())
+    respuesta = await lector.readline()
+    if not respuesta.startswith(b"OK"):
+        raise RuntimeError(f"Autenticación rechazada: {respuesta!r}")
+    errores = 0
+    for inicio in range(0, lineas, RAFAGA):
+        escritor.write("".join(
+            f"{numero_cultivo},{ts_inicial + i},40.5,6.5,20.1,60,35,90\n"
+            for i in range(inicio, min(inicio + RAFAGA, lineas))
+        ).encode())
+        await escritor.drain()
+    escritor.write(b"SYNC\n")
+    while True:
+        respuesta = await lector.readline()
+        if not respuesta or respuesta.startswith(b"OK"):
+            break
+        errores += 1
+    escritor.close()
+    return errores
+
+
+async def generar(host, puerto, token, conexiones, lineas):
+    ts_inicial = base_datos.epoch_ms() - lineas
+    inicio = time.perf_counter()
+    errores = await asyncio.gather(*(
+        dispositivo(host, puerto, token, f"AGRO-1-{i}", lineas, ts_inicial)
+        for i in range(1, conexiones + 1)
+    ))
+    return time.perf_counter() - inicio, sum(errores)
+
+
+def main():
+    conexiones = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    lineas = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    # Cada conexión local usa dos descriptores (cliente y servidor)
+    blando, duro = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(duro, max(blando, 2 * conexiones + 100)), duro))
+
+    servidor = None
+    with tempfile.TemporaryDirectory() as carpeta:
+        if len(sys.argv) > 4:
+            host, puerto = sys.argv[3].rsplit(":", 1)
+            puerto, token = int(puerto), sys.argv[4]
+        else:
+            os.chdir(carpeta)
+            base_datos.configurar(perfil="rendimiento", pool=True)
+            host = "127.0.0.1"
+            puerto, token, servidor = pasarela_local(conexiones)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            segundos, errores = asyncio.run(generar(host, puerto, token, conexiones, lineas))
+        os.chdir(RAIZ)
+
+    total = conexiones * lineas
+    print(f"{conexiones} conexiones simultáneas x {lineas} lecturas = {total} lecturas")
+    print(f"tiempo hasta el último SYNC: {segundos:.2f} s -> {total / segundos:.0f} lecturas/s confirmadas, {errores} errores")
+    if servidor is not None:
+        escritor = servidor.estadisticas()["escritor"]
+        print(f"escritor: {escritor['lotes']} commits, {escritor['ms_commit_promedio']:.1f} ms por commit en promedio")
+
+
+if __name__ == "__main__":
+    main()
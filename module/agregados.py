@@ -0,0 +1,369 @@
+# module/agregados.py
+"""
+Agregados por hora y por día de las lecturas de sensores.
+
+Para cada cultivo, parámetro e intervalo se guardan n, suma, suma de cuadrados,
+mínimo, máximo y último valor. Con eso el promedio, la desviación y los
+extremos de una ventana larga salen de unas pocas filas en lugar de recorrer
+todas las lecturas. guardar_datos los actualiza en su misma transacción y
+reconstruir_agregados() los regenera a partir de las particiones de lecturas
+y del archivo columnar (los días que la retención ya borró se conservan).
+"""
+import math
+from datetime import datetime, timedelta
+from operator import itemgetter
+from module import base_datos, particiones
+
+DATABASE = "users.db"
+PARAMETROS = ("humedad_suelo", "ph_suelo", "temperatura_ambiente", "nitrogeno", "fosforo", "potasio")
+MS_HORA = 3600 * 1000
+
+# Inicio del intervalo en SQL: la hora se alinea a horas exactas y el día a la
+# medianoche local, igual que inicio_hora() e inicio_dia().
+SQL_INICIO_HORA = "({columna} - {columna} % 3600000)"
+SQL_INICIO_DIA = "CAST(strftime('%s', {columna} / 1000, 'unixepoch', 'localtime', 'start of day', 'utc') AS INTEGER) * 1000"
+
+# Suma una lectura (o un grupo ya agregado) a la fila existente del intervalo
+_SQL_FUSIONAR = """
+    ON CONFLICT (cultivo_id, parametro, inicio) DO UPDATE SET
+        n = n + excluded.n,
+        suma = suma + excluded.suma,
+        suma_cuadrados = suma_cuadrados + excluded.suma_cuadrados,
+        minimo = MIN(minimo, excluded.minimo),
+        maximo = MAX(maximo, excluded.maximo),
+        ultimo = CASE WHEN excluded.ultimo_ts >= ultimo_ts THEN excluded.ultimo ELSE ultimo END,
+        ultimo_ts = MAX(ultimo_ts, excluded.ultimo_ts)
+"""
+
+
+def _crear_tablas(cursor):
+    for tabla in ("agregados_hora", "agregados_dia"):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabla} (
+                cultivo_id INTEGER NOT NULL,
+                parametro TEXT NOT NULL,
+                inicio INTEGER NOT NULL, -- ms desde epoch del inicio del intervalo
+                n INTEGER NOT NULL,
+                suma REAL NOT NULL,
+                suma_cuadrados REAL NOT NULL,
+                minimo REAL,
+                maximo REAL,
+                ultimo REAL,
+                ultimo_ts INTEGER,
+                PRIMARY KEY (cultivo_id, parametro, inicio)
+            ) WITHOUT ROWID
+        """)
+
+
+def crear_tablas_agregados():
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    _crear_tablas(cursor)
+    conn.commit()
+    conn.close()
+
+
+def inicio_hora(ts):
+    return ts - ts % MS_HORA
+
+
+def inicio_dia(ts):
+    medianoche = datetime.fromtimestamp(ts / 1000).replace(hour=0, minute=0, second=0, microsecond=0)
+    return base_datos.epoch_ms(medianoche)
+
+
+def dia_siguiente(ts_dia):
+    return inicio_dia(base_datos.epoch_ms(datetime.fromtimestamp(ts_dia / 1000) + timedelta(days=1, hours=2)))
+
+
+def actualizar_agregados(cursor, numero_cultivo, ts, valores):
+    """
+    Suma una lectura a los agregados de su hora y de su día. 'valores' es un
+    diccionario parametro -> valor; los None se ignoran. No confirma: corre
+    dentro de la transacción de quien inserta la lectura.
+    """
+    valores = [(p, v) for p, v in valores.items() if v is not None]
+    if not valores:
+        return
+    for tabla, inicio in (("agregados_hora", inicio_hora(ts)), ("agregados_dia", inicio_dia(ts))):
+        cursor.executemany(f"""
+            INSERT INTO {tabla} (cultivo_id, parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)
+            SELECT id, ?, ?, 1, ?, ?, ?, ?, ?, ? FROM cultivos WHERE numero = ?
+            {_SQL_FUSIONAR}
+        """, [(p, inicio, v, v * v, v, v, v, ts, numero_cultivo) for p, v in valores])
+
+
+def actualizar_agregados_lote(cursor, lecturas):
+    """
+    Como actualizar_agregados() para muchas lecturas [(cultivo_id, ts, valores), ...]:
+    se agrupan por cultivo y hora, cada parámetro del grupo se resume de una
+    vez (sum/min/max sobre la lista) y los días se obtienen sumando las horas,
+    como en _reconstruir(). Se escribe una fila por cultivo, parámetro e
+    intervalo con un executemany por tabla. No confirma.
+    """
+    por_hora = {}
+    for cultivo_id, ts, valores in lecturas:
+        clave = (cultivo_id, ts - ts % MS_HORA)
+        grupo = por_hora.get(clave)
+        if grupo is None:
+            por_hora[clave] = grupo = []
+        grupo.append((ts, valores))
+
+    # (cultivo_id, parametro, inicio) -> [n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts]
+    horas = {}
+    for (cultivo_id, inicio), grupo in por_hora.items():
+        if len(grupo) == 1:
+            # Caso común con muchos cultivos: una sola lectura del cultivo en la hora
+            ts, valores = grupo[0]
+            for parametro, valor in valores.items():
+                if valor is not None:
+                    horas[(cultivo_id, parametro, inicio)] = [1, valor, valor * valor, valor, valor, valor, ts]
+            continue
+        for parametro in dict.fromkeys(p for _, valores in grupo for p in valores):
+            pares = [(ts, valores[parametro]) for ts, valores in grupo if valores.get(parametro) is not None]
+            if not pares:
+                continue
+            datos = [valor for _, valor in pares]
+            # Con marcas repetidas gana la última del lote, como en actualizar_agregados
+            ultimo_ts, ultimo = max(reversed(pares), key=itemgetter(0))
+            horas[(cultivo_id, parametro, inicio)] = [
+                len(datos), sum(datos), sum(valor * valor for valor in datos),
+                min(datos), max(datos), ultimo, ultimo_ts,
+            ]
+
+    dias = {}
+    inicios_dia = {}  # inicio de la hora -> inicio del día (inicio_dia pasa por datetime)
+    for (cultivo_id, parametro, inicio), hora in horas.items():
+        if inicio not in inicios_dia:
+            inicios_dia[inicio] = inicio_dia(inicio)
+        clave = (cultivo_id, parametro, inicios_dia[inicio])
+        dia = dias.get(clave)
+        if dia is None:
+            dias[clave] = list(hora)
+            continue
+        dia[0] += hora[0]
+        dia[1] += hora[1]
+        dia[2] += hora[2]
+        dia[3] = min(dia[3], hora[3])
+        dia[4] = max(dia[4], hora[4])
+        if hora[6] >= dia[6]:
+            dia[5], dia[6] = hora[5], hora[6]
+
+    for tabla, grupos in (("agregados_hora", horas), ("agregados_dia", dias)):
+        cursor.executemany(f"""
+            INSERT INTO {tabla} (cultivo_id, parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            {_SQL_FUSIONAR}
+        """, [clave + tuple(grupo) for clave, grupo in grupos.items()])
+
+
+def _pisos(cursor, desde):
+    """
+    {cultivo_id: (piso, corte)} de los cultivos con lecturas: desde qué día se
+    pueden recalcular sus agregados y dónde termina su archivo columnar (0 si
+    no tiene). Un día se puede recalcular si está archivado o si es posterior a
+    todo lo que la retención borró (lo borrado quedó resumido en
+    lecturas_15min). Los agregados anteriores al piso no se tocan: son lo
+    único que queda de esos días.
+    """
+    cultivos = set()
+    for nombre in particiones.particiones_en_rango(cursor):
+        cultivos.update(particiones.cultivos_en_particion(cursor, nombre))
+    archivados = {}
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'archivo_dias'")
+    if cursor.fetchone():
+        cursor.execute("SELECT cultivo_id, MIN(desde), MAX(hasta) FROM archivo_dias GROUP BY cultivo_id")
+        archivados = {cultivo_id: (primero, corte) for cultivo_id, primero, corte in cursor.fetchall()}
+    horizontes = {}
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'lecturas_15min'")
+    if cursor.fetchone():
+        # Fin del último bloque de 15 minutos resumido por la retención
+        cursor.execute(f"SELECT cultivo_id, MAX(inicio) + {15 * 60 * 1000} FROM lecturas_15min GROUP BY cultivo_id")
+        horizontes = dict(cursor.fetchall())
+
+    pisos = {}
+    for cultivo_id in cultivos | archivados.keys():
+        horizonte = horizontes.get(cultivo_id, 0)
+        # Primer día que empieza después de lo borrado
+        piso = inicio_dia(horizonte) if horizonte else 0
+        if piso < horizonte:
+            piso = dia_siguiente(piso)
+        primero, corte = archivados.get(cultivo_id, (None, 0))
+        if primero is not None and horizonte <= corte:
+            # El archivo cubre lo borrado sin dejar huecos
+            piso = min(piso, primero)
+        pisos[cultivo_id] = (max(piso, desde), corte)
+    return pisos
+
+
+def _reconstruir(cursor, desde=None):
+    """
+    Regenera los agregados desde el día de 'desde' (o todos si es None): los
+    días archivados se recalculan desde el archivo columnar y el resto desde
+    las particiones. Los días cuyas lecturas ya no existen se conservan.
+    """
+    # archivo importa este módulo
+    from module import archivo
+
+    _crear_tablas(cursor)
+    desde = inicio_dia(desde) if desde is not None else 0
+    pisos = _pisos(cursor, desde)
+    cursor.execute("DROP TABLE IF EXISTS temp.pisos_agregados")
+    cursor.execute("""
+        CREATE TEMP TABLE pisos_agregados (cultivo_id INTEGER PRIMARY KEY, piso INTEGER NOT NULL, corte INTEGER NOT NULL)
+    """)
+    cursor.executemany("INSERT INTO pisos_agregados VALUES (?, ?, ?)",
+                       [(cultivo_id,) + piso for cultivo_id, piso in pisos.items()])
+    for tabla in ("agregados_hora", "agregados_dia"):
+        cursor.execute(f"""
+            DELETE FROM {tabla} WHERE inicio >= (
+                SELECT piso FROM pisos_agregados p WHERE p.cultivo_id = {tabla}.cultivo_id
+            )
+        """)
+    minimo = min((piso for piso, _ in pisos.values()), default=None)
+
+    # Horas de los días archivados: del archivo
+    for cultivo_id, (piso, corte) in pisos.items():
+        if corte <= piso:
+            continue
+        cursor.execute("SELECT desde FROM archivo_dias WHERE cultivo_id = ? AND desde >= ? ORDER BY desde",
+                       (cultivo_id, piso))
+        for (dia,) in cursor.fetchall():
+            # Texto fijo (cultivo_id como parámetro): una sola sentencia en la caché
+            cursor.executemany(f"""
+                INSERT INTO agregados_hora (cultivo_id, parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                {_SQL_FUSIONAR}
+            """, [(cultivo_id,) + hora for hora in archivo.horas_dia(cultivo_id, dia)])
+
+    # Horas del resto: un GROUP BY por partición y parámetro
+    hora = SQL_INICIO_HORA.format(columna="l.ts")
+    for nombre in (particiones.particiones_en_rango(cursor, minimo) if pisos else []):
+        for parametro in PARAMETROS:
+            cursor.execute(f"""
+                INSERT INTO agregados_hora (cultivo_id, parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)
+                SELECT l.cultivo_id, '{parametro}', {hora} AS inicio_hora, COUNT(l.{parametro}), SUM(l.{parametro}),
+                       SUM(l.{parametro} * l.{parametro}), MIN(l.{parametro}), MAX(l.{parametro}), NULL, MAX(l.ts)
+                FROM {nombre} l JOIN pisos_agregados p ON p.cultivo_id = l.cultivo_id
+                WHERE l.{parametro} IS NOT NULL AND l.ts >= MAX(p.piso, p.corte)
+                GROUP BY l.cultivo_id, inicio_hora
+                {_SQL_FUSIONAR}
+            """)
+            # El último valor de cada hora es el de la lectura con ultimo_ts
+            cursor.execute(f"""
+                UPDATE agregados_hora SET ultimo = (
+                    SELECT l.{parametro} FROM {nombre} l
+                    WHERE l.cultivo_id = agregados_hora.cultivo_id AND l.ts = agregados_hora.ultimo_ts
+                )
+                WHERE parametro = ? AND ultimo IS NULL AND inicio >= ?
+            """, (parametro, minimo))
+
+    # Días: se suman las horas ya calculadas
+    dia = SQL_INICIO_DIA.format(columna="h.inicio")
+    cursor.execute(f"""
+        INSERT INTO agregados_dia (cultivo_id, parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)
+        SELECT h.cultivo_id, h.parametro, {dia} AS inicio_dia, SUM(h.n), SUM(h.suma),
+               SUM(h.suma_cuadrados), MIN(h.minimo), MAX(h.maximo), NULL, MAX(h.ultimo_ts)
+        FROM agregados_hora h JOIN pisos_agregados p ON p.cultivo_id = h.cultivo_id
+        WHERE h.inicio >= p.piso
+        GROUP BY h.cultivo_id, h.parametro, inicio_dia
+        {_SQL_FUSIONAR}
+    """)
+    cursor.execute(f"""
+        UPDATE agregados_dia SET ultimo = (
+            SELECT h.ultimo FROM agregados_hora h
+            WHERE h.cultivo_id = agregados_dia.cultivo_id AND h.parametro = agregados_dia.parametro
+              AND h.inicio = {SQL_INICIO_HORA.format(columna='agregados_dia.ultimo_ts')}
+        )
+        WHERE ultimo IS NULL
+    """)
+    cursor.execute("DROP TABLE temp.pisos_agregados")
+
+    cursor.execute("SELECT COUNT(*) FROM agregados_hora WHERE inicio >= ?", (desde,))
+    horas = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM agregados_dia WHERE inicio >= ?", (desde,))
+    dias = cursor.fetchone()[0]
+    return {"horas": horas, "dias": dias}
+
+
+def reconstruir_agregados(desde=None):
+    """
+    Borra y recalcula los agregados desde las lecturas (por defecto, todos).
+    Devuelve cuántas filas por hora y por día quedaron.
+    """
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    try:
+        resultado = _reconstruir(cursor, desde)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return resultado
+
+
+def _combinar(filas):
+    n = sum(fila["n"] for fila in filas)
+    if n == 0:
+        return None
+    suma = sum(fila["suma"] for fila in filas)
+    suma_cuadrados = sum(fila["suma_cuadrados"] for fila in filas)
+    promedio = suma / n
+    ultima = max(filas, key=lambda fila: fila["ultimo_ts"])
+    return {
+        "n": n,
+        "promedio": promedio,
+        # Desviación poblacional, igual que datos_avanzados.calcular_estadisticas
+        "desviacion": math.sqrt(max(suma_cuadrados / n - promedio ** 2, 0.0)),
+        "minimo": min(fila["minimo"] for fila in filas),
+        "maximo": max(fila["maximo"] for fila in filas),
+        "ultimo": ultima["ultimo"],
+        "ultimo_ts": ultima["ultimo_ts"],
+    }
+
+
+def estadisticas_ventana(cursor, numero_cultivo, parametro, desde, hasta):
+    """
+    Estadísticas de un parámetro en [desde, hasta) con resolución de una hora:
+    los días completos se leen de agregados_dia y los extremos de agregados_hora.
+    Devuelve None si no hay lecturas en la ventana.
+    """
+    cursor.execute("SELECT id FROM cultivos WHERE numero = ?", (numero_cultivo,))
+    fila = cursor.fetchone()
+    if not fila:
+        return None
+    cultivo_id = fila[0]
+
+    primer_dia = inicio_dia(desde)
+    if primer_dia < desde:
+        primer_dia = dia_siguiente(primer_dia)
+    ultimo_dia = inicio_dia(hasta)
+    if primer_dia < ultimo_dia:
+        tramos = [("agregados_dia", primer_dia, ultimo_dia),
+                  ("agregados_hora", inicio_hora(desde), primer_dia),
+                  ("agregados_hora", ultimo_dia, hasta)]
+    else:
+        tramos = [("agregados_hora", inicio_hora(desde), hasta)]
+
+    filas = []
+    for tabla, inicio, fin in tramos:
+        if inicio >= fin:
+            continue
+        cursor.execute(f"""
+            SELECT n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts FROM {tabla}
+            WHERE cultivo_id = ? AND parametro = ? AND inicio >= ? AND inicio < ?
+        """, (cultivo_id, parametro, inicio, fin))
+        columnas = [d[0] for d in cursor.description]
+        filas.extend(dict(zip(columnas, f)) for f in cursor.fetchall())
+    return _combinar(filas)
+
+
+def obtener_estadisticas(numero_cultivo, desde, hasta, parametros=PARAMETROS):
+    """Estadísticas de la ventana para cada parámetro: {parametro: dict o None}."""
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    resultado = {p: estadisticas_ventana(cursor, numero_cultivo, p, desde, hasta) for p in parametros}
+    conn.close()
+    return resultado
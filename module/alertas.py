@@ -1,11 +1,21 @@
 import sqlite3
+import json
 from datetime import datetime, timedelta
 import os
+import queue
 import smtplib
 from email.mime.text import MIMEText
 from email.header import Header  # Para manejar caracteres especiales en el asunto
+from flask import Response, stream_with_context
+from module import base_datos, eventos, repositorios
 
 DATABASE = "users.db"
+# Tiempo mínimo entre dos avisos de la misma alerta al mismo usuario (15 minutos)
+ENFRIAMIENTO_MS = 15 * 60 * 1000
+# Alertas en vivo (flujo_alertas_api): avisos retenidos por cliente lento y
+# segundos entre comentarios que mantienen abierta la conexión
+LIMITE_FLUJO = 100
+SEGUNDOS_LATIDO = 15
 
 def enviar_notificacion_email(destinatario, asunto, mensaje):
     EMAIL_ADDRESS = 'ecos75396@gmail.com'
@@ -33,7 +43,7 @@ def enviar_notificacion_email(destinatario, asunto, mensaje):
 
 def crear_tabla_alertas():
     """Crea la tabla 'alertas' si no existe."""
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS alertas (
@@ -49,15 +59,15 @@ def crear_tabla_alertas():
 
 def crear_tabla_historial_alertas():
     """Crea la tabla 'historial_alertas' si no existe."""
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
-    cursor.execute('''
+    cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS historial_alertas (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             alerta_id INTEGER,
             usuario_id INTEGER NOT NULL,
             agronomist_id INTEGER,
-            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ts INTEGER NOT NULL DEFAULT ({base_datos.SQL_AHORA_MS}), -- milisegundos desde epoch
             numero_cultivo INTEGER,
             valor_sensor REAL,
             FOREIGN KEY (alerta_id) REFERENCES alertas (id),
@@ -71,13 +81,13 @@ def crear_tabla_historial_alertas():
 
 def activar_alerta(alerta_id, usuario_id, agronomist_id, numero_cultivo, valor_sensor):
     """Registra una activación de alerta en el historial."""
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
-    timestamp_actual = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ts = base_datos.epoch_ms()
     try:
         cursor.execute(
-            "INSERT INTO historial_alertas (alerta_id, usuario_id, agronomist_id, fecha, numero_cultivo, valor_sensor) VALUES (?, ?, ?, ?, ?, ?)",
-            (alerta_id, usuario_id, agronomist_id, timestamp_actual, numero_cultivo, valor_sensor)
+            "INSERT INTO historial_alertas (alerta_id, usuario_id, agronomist_id, ts, numero_cultivo, valor_sensor) VALUES (?, ?, ?, ?, ?, ?)",
+            (alerta_id, usuario_id, agronomist_id, ts, numero_cultivo, valor_sensor)
         )
         conn.commit()
         print(f"[INFO] Alerta ID {alerta_id} registrada para cultivo {numero_cultivo}, usuario {usuario_id}, valor sensor {valor_sensor}")
@@ -86,17 +96,73 @@ def activar_alerta(alerta_id, usuario_id, agronomist_id, numero_cultivo, valor_s
     finally:
         conn.close()
 
+def obtener_reglas():
+    conn = base_datos.obtener_conexion(DATABASE)
+    reglas = repositorios.RepositorioAlertas(conn).reglas()
+    conn.close()
+    return reglas
+
+def obtener_historial_usuario(usuario_id, limite=None):
+    conn = base_datos.obtener_conexion(DATABASE)
+    historial = repositorios.RepositorioAlertas(conn).historial(usuario_id, limite)
+    conn.close()
+    return historial
+
+def obtener_notificaciones(usuario_id, limite=10):
+    conn = base_datos.obtener_conexion(DATABASE)
+    notificaciones = repositorios.RepositorioAlertas(conn).notificaciones(usuario_id, limite)
+    conn.close()
+    return notificaciones
+
 def get_user_email(user_id):
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute("SELECT email FROM usuarios WHERE id = ?", (user_id,))
     result = cursor.fetchone()
     conn.close()
     return result[0] if result else None
 
+def cumple_condicion(condicion, valor_sensor, umbral):
+    if condicion == '>':
+        return valor_sensor > umbral
+    if condicion == '<':
+        return valor_sensor < umbral
+    if condicion == '>=':
+        return valor_sensor >= umbral
+    if condicion == '<=':
+        return valor_sensor <= umbral
+    if condicion == '==':
+        return valor_sensor == umbral
+    return False
+
+def notificar_alerta(numero_cultivo, tipo_alerta, valor_sensor, condicion, umbral, unidad,
+                     usuario_id, agricultor_email, agronomist_id, agronomo_email):
+    """Envía el correo de una alerta disparada al agricultor y al agrónomo del cultivo."""
+    asunto = f"¡Alerta EcoSmart - Cultivo {numero_cultivo}!"
+    mensaje_base = (
+        f"Se ha detectado una condición inusual en el cultivo número {numero_cultivo}.\n\n"
+        f"Tipo de Alerta: {tipo_alerta.replace('_', ' ').title()}\n"
+        f"Condición: {valor_sensor} {condicion} {umbral} {unidad}\n"
+        f"Fecha y Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        "Por favor, revisa el panel de EcoSmart."
+    )
+
+    if agricultor_email:
+        enviar_notificacion_email(agricultor_email, asunto, mensaje_base)
+    else:
+        print(f"[WARN] No se encontró email para agricultor {usuario_id}.")
+
+    if agronomo_email:
+        mensaje_agronomo = (
+            f"Alerta del cultivo asignado #{numero_cultivo}.\n\n{mensaje_base}"
+        )
+        enviar_notificacion_email(agronomo_email, asunto, mensaje_agronomo)
+    elif agronomist_id:
+        print(f"[WARN] No se encontró email para agrónomo {agronomist_id}.")
+
 def verificar_alertas(numero_cultivo, datos):
     triggered = False
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
@@ -137,65 +203,176 @@ def verificar_alertas(numero_cultivo, datos):
             print(f"[ERROR] Fallo conversión numérica para alerta ID {alerta_id}: {e}")
             continue
 
-        cumple = False
-        if condicion == '>' and valor_sensor > umbral:
-            cumple = True
-        elif condicion == '<' and valor_sensor < umbral:
-            cumple = True
-        elif condicion == '>=' and valor_sensor >= umbral:
-            cumple = True
-        elif condicion == '<=' and valor_sensor <= umbral:
-            cumple = True
-        elif condicion == '==' and valor_sensor == umbral:
-            cumple = True
+        cumple = cumple_condicion(condicion, valor_sensor, umbral)
 
         print(f"[DEBUG] Evaluando alerta ID {alerta_id}: {valor_sensor} {condicion} {umbral} => {cumple}")
 
         if cumple:
             cursor.execute("""
-                SELECT fecha FROM historial_alertas 
+                SELECT ts FROM historial_alertas 
                 WHERE alerta_id = ? AND usuario_id = ?
-                ORDER BY fecha DESC LIMIT 1
+                ORDER BY ts DESC LIMIT 1
             """, (alerta_id, usuario_id))
             last = cursor.fetchone()
 
             should_send = True
-            if last:
-                try:
-                    last_time = datetime.strptime(last["fecha"], "%Y-%m-%d %H:%M:%S")
-                    if (datetime.now() - last_time).total_seconds() < 15 * 60: # 15 minutos
-                        print(f"[DEBUG] Alerta ID {alerta_id} ya enviada recientemente.")
-                        should_send = False
-                except Exception as e:
-                    print(f"[ERROR] Error parseando fecha: {e}")
+            if last and base_datos.epoch_ms() - last["ts"] < ENFRIAMIENTO_MS:
+                print(f"[DEBUG] Alerta ID {alerta_id} ya enviada recientemente.")
+                should_send = False
 
             if should_send:
                 activar_alerta(alerta_id, usuario_id, agronomist_id, numero_cultivo, valor_sensor)
                 triggered = True
-
-                asunto = f"¡Alerta EcoSmart - Cultivo {numero_cultivo}!"
-                mensaje_base = (
-                    f"Se ha detectado una condición inusual en el cultivo número {numero_cultivo}.\n\n"
-                    f"Tipo de Alerta: {tipo_alerta.replace('_', ' ').title()}\n"
-                    f"Condición: {valor_sensor} {condicion} {umbral} {datos.get('unidad', '')}\n"
-                    f"Fecha y Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-                    "Por favor, revisa el panel de EcoSmart."
-                )
-
-                if agricultor_email:
-                    enviar_notificacion_email(agricultor_email, asunto, mensaje_base)
-                else:
-                    print(f"[WARN] No se encontró email para agricultor {usuario_id}.")
-
-                if agronomo_email:
-                    mensaje_agronomo = (
-                        f"Alerta del cultivo asignado #{numero_cultivo}.\n\n{mensaje_base}"
-                    )
-                    enviar_notificacion_email(agronomo_email, asunto, mensaje_agronomo)
-                elif agronomist_id:
-                    print(f"[WARN] No se encontró email para agrónomo {agronomist_id}.")
+                eventos.publicar(eventos.ALERTA_DISPARADA, clave=numero_cultivo, alerta_id=alerta_id,
+                                 tipo_alerta=tipo_alerta, numero_cultivo=numero_cultivo, valor_sensor=valor_sensor,
+                                 usuario_id=usuario_id, agronomist_id=agronomist_id, ts=base_datos.epoch_ms())
+                notificar_alerta(numero_cultivo, tipo_alerta, valor_sensor, condicion, umbral, datos.get('unidad', ''),
+                                 usuario_id, agricultor_email, agronomist_id, agronomo_email)
         else:
             print(f"[DEBUG] Condición no cumplida para alerta ID {alerta_id}.")
 
     conn.close()
     return triggered
+
+def verificar_alertas_lote(lecturas):
+    """
+    Evalúa las alertas activas sobre un lote de lecturas [(numero_cultivo, datos), ...]
+    con las mismas reglas y el mismo enfriamiento que verificar_alertas:
+    registrar_alertas_lote y, después del commit, los correos. Devuelve los
+    cultivos con alguna alerta.
+    """
+    disparadas, avisos = registrar_alertas_lote(lecturas)
+    notificar_avisos(avisos)
+    return disparadas
+
+def notificar_avisos(avisos):
+    """Envía los correos de los avisos que devolvió registrar_alertas_lote."""
+    for aviso in avisos:
+        notificar_alerta(*aviso)
+
+def registrar_alertas_lote(lecturas):
+    """
+    La parte de verificar_alertas_lote que no envía correos: lee reglas,
+    cultivos, correos y últimos avisos una sola vez, registra todas las
+    activaciones con un único executemany y publica ALERTA_DISPARADA.
+    Devuelve (cultivos con alguna alerta, avisos para notificar_avisos); la
+    ingesta por lotes responde con lo primero y deja los correos al bus.
+    """
+    if not lecturas:
+        return [], []
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, tipo_alerta, umbral, condicion FROM alertas WHERE activa = 1")
+    reglas = []
+    for alerta_id, tipo_alerta, umbral, condicion in cursor.fetchall():
+        try:
+            reglas.append((alerta_id, tipo_alerta, float(umbral), condicion))
+        except (TypeError, ValueError) as e:
+            print(f"[ERROR] Fallo conversión numérica para alerta ID {alerta_id}: {e}")
+    if not reglas:
+        conn.close()
+        return [], []
+
+    cultivos = repositorios.RepositorioCultivos(conn).por_numeros({numero for numero, _ in lecturas})
+    usuarios = {c["usuario_id"] for c in cultivos.values()} | {c["agronomist_id"] for c in cultivos.values()}
+    usuarios.discard(None)
+    cursor.execute("SELECT id, email FROM usuarios WHERE id IN (SELECT value FROM json_each(?))",
+                   (json.dumps(sorted(usuarios)),))
+    correos = dict(cursor.fetchall())
+    cursor.execute("""
+        SELECT alerta_id, usuario_id, MAX(ts) FROM historial_alertas
+        WHERE usuario_id IN (SELECT value FROM json_each(?))
+        GROUP BY alerta_id, usuario_id
+    """, (json.dumps(sorted(usuarios)),))
+    ultimo_aviso = {(alerta_id, usuario_id): ts for alerta_id, usuario_id, ts in cursor.fetchall()}
+
+    ahora = base_datos.epoch_ms()
+    activaciones = []
+    avisos = []
+    for numero_cultivo, datos in lecturas:
+        cultivo = cultivos.get(numero_cultivo)
+        if cultivo is None:
+            continue
+        usuario_id, agronomist_id = cultivo["usuario_id"], cultivo["agronomist_id"]
+        for alerta_id, tipo_alerta, umbral, condicion in reglas:
+            valor_sensor = datos.get(tipo_alerta)
+            if valor_sensor is None:
+                continue
+            try:
+                valor_sensor = float(valor_sensor)
+            except (TypeError, ValueError):
+                continue
+            if not cumple_condicion(condicion, valor_sensor, umbral):
+                continue
+            clave = (alerta_id, usuario_id)
+            if clave in ultimo_aviso and ahora - ultimo_aviso[clave] < ENFRIAMIENTO_MS:
+                continue
+            ultimo_aviso[clave] = ahora
+            activaciones.append((alerta_id, usuario_id, agronomist_id, ahora, numero_cultivo, valor_sensor))
+            avisos.append((numero_cultivo, tipo_alerta, valor_sensor, condicion, umbral, datos.get('unidad', ''),
+                           usuario_id, correos.get(usuario_id), agronomist_id, correos.get(agronomist_id)))
+
+    if activaciones:
+        cursor.executemany(
+            "INSERT INTO historial_alertas (alerta_id, usuario_id, agronomist_id, ts, numero_cultivo, valor_sensor) VALUES (?, ?, ?, ?, ?, ?)",
+            activaciones
+        )
+        conn.commit()
+        print(f"[INFO] {len(activaciones)} alerta(s) registrada(s) para un lote de {len(lecturas)} lecturas")
+    conn.close()
+
+    for (alerta_id, usuario_id, agronomist_id, ts, numero_cultivo, valor_sensor), aviso in zip(activaciones, avisos):
+        eventos.publicar(eventos.ALERTA_DISPARADA, clave=numero_cultivo, alerta_id=alerta_id,
+                         tipo_alerta=aviso[1], numero_cultivo=numero_cultivo, valor_sensor=valor_sensor,
+                         usuario_id=usuario_id, agronomist_id=agronomist_id, ts=ts)
+    return sorted({a[4] for a in activaciones}), avisos
+
+
+def flujo_alertas_api(usuario_id, es_admin=False):
+    """
+    Respuesta de GET /api/alertas/stream (Server-Sent Events): cada
+    ALERTA_DISPARADA de un cultivo del usuario (todas si es admin) llega como
+    "event: alerta" con sus datos en JSON. Si el cliente no lee, se retienen
+    hasta LIMITE_FLUJO avisos y los siguientes se pierden.
+    """
+    cola = queue.Queue(maxsize=LIMITE_FLUJO)
+
+    def recibir(evento):
+        if es_admin or usuario_id in (evento["usuario_id"], evento["agronomist_id"]):
+            try:
+                cola.put_nowait({k: v for k, v in evento.items() if k != "evento"})
+            except queue.Full:
+                pass
+
+    def avisos():
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                alerta = cola.get(timeout=SEGUNDOS_LATIDO)
+            except queue.Empty:
+                yield ": latido\n\n"
+                continue
+            yield f"event: alerta\ndata: {json.dumps(alerta)}\n\n"
+
+    # Síncrono: solo deja el aviso en la cola del cliente
+    eventos.suscribir(eventos.ALERTA_DISPARADA, recibir, sincrono=True)
+    respuesta = Response(stream_with_context(avisos()), mimetype="text/event-stream")
+    respuesta.headers["Cache-Control"] = "no-cache"
+    respuesta.call_on_close(lambda: eventos.desuscribir(eventos.ALERTA_DISPARADA, recibir))
+    return respuesta
+
+
+# Suscriptores del bus de eventos: la ingesta publica y las alertas se evalúan
+# en los hilos del bus, con sus consultas y correos fuera de la petición
+def _evaluar_lectura(evento):
+    verificar_alertas(evento["numero_cultivo"], evento["datos"])
+
+def _evaluar_lote(evento):
+    if evento["alertas"] is None:
+        verificar_alertas_lote(evento["lecturas"])
+    else:
+        # Ya evaluadas en la petición: aquí solo quedan sus correos
+        notificar_avisos(evento.get("avisos", ()))
+
+eventos.suscribir(eventos.LECTURA_GUARDADA, _evaluar_lectura)
+eventos.suscribir(eventos.LOTE_GUARDADO, _evaluar_lote)
@@ -0,0 +1,398 @@
+# module/archivo.py
+"""
+Archivo columnar de lecturas frías.
+
+Las lecturas con más de VENTANA_CALIENTE_DIAS días se compactan en archivos
+binarios: por cultivo y por día local, un arreglo de marcas de tiempo (int64,
+ms desde epoch) y un arreglo float32 por parámetro (NaN donde la lectura no
+tenía valor), todos en el orden nativo de la máquina:
+
+    ARCHIVO_DIR/<cultivo_id>/<AAAAMMDD>/ts.i64
+    ARCHIVO_DIR/<cultivo_id>/<AAAAMMDD>/<parametro>.f32
+
+Se leen con mmap sin copiar: leer_dia() devuelve memoryview (o arreglos de
+NumPy si está instalado) apoyados directamente en el archivo mapeado. La tabla
+archivo_dias registra qué días de cada cultivo están archivados; la
+consulta de lecturas lee esos días del archivo y el resto de SQLite, así que
+los gráficos siguen funcionando cuando la retención borra las lecturas crudas.
+consultar_columnas() devuelve un rango como columnas (cortes de los días
+mapeados) y solo consultar_lecturas(), para las respuestas JSON, arma una
+tupla por lectura.
+"""
+import bisect
+import math
+import mmap
+import os
+import shutil
+from array import array
+from datetime import datetime
+from module import base_datos, particiones, agregados
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usan memoryview
+    np = None
+
+DATABASE = "users.db"
+ARCHIVO_DIR = "archivo_lecturas"
+VENTANA_CALIENTE_DIAS = 7
+MS_DIA = 24 * 3600 * 1000
+PARAMETROS = agregados.PARAMETROS
+
+
+def crear_tabla_archivo(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archivo_dias (
+            cultivo_id INTEGER NOT NULL,
+            desde INTEGER NOT NULL, -- medianoche local en ms, inclusive
+            hasta INTEGER NOT NULL, -- medianoche siguiente en ms, exclusivo
+            n INTEGER NOT NULL,
+            PRIMARY KEY (cultivo_id, desde)
+        ) WITHOUT ROWID
+    """)
+
+
+def ruta_dia(cultivo_id, desde):
+    dia = datetime.fromtimestamp(desde / 1000).strftime("%Y%m%d")
+    return os.path.join(ARCHIVO_DIR, str(cultivo_id), dia)
+
+
+def _escribir_dia(cultivo_id, desde, filas):
+    """Escribe las columnas de un día en un directorio temporal y lo renombra."""
+    destino = ruta_dia(cultivo_id, desde)
+    temporal = destino + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    with open(os.path.join(temporal, "ts.i64"), "wb") as f:
+        array("q", (fila[0] for fila in filas)).tofile(f)
+    for i, parametro in enumerate(PARAMETROS, start=1):
+        valores = array("f", (float("nan") if fila[i] is None else fila[i] for fila in filas))
+        with open(os.path.join(temporal, f"{parametro}.f32"), "wb") as f:
+            valores.tofile(f)
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporal, destino)
+
+
+class DiaArchivado:
+    """Columnas mapeadas en memoria de un día: .ts y .valores[parametro]."""
+
+    def __init__(self, ruta, parametros=PARAMETROS):
+        self._mapas = []
+        self.ts = self._mapear(os.path.join(ruta, "ts.i64"), "q")
+        self.valores = {p: self._mapear(os.path.join(ruta, f"{p}.f32"), "f") for p in parametros}
+
+    def _mapear(self, archivo, formato):
+        with open(archivo, "rb") as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapas.append(mapa)
+        if np is not None:
+            return np.frombuffer(mapa, dtype=np.int64 if formato == "q" else np.float32)
+        return memoryview(mapa).cast(formato)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def cerrar(self):
+        columnas = [self.ts, *self.valores.values()]
+        self.ts, self.valores = None, {}
+        for columna in columnas:
+            if isinstance(columna, memoryview):
+                columna.release()
+        del columnas
+        for mapa in self._mapas:
+            try:
+                mapa.close()
+            except BufferError:
+                # Alguien conserva una vista del día: el mapa se libera con ella
+                pass
+        self._mapas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.cerrar()
+
+
+def leer_dia(cultivo_id, desde, parametros=PARAMETROS):
+    """Abre el día archivado que empieza en 'desde' (sin copiar los datos)."""
+    return DiaArchivado(ruta_dia(cultivo_id, desde), parametros)
+
+
+def frontera(cursor, cultivo_id):
+    """Fin (ms) del último día archivado del cultivo, o None si no hay ninguno."""
+    cursor.execute("SELECT MAX(hasta) FROM archivo_dias WHERE cultivo_id = ?", (cultivo_id,))
+    return cursor.fetchone()[0]
+
+
+def fronteras(cursor):
+    """{cultivo_id: frontera} de los cultivos con días archivados ({} si aún no hay archivo)."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'archivo_dias'")
+    if not cursor.fetchone():
+        return {}
+    cursor.execute("SELECT cultivo_id, MAX(hasta) FROM archivo_dias GROUP BY cultivo_id")
+    return dict(cursor.fetchall())
+
+
+def compactar(ahora=None):
+    """
+    Archiva los días completos anteriores a la ventana caliente que aún no
+    están archivados. Las lecturas siguen en SQLite hasta que la retención las
+    borra. Devuelve {"dias": n, "lecturas": n}.
+    """
+    ahora = ahora if ahora is not None else base_datos.epoch_ms()
+    limite = agregados.inicio_dia(ahora - VENTANA_CALIENTE_DIAS * MS_DIA)
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    crear_tabla_archivo(cursor)
+    conn.commit()
+    columnas = ", ".join(("ts",) + PARAMETROS)
+    resultado = {"dias": 0, "lecturas": 0}
+    try:
+        for nombre in particiones.particiones_en_rango(cursor, hasta=limite):
+            for cultivo_id in particiones.cultivos_en_particion(cursor, nombre):
+                desde = frontera(cursor, cultivo_id) or 0
+                if desde >= limite:
+                    continue
+                cursor.execute(f"""
+                    SELECT {columnas} FROM {nombre}
+                    WHERE cultivo_id = ? AND ts >= ? AND ts < ? ORDER BY ts
+                """, (cultivo_id, desde, limite))
+                dias = {}
+                for fila in cursor.fetchall():
+                    dias.setdefault(agregados.inicio_dia(fila[0]), []).append(fila)
+                for inicio, filas in dias.items():
+                    _escribir_dia(cultivo_id, inicio, filas)
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO archivo_dias (cultivo_id, desde, hasta, n) VALUES (?, ?, ?, ?)",
+                        (cultivo_id, inicio, agregados.dia_siguiente(inicio), len(filas))
+                    )
+                    resultado["dias"] += 1
+                    resultado["lecturas"] += len(filas)
+                conn.commit()
+    finally:
+        conn.close()
+    return resultado
+
+
+def horas_dia(cultivo_id, desde):
+    """
+    Agregados por hora de un día archivado, como los de agregados_hora:
+    [(parametro, inicio_hora, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)].
+    """
+    filas = []
+    with leer_dia(cultivo_id, desde) as dia:
+        total = len(dia)
+        primero = 0
+        while primero < total:
+            inicio = int(dia.ts[primero]) - int(dia.ts[primero]) % agregados.MS_HORA
+            ultimo = bisect.bisect_left(dia.ts, inicio + agregados.MS_HORA, primero)
+            for parametro in PARAMETROS:
+                columna = dia.valores[parametro]
+                indices = [i for i in range(primero, ultimo) if columna[i] == columna[i]]  # sin NaN
+                if indices:
+                    datos = [_valor(columna[i]) for i in indices]
+                    # ts está ordenado: la última lectura con valor es la última de la lista
+                    filas.append((parametro, inicio, len(datos), sum(datos), sum(v * v for v in datos),
+                                  min(datos), max(datos), datos[-1], int(dia.ts[indices[-1]])))
+                del columna
+            primero = ultimo
+    return filas
+
+
+def _valor(v):
+    # float32 -> float con los decimales con que se guardó (45.3, no 45.29999923706055)
+    return None if v != v else float(f"{v:.7g}")
+
+
+def _nulo(v):
+    return None if v != v else v
+
+
+class Lecturas:
+    """
+    Resultado de consultar_columnas(): las lecturas de un cultivo en tramos
+    ordenados por ts. Cada tramo es (ts, {parametro: columna}, archivado): en
+    los días archivados, cortes de las columnas mapeadas (memoryview o NumPy,
+    sin copiar); en la parte caliente, arreglos armados desde SQLite. Los
+    valores faltantes son NaN. Hay que cerrarlo (with) para soltar los mapas.
+    """
+
+    def __init__(self, parametros, no_nulo=None):
+        self.parametros = tuple(parametros)
+        self.no_nulo = no_nulo
+        self.tramos = []
+        self._dias = []
+
+    @property
+    def archivado(self):
+        """True si alguna columna es float32 del archivo (ver redondear)."""
+        return any(archivado for _, _, archivado in self.tramos)
+
+    def columna(self, parametro):
+        """Los valores del parámetro en orden de ts en un solo arreglo (sin copiar si hay un tramo)."""
+        return self._unir([columnas[parametro] for _, columnas, _ in self.tramos], "d")
+
+    def ts(self):
+        return self._unir([ts for ts, _, _ in self.tramos], "q")
+
+    def redondear(self, valor):
+        """Un valor calculado sobre las columnas, con la precisión con que se guardó."""
+        return _valor(valor) if self.archivado and valor is not None else valor
+
+    def filas(self, descendente=False):
+        """
+        (ts, valores...) de cada lectura, para armar respuestas: es el único
+        lugar donde se crea una tupla por lectura y se redondean los float32.
+        """
+        posicion = self.parametros.index(self.no_nulo) if self.no_nulo else None
+        for ts, columnas, archivado in (reversed(self.tramos) if descendente else self.tramos):
+            columnas = [columnas[p] for p in self.parametros]
+            convertir = _valor if archivado else _nulo
+            for i in (range(len(ts) - 1, -1, -1) if descendente else range(len(ts))):
+                if posicion is not None and columnas[posicion][i] != columnas[posicion][i]:
+                    continue
+                yield (int(ts[i]), *(convertir(c[i]) for c in columnas))
+
+    @staticmethod
+    def _unir(partes, formato):
+        if len(partes) == 1:
+            return partes[0]
+        if np is not None:
+            return np.concatenate(partes) if partes else np.empty(0, dtype=np.int64 if formato == "q" else np.float64)
+        unido = array(formato)
+        for parte in partes:
+            unido.extend(parte)
+        return unido
+
+    def cerrar(self):
+        tramos, self.tramos = self.tramos, []
+        for ts, columnas, _ in tramos:
+            # Los cortes se sueltan antes que los días: si no, el mapa no se puede cerrar
+            for columna in (ts, *columnas.values()):
+                if isinstance(columna, memoryview):
+                    columna.release()
+        del tramos
+        for dia in self._dias:
+            dia.cerrar()
+        self._dias = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.cerrar()
+
+
+def _corte(dia, desde, hasta, descendente, resto, columna):
+    """
+    Índices [a, b) del día dentro de [desde, hasta), recortados a las 'resto'
+    lecturas más cercanas al extremo que se lee primero (solo las que tienen
+    valor en 'columna', si se da). Devuelve (a, b, lecturas).
+    """
+    a = bisect.bisect_left(dia.ts, desde)
+    b = bisect.bisect_left(dia.ts, hasta)
+    if columna is None:
+        if resto is not None:
+            if descendente:
+                a = max(a, b - resto)
+            else:
+                b = min(b, a + resto)
+        return a, b, max(b - a, 0)
+    validas = 0
+    indices = range(b - 1, a - 1, -1) if descendente else range(a, b)
+    for i in indices:
+        if columna[i] == columna[i]:
+            validas += 1
+            if validas == resto:
+                if descendente:
+                    a = i
+                else:
+                    b = i + 1
+                break
+    return a, b, validas
+
+
+def consultar_columnas(cursor, numero_cultivo, parametros=PARAMETROS, desde=None, hasta=None,
+                       descendente=False, limite=None, no_nulo=None):
+    """
+    Lecturas de un cultivo en [desde, hasta) como columnas (ver Lecturas): la
+    parte anterior a la frontera del archivo son cortes de los archivos
+    mapeados, hallados con bisect, y el resto sale de las particiones de
+    SQLite. Con 'descendente' el límite se cuenta desde la más reciente; los
+    tramos quedan igual en orden de ts. 'no_nulo' (uno de los parámetros) no
+    cuenta para el límite las lecturas sin valor en ese parámetro.
+    """
+    parametros = tuple(parametros)
+    lecturas = Lecturas(parametros, no_nulo)
+    cursor.execute("SELECT id FROM cultivos WHERE numero = ?", (numero_cultivo,))
+    fila = cursor.fetchone()
+    if not fila:
+        return lecturas
+    cultivo_id = fila[0]
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'archivo_dias'")
+    corte = frontera(cursor, cultivo_id) if cursor.fetchone() else None
+
+    def caliente(resto):
+        inicio = desde if corte is None else max(desde or corte, corte)
+        filas = particiones.consultar_lecturas(
+            cursor, numero_cultivo, ", ".join(("ts",) + parametros), inicio, hasta, descendente,
+            resto, f"{no_nulo} IS NOT NULL" if no_nulo else None
+        )
+        if filas:
+            if descendente:
+                filas.reverse()
+            columnas = list(zip(*filas))
+            if np is not None:
+                ts = np.array(columnas[0], dtype=np.int64)
+                valores = [np.array(c, dtype=np.float64) for c in columnas[1:]]  # None -> NaN
+            else:
+                ts = array("q", columnas[0])
+                valores = [array("d", (math.nan if v is None else v for v in c)) for c in columnas[1:]]
+            lecturas.tramos.append((ts, dict(zip(parametros, valores)), False))
+        return None if resto is None else resto - len(filas)
+
+    def frio(resto):
+        if corte is None:
+            return resto
+        cursor.execute(f"""
+            SELECT desde FROM archivo_dias
+            WHERE cultivo_id = ? AND hasta > ? AND desde < ?
+            ORDER BY desde {'DESC' if descendente else 'ASC'}
+        """, (cultivo_id, desde or 0, min(hasta or corte, corte)))
+        for (inicio,) in cursor.fetchall():
+            if resto is not None and resto <= 0:
+                break
+            dia = leer_dia(cultivo_id, inicio, parametros)
+            lecturas._dias.append(dia)
+            a, b, cantidad = _corte(dia, desde or 0, min(hasta or corte, corte), descendente, resto,
+                                    dia.valores[no_nulo] if no_nulo else None)
+            if a < b:
+                lecturas.tramos.append((dia.ts[a:b], {p: dia.valores[p][a:b] for p in parametros}, True))
+            if resto is not None:
+                resto -= cantidad
+        return resto
+
+    try:
+        resto = limite
+        for parte in ((caliente, frio) if descendente else (frio, caliente)):
+            if resto is not None and resto <= 0:
+                break
+            resto = parte(resto)
+    except Exception:
+        lecturas.cerrar()
+        raise
+    if descendente:
+        lecturas.tramos.reverse()
+    return lecturas
+
+
+def consultar_lecturas(cursor, numero_cultivo, parametros=PARAMETROS, desde=None, hasta=None,
+                       descendente=False, limite=None, no_nulo=None):
+    """
+    Lecturas (ts, parametros...) de un cultivo en [desde, hasta), una tupla
+    por lectura y en el orden pedido: para armar respuestas JSON. Para leer
+    rangos largos sin crear objetos por lectura, consultar_columnas().
+    """
+    with consultar_columnas(cursor, numero_cultivo, parametros, desde, hasta, descendente, limite, no_nulo) as lecturas:
+        return list(lecturas.filas(descendente))
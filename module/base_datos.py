@@ -0,0 +1,333 @@
+# module/base_datos.py
+"""
+Capa de conexión compartida a SQLite.
+
+Todos los módulos piden su conexión con obtener_conexion() en lugar de llamar
+a sqlite3.connect(). Cada hilo recibe una única conexión mientras la tenga
+prestada (las llamadas anidadas dentro del mismo hilo comparten la misma), y
+cuando el último préstamo hace close() la conexión vuelve al pool en vez de
+cerrarse, de modo que el siguiente hilo la reutiliza sin volver a abrir el
+archivo ni repetir los PRAGMAs.
+
+Las lecturas de paneles y análisis pueden ir por un carril aparte de
+conexiones de solo lectura (mode=ro + PRAGMA query_only), con su propio pool:
+con WAL esas lecturas no esperan a los commits de guardar_datos ni los
+bloquean. Se piden con obtener_conexion_lectura() o, para no cambiar cada
+función, envolviendo la ruta en solo_lectura().
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.request import pathname2url
+
+DATABASE = "users.db"
+
+# Las marcas de tiempo se guardan como enteros: milisegundos desde epoch (UTC).
+# Para mostrarlas se formatean en hora local con FORMATO_FECHA, como antes.
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+# Expresión SQL para el DEFAULT de las columnas ts (equivale a epoch_ms()).
+SQL_AHORA_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Perfiles de PRAGMAs que se aplican una sola vez al abrir cada conexión.
+PERFILES_PRAGMAS = {
+    # Perfil por defecto: WAL para que lecturas y escrituras no se bloqueen,
+    # fsync solo en los checkpoints y caché/mmap amplios para los paneles.
+    "rendimiento": {
+        "journal_mode": "WAL",
+        "busy_timeout": 5000,
+        "synchronous": "NORMAL",
+        "cache_size": -16000,  # Valor negativo = KiB (~16 MB)
+        "mmap_size": 268435456,  # 256 MB
+        "temp_store": "MEMORY",
+    },
+    # Igual que el anterior pero con fsync en cada commit.
+    "seguro": {
+        "journal_mode": "WAL",
+        "busy_timeout": 10000,
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+    },
+    # Comportamiento original de sqlite3.connect (sin PRAGMAs).
+    "legado": {},
+}
+
+# Sentencias preparadas que sqlite3 guarda por conexión (indexadas por el texto
+# SQL). El valor por defecto (128) se queda corto con los repositorios y las
+# particiones mensuales, que generan un texto distinto por tabla.
+CACHE_SENTENCIAS = 256
+
+# Configuración activa. Se puede cambiar con configurar() o con las variables
+# de entorno ECOSMART_DB_PERFIL y ECOSMART_DB_POOL.
+_configuracion = {
+    "perfil": os.environ.get("ECOSMART_DB_PERFIL", "rendimiento"),
+    "pragmas": {},
+    "pool": os.environ.get("ECOSMART_DB_POOL", "1") != "0",
+    "max_inactivas": 8,
+    "lectura": os.environ.get("ECOSMART_DB_LECTURA", "1") != "0",
+}
+
+# PRAGMAs que una conexión de solo lectura no puede (ni necesita) aplicar:
+# el modo del journal es del archivo y lo fija la primera conexión normal.
+PRAGMAS_SOLO_ESCRITURA = ("journal_mode",)
+
+_hilo = threading.local()
+_inactivas = {}  # database -> lista de conexiones libres
+_lock = threading.Lock()
+_estadisticas = {"conexiones_abiertas": 0, "conexiones_lectura": 0, "prestamos": 0, "reutilizadas": 0}
+
+
+class _Entrada:
+    """Conexión asignada a un hilo y cuántos préstamos tiene abiertos."""
+
+    def __init__(self, clave, conexion):
+        self.clave = clave  # database, o ("lectura", database) en el carril de solo lectura
+        self.conexion = conexion
+        self.prestamos = 0
+        self.hilo = threading.get_ident()
+
+
+class ConexionPrestada:
+    """
+    Préstamo de la conexión del hilo actual.
+
+    Se usa igual que una sqlite3.Connection: cursor(), execute(), commit(),
+    rollback(), row_factory... La diferencia es que close() la devuelve al
+    pool. Cada préstamo tiene su propio row_factory, así que una función
+    anidada que pida sqlite3.Row no cambia las filas de quien la llamó.
+    Como context manager confirma (o revierte) la transacción y luego libera.
+    """
+
+    def __init__(self, entrada):
+        self._entrada = entrada
+        self._liberada = False
+        self.row_factory = None
+
+    def cursor(self):
+        cursor = self._entrada.conexion.cursor()
+        cursor.row_factory = self.row_factory
+        return cursor
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
+
+    def executescript(self, script):
+        return self._entrada.conexion.executescript(script)
+
+    def commit(self):
+        self._entrada.conexion.commit()
+
+    def rollback(self):
+        self._entrada.conexion.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._entrada.conexion.in_transaction
+
+    @property
+    def total_changes(self):
+        return self._entrada.conexion.total_changes
+
+    def close(self):
+        if self._liberada:
+            return
+        self._liberada = True
+        _liberar(self._entrada)
+
+    def __del__(self):
+        # Un préstamo que se pierde sin close() (p. ej. por una excepción a mitad
+        # de función) se libera al recolectarse, como sqlite3 con una conexión
+        # huérfana. Solo desde el hilo dueño: la entrada vive en su threading.local.
+        if not self._liberada and self._entrada.hilo == threading.get_ident():
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        try:
+            if tipo is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+        return False
+
+
+def configurar(perfil=None, pool=None, max_inactivas=None, lectura=None, **pragmas):
+    """
+    Cambia el perfil de PRAGMAs y/o activa o desactiva el pool o el carril de
+    solo lectura (con lectura=False, solo_lectura() no cambia nada).
+    Los PRAGMAs sueltos (p. ej. cache_size=-64000) sobrescriben los del perfil.
+    Las conexiones libres se cierran para que la nueva configuración se aplique.
+    """
+    if perfil is not None:
+        if perfil not in PERFILES_PRAGMAS:
+            raise ValueError(f"Perfil de PRAGMAs desconocido: {perfil}")
+        _configuracion["perfil"] = perfil
+        _configuracion["pragmas"] = {}
+    if pool is not None:
+        _configuracion["pool"] = bool(pool)
+    if max_inactivas is not None:
+        _configuracion["max_inactivas"] = int(max_inactivas)
+    if lectura is not None:
+        _configuracion["lectura"] = bool(lectura)
+    _configuracion["pragmas"].update(pragmas)
+    cerrar_conexiones()
+
+
+def pragmas_activos():
+    """Devuelve los PRAGMAs que se aplican a cada conexión nueva."""
+    pragmas = dict(PERFILES_PRAGMAS[_configuracion["perfil"]])
+    pragmas.update(_configuracion["pragmas"])
+    return pragmas
+
+
+def aplicar_pragmas(conexion, pragmas=None):
+    for nombre, valor in (pragmas if pragmas is not None else pragmas_activos()).items():
+        conexion.execute(f"PRAGMA {nombre} = {valor}")
+
+
+def _abrir(database):
+    conexion = sqlite3.connect(database, check_same_thread=False, cached_statements=CACHE_SENTENCIAS)
+    aplicar_pragmas(conexion)
+    with _lock:
+        _estadisticas["conexiones_abiertas"] += 1
+    return conexion
+
+
+def _abrir_lectura(database):
+    ruta = pathname2url(os.path.abspath(database))
+    conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=CACHE_SENTENCIAS)
+    pragmas = {n: v for n, v in pragmas_activos().items() if n not in PRAGMAS_SOLO_ESCRITURA}
+    pragmas["query_only"] = 1
+    aplicar_pragmas(conexion, pragmas)
+    with _lock:
+        _estadisticas["conexiones_abiertas"] += 1
+        _estadisticas["conexiones_lectura"] += 1
+    return conexion
+
+
+def obtener_conexion(database=DATABASE):
+    """
+    Presta la conexión del hilo actual para 'database' (abriéndola si hace falta).
+    Dentro de solo_lectura() presta la del carril de solo lectura.
+    """
+    if getattr(_hilo, "solo_lectura", 0) and _configuracion["lectura"]:
+        return obtener_conexion_lectura(database)
+    return _prestar(database, database, _abrir)
+
+
+def obtener_conexion_lectura(database=DATABASE):
+    """
+    Presta una conexión de solo lectura para 'database', de un pool separado
+    del de escritura. No ve lo que el hilo tenga sin confirmar en su conexión
+    normal, y cualquier escritura falla con sqlite3.OperationalError.
+    """
+    return _prestar(("lectura", database), database, _abrir_lectura)
+
+
+def _prestar(clave, database, abrir):
+    if not _configuracion["pool"]:
+        # Sin pool se reproduce el comportamiento original: una conexión por llamada.
+        entrada = _Entrada(clave, abrir(database))
+    else:
+        activas = _hilo.__dict__.setdefault("activas", {})
+        entrada = activas.get(clave)
+        if entrada is None:
+            conexion = None
+            with _lock:
+                libres = _inactivas.get(clave)
+                if libres:
+                    conexion = libres.pop()
+                    _estadisticas["reutilizadas"] += 1
+            if conexion is None:
+                conexion = abrir(database)
+            entrada = _Entrada(clave, conexion)
+            activas[clave] = entrada
+    entrada.prestamos += 1
+    with _lock:
+        _estadisticas["prestamos"] += 1
+    return ConexionPrestada(entrada)
+
+
+def _liberar(entrada):
+    entrada.prestamos -= 1
+    if entrada.prestamos > 0:
+        return
+    conexion = entrada.conexion
+    activas = _hilo.__dict__.get("activas", {})
+    if activas.get(entrada.clave) is not entrada:
+        conexion.close()
+        return
+    del activas[entrada.clave]
+    # Igual que sqlite3.Connection.close(): lo que no se confirmó se descarta.
+    if conexion.in_transaction:
+        conexion.rollback()
+    if _configuracion["pool"]:
+        with _lock:
+            libres = _inactivas.setdefault(entrada.clave, [])
+            if len(libres) < _configuracion["max_inactivas"]:
+                libres.append(conexion)
+                return
+    conexion.close()
+
+
+@contextlib.contextmanager
+def solo_lectura():
+    """
+    Mientras dure el bloque, obtener_conexion() presta conexiones de solo
+    lectura en este hilo. También sirve como decorador de rutas GET:
+
+        @app.route('/api/...')
+        @base_datos.solo_lectura()
+        def ruta(): ...
+    """
+    _hilo.solo_lectura = getattr(_hilo, "solo_lectura", 0) + 1
+    try:
+        yield
+    finally:
+        _hilo.solo_lectura -= 1
+
+
+def cerrar_conexiones():
+    """Cierra todas las conexiones libres del pool. Devuelve cuántas cerró."""
+    with _lock:
+        conexiones = [c for libres in _inactivas.values() for c in libres]
+        _inactivas.clear()
+    for conexion in conexiones:
+        conexion.close()
+    return len(conexiones)
+
+
+def estadisticas():
+    with _lock:
+        return dict(_estadisticas)
+
+
+def reiniciar_estadisticas():
+    with _lock:
+        for clave in _estadisticas:
+            _estadisticas[clave] = 0
+
+
+def epoch_ms(fecha=None):
+    """Convierte un datetime local (por defecto, ahora) a milisegundos desde epoch."""
+    return int((fecha or datetime.now()).timestamp() * 1000)
+
+
+def sql_fecha_local(columna="ts"):
+    """Expresión SQL que muestra una columna ts como texto 'YYYY-MM-DD HH:MM:SS' local."""
+    return f"strftime('%Y-%m-%d %H:%M:%S', {columna} / 1000, 'unixepoch', 'localtime')"
+
+
+def formatear_epoch_ms(ms):
+    """Milisegundos desde epoch -> texto 'YYYY-MM-DD HH:MM:SS' en hora local."""
+    return datetime.fromtimestamp(ms / 1000).strftime(FORMATO_FECHA)
@@ -0,0 +1,65 @@
+# module/binario.py
+"""
+Formato binario compacto de lecturas para dispositivos y pasarelas.
+
+Cada lectura es un registro de 36 bytes, little-endian y sin relleno
+(struct "<Iq6f"):
+
+    byte  tipo     campo
+     0    uint32   id del cultivo (cultivos.id, no el número AGRO-...)
+     4    int64    ts, ms desde epoch
+    12    float32  humedad_suelo
+    16    float32  ph_suelo
+    20    float32  temperatura_ambiente
+    24    float32  nitrogeno (N)
+    28    float32  fosforo (P)
+    32    float32  potasio (K)
+
+NaN significa "sin dato"; ±inf se decodifica tal cual y
+sensores.insertar_registros rechaza ese registro. Un cuerpo es la concatenación de registros
+(Content-Type: application/octet-stream), así que su largo es múltiplo de 36.
+Se decodifica entero de una vez con struct.iter_unpack (o numpy.frombuffer si
+NumPy está instalado), sin pasar por texto ni por JSON. Los float32 guardan
+unas 7 cifras significativas: 20.1 llega como 20.100000381469727.
+"""
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa struct.iter_unpack
+    np = None
+
+TIPO_CONTENIDO = "application/octet-stream"
+REGISTRO = struct.Struct("<Iq6f")
+TAMANO_REGISTRO = REGISTRO.size
+if np is not None:
+    TIPO_NUMPY = np.dtype([("cultivo_id", "<u4"), ("ts", "<i8"), ("valores", "<f4", (6,))])
+
+
+def empaquetar(registros):
+    """[(cultivo_id, ts, humedad, ph, temperatura, N, P, K), ...] -> bytes; None se envía como NaN."""
+    nan = float("nan")
+    return b"".join(
+        REGISTRO.pack(cultivo_id, ts, *(nan if v is None else v for v in valores))
+        for cultivo_id, ts, *valores in registros
+    )
+
+
+def decodificar(datos):
+    """
+    bytes -> [(cultivo_id, ts, (humedad, ph, temperatura, N, P, K)), ...] con
+    None donde venía NaN. ValueError si el largo no es múltiplo del registro.
+    """
+    if len(datos) % TAMANO_REGISTRO:
+        raise ValueError(f"El cuerpo debe ser una secuencia de registros de {TAMANO_REGISTRO} bytes")
+    if np is not None:
+        registros = np.frombuffer(datos, dtype=TIPO_NUMPY)
+        numeros = registros["valores"]
+        valores = numeros.astype(np.float64).astype(object)
+        valores[np.isnan(numeros)] = None
+        return list(zip(registros["cultivo_id"].tolist(), registros["ts"].tolist(), map(tuple, valores.tolist())))
+    # v != v solo es cierto para NaN
+    return [
+        (cultivo_id, ts, tuple(None if v != v else v for v in valores))
+        for cultivo_id, ts, *valores in REGISTRO.iter_unpack(datos)
+    ]
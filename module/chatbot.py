@@ -1,12 +1,13 @@
 import requests
-import sqlite3
 from flask import jsonify, session, request, redirect, url_for, render_template
 import uuid
 import json
 import re  # Importar módulo de expresiones regulares
 
 # Importar módulos de cultivo y sensores
-from module import cultivos, sensores
+from module import base_datos, cultivos, sensores, repositorios
+
+DATABASE = "users.db"
 
 # Configuración para OpenRouter
 API_KEY = "apikey from openrouter"  # CLAVE de OpenRouter
@@ -23,7 +24,7 @@ HEADERS = {
 # --- Funciones de Base de Datos y Conversación ---
 
 def crear_tabla_chat():
-    conn = sqlite3.connect("users.db")
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS historial_chat (
@@ -41,7 +42,7 @@ def crear_tabla_chat():
 
 def cambiar_estado(conversacion_id):
     # Cambiar el estado de la conversación a 0
-    conn = sqlite3.connect("users.db")
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute('''
         UPDATE historial_chat
@@ -55,7 +56,7 @@ def nueva_conversacion():
     return str(uuid.uuid4())
 
 def guardar_interaccion(user_id, conversacion_id, pregunta, respuesta, activa=1):
-    conn = sqlite3.connect("users.db")
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute('''
         INSERT INTO historial_chat (user_id, conversacion_id, pregunta, respuesta, estado)
@@ -65,21 +66,18 @@ def guardar_interaccion(user_id, conversacion_id, pregunta, respuesta, activa=1)
     conn.close()
 
 def obtener_historial(conversacion_id, max_mensajes=10):
-    activa = 1
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT pregunta, respuesta, fecha, estado FROM historial_chat
-        WHERE conversacion_id = ? AND estado = ?
-        ORDER BY fecha ASC
-    ''', (conversacion_id, activa))
-    historial = cursor.fetchall()
+    conn = base_datos.obtener_conexion(DATABASE)
+    # Solo los últimos max_mensajes activos, ya en orden cronológico
+    historial = repositorios.RepositorioChat(conn).conversacion(conversacion_id, max_mensajes)
     conn.close()
-    # Limitar historial a últimos max_mensajes
-    if len(historial) > max_mensajes:
-        historial = historial[-max_mensajes:]
     return historial
 
+def obtener_conversaciones_usuario(user_id):
+    conn = base_datos.obtener_conexion(DATABASE)
+    conversaciones = repositorios.RepositorioChat(conn).conversaciones_usuario(user_id)
+    conn.close()
+    return conversaciones
+
 def cargar_contexto_conversacion(conversacion_id, max_mensajes=10):
     """
     Carga el historial completo desde la base de datos y lo formatea
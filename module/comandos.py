@@ -0,0 +1,183 @@
+# module/comandos.py
+"""
+Comandos de mantenimiento para la CLI de Flask.
+
+Uso: flask --app app <comando> [opciones]
+"""
+from datetime import datetime
+import click
+from module import agregados, archivo, base_datos, importador, pasarela, relleno, retencion, simulador
+
+
+def _fecha_a_ms(texto):
+    """'AAAA-MM-DD' (hora local) -> ms desde epoch; None si no se indicó."""
+    if texto is None:
+        return None
+    try:
+        return base_datos.epoch_ms(datetime.strptime(texto, "%Y-%m-%d"))
+    except ValueError:
+        raise click.BadParameter("Use el formato AAAA-MM-DD.")
+
+
+def registrar_comandos(app):
+    @app.cli.command("reconstruir-agregados")
+    @click.option("--desde", default=None, help="Día AAAA-MM-DD desde el que se regeneran (por defecto, todo).")
+    def reconstruir_agregados_comando(desde):
+        """Regenera los agregados por hora y día a partir de las lecturas y del archivo (conserva los días ya purgados)."""
+        resultado = agregados.reconstruir_agregados(_fecha_a_ms(desde))
+        click.echo(f"Agregados reconstruidos: {resultado['horas']} filas por hora, {resultado['dias']} por día.")
+
+    @app.cli.command("aplicar-retencion")
+    @click.option("--lote", type=int, default=None, help="Filas borradas por transacción.")
+    def aplicar_retencion_comando(lote):
+        """Resume y borra los datos más antiguos que su plazo de retención."""
+        if lote is not None:
+            retencion.configurar(tamano_lote=lote)
+        resultado = retencion.aplicar_retencion()
+        for tabla, filas in resultado["filas"].items():
+            click.echo(f"{tabla}: {filas} filas eliminadas")
+        click.echo(f"Espacio liberado: {resultado['bytes']} bytes")
+
+    @app.cli.command("compactar-archivo")
+    def compactar_archivo_comando():
+        """Pasa al archivo columnar los días fuera de la ventana caliente."""
+        resultado = archivo.compactar()
+        click.echo(f"Archivo columnar: {resultado['dias']} días, {resultado['lecturas']} lecturas compactadas.")
+
+    @app.cli.command("importar-texto")
+    @click.argument("tipo", type=click.Choice(["sensores", "cultivos", "clima"]))
+    @click.argument("ruta", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--cultivo", default=None, help="Número del cultivo al que pertenecen las lecturas (sensores).")
+    @click.option("--desde", default=None, help="Día AAAA-MM-DD de la primera lectura (sensores; por defecto, hoy).")
+    @click.option("--intervalo", type=float, default=60, show_default=True, help="Segundos entre lecturas consecutivas (sensores).")
+    @click.option("--usuario", type=int, default=None, help="Id del agricultor dueño de los cultivos (cultivos).")
+    @click.option("--prefijo", default="LEG", show_default=True, help="Prefijo del número de cultivo (cultivos).")
+    @click.option("--lote", type=int, default=None, help="Líneas por transacción.")
+    @click.option("--reiniciar", is_flag=True, help="Ignora el avance guardado y empieza desde la primera línea.")
+    def importar_texto_comando(tipo, ruta, cultivo, desde, intervalo, usuario, prefijo, lote, reiniciar):
+        """Importa datos_sensores.txt, cultivos.txt o clima.txt, retomando donde quedó."""
+        ultimo = [0.0]
+
+        def progreso(estado):
+            # Como mucho una línea de avance por segundo
+            if estado["segundos"] - ultimo[0] >= 1:
+                ultimo[0] = estado["segundos"]
+                click.echo(f"  línea {estado['hasta_linea']}: {estado['insertadas']} insertadas, "
+                           f"{estado['errores']} errores ({estado['lineas'] / estado['segundos']:.0f} líneas/s)")
+
+        opciones = {"tamano_lote": lote, "reiniciar": reiniciar, "progreso": progreso}
+        if tipo == "sensores":
+            if not cultivo:
+                raise click.UsageError("Indique --cultivo para importar lecturas de sensores.")
+            desde_ms = _fecha_a_ms(desde) if desde else _fecha_a_ms(datetime.now().strftime("%Y-%m-%d"))
+            try:
+                resultado = importador.importar_sensores(ruta, cultivo, desde_ms, intervalo, **opciones)
+            except ValueError as e:
+                raise click.UsageError(str(e))
+        elif tipo == "cultivos":
+            if usuario is None:
+                raise click.UsageError("Indique --usuario para importar cultivos.")
+            resultado = importador.importar_cultivos(ruta, usuario, prefijo, **opciones)
+        else:
+            resultado = importador.importar_clima(ruta, **opciones)
+
+        if not resultado["lineas"]:
+            click.echo(f"{resultado['archivo']}: sin líneas nuevas desde la línea {resultado['hasta_linea']}.")
+            return
+        codificaciones = ", ".join(f"{n} {c}" for c, n in resultado["codificaciones"].items())
+        click.echo(f"{resultado['archivo']}, líneas {resultado['desde_linea']}-{resultado['hasta_linea']} "
+                   f"({codificaciones}): {resultado['insertadas']} filas insertadas, "
+                   f"{resultado['errores']} líneas con errores.")
+        for error in resultado["detalle_errores"]:
+            click.echo(f"  línea {error['linea']}: {error['error']}", err=True)
+        if resultado["errores"] > len(resultado["detalle_errores"]):
+            click.echo(f"  ... y {resultado['errores'] - len(resultado['detalle_errores'])} más", err=True)
+
+    @app.cli.command("registrar-dispositivo")
+    @click.argument("nombre")
+    @click.option("--usuario", type=int, required=True, help="Id del usuario dueño; el dispositivo envía lecturas de sus cultivos.")
+    def registrar_dispositivo_comando(nombre, usuario):
+        """Da de alta un sensor de campo para la pasarela y muestra su token."""
+        pasarela.crear_tabla_dispositivos()
+        token = pasarela.registrar_dispositivo(nombre, usuario)
+        click.echo(f"Dispositivo '{nombre}' registrado. Token (guárdelo, no se vuelve a mostrar):")
+        click.echo(token)
+
+    @app.cli.command("revocar-dispositivo")
+    @click.argument("nombre")
+    def revocar_dispositivo_comando(nombre):
+        """Desactiva el token de un sensor de campo."""
+        if not pasarela.revocar_dispositivo(nombre):
+            raise click.UsageError(f"No existe el dispositivo '{nombre}'.")
+        click.echo(f"Dispositivo '{nombre}' revocado.")
+
+    @app.cli.command("simular")
+    @click.option("--cultivos", "cantidad", type=int, default=None, help="Cuántos cultivos simular (por defecto, todos).")
+    @click.option("--crear", is_flag=True, help="Da de alta los cultivos SIM-<usuario>-n que falten y simula esos.")
+    @click.option("--usuario", type=int, default=None, help="Id del agricultor dueño de los cultivos creados (con --crear).")
+    @click.option("--intervalo", type=float, default=simulador.INTERVALO_S, show_default=True, help="Segundos entre ticks.")
+    @click.option("--ticks", type=int, default=None, help="Cuántos ticks (por defecto, hasta Ctrl+C).")
+    @click.option("--rapido", is_flag=True, help="Sin esperar entre ticks: el ts avanza --intervalo por tick hasta ahora.")
+    @click.option("--semilla", type=int, default=None, help="Semilla para repetir la misma simulación.")
+    def simular_comando(cantidad, crear, usuario, intervalo, ticks, rapido, semilla):
+        """Simula lecturas de toda una flota de cultivos a la vez (pruebas de carga)."""
+        if crear:
+            if usuario is None or cantidad is None:
+                raise click.UsageError("Con --crear indique --cultivos y --usuario.")
+            ids = simulador.crear_cultivos_simulados(cantidad, usuario)
+        else:
+            ids = simulador.ids_cultivos(limite=cantidad)
+        if not ids:
+            raise click.UsageError("No hay cultivos que simular (use --crear).")
+        if rapido and ticks is None:
+            raise click.UsageError("Con --rapido indique --ticks.")
+
+        def informar(numero, resultado):
+            # Con --rapido se informa por transacción (varios ticks juntos)
+            click.echo(f"  tick {numero}: {resultado['insertadas']} insertadas, {len(resultado['alertas'])} cultivos con alerta")
+
+        click.echo(f"Simulando {len(ids)} cultivos cada {intervalo:g} s"
+                   f" ({'NumPy' if simulador.np is not None else 'sin NumPy'}).")
+        estadisticas = simulador.Simulador(ids, intervalo, semilla).ejecutar(ticks, tiempo_real=not rapido, al_tick=informar)
+        click.echo(f"{estadisticas['insertadas']} lecturas en {estadisticas['ticks']} ticks: "
+                   f"generación {estadisticas['segundos_generacion']:.2f} s, escritura {estadisticas['segundos_escritura']:.2f} s "
+                   f"({estadisticas['lecturas_por_segundo']:.0f} lecturas/s).")
+
+    @app.cli.command("rellenar")
+    @click.option("--desde", required=True, help="Día AAAA-MM-DD de la primera lectura.")
+    @click.option("--hasta", default=None, help="Día AAAA-MM-DD en que termina la historia, sin incluirlo (por defecto, ahora).")
+    @click.option("--intervalo", type=float, default=60, show_default=True, help="Segundos entre lecturas de un cultivo.")
+    @click.option("--semilla", type=int, default=0, show_default=True, help="La misma semilla produce las mismas lecturas.")
+    @click.option("--cultivos", "cantidad", type=int, default=None, help="Cuántos cultivos rellenar (por defecto, todos).")
+    @click.option("--crear", is_flag=True, help="Da de alta los cultivos SIM-<usuario>-n que falten y rellena esos.")
+    @click.option("--usuario", type=int, default=None, help="Id del agricultor dueño de los cultivos creados (con --crear).")
+    @click.option("--lote", type=int, default=None, help="Lecturas por transacción.")
+    def rellenar_comando(desde, hasta, intervalo, semilla, cantidad, crear, usuario, lote):
+        """Genera historia reproducible de los cultivos entre dos fechas."""
+        desde_ms = _fecha_a_ms(desde)
+        hasta_ms = _fecha_a_ms(hasta) if hasta else base_datos.epoch_ms()
+        if hasta_ms <= desde_ms:
+            raise click.UsageError("--hasta debe ser posterior a --desde.")
+        if crear:
+            if usuario is None or cantidad is None:
+                raise click.UsageError("Con --crear indique --cultivos y --usuario.")
+            ids = simulador.crear_cultivos_simulados(cantidad, usuario)
+        else:
+            ids = simulador.ids_cultivos(limite=cantidad)
+        if not ids:
+            raise click.UsageError("No hay cultivos que rellenar (use --crear).")
+        ultimo = [0.0]
+
+        def progreso(estado):
+            if estado["segundos"] - ultimo[0] >= 1:
+                ultimo[0] = estado["segundos"]
+                click.echo(f"  {estado['insertadas']} lecturas, {estado['cultivos']} cultivos "
+                           f"({estado['insertadas'] / estado['segundos']:.0f} lecturas/s)")
+
+        resultado = relleno.rellenar(ids, desde_ms, hasta_ms, intervalo, semilla, lote, progreso)
+        click.echo(f"{resultado['insertadas']} lecturas de {resultado['cultivos']} cultivos "
+                   f"en {resultado['segundos']:.1f} s.")
+        if resultado["omitidos"]:
+            click.echo(f"Omitidos por tener ya lecturas en el rango: {', '.join(resultado['omitidos'])}", err=True)
+        if resultado["rechazadas"]:
+            click.echo(f"{resultado['rechazadas']} lecturas rechazadas (días ya archivados).", err=True)
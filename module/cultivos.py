@@ -1,11 +1,12 @@
 # module/cultivos.py
 import sqlite3
 from flask import jsonify, request, session
+from module import base_datos, eventos, repositorios, muestreo
 
 DATABASE = "users.db"
 
 def crear_tabla_cultivos():
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS cultivos (
@@ -18,6 +19,8 @@ def crear_tabla_cultivos():
             longitud REAL NOT NULL,
             usuario_id INTEGER NOT NULL,
             agronomist_id INTEGER,
+            intervalo_muestreo INTEGER,  -- segundos (NULL: muestreo.INTERVALO_S)
+            muestreo_adaptativo INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (usuario_id) REFERENCES usuarios(id),
             FOREIGN KEY (agronomist_id) REFERENCES usuarios(id)
         )
@@ -25,41 +28,27 @@ def crear_tabla_cultivos():
     conn.commit()
     conn.close()
 
-def obtener_cultivos():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cultivos")
-    cultivos = [dict(row) for row in cursor.fetchall()]
+def listar_cultivos(usuario_id=None, tipo_usuario="admin"):
+    """Cultivos visibles para el usuario según su rol (admin: todos), como lista de dicts."""
+    conn = base_datos.obtener_conexion(DATABASE)
+    cultivos = repositorios.RepositorioCultivos(conn).visibles(usuario_id, tipo_usuario)
     conn.close()
-    return jsonify(cultivos)
+    return cultivos
+
+def obtener_cultivos():
+    return jsonify(listar_cultivos())
 
 def obtener_cultivos_por_usuario(usuario_id):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cultivos WHERE usuario_id=?", (usuario_id,))
-    cultivos = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(cultivos)
+    return jsonify(listar_cultivos(usuario_id, "agricultor"))
 
 def obtener_cultivos_por_agronomo(agronomist_id):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cultivos WHERE agronomist_id=?", (agronomist_id,))
-    cultivos = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(cultivos)
+    return jsonify(listar_cultivos(agronomist_id, "agronomo"))
 
 def obtener_datos_cultivo(numero_cultivo):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cultivos WHERE numero=?", (numero_cultivo,))
-    cultivo = cursor.fetchone()
+    conn = base_datos.obtener_conexion(DATABASE)
+    cultivo = repositorios.RepositorioCultivos(conn).por_numero(numero_cultivo)
     conn.close()
-    return dict(cultivo) if cultivo else None
+    return cultivo
 
 def agregar_cultivo():
     datos = request.get_json()
@@ -77,7 +66,7 @@ def agregar_cultivo():
     except (KeyError, ValueError) as e:
         return jsonify({"message": f"Datos inválidos o incompletos: {e}"}), 400
 
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute("SELECT nombre FROM usuarios WHERE id=?", (usuario_id,))
     row = cursor.fetchone()
@@ -102,6 +91,9 @@ def agregar_cultivo():
         return jsonify({"message": "Error al insertar cultivo. Verifica que no esté duplicado."}), 400
 
     conn.close()
+    eventos.publicar(eventos.CULTIVO_CAMBIADO, clave=numero, numero_cultivo=numero, accion="creado", campos={
+        "usuario_id": usuario_id, "agronomist_id": agronomist_id,
+    })
     return jsonify({"message": "Cultivo agregado exitosamente", "numero": numero})
 
 def editar_cultivo(numero_cultivo):
@@ -109,7 +101,7 @@ def editar_cultivo(numero_cultivo):
     if not datos:
         return jsonify({"message": "No se proporcionaron datos para actualizar"}), 400
 
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -121,9 +113,22 @@ def editar_cultivo(numero_cultivo):
 
     # Validar y preparar datos
     campos_actualizados = {}
-    for campo in ['ciudad', 'agricultor', 'tipo', 'latitud', 'longitud', 'usuario_id']:
+    for campo in ['ciudad', 'agricultor', 'tipo', 'latitud', 'longitud', 'usuario_id',
+                  'intervalo_muestreo', 'muestreo_adaptativo']:
         if campo in datos and datos[campo] is not None:
-            if campo in ['latitud', 'longitud']:
+            if campo == 'intervalo_muestreo':
+                # Segundos entre lecturas de la generación continua (base del modo adaptativo)
+                valor = datos[campo]
+                if isinstance(valor, bool) or not isinstance(valor, int) or not muestreo.MINIMO_S <= valor <= 86400:
+                    conn.close()
+                    return jsonify({"message": f"intervalo_muestreo debe ser un entero entre {muestreo.MINIMO_S} y 86400 segundos"}), 400
+                campos_actualizados[campo] = valor
+            elif campo == 'muestreo_adaptativo':
+                if not isinstance(datos[campo], bool):
+                    conn.close()
+                    return jsonify({"message": "muestreo_adaptativo debe ser true o false"}), 400
+                campos_actualizados[campo] = int(datos[campo])
+            elif campo in ['latitud', 'longitud']:
                 try:
                     campos_actualizados[campo] = float(datos[campo])
                 except ValueError:
@@ -155,10 +160,12 @@ def editar_cultivo(numero_cultivo):
 
     conn.commit()
     conn.close()
+    eventos.publicar(eventos.CULTIVO_CAMBIADO, clave=numero_cultivo, numero_cultivo=numero_cultivo,
+                     accion="editado", campos=campos_actualizados)
     return jsonify({"message": f"Cultivo {numero_cultivo} actualizado exitosamente"})
 
 def eliminar_cultivo(numero_cultivo):
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute("DELETE FROM cultivos WHERE numero=?", (numero_cultivo,))
     conn.commit()
@@ -166,4 +173,6 @@ def eliminar_cultivo(numero_cultivo):
         conn.close()
         return jsonify({"message": f"Cultivo con número {numero_cultivo} no encontrado"}), 404
     conn.close()
+    eventos.publicar(eventos.CULTIVO_CAMBIADO, clave=numero_cultivo, numero_cultivo=numero_cultivo,
+                     accion="eliminado", campos={})
     return jsonify({"message": f"Cultivo {numero_cultivo} eliminado exitosamente"})
\ No newline at end of file
@@ -8,6 +8,9 @@ from email.mime.text import MIMEText
 from email.header import Header
 import json
 from email.mime.multipart import MIMEMultipart
+from module import base_datos
+from module import archivo
+from module import repositorios
 
 # Configuración de la base de datos
 DATABASE = "users.db"
@@ -35,9 +38,9 @@ OPENWEATHER_API_KEY = "apikey from openweathermap"
 OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/forecast"
 
 def crear_tabla_datos_avanzados():
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS datos_avanzados (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             numero_cultivo TEXT NOT NULL,
@@ -78,7 +81,7 @@ def crear_tabla_datos_avanzados():
             potasio_desviacion REAL,
             potasio_anomalia INTEGER DEFAULT 0,
             probabilidad_lluvia REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ts INTEGER NOT NULL DEFAULT ({base_datos.SQL_AHORA_MS}), -- milisegundos desde epoch
             FOREIGN KEY (numero_cultivo) REFERENCES cultivos(numero)
         )
     """)
@@ -87,7 +90,7 @@ def crear_tabla_datos_avanzados():
 
 def obtener_destinatarios_cultivo(numero_cultivo):
     """Obtiene los emails del agricultor y agrónomo asociados a un cultivo"""
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -115,76 +118,14 @@ def obtener_destinatarios_cultivo(numero_cultivo):
     return lat, lon, numero_cultivo, agronomo_email, agricultor_email
 
 def obtener_datos_avanzados(numero_cultivo):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM datos_avanzados 
-        WHERE numero_cultivo = ?
-        ORDER BY timestamp DESC
-        LIMIT 1
-    """, (numero_cultivo,))
-    
-    row = cursor.fetchone()
+    conn = base_datos.obtener_conexion(DATABASE)
+    # {"humedad": {"ultimo": ..., "maximo": ...}, ..., "probabilidad_lluvia": ..., "timestamp": ...}
+    datos = repositorios.RepositorioDatosAvanzados(conn).ultimo(numero_cultivo)
     conn.close()
     
-    if not row:
+    if not datos:
         return {"error": "No hay datos avanzados para este cultivo"}, 404
     
-    datos = {
-        "humedad": {
-            "ultimo": row["humedad_ultimo"],
-            "maximo": row["humedad_maximo"],
-            "minimo": row["humedad_minimo"],
-            "promedio": row["humedad_promedio"],
-            "desviacion": row["humedad_desviacion"],
-            "anomalia": row["humedad_anomalia"]
-        },
-        "ph": {
-            "ultimo": row["ph_ultimo"],
-            "maximo": row["ph_maximo"],
-            "minimo": row["ph_minimo"],
-            "promedio": row["ph_promedio"],
-            "desviacion": row["ph_desviacion"],
-            "anomalia": row["ph_anomalia"]
-        },
-        "temp": {
-            "ultimo": row["temp_ultimo"],
-            "maximo": row["temp_maximo"],
-            "minimo": row["temp_minimo"],
-            "promedio": row["temp_promedio"],
-            "desviacion": row["temp_desviacion"],
-            "anomalia": row["temp_anomalia"]
-        },
-        "nitrogeno": {
-            "ultimo": row["nitrogeno_ultimo"],
-            "maximo": row["nitrogeno_maximo"],
-            "minimo": row["nitrogeno_minimo"],
-            "promedio": row["nitrogeno_promedio"],
-            "desviacion": row["nitrogeno_desviacion"],
-            "anomalia": row["nitrogeno_anomalia"]
-        },
-        "fosforo": {
-            "ultimo": row["fosforo_ultimo"],
-            "maximo": row["fosforo_maximo"],
-            "minimo": row["fosforo_minimo"],
-            "promedio": row["fosforo_promedio"],
-            "desviacion": row["fosforo_desviacion"],
-            "anomalia": row["fosforo_anomalia"]
-        },
-        "potasio": {
-            "ultimo": row["potasio_ultimo"],
-            "maximo": row["potasio_maximo"],
-            "minimo": row["potasio_minimo"],
-            "promedio": row["potasio_promedio"],
-            "desviacion": row["potasio_desviacion"],
-            "anomalia": row["potasio_anomalia"]
-        },
-        "probabilidad_lluvia": row["probabilidad_lluvia"],
-        "timestamp": row["timestamp"]
-    }
-    
     return datos
 
 def obtener_recomendaciones_ia(numero_cultivo):
@@ -258,20 +199,12 @@ def detectar_anomalia(current_value, historical_values, threshold_std_dev=2):
     return 0
 
 def obtener_ultimos_valores_parametro(numero_cultivo, parametro, limit=30):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     
-    cursor.execute(f"""
-        SELECT {parametro}, timestamp FROM datos_sensores
-        WHERE numero_cultivo = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """, (numero_cultivo, limit))
-    
-    filas = cursor.fetchall()
+    filas = archivo.consultar_lecturas(cursor, numero_cultivo, (parametro,), descendente=True, limite=limit)
     conn.close()
-    return [(fila[parametro], fila['timestamp']) for fila in reversed(filas) if fila[parametro] is not None]
+    return [(valor, base_datos.formatear_epoch_ms(ts)) for ts, valor in reversed(filas) if valor is not None]
 
 def generar_datos_avanzados(numero_cultivo):
     parametros = {
@@ -285,9 +218,14 @@ def generar_datos_avanzados(numero_cultivo):
 
     datos = {}
 
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
     for clave_sensor, prefijo_columna in parametros.items():
-        valores_con_timestamp = obtener_ultimos_valores_parametro(numero_cultivo, clave_sensor)
-        valores = [val for val, _ in valores_con_timestamp]
+        # Las últimas 30 lecturas como columna (cortes del archivo o arreglos de
+        # SQLite): sin tuplas ni fechas por lectura; se redondea solo el resultado
+        with archivo.consultar_columnas(cursor, numero_cultivo, (clave_sensor,), descendente=True, limite=30) as lecturas:
+            valores = [float(valor) for valor in lecturas.columna(clave_sensor) if valor == valor]  # sin NaN
+            estadisticas = tuple(map(lecturas.redondear, calcular_estadisticas(valores)))
 
         if not valores:
             datos[f"{prefijo_columna}_ultimo"] = None
@@ -298,8 +236,8 @@ def generar_datos_avanzados(numero_cultivo):
             datos[f"{prefijo_columna}_anomalia"] = 0
             continue
 
-        ultimo, maximo, minimo, promedio, desviacion = calcular_estadisticas(valores)
-        anomalia = detectar_anomalia(ultimo, valores[:-1]) if len(valores) > 1 else 0
+        anomalia = detectar_anomalia(valores[-1], valores[:-1]) if len(valores) > 1 else 0
+        ultimo, maximo, minimo, promedio, desviacion = estadisticas
 
         datos[f"{prefijo_columna}_ultimo"] = ultimo
         datos[f"{prefijo_columna}_maximo"] = maximo
@@ -307,6 +245,7 @@ def generar_datos_avanzados(numero_cultivo):
         datos[f"{prefijo_columna}_promedio"] = promedio
         datos[f"{prefijo_columna}_desviacion"] = desviacion
         datos[f"{prefijo_columna}_anomalia"] = anomalia
+    conn.close()
 
     # Obtener probabilidad de lluvia
     lat, lon = obtener_coordenadas_cultivo(numero_cultivo)
@@ -317,13 +256,14 @@ def generar_datos_avanzados(numero_cultivo):
             prob_lluvia = pronosticos[0].get("probabilidad_lluvia", 0)
 
     datos['probabilidad_lluvia'] = prob_lluvia
+    datos['ts'] = base_datos.epoch_ms()
 
     # Insertar en la tabla datos_avanzados
     columnas = ', '.join(['numero_cultivo'] + list(datos.keys()))
     placeholders = ', '.join(['?'] * (len(datos) + 1))
     valores = [numero_cultivo] + list(datos.values())
 
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute(f"""
         INSERT INTO datos_avanzados ({columnas})
@@ -335,7 +275,7 @@ def generar_datos_avanzados(numero_cultivo):
     return {"message": f"Datos avanzados generados para cultivo {numero_cultivo}"}, 201
 
 def obtener_coordenadas_cultivo(numero_cultivo):
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute("SELECT latitud, longitud FROM cultivos WHERE numero = ?", (numero_cultivo,))
     resultado = cursor.fetchone()
@@ -434,13 +374,13 @@ def enviar_resumen_clima_email_V2(lat, lon, numero_cultivo, agronomo_email, agri
 
         recomendacion = obtener_recomendacion_clima(pronostico)
         
-        conn = sqlite3.connect(DATABASE)
+        conn = base_datos.obtener_conexion(DATABASE)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT * FROM datos_avanzados 
+            SELECT * FROM vista_datos_avanzados 
             WHERE numero_cultivo = ?
-            ORDER BY timestamp DESC LIMIT 1
+            ORDER BY ts DESC LIMIT 1
         """, (numero_cultivo,))
         datos = cursor.fetchone()
         conn.close()
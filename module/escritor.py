@@ -0,0 +1,175 @@
+# module/escritor.py
+"""
+Escritor con commit agrupado (group commit).
+
+Los productores encolan elementos y reciben un Future; un único hilo los
+junta hasta 'max_filas' o hasta que pasan 'intervalo_ms' desde el primero y
+los entrega de una vez a 'volcar', que los escribe en una sola transacción.
+Así un commit (y su fsync) se reparte entre todas las lecturas del lote y los
+hilos generadores no compiten por el bloqueo de escritura de SQLite.
+
+'volcar(elementos)' devuelve un resultado por elemento (una excepción marca
+ese elemento como fallido); con ellos se resuelven los Future y después se
+llama a 'despues(elementos, resultados)', fuera del tiempo de commit, p. ej.
+para evaluar alertas.
+
+Contrapresión: con 'limite_alto' la cola queda acotada. Al llegar a ese
+número de pendientes el escritor se declara saturado y encolar lanza
+Saturado en vez de aceptar más; vuelve a aceptar cuando la cola baja a
+'limite_bajo' (por defecto, la mitad). La histéresis evita que los
+productores oscilen entre aceptado y rechazado con cada lote confirmado.
+"""
+import atexit
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_FIN = object()
+
+
+class Saturado(Exception):
+    """
+    La ingesta no admite más trabajo por ahora. 'reintentar' son los segundos
+    sugeridos para Retry-After y 'estado', el código HTTP con que responder.
+    """
+    def __init__(self, mensaje, reintentar=1, estado=503):
+        super().__init__(mensaje)
+        self.reintentar = reintentar
+        self.estado = estado
+
+
+class EscritorLotes:
+    def __init__(self, volcar, intervalo_ms=50, max_filas=500, despues=None, nombre="escritor-lotes",
+                 limite_alto=None, limite_bajo=None):
+        self.volcar = volcar
+        self.despues = despues
+        self.intervalo = intervalo_ms / 1000
+        self.max_filas = max_filas
+        self.nombre = nombre
+        self.limite_alto = limite_alto or None
+        self.limite_bajo = (limite_alto // 2 if limite_bajo is None else limite_bajo) if self.limite_alto else None
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._saturado = False
+        self._estadisticas = {
+            "lotes": 0, "filas": 0, "errores": 0, "segundos_commit": 0.0, "max_segundos_commit": 0.0,
+            "descartadas": 0, "saturaciones": 0,
+        }
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name=self.nombre, daemon=True)
+            self._hilo.start()
+            # Lo que quede en la cola se escribe al salir del proceso
+            atexit.register(self.detener)
+        return self
+
+    @property
+    def en_marcha(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    @property
+    def saturado(self):
+        """True desde que la cola llega a limite_alto hasta que baja a limite_bajo."""
+        if self.limite_alto is None:
+            return False
+        pendientes = self._cola.qsize()
+        with self._lock:
+            if self._saturado and pendientes <= self.limite_bajo:
+                self._saturado = False
+            elif not self._saturado and pendientes >= self.limite_alto:
+                self._saturado = True
+                self._estadisticas["saturaciones"] += 1
+            return self._saturado
+
+    def segundos_para_vaciar(self):
+        """Estimación (>= 1 s) de lo que tarda la cola en bajar a limite_bajo, para Retry-After."""
+        with self._lock:
+            lotes, segundos = self._estadisticas["lotes"], self._estadisticas["segundos_commit"]
+        por_lote = self.intervalo + (segundos / lotes if lotes else 0.0)
+        exceso = self._cola.qsize() - (self.limite_bajo or 0)
+        return max(1, math.ceil(exceso / self.max_filas * por_lote))
+
+    def encolar(self, elemento):
+        """
+        Agrega un elemento al próximo lote. El Future se resuelve tras su commit.
+        Si el escritor está saturado lanza Saturado y el elemento se descarta.
+        """
+        if self.saturado:
+            with self._lock:
+                self._estadisticas["descartadas"] += 1
+            raise Saturado(f"{self.nombre}: cola llena, reintente más tarde", self.segundos_para_vaciar())
+        futuro = Future()
+        self._cola.put((elemento, futuro))
+        return futuro
+
+    def detener(self, timeout=None):
+        """Escribe lo pendiente y termina el hilo."""
+        if self._hilo is None:
+            return
+        self._cola.put(_FIN)
+        self._hilo.join(timeout)
+        self._hilo = None
+        atexit.unregister(self.detener)
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._estadisticas)
+        datos["pendientes"] = self._cola.qsize()
+        datos["limite_alto"] = self.limite_alto
+        datos["limite_bajo"] = self.limite_bajo
+        datos["saturado"] = self.saturado
+        datos["ms_commit_promedio"] = 1000 * datos["segundos_commit"] / datos["lotes"] if datos["lotes"] else 0.0
+        return datos
+
+    def _bucle(self):
+        fin = False
+        while not fin:
+            primero = self._cola.get()
+            if primero is _FIN:
+                return
+            lote = [primero]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.max_filas:
+                espera = limite - time.monotonic()
+                try:
+                    siguiente = self._cola.get(timeout=espera) if espera > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if siguiente is _FIN:
+                    fin = True
+                    break
+                lote.append(siguiente)
+            self._escribir(lote)
+
+    def _escribir(self, lote):
+        elementos = [elemento for elemento, _ in lote]
+        inicio = time.perf_counter()
+        try:
+            resultados = self.volcar(elementos)
+        except Exception as e:  # Falló la transacción entera: falla cada elemento
+            resultados = [e] * len(elementos)
+        duracion = time.perf_counter() - inicio
+
+        errores = 0
+        for (_, futuro), resultado in zip(lote, resultados):
+            if isinstance(resultado, BaseException):
+                futuro.set_exception(resultado)
+                errores += 1
+            else:
+                futuro.set_result(resultado)
+        with self._lock:
+            self._estadisticas["lotes"] += 1
+            self._estadisticas["filas"] += len(lote)
+            self._estadisticas["errores"] += errores
+            self._estadisticas["segundos_commit"] += duracion
+            self._estadisticas["max_segundos_commit"] = max(self._estadisticas["max_segundos_commit"], duracion)
+
+        if self.despues is not None:
+            try:
+                self.despues(elementos, resultados)
+            except Exception as e:
+                print(f"[ERROR] {self.nombre}: fallo después del commit: {e}")
@@ -0,0 +1,174 @@
+# module/eventos.py
+"""
+Bus de eventos en proceso (publicar / suscribir).
+
+La ingesta publica lo que ya quedó confirmado y no espera a quien lo consume:
+guardar_datos hace su insert, publica LECTURA_GUARDADA y vuelve; las alertas
+(con sus consultas y correos), las cachés o el envío por SSE corren después en
+los hilos del bus. Un consumidor nuevo solo tiene que suscribirse.
+
+Eventos y sus datos:
+
+    LECTURA_GUARDADA   numero_cultivo, ts, datos
+    LOTE_GUARDADO      lecturas [(numero_cultivo, datos)], origen,
+                       alertas (cultivos con alerta, o None si no se evaluaron),
+                       avisos (correos pendientes de esas alertas)
+    CULTIVO_CAMBIADO   numero_cultivo, accion ("creado", "editado", "eliminado"), campos
+    ALERTA_DISPARADA   alerta_id, tipo_alerta, numero_cultivo, valor_sensor,
+                       usuario_id, agronomist_id, ts
+    REGLA_CAMBIADA     alerta_id, accion ("creada", "eliminada")
+    USUARIO_ELIMINADO  usuario_id
+
+Los suscriptores reciben un dict con esos campos más "evento". Cada evento
+con 'clave' (p. ej. el número de cultivo) va siempre al mismo hilo, así que
+los de un mismo cultivo se procesan en orden. Si la cola del bus pasa de
+LIMITE_PENDIENTES, el que publica ejecuta los suscriptores él mismo (la
+contrapresión llega al productor en vez de crecer la memoria). Un
+suscriptor 'sincrono' corre siempre en el hilo que publica, y con
+ECOSMART_EVENTOS_HILOS=0 todos lo hacen.
+"""
+import atexit
+import itertools
+import os
+import queue
+import threading
+
+LECTURA_GUARDADA = "lectura_guardada"
+LOTE_GUARDADO = "lote_guardado"
+CULTIVO_CAMBIADO = "cultivo_cambiado"
+ALERTA_DISPARADA = "alerta_disparada"
+REGLA_CAMBIADA = "regla_cambiada"
+USUARIO_ELIMINADO = "usuario_eliminado"
+
+HILOS = int(os.environ.get("ECOSMART_EVENTOS_HILOS", "4"))
+LIMITE_PENDIENTES = 10000
+
+_FIN = object()
+
+
+class Bus:
+    def __init__(self, hilos=HILOS, limite_pendientes=LIMITE_PENDIENTES, nombre="eventos"):
+        self.hilos = hilos
+        self.limite_pendientes = limite_pendientes
+        self.nombre = nombre
+        self._suscriptores = {}  # evento -> ((funcion, sincrono), ...)
+        self._colas = []
+        self._trabajadores = []
+        self._turno = itertools.count()
+        self._lock = threading.Lock()
+        self._vacio = threading.Condition(self._lock)
+        self._pendientes = 0
+        self._estadisticas = {"publicados": 0, "entregas": 0, "errores": 0, "en_linea": 0}
+
+    def suscribir(self, evento, funcion, sincrono=False):
+        """Registra 'funcion(datos)' para el evento. Devuelve la función (sirve como decorador)."""
+        with self._lock:
+            self._suscriptores[evento] = self._suscriptores.get(evento, ()) + ((funcion, sincrono),)
+        return funcion
+
+    def desuscribir(self, evento, funcion):
+        with self._lock:
+            self._suscriptores[evento] = tuple(s for s in self._suscriptores.get(evento, ()) if s[0] != funcion)
+
+    def publicar(self, evento, clave=None, **datos):
+        """Entrega el evento a sus suscriptores. Devuelve cuántos había."""
+        suscriptores = self._suscriptores.get(evento, ())
+        with self._lock:
+            self._estadisticas["publicados"] += 1
+        if not suscriptores:
+            return 0
+        datos["evento"] = evento
+        en_segundo_plano = []
+        for funcion, sincrono in suscriptores:
+            if sincrono or self.hilos <= 0:
+                self._entregar(funcion, datos)
+            else:
+                en_segundo_plano.append(funcion)
+        if en_segundo_plano:
+            with self._lock:
+                lleno = self._pendientes >= self.limite_pendientes
+                if lleno:
+                    self._estadisticas["en_linea"] += 1
+                else:
+                    self._pendientes += 1
+            if lleno:
+                for funcion in en_segundo_plano:
+                    self._entregar(funcion, datos)
+            else:
+                self._cola_para(clave).put((en_segundo_plano, datos))
+        return len(suscriptores)
+
+    def esperar(self, timeout=None):
+        """Espera a que se hayan procesado los eventos publicados. False si vence el plazo."""
+        with self._vacio:
+            return self._vacio.wait_for(lambda: self._pendientes == 0, timeout)
+
+    def detener(self, timeout=5):
+        """Procesa lo pendiente y termina los hilos."""
+        with self._lock:
+            colas, trabajadores = self._colas, self._trabajadores
+            self._colas, self._trabajadores = [], []
+        for cola in colas:
+            cola.put(_FIN)
+        for trabajador in trabajadores:
+            trabajador.join(timeout)
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._estadisticas)
+            datos["pendientes"] = self._pendientes
+            datos["suscriptores"] = {evento: len(s) for evento, s in self._suscriptores.items() if s}
+        datos["hilos"] = self.hilos
+        return datos
+
+    def _cola_para(self, clave):
+        if not self._colas:
+            with self._lock:
+                if not self._colas:
+                    self._iniciar()
+        indice = next(self._turno) if clave is None else hash(clave)
+        return self._colas[indice % len(self._colas)]
+
+    def _iniciar(self):
+        for i in range(self.hilos):
+            cola = queue.Queue()
+            trabajador = threading.Thread(target=self._bucle, args=(cola,), name=f"{self.nombre}-{i}", daemon=True)
+            trabajador.start()
+            self._colas.append(cola)
+            self._trabajadores.append(trabajador)
+
+    def _bucle(self, cola):
+        while True:
+            elemento = cola.get()
+            if elemento is _FIN:
+                return
+            funciones, datos = elemento
+            for funcion in funciones:
+                self._entregar(funcion, datos)
+            with self._vacio:
+                self._pendientes -= 1
+                if self._pendientes == 0:
+                    self._vacio.notify_all()
+
+    def _entregar(self, funcion, datos):
+        try:
+            funcion(datos)
+        except Exception as e:
+            print(f"[ERROR] {self.nombre}: el suscriptor {getattr(funcion, '__name__', funcion)} "
+                  f"falló con {datos['evento']}: {e}")
+            with self._lock:
+                self._estadisticas["errores"] += 1
+        else:
+            with self._lock:
+                self._estadisticas["entregas"] += 1
+
+
+# Bus de la aplicación
+bus = Bus()
+suscribir = bus.suscribir
+desuscribir = bus.desuscribir
+publicar = bus.publicar
+esperar = bus.esperar
+estadisticas = bus.estadisticas
+# Los eventos ya publicados se procesan antes de salir del proceso
+atexit.register(bus.esperar, 5)
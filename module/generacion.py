@@ -0,0 +1,311 @@
+# module/generacion.py
+"""
+Registro compartido de la generación continua (varios procesos, reinicios).
+
+Qué cultivos están generando se guarda en la tabla generacion_cultivos y no
+en un diccionario del proceso: con varios procesos del servidor WSGI todos
+ven el mismo estado, y tras un reinicio la generación sigue sola.
+
+Cada cultivo en generación tiene un dueño (el proceso que lo ejecuta) con un
+arriendo que vence a los PLAZO_S segundos. Cada LATIDO_S segundos cada
+proceso, en una sola transacción:
+
+- anota su latido en generacion_trabajadores y renueva sus arriendos;
+- toma los cultivos sin dueño o con el arriendo vencido (un proceso caído
+  los suelta solo) hasta su cuota, la parte que le toca entre los procesos
+  vivos, y suelta lo que pase de ella para que uno nuevo reciba trabajo;
+- deja de ejecutar los cultivos que ya no son suyos.
+
+Antes de cada ciclo el dueño confirma su arriendo con un UPDATE condicionado
+(dueño y vencimiento); si otro proceso se lo quedó o alguien detuvo el
+cultivo, el ciclo no genera y la tarea se da de baja. Así nunca hay dos
+procesos generando el mismo cultivo. La columna 'proximo' (ms desde epoch)
+permite que el nuevo dueño siga el mismo ritmo en vez de generar de inmediato;
+se anota con el intervalo que eligió el propio ciclo (por cultivo o adaptativo).
+"""
+import asyncio
+import inspect
+import math
+import os
+import secrets
+import socket
+from module import base_datos
+from module.planificador import nuevo_intervalo
+
+DATABASE = "users.db"
+LATIDO_S = float(os.environ.get("ECOSMART_GENERACION_LATIDO_S", "10"))
+PLAZO_S = 3 * LATIDO_S
+_LATIDO = ("latido",)  # clave de la tarea de latido en el planificador
+
+
+def crear_tablas(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS generacion_cultivos (
+            numero_cultivo TEXT PRIMARY KEY,
+            usuario_id INTEGER,
+            tipo_usuario TEXT NOT NULL,
+            dueno TEXT,                  -- proceso que la ejecuta (NULL: libre)
+            vence INTEGER NOT NULL,      -- fin del arriendo, ms desde epoch
+            proximo INTEGER NOT NULL,    -- próximo ciclo, ms desde epoch
+            iniciado INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_generacion_cultivos_dueno ON generacion_cultivos (dueno)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS generacion_trabajadores (
+            trabajador TEXT PRIMARY KEY,
+            latido INTEGER NOT NULL,
+            cultivos INTEGER NOT NULL,
+            iniciado INTEGER NOT NULL
+        )
+    """)
+
+
+def identificador_trabajador():
+    return f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(3)}"
+
+
+class Coordinador:
+    """
+    Une el registro con el planificador de este proceso (planificador.Planificador
+    o motor.Motor). 'ciclo(numero_cultivo, usuario_id, tipo_usuario)' es un ciclo
+    de generación, normal o corrutina (False lo detiene).
+    """
+
+    def __init__(self, planificador, ciclo, intervalo_s, trabajador=None, latido_s=None, plazo_s=None):
+        self.planificador = planificador
+        self.ciclo = ciclo
+        self.intervalo_s = intervalo_s
+        self.trabajador = trabajador or identificador_trabajador()
+        self.latido_s = latido_s or LATIDO_S
+        self.plazo_ms = int((plazo_s or 3 * self.latido_s) * 1000)
+        self._intervalos = {}  # numero_cultivo -> último intervalo (s) que devolvió su ciclo
+
+    def iniciar_cultivo(self, numero_cultivo, usuario_id, tipo_usuario):
+        """Registra el cultivo y lo ejecuta aquí. False si ya estaba en generación."""
+        ahora = base_datos.epoch_ms()
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO generacion_cultivos
+                (numero_cultivo, usuario_id, tipo_usuario, dueno, vence, proximo, iniciado)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (numero_cultivo, usuario_id, tipo_usuario, self.trabajador, ahora + self.plazo_ms, ahora, ahora))
+        nuevo = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        if nuevo:
+            self._programar(numero_cultivo, usuario_id, tipo_usuario, 0.0)
+        return nuevo
+
+    def detener_cultivo(self, numero_cultivo):
+        """
+        Quita el cultivo del registro. Si corre aquí se da de baja ya; si corre
+        en otro proceso, su próximo ciclo ya no encuentra el arriendo y no genera.
+        """
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM generacion_cultivos WHERE numero_cultivo = ?", (numero_cultivo,))
+        existia = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        self.planificador.cancelar(numero_cultivo)
+        return existia
+
+    def detener_iniciados(self, numero_cultivo=None, usuario_id=None, sigue=None):
+        """
+        Detiene los cultivos en generación (el cultivo dado, los que inició
+        usuario_id, o ambos filtros) salvo aquellos para los que
+        sigue(numero_cultivo, usuario_id, tipo_usuario) es verdadero. Como
+        detener_cultivo, vale para todos los procesos. Devuelve los detenidos.
+        """
+        condiciones, parametros = [], []
+        if numero_cultivo is not None:
+            condiciones.append("numero_cultivo = ?")
+            parametros.append(numero_cultivo)
+        if usuario_id is not None:
+            condiciones.append("usuario_id = ?")
+            parametros.append(usuario_id)
+        if not condiciones:
+            raise ValueError("Falta numero_cultivo o usuario_id")
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT numero_cultivo, usuario_id, tipo_usuario FROM generacion_cultivos WHERE {" AND ".join(condiciones)}
+        """, parametros)
+        candidatos = cursor.fetchall()
+        conn.close()
+        detenidos = []
+        for numero, iniciador, tipo_usuario in candidatos:
+            if sigue is not None and sigue(numero, iniciador, tipo_usuario):
+                continue
+            conn = base_datos.obtener_conexion(DATABASE)
+            cursor = conn.cursor()
+            # Solo si nadie lo reinició entre medio
+            cursor.execute("""
+                DELETE FROM generacion_cultivos WHERE numero_cultivo = ? AND usuario_id IS ? AND tipo_usuario = ?
+            """, (numero, iniciador, tipo_usuario))
+            borrado = cursor.rowcount == 1
+            conn.commit()
+            conn.close()
+            if borrado:
+                self.planificador.cancelar(numero)
+                detenidos.append(numero)
+        return detenidos
+
+    def estados(self, numeros):
+        """{numero_cultivo: 'running' | 'stopped'} con una sola consulta."""
+        numeros = list(numeros)
+        if not numeros:
+            return {}
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        marcadores = ", ".join("?" * len(numeros))
+        cursor.execute(f"SELECT numero_cultivo FROM generacion_cultivos WHERE numero_cultivo IN ({marcadores})", numeros)
+        activos = {fila[0] for fila in cursor.fetchall()}
+        conn.close()
+        return {numero: 'running' if numero in activos else 'stopped' for numero in numeros}
+
+    def estado(self, numero_cultivo):
+        return self.estados([numero_cultivo])[numero_cultivo]
+
+    def arrancar(self):
+        """Programa el latido (el primero de inmediato: retoma lo que quedó de antes del reinicio)."""
+        self.planificador.programar(_LATIDO, self.latir, self.latido_s)
+
+    def latir(self):
+        """Un latido: renueva, reparte y suelta arriendos. Devuelve lo que cambió."""
+        ahora = base_datos.epoch_ms()
+        vence = ahora + self.plazo_ms
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("UPDATE generacion_cultivos SET vence = ? WHERE dueno = ?", (vence, self.trabajador))
+            mios = cursor.rowcount
+            cursor.execute("""
+                INSERT INTO generacion_trabajadores (trabajador, latido, cultivos, iniciado) VALUES (?, ?, ?, ?)
+                ON CONFLICT (trabajador) DO UPDATE SET latido = excluded.latido, cultivos = excluded.cultivos
+            """, (self.trabajador, ahora, mios, ahora))
+            cursor.execute("DELETE FROM generacion_trabajadores WHERE latido < ?", (ahora - self.plazo_ms,))
+            cursor.execute("SELECT COUNT(*) FROM generacion_trabajadores")
+            vivos = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM generacion_cultivos")
+            cuota = math.ceil(cursor.fetchone()[0] / max(1, vivos))
+
+            tomados = soltados = 0
+            if mios < cuota:
+                cursor.execute("""
+                    UPDATE generacion_cultivos SET dueno = ?, vence = ?
+                    WHERE numero_cultivo IN (
+                        SELECT numero_cultivo FROM generacion_cultivos
+                        WHERE dueno IS NULL OR vence <= ? ORDER BY proximo LIMIT ?
+                    )
+                """, (self.trabajador, vence, ahora, cuota - mios))
+                tomados = cursor.rowcount
+            elif mios > cuota:
+                # Los que más tardan en tocar: el que los tome tiene tiempo de programarlos
+                cursor.execute("""
+                    UPDATE generacion_cultivos SET dueno = NULL, vence = 0
+                    WHERE numero_cultivo IN (
+                        SELECT numero_cultivo FROM generacion_cultivos
+                        WHERE dueno = ? ORDER BY proximo DESC LIMIT ?
+                    )
+                """, (self.trabajador, mios - cuota))
+                soltados = cursor.rowcount
+            cursor.execute("""
+                SELECT numero_cultivo, usuario_id, tipo_usuario, proximo FROM generacion_cultivos WHERE dueno = ?
+            """, (self.trabajador,))
+            propios = cursor.fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        programados = {clave for clave in self.planificador.claves() if clave != _LATIDO}
+        nuevos = 0
+        for numero_cultivo, usuario_id, tipo_usuario, proximo in propios:
+            if numero_cultivo not in programados:
+                self._programar(numero_cultivo, usuario_id, tipo_usuario, max(0, proximo - ahora) / 1000)
+                nuevos += 1
+        perdidos = programados - {fila[0] for fila in propios}
+        for numero_cultivo in perdidos:
+            self.planificador.cancelar(numero_cultivo)
+        return {"propios": len(propios), "tomados": tomados, "soltados": soltados,
+                "programados": nuevos, "cancelados": len(perdidos), "trabajadores": vivos}
+
+    def cerrar(self):
+        """Suelta los arriendos de este proceso (al apagarlo) para que otro los tome sin esperar el plazo."""
+        self.planificador.cancelar(_LATIDO)
+        for clave in self.planificador.claves():
+            self.planificador.cancelar(clave)
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        cursor.execute("UPDATE generacion_cultivos SET dueno = NULL, vence = 0 WHERE dueno = ?", (self.trabajador,))
+        cursor.execute("DELETE FROM generacion_trabajadores WHERE trabajador = ?", (self.trabajador,))
+        conn.commit()
+        conn.close()
+
+    def estadisticas(self):
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        cursor.execute("SELECT trabajador, latido, cultivos FROM generacion_trabajadores ORDER BY trabajador")
+        trabajadores = [{"trabajador": t, "latido": l, "cultivos": c} for t, l, c in cursor.fetchall()]
+        cursor.execute("SELECT COUNT(*), COUNT(dueno) FROM generacion_cultivos")
+        total, con_dueno = cursor.fetchone()
+        conn.close()
+        return {"trabajador": self.trabajador, "cultivos": total, "sin_dueno": total - con_dueno,
+                "trabajadores": trabajadores, "planificador": self.planificador.estadisticas()}
+
+    def _programar(self, numero_cultivo, usuario_id, tipo_usuario, retraso):
+        self.planificador.programar(numero_cultivo, self._ejecutar, self.intervalo_s,
+                                    args=(numero_cultivo, usuario_id, tipo_usuario), retraso=retraso)
+
+    def _ejecutar(self, numero_cultivo, usuario_id, tipo_usuario):
+        # Confirma el arriendo y anota el próximo ciclo en la misma escritura,
+        # con el intervalo vigente del cultivo; si el ciclo elige otro, se corrige
+        ahora = base_datos.epoch_ms()
+        intervalo = self._intervalos.get(numero_cultivo, self.intervalo_s)
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE generacion_cultivos SET proximo = ?
+            WHERE numero_cultivo = ? AND dueno = ? AND vence > ?
+        """, (ahora + int(intervalo * 1000), numero_cultivo, self.trabajador, ahora))
+        vigente = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        if not vigente:
+            self._intervalos.pop(numero_cultivo, None)
+            return False
+        resultado = self.ciclo(numero_cultivo, usuario_id, tipo_usuario)
+        if inspect.isawaitable(resultado):
+            # El motor espera la corrutina; el intervalo se anota al terminar
+            return self._anotar_al_terminar(numero_cultivo, ahora, resultado)
+        self._anotar_intervalo(numero_cultivo, ahora, resultado)
+        return resultado
+
+    async def _anotar_al_terminar(self, numero_cultivo, ahora, pendiente):
+        resultado = await pendiente
+        await asyncio.to_thread(self._anotar_intervalo, numero_cultivo, ahora, resultado)
+        return resultado
+
+    def _anotar_intervalo(self, numero_cultivo, ahora, resultado):
+        """Reescribe 'proximo' si el ciclo devolvió un intervalo distinto del anotado."""
+        if resultado is False:
+            self._intervalos.pop(numero_cultivo, None)
+            return
+        intervalo = nuevo_intervalo(resultado)
+        if intervalo is None or intervalo == self._intervalos.get(numero_cultivo, self.intervalo_s):
+            return
+        self._intervalos[numero_cultivo] = intervalo
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE generacion_cultivos SET proximo = ?
+            WHERE numero_cultivo = ? AND dueno = ?
+        """, (ahora + int(intervalo * 1000), numero_cultivo, self.trabajador))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,301 @@
+# module/importador.py
+"""
+Importación de los archivos de texto heredados a la base de datos.
+
+    datos_sensores.txt  "Humedad: 38.33%, pH: 7.33, Temperatura: 29.44°C, Nutrientes - N: 162.2, P: 22.9, K: 66.6"
+    cultivos.txt        "1,Curicó,Pedro Álvarez,Maíz,-35.004447,-71.226697" (id heredado, ciudad, agricultor, tipo, lat, lon)
+    clima.txt           "Curicó, 2025-05-21 21:32:53, 13.06, 94, 0, 1.86, muy nuboso" (lo que escribe /clima)
+
+Los archivos se leen línea a línea en binario, sin cargarlos enteros. La
+codificación se detecta por línea, porque los archivos heredados las mezclan
+(cultivos.txt y datos_sensores.txt tienen líneas UTF-8 y líneas Latin-1): se
+prueba UTF-8 estricto y, si no es válido, Latin-1. Cada línea se interpreta
+con una expresión regular precompilada. Las filas válidas se escriben en bloques
+con executemany, un bloque por transacción; las líneas que no se pueden
+interpretar se informan con su número y no detienen la importación.
+
+El avance (byte y línea siguientes al último bloque confirmado) se guarda en
+la tabla importaciones dentro de la misma transacción que las filas, así que
+una importación interrumpida se retoma donde quedó sin duplicar nada; volver
+a importar un archivo al que se le agregaron líneas (clima.txt crece con cada
+consulta) solo carga las nuevas. Si el inicio del archivo cambió, se empieza
+de cero.
+"""
+import codecs
+import hashlib
+import os
+import re
+import time
+from datetime import datetime
+from module import base_datos, repositorios, sensores
+
+DATABASE = "users.db"
+TAMANO_LOTE = 5000           # líneas por transacción
+BYTES_HUELLA = 4096          # bytes del inicio del archivo que identifican la importación
+LIMITE_DETALLE_ERRORES = 100
+
+_NUMERO = r"[-+]?\d+(?:\.\d*)?"
+_RE_SENSOR = re.compile(
+    rf"\s*Humedad:\s*({_NUMERO})\s*%,\s*pH:\s*({_NUMERO}),\s*Temperatura:\s*({_NUMERO})[^,]*,"
+    rf"\s*Nutrientes\s*-\s*N:\s*({_NUMERO}),\s*P:\s*({_NUMERO}),\s*K:\s*({_NUMERO})\s*"
+)
+_RE_CULTIVO = re.compile(rf"\s*(\d+)\s*,([^,]+),([^,]+),([^,]+),\s*({_NUMERO})\s*,\s*({_NUMERO})\s*")
+# La ciudad puede traer comas ("Sagrada Familia, Chile"): termina antes de la fecha
+_RE_CLIMA = re.compile(
+    rf"(.+?),\s*(\d{{4}}-\d{{2}}-\d{{2}} \d{{2}}:\d{{2}}:\d{{2}}),\s*({_NUMERO}),\s*({_NUMERO}),"
+    rf"\s*({_NUMERO}),\s*({_NUMERO}),\s*(.*?)\s*"
+)
+
+
+def crear_tabla_importaciones(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS importaciones (
+            archivo TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            destino TEXT NOT NULL,
+            huella TEXT NOT NULL,
+            posicion INTEGER NOT NULL,
+            linea INTEGER NOT NULL,
+            actualizado INTEGER NOT NULL,
+            PRIMARY KEY (archivo, tipo, destino)
+        )
+    """)
+
+
+def crear_tabla_registros_clima(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS registros_clima (
+            ciudad TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            temperatura REAL,
+            humedad REAL,
+            prob_lluvia REAL,
+            viento REAL,
+            descripcion TEXT,
+            PRIMARY KEY (ciudad, ts)
+        ) WITHOUT ROWID
+    """)
+
+
+def decodificar(cruda):
+    """Bytes de una línea -> (texto, codificación): UTF-8 si es válido, si no Latin-1."""
+    try:
+        return cruda.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        # Latin-1 acepta cualquier byte; un texto Latin-1 con acentos casi nunca es UTF-8 válido
+        return cruda.decode("latin-1"), "latin-1"
+
+
+def leer_lineas(ruta, posicion=0, linea=0):
+    """Genera (numero_linea, posicion_siguiente, texto, codificacion) desde el byte 'posicion'."""
+    with open(ruta, "rb") as f:
+        f.seek(posicion)
+        for cruda in f:
+            linea += 1
+            if posicion == 0 and cruda.startswith(codecs.BOM_UTF8):
+                cruda_sin_bom = cruda[len(codecs.BOM_UTF8):]
+            else:
+                cruda_sin_bom = cruda
+            posicion += len(cruda)
+            texto, codificacion = decodificar(cruda_sin_bom)
+            yield linea, posicion, texto.rstrip("\r\n"), codificacion
+
+
+def _huella(ruta, posicion):
+    with open(ruta, "rb") as f:
+        return hashlib.sha1(f.read(min(posicion, BYTES_HUELLA))).hexdigest()
+
+
+def _coincidir(expresion, texto, formato):
+    coincidencia = expresion.fullmatch(texto)
+    if coincidencia is None:
+        raise ValueError(f"La línea no tiene el formato {formato}")
+    return coincidencia.groups()
+
+
+def interpretar_sensor(texto):
+    """Línea de datos_sensores.txt -> dict con el formato de guardar_datos."""
+    humedad, ph, temperatura, n, p, k = _coincidir(_RE_SENSOR, texto, "de datos_sensores.txt")
+    return {
+        "humedad_suelo": float(humedad),
+        "ph_suelo": float(ph),
+        "temperatura_ambiente": float(temperatura),
+        "nutrientes": {"N": float(n), "P": float(p), "K": float(k)},
+    }
+
+
+def interpretar_cultivo(texto):
+    """Línea de cultivos.txt -> (id heredado, ciudad, agricultor, tipo, latitud, longitud)."""
+    identificador, ciudad, agricultor, tipo, latitud, longitud = _coincidir(_RE_CULTIVO, texto, "de cultivos.txt")
+    latitud, longitud = float(latitud), float(longitud)
+    if not -90 <= latitud <= 90:
+        raise ValueError(f"Latitud fuera de rango: {latitud}")
+    if not -180 <= longitud <= 180:
+        raise ValueError(f"Longitud fuera de rango: {longitud}")
+    return int(identificador), ciudad.strip(), agricultor.strip(), tipo.strip(), latitud, longitud
+
+
+def interpretar_clima(texto):
+    """Línea de clima.txt -> (ciudad, ts, temperatura, humedad, prob_lluvia, viento, descripcion)."""
+    ciudad, fecha, temperatura, humedad, lluvia, viento, descripcion = _coincidir(_RE_CLIMA, texto, "de clima.txt")
+    ts = base_datos.epoch_ms(datetime.fromisoformat(fecha))
+    return ciudad.strip(), ts, float(temperatura), float(humedad), float(lluvia), float(viento), descripcion
+
+
+def _estado_guardado(ruta, tipo, destino):
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    crear_tabla_importaciones(cursor)
+    conn.commit()
+    cursor.execute(
+        "SELECT huella, posicion, linea FROM importaciones WHERE archivo = ? AND tipo = ? AND destino = ?",
+        (ruta, tipo, destino)
+    )
+    fila = cursor.fetchone()
+    conn.close()
+    return fila
+
+
+def _importar(ruta, tipo, destino, interpretar, escribir, tamano_lote, reiniciar, progreso):
+    """
+    Recorre el archivo en bloques de 'tamano_lote' líneas. interpretar(texto,
+    numero_linea) devuelve la fila o lanza ValueError; escribir(filas,
+    registrar) guarda [(numero_linea, fila), ...] en una transacción, llama a
+    registrar(cursor) antes del commit y devuelve (insertadas, [(linea, error)]).
+    """
+    ruta = os.path.abspath(ruta)
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    posicion = linea = 0
+    estado = _estado_guardado(ruta, tipo, destino)
+    if estado is not None and not reiniciar:
+        huella, posicion_guardada, linea_guardada = estado
+        if posicion_guardada <= os.path.getsize(ruta) and huella == _huella(ruta, posicion_guardada):
+            posicion, linea = posicion_guardada, linea_guardada
+
+    resultado = {
+        "archivo": ruta, "codificaciones": {}, "desde_linea": linea + 1,
+        "hasta_linea": linea, "lineas": 0, "insertadas": 0, "errores": 0, "detalle_errores": [],
+    }
+    inicio = time.perf_counter()
+
+    def anotar_error(numero, error):
+        resultado["errores"] += 1
+        if len(resultado["detalle_errores"]) < LIMITE_DETALLE_ERRORES:
+            resultado["detalle_errores"].append({"linea": numero, "error": error})
+
+    def confirmar(filas, hasta_posicion, hasta_linea):
+        def registrar(cursor):
+            cursor.execute("""
+                INSERT OR REPLACE INTO importaciones (archivo, tipo, destino, huella, posicion, linea, actualizado)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (ruta, tipo, destino, _huella(ruta, hasta_posicion), hasta_posicion, hasta_linea, base_datos.epoch_ms()))
+
+        insertadas, rechazos = escribir(filas, registrar)
+        resultado["insertadas"] += insertadas
+        for numero, error in rechazos:
+            anotar_error(numero, error)
+        resultado["lineas"] = hasta_linea - resultado["desde_linea"] + 1
+        resultado["hasta_linea"] = hasta_linea
+        resultado["segundos"] = time.perf_counter() - inicio
+        if progreso is not None:
+            progreso(resultado)
+
+    filas = []
+    pendientes = 0
+    codificaciones = resultado["codificaciones"]
+    for numero, posicion, texto, codificacion in leer_lineas(ruta, posicion, linea):
+        linea = numero
+        pendientes += 1
+        codificaciones[codificacion] = codificaciones.get(codificacion, 0) + 1
+        if texto.strip():
+            try:
+                filas.append((numero, interpretar(texto, numero)))
+            except ValueError as e:
+                anotar_error(numero, str(e))
+        if pendientes >= tamano_lote:
+            confirmar(filas, posicion, linea)
+            filas, pendientes = [], 0
+    if pendientes:
+        confirmar(filas, posicion, linea)
+
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def importar_sensores(ruta, numero_cultivo, desde_ms, intervalo_s=60, tamano_lote=None, reiniciar=False, progreso=None):
+    """
+    Importa datos_sensores.txt como lecturas de 'numero_cultivo'. El archivo
+    no trae fechas: la línea n se guarda en desde_ms + (n - 1) * intervalo_s,
+    así que retomar produce las mismas marcas de tiempo. Las lecturas pasan por
+    sensores.insertar_lote (particiones y agregados), sin evaluar alertas.
+    Lanza ValueError si el cultivo no existe.
+    """
+    conn = base_datos.obtener_conexion(DATABASE)
+    cultivo = repositorios.RepositorioCultivos(conn).por_numero(numero_cultivo)
+    conn.close()
+    if cultivo is None:
+        raise ValueError(f"Cultivo inexistente: {numero_cultivo}")
+    intervalo_ms = int(intervalo_s * 1000)
+
+    def interpretar(texto, numero):
+        lectura = interpretar_sensor(texto)
+        lectura["numero_cultivo"] = numero_cultivo
+        lectura["ts"] = desde_ms + (numero - 1) * intervalo_ms
+        return lectura
+
+    def escribir(filas, registrar):
+        insertadas, rechazadas, _ = sensores.insertar_lote([lectura for _, lectura in filas], registrar=registrar)
+        return insertadas, [(filas[r["indice"]][0], r["error"]) for r in rechazadas]
+
+    return _importar(ruta, "sensores", numero_cultivo, interpretar, escribir, tamano_lote, reiniciar, progreso)
+
+
+def _escribir_filas(sql):
+    """escribir() para tablas simples: un executemany por bloque; las filas repetidas se ignoran."""
+    def escribir(filas, registrar):
+        conn = base_datos.obtener_conexion(DATABASE)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            antes = conn.total_changes
+            cursor.executemany(sql, [fila for _, fila in filas])
+            insertadas = conn.total_changes - antes
+            registrar(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return insertadas, []
+    return escribir
+
+
+def importar_cultivos(ruta, usuario_id, prefijo="LEG", tamano_lote=None, reiniciar=False, progreso=None):
+    """
+    Importa cultivos.txt como cultivos del agricultor 'usuario_id'. El número
+    de cada cultivo es '<prefijo>-<id heredado>'; los que ya existen se omiten.
+    """
+    def interpretar(texto, numero):
+        identificador, ciudad, agricultor, tipo, latitud, longitud = interpretar_cultivo(texto)
+        return f"{prefijo}-{identificador}", ciudad, agricultor, tipo, latitud, longitud, usuario_id
+
+    escribir = _escribir_filas("""
+        INSERT OR IGNORE INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """)
+    return _importar(ruta, "cultivos", f"{prefijo}:{usuario_id}", interpretar, escribir, tamano_lote, reiniciar, progreso)
+
+
+def importar_clima(ruta, tamano_lote=None, reiniciar=False, progreso=None):
+    """Importa clima.txt a la tabla registros_clima (una fila por ciudad y hora de consulta)."""
+    conn = base_datos.obtener_conexion(DATABASE)
+    crear_tabla_registros_clima(conn.cursor())
+    conn.commit()
+    conn.close()
+    escribir = _escribir_filas("""
+        INSERT OR IGNORE INTO registros_clima (ciudad, ts, temperatura, humedad, prob_lluvia, viento, descripcion)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """)
+    return _importar(ruta, "clima", "", lambda texto, numero: interpretar_clima(texto),
+                     escribir, tamano_lote, reiniciar, progreso)
@@ -0,0 +1,506 @@
+# module/migraciones.py
+"""
+Migraciones versionadas del esquema de users.db.
+
+Las funciones crear_tabla_* de cada módulo siguen creando las tablas base; aquí
+se registran los cambios posteriores (índices, columnas nuevas, copias de
+datos) en orden. Cada migración corre en su propia transacción y al terminar
+se anota en la tabla 'version_esquema', así que aplicar_migraciones() se puede
+llamar en cada arranque y solo ejecuta las que faltan.
+"""
+import re
+from datetime import datetime
+from module import base_datos
+
+DATABASE = "users.db"
+
+
+def _columnas(cursor, tabla):
+    cursor.execute(f"PRAGMA table_info({tabla})")
+    return [fila[1] for fila in cursor.fetchall()]
+
+
+def _crear_indice(cursor, nombre, tabla, columnas):
+    """Crea el índice solo si la tabla existe y tiene todas las columnas."""
+    existentes = _columnas(cursor, tabla)
+    if not all(columna in existentes for columna in columnas):
+        return
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({', '.join(columnas)})")
+
+
+def _migracion_indices_consultas_frecuentes(cursor):
+    # Último dato / historial por cultivo (ORDER BY timestamp con LIMIT)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_sensores_cultivo_ts ON datos_sensores (numero_cultivo, timestamp)")
+    # Enfriamiento de 15 minutos en verificar_alertas
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_alertas_alerta_usuario_fecha ON historial_alertas (alerta_id, usuario_id, fecha)")
+    # Historial y notificaciones: WHERE usuario_id = ? OR agronomist_id = ? ORDER BY fecha
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_alertas_usuario_fecha ON historial_alertas (usuario_id, fecha)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_alertas_agronomo_fecha ON historial_alertas (agronomist_id, fecha)")
+    # Contexto de una conversación y listado de conversaciones activas del usuario
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_chat_conversacion ON historial_chat (conversacion_id, estado, fecha)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_chat_usuario ON historial_chat (user_id, estado, conversacion_id, fecha)")
+    # Cultivos por agrónomo / agricultor (listados y verificación de permisos)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cultivos_agronomo ON cultivos (agronomist_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cultivos_usuario ON cultivos (usuario_id)")
+    # Último resumen de datos avanzados por cultivo
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_avanzados_cultivo_ts ON datos_avanzados (numero_cultivo, timestamp)")
+
+
+# Tablas y columnas con que se escribió la migración 1 (fechas en texto).
+# Una base creada después con ts no las tiene: la migración 1 se anota sin
+# ejecutarse y sus índices vigentes los crean las migraciones 2 y 10.
+_ESQUEMA_MIGRACION_1 = {
+    "datos_sensores": ("numero_cultivo", "timestamp"),
+    "historial_alertas": ("alerta_id", "usuario_id", "agronomist_id", "fecha"),
+    "historial_chat": ("conversacion_id", "estado", "user_id", "fecha"),
+    "cultivos": ("agronomist_id", "usuario_id"),
+    "datos_avanzados": ("numero_cultivo", "timestamp"),
+}
+
+
+def _tiene_esquema_migracion_1(cursor):
+    for tabla, columnas in _ESQUEMA_MIGRACION_1.items():
+        existentes = _columnas(cursor, tabla)
+        if not all(columna in existentes for columna in columnas):
+            return False
+    return True
+
+
+# Columna de texto que cada tabla reemplaza por ts, y si ese texto estaba en
+# hora local (escrito con datetime.now()) o en UTC (CURRENT_TIMESTAMP de SQLite).
+COLUMNAS_FECHA_TEXTO = {
+    "datos_sensores": ("timestamp", "localtime"),
+    "historial_alertas": ("fecha", "localtime"),
+    "datos_avanzados": ("timestamp", "utc"),
+}
+
+
+def _reconstruir_con_ts(cursor, tabla, columna, zona):
+    """
+    Reemplaza la columna de fecha en texto por ts (milisegundos desde epoch).
+    SQLite no permite cambiar el tipo de una columna, así que se crea la tabla
+    nueva a partir del DDL original, se copian las filas y se renombra.
+    """
+    existentes = _columnas(cursor, tabla)
+    if not existentes or columna not in existentes or "ts" in existentes:
+        return
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,))
+    ddl = cursor.fetchone()[0]
+    definicion_ts = f"ts INTEGER NOT NULL DEFAULT ({base_datos.SQL_AHORA_MS})"
+    ddl_nuevo, reemplazos = re.subn(
+        rf"\b{columna}\s+(DATETIME|TIMESTAMP|TEXT)(\s+DEFAULT\s+CURRENT_TIMESTAMP)?",
+        definicion_ts, ddl, count=1, flags=re.IGNORECASE
+    )
+    if not reemplazos:
+        raise RuntimeError(f"No se encontró la columna {columna} en el DDL de {tabla}")
+    ddl_nuevo = re.sub(rf"\b{tabla}\b", f"{tabla}_nueva", ddl_nuevo, count=1)
+    cursor.execute(ddl_nuevo)
+
+    # Las fechas en hora local se pasan a UTC antes de convertirlas a epoch
+    modificador = ", 'utc'" if zona == "localtime" else ""
+    conversion = f"COALESCE(CAST(strftime('%s', {columna}{modificador}) AS INTEGER), 0) * 1000"
+    destino = ", ".join("ts" if c == columna else c for c in existentes)
+    origen = ", ".join(conversion if c == columna else c for c in existentes)
+    cursor.execute(f"INSERT INTO {tabla}_nueva ({destino}) SELECT {origen} FROM {tabla}")
+    cursor.execute(f"DROP TABLE {tabla}")
+    cursor.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+
+
+def _migracion_marcas_tiempo_enteras(cursor):
+    for tabla, (columna, zona) in COLUMNAS_FECHA_TEXTO.items():
+        _reconstruir_con_ts(cursor, tabla, columna, zona)
+
+    # Los índices de la migración 1 sobre las columnas de texto se fueron con
+    # las tablas viejas; se recrean sobre ts.
+    _crear_indice(cursor, "idx_datos_sensores_cultivo_ts", "datos_sensores", ["numero_cultivo", "ts"])
+    _crear_indice(cursor, "idx_historial_alertas_alerta_usuario_ts", "historial_alertas", ["alerta_id", "usuario_id", "ts"])
+    _crear_indice(cursor, "idx_historial_alertas_usuario_ts", "historial_alertas", ["usuario_id", "ts"])
+    _crear_indice(cursor, "idx_historial_alertas_agronomo_ts", "historial_alertas", ["agronomist_id", "ts"])
+    _crear_indice(cursor, "idx_datos_avanzados_cultivo_ts", "datos_avanzados", ["numero_cultivo", "ts"])
+
+    # Vistas de compatibilidad: las mismas filas con la fecha en texto local
+    # bajo el nombre de antes, para las plantillas y la API que la muestran.
+    formato = "strftime('%Y-%m-%d %H:%M:%S', ts / 1000, 'unixepoch', 'localtime')"
+    for vista, tabla, columna in (
+        ("vista_datos_sensores", "datos_sensores", "timestamp"),
+        ("vista_historial_alertas", "historial_alertas", "fecha"),
+        ("vista_datos_avanzados", "datos_avanzados", "timestamp"),
+    ):
+        if _columnas(cursor, tabla):
+            cursor.execute(f"DROP VIEW IF EXISTS {vista}")
+            cursor.execute(f"CREATE VIEW {vista} AS SELECT *, {formato} AS {columna} FROM {tabla}")
+
+
+def _migracion_lecturas_agrupadas_por_cultivo(cursor):
+    """
+    Pasa las lecturas de datos_sensores (clave rowid, cultivo en texto) a
+    lecturas_sensores, WITHOUT ROWID con clave (cultivo_id, ts).
+    """
+    if not _columnas(cursor, "cultivos"):
+        return
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS lecturas_sensores (
+            cultivo_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL DEFAULT ({base_datos.SQL_AHORA_MS}),
+            humedad_suelo REAL,
+            ph_suelo REAL,
+            temperatura_ambiente REAL,
+            nitrogeno REAL,
+            fosforo REAL,
+            potasio REAL,
+            PRIMARY KEY (cultivo_id, ts),
+            FOREIGN KEY (cultivo_id) REFERENCES cultivos(id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'datos_sensores'")
+    if cursor.fetchone():
+        # Lecturas de cultivos que ya no existen no tienen id al que asociarse
+        cursor.execute("""
+            SELECT COUNT(*) FROM datos_sensores
+            WHERE numero_cultivo NOT IN (SELECT numero FROM cultivos)
+        """)
+        huerfanas = cursor.fetchone()[0]
+        if huerfanas:
+            print(f"[WARN] {huerfanas} lecturas de cultivos inexistentes no se migraron.")
+        # Insertar en el orden de la clave deja las páginas llenas y contiguas
+        cursor.execute("""
+            INSERT OR REPLACE INTO lecturas_sensores (
+                cultivo_id, ts, humedad_suelo, ph_suelo,
+                temperatura_ambiente, nitrogeno, fosforo, potasio
+            )
+            SELECT c.id, d.ts, d.humedad_suelo, d.ph_suelo,
+                   d.temperatura_ambiente, d.nitrogeno, d.fosforo, d.potasio
+            FROM datos_sensores d
+            JOIN cultivos c ON c.numero = d.numero_cultivo
+            ORDER BY c.id, d.ts, d.id
+        """)
+        cursor.execute("DROP VIEW IF EXISTS vista_datos_sensores")
+        cursor.execute("DROP TABLE datos_sensores")
+
+    # La vista de compatibilidad vuelve a exponer el número de cultivo
+    cursor.execute("DROP VIEW IF EXISTS vista_datos_sensores")
+    cursor.execute(f"""
+        CREATE VIEW vista_datos_sensores AS
+        SELECT l.cultivo_id, c.numero AS numero_cultivo, l.humedad_suelo, l.ph_suelo,
+               l.temperatura_ambiente, l.nitrogeno, l.fosforo, l.potasio, l.ts,
+               {base_datos.sql_fecha_local('l.ts')} AS timestamp
+        FROM lecturas_sensores l
+        JOIN cultivos c ON c.id = l.cultivo_id
+    """)
+
+
+# SQL de las migraciones 4 a 8 tal como se publicaron. Se copia aquí en vez
+# de llamar a particiones, agregados, retencion, archivo o generacion para que
+# un cambio posterior en esos módulos no altere lo que hace una migración vieja.
+COLUMNAS_LECTURAS = (
+    "cultivo_id", "ts", "humedad_suelo", "ph_suelo",
+    "temperatura_ambiente", "nitrogeno", "fosforo", "potasio"
+)
+PARAMETROS_LECTURAS = COLUMNAS_LECTURAS[2:]
+
+
+def _particion_mensual(cursor, ts):
+    """Crea (si falta) y registra la tabla del mes local de ts. Devuelve (nombre, desde, hasta)."""
+    inicio = datetime.fromtimestamp(ts / 1000).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if inicio.month == 12:
+        fin = inicio.replace(year=inicio.year + 1, month=1)
+    else:
+        fin = inicio.replace(month=inicio.month + 1)
+    nombre = "lecturas_sensores_" + inicio.strftime("%Y%m")
+    desde, hasta = base_datos.epoch_ms(inicio), base_datos.epoch_ms(fin)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            cultivo_id INTEGER NOT NULL, -- cultivos.id
+            ts INTEGER NOT NULL DEFAULT ({base_datos.SQL_AHORA_MS}), -- milisegundos desde epoch
+            humedad_suelo REAL,
+            ph_suelo REAL,
+            temperatura_ambiente REAL,
+            nitrogeno REAL,
+            fosforo REAL,
+            potasio REAL,
+            PRIMARY KEY (cultivo_id, ts),
+            FOREIGN KEY (cultivo_id) REFERENCES cultivos(id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(
+        "INSERT OR IGNORE INTO particiones_lecturas (nombre, desde, hasta) VALUES (?, ?, ?)",
+        (nombre, desde, hasta)
+    )
+    return nombre, desde, hasta
+
+
+def _rehacer_vista_lecturas(cursor):
+    """Vista lecturas_sensores como UNION ALL de las particiones registradas."""
+    columnas = ", ".join(COLUMNAS_LECTURAS)
+    cursor.execute("SELECT nombre FROM particiones_lecturas ORDER BY desde")
+    nombres = [fila[0] for fila in cursor.fetchall()]
+    if nombres:
+        cuerpo = " UNION ALL ".join(f"SELECT {columnas} FROM {nombre}" for nombre in nombres)
+    else:
+        cuerpo = "SELECT " + ", ".join(f"NULL AS {c}" for c in COLUMNAS_LECTURAS) + " WHERE 0"
+    cursor.execute("DROP VIEW IF EXISTS lecturas_sensores")
+    cursor.execute(f"CREATE VIEW lecturas_sensores AS {cuerpo}")
+
+
+def _migracion_particiones_mensuales(cursor):
+    """
+    Reparte lecturas_sensores en tablas mensuales y la reemplaza por una vista
+    UNION ALL con el mismo nombre.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS particiones_lecturas (
+            nombre TEXT PRIMARY KEY,
+            desde INTEGER NOT NULL, -- ms desde epoch, inclusive
+            hasta INTEGER NOT NULL  -- ms desde epoch, exclusivo
+        )
+    """)
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'lecturas_sensores'")
+    existente = cursor.fetchone()
+    if existente and existente[0] == "table":
+        columnas = ", ".join(COLUMNAS_LECTURAS)
+        cursor.execute("SELECT MIN(ts) FROM lecturas_sensores")
+        ts = cursor.fetchone()[0]
+        # Mes a mes, saltando los meses sin lecturas
+        while ts is not None:
+            nombre, desde, hasta = _particion_mensual(cursor, ts)
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO {nombre} ({columnas})
+                SELECT {columnas} FROM lecturas_sensores
+                WHERE ts >= ? AND ts < ?
+                ORDER BY cultivo_id, ts
+            """, (desde, hasta))
+            cursor.execute("SELECT MIN(ts) FROM lecturas_sensores WHERE ts >= ?", (hasta,))
+            ts = cursor.fetchone()[0]
+        cursor.execute("DROP TABLE lecturas_sensores")
+    _rehacer_vista_lecturas(cursor)
+
+
+_SQL_FUSIONAR_AGREGADOS = """
+    ON CONFLICT (cultivo_id, parametro, inicio) DO UPDATE SET
+        n = n + excluded.n,
+        suma = suma + excluded.suma,
+        suma_cuadrados = suma_cuadrados + excluded.suma_cuadrados,
+        minimo = MIN(minimo, excluded.minimo),
+        maximo = MAX(maximo, excluded.maximo),
+        ultimo = CASE WHEN excluded.ultimo_ts >= ultimo_ts THEN excluded.ultimo ELSE ultimo END,
+        ultimo_ts = MAX(ultimo_ts, excluded.ultimo_ts)
+"""
+
+
+def _migracion_agregados(cursor):
+    """Crea agregados_hora / agregados_dia y los llena con las lecturas existentes."""
+    for tabla in ("agregados_hora", "agregados_dia"):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabla} (
+                cultivo_id INTEGER NOT NULL,
+                parametro TEXT NOT NULL,
+                inicio INTEGER NOT NULL, -- ms desde epoch del inicio del intervalo
+                n INTEGER NOT NULL,
+                suma REAL NOT NULL,
+                suma_cuadrados REAL NOT NULL,
+                minimo REAL,
+                maximo REAL,
+                ultimo REAL,
+                ultimo_ts INTEGER,
+                PRIMARY KEY (cultivo_id, parametro, inicio)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(f"DELETE FROM {tabla}")
+
+    # Horas: un GROUP BY por partición y parámetro (horas exactas en UTC)
+    cursor.execute("SELECT nombre FROM particiones_lecturas ORDER BY desde")
+    for (nombre,) in cursor.fetchall():
+        for parametro in PARAMETROS_LECTURAS:
+            cursor.execute(f"""
+                INSERT INTO agregados_hora (cultivo_id, parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)
+                SELECT cultivo_id, '{parametro}', (ts - ts % 3600000) AS inicio_hora, COUNT({parametro}), SUM({parametro}),
+                       SUM({parametro} * {parametro}), MIN({parametro}), MAX({parametro}), NULL, MAX(ts)
+                FROM {nombre}
+                WHERE {parametro} IS NOT NULL
+                GROUP BY cultivo_id, inicio_hora
+                {_SQL_FUSIONAR_AGREGADOS}
+            """)
+            # El último valor de cada hora es el de la lectura con ultimo_ts
+            cursor.execute(f"""
+                UPDATE agregados_hora SET ultimo = (
+                    SELECT l.{parametro} FROM {nombre} l
+                    WHERE l.cultivo_id = agregados_hora.cultivo_id AND l.ts = agregados_hora.ultimo_ts
+                )
+                WHERE parametro = ? AND ultimo IS NULL
+            """, (parametro,))
+
+    # Días (medianoche local): se suman las horas ya calculadas
+    cursor.execute(f"""
+        INSERT INTO agregados_dia (cultivo_id, parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts)
+        SELECT cultivo_id, parametro,
+               CAST(strftime('%s', inicio / 1000, 'unixepoch', 'localtime', 'start of day', 'utc') AS INTEGER) * 1000 AS inicio_dia,
+               SUM(n), SUM(suma), SUM(suma_cuadrados), MIN(minimo), MAX(maximo), NULL, MAX(ultimo_ts)
+        FROM agregados_hora
+        GROUP BY cultivo_id, parametro, inicio_dia
+        {_SQL_FUSIONAR_AGREGADOS}
+    """)
+    cursor.execute("""
+        UPDATE agregados_dia SET ultimo = (
+            SELECT h.ultimo FROM agregados_hora h
+            WHERE h.cultivo_id = agregados_dia.cultivo_id AND h.parametro = agregados_dia.parametro
+              AND h.inicio = (agregados_dia.ultimo_ts - agregados_dia.ultimo_ts % 3600000)
+        )
+        WHERE ultimo IS NULL
+    """)
+
+
+def _migracion_lecturas_15min(cursor):
+    # Promedios de 15 minutos que quedan cuando la retención borra lecturas crudas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS lecturas_15min (
+            cultivo_id INTEGER NOT NULL,
+            inicio INTEGER NOT NULL, -- ms desde epoch, múltiplo de 15 minutos
+            n INTEGER NOT NULL,
+            humedad_suelo REAL,
+            ph_suelo REAL,
+            temperatura_ambiente REAL,
+            nitrogeno REAL,
+            fosforo REAL,
+            potasio REAL,
+            PRIMARY KEY (cultivo_id, inicio)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migracion_archivo_columnar(cursor):
+    # Registro de los días compactados en el archivo columnar (module/archivo.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archivo_dias (
+            cultivo_id INTEGER NOT NULL,
+            desde INTEGER NOT NULL, -- medianoche local en ms, inclusive
+            hasta INTEGER NOT NULL, -- medianoche siguiente en ms, exclusivo
+            n INTEGER NOT NULL,
+            PRIMARY KEY (cultivo_id, desde)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migracion_registro_generacion(cursor):
+    # Cultivos en generación continua con arriendo por proceso (module/generacion.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS generacion_cultivos (
+            numero_cultivo TEXT PRIMARY KEY,
+            usuario_id INTEGER,
+            tipo_usuario TEXT NOT NULL,
+            dueno TEXT,                  -- proceso que la ejecuta (NULL: libre)
+            vence INTEGER NOT NULL,      -- fin del arriendo, ms desde epoch
+            proximo INTEGER NOT NULL,    -- próximo ciclo, ms desde epoch
+            iniciado INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_generacion_cultivos_dueno ON generacion_cultivos (dueno)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS generacion_trabajadores (
+            trabajador TEXT PRIMARY KEY,
+            latido INTEGER NOT NULL,
+            cultivos INTEGER NOT NULL,
+            iniciado INTEGER NOT NULL
+        )
+    """)
+
+
+def _migracion_muestreo_por_cultivo(cursor):
+    # Intervalo de muestreo de cada cultivo y modo adaptativo (module/muestreo.py)
+    existentes = _columnas(cursor, "cultivos")
+    if not existentes:
+        return
+    if "intervalo_muestreo" not in existentes:
+        cursor.execute("ALTER TABLE cultivos ADD COLUMN intervalo_muestreo INTEGER")
+    if "muestreo_adaptativo" not in existentes:
+        cursor.execute("ALTER TABLE cultivos ADD COLUMN muestreo_adaptativo INTEGER NOT NULL DEFAULT 0")
+
+
+def _migracion_indices_sin_fechas_texto(cursor):
+    # Índices de la migración 1 que no dependen de las fechas en texto, para
+    # las bases que la anotaron sin ejecutarla (creadas ya con ts). Los de
+    # lecturas, alertas y datos avanzados sobre ts los crea la migración 2.
+    # Contexto de una conversación y listado de conversaciones activas del usuario
+    _crear_indice(cursor, "idx_historial_chat_conversacion", "historial_chat", ["conversacion_id", "estado", "fecha"])
+    _crear_indice(cursor, "idx_historial_chat_usuario", "historial_chat", ["user_id", "estado", "conversacion_id", "fecha"])
+    # Cultivos por agrónomo / agricultor (listados y verificación de permisos)
+    _crear_indice(cursor, "idx_cultivos_agronomo", "cultivos", ["agronomist_id"])
+    _crear_indice(cursor, "idx_cultivos_usuario", "cultivos", ["usuario_id"])
+
+
+# Lista ordenada de migraciones: (versión, descripción, función).
+# Nunca se modifica una migración ya publicada; los cambios nuevos van al final.
+MIGRACIONES = [
+    (1, "Índices compuestos para las consultas frecuentes", _migracion_indices_consultas_frecuentes),
+    (2, "Marcas de tiempo enteras (ms desde epoch) en lecturas, alertas y datos avanzados", _migracion_marcas_tiempo_enteras),
+    (3, "Lecturas agrupadas por cultivo (WITHOUT ROWID, clave cultivo_id + ts)", _migracion_lecturas_agrupadas_por_cultivo),
+    (4, "Particiones mensuales de lecturas de sensores", _migracion_particiones_mensuales),
+    (5, "Agregados por hora y día de las lecturas", _migracion_agregados),
+    (6, "Promedios de 15 minutos para la retención de lecturas", _migracion_lecturas_15min),
+    (7, "Registro de días del archivo columnar de lecturas", _migracion_archivo_columnar),
+    (8, "Registro compartido de la generación continua (arriendos y latidos)", _migracion_registro_generacion),
+    (9, "Intervalo de muestreo por cultivo y muestreo adaptativo", _migracion_muestreo_por_cultivo),
+    (10, "Índices de consultas frecuentes en bases creadas con ts", _migracion_indices_sin_fechas_texto),
+]
+
+# Migraciones escritas para un esquema que una base nueva ya no tiene:
+# versión -> comprobación. Si no se cumple, la versión se anota sin ejecutarla.
+REQUISITOS = {
+    1: _tiene_esquema_migracion_1,
+}
+
+
+def crear_tabla_version(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS version_esquema (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            aplicada_en TEXT NOT NULL
+        )
+    """)
+
+
+def version_actual(database=DATABASE):
+    """Devuelve la última versión de esquema aplicada (0 si no hay ninguna)."""
+    conn = base_datos.obtener_conexion(database)
+    cursor = conn.cursor()
+    crear_tabla_version(cursor)
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM version_esquema")
+    version = cursor.fetchone()[0]
+    conn.close()
+    return version
+
+
+def aplicar_migraciones(database=DATABASE):
+    """Aplica en orden las migraciones pendientes. Devuelve las versiones aplicadas."""
+    aplicadas = []
+    conn = base_datos.obtener_conexion(database)
+    cursor = conn.cursor()
+    crear_tabla_version(cursor)
+    conn.commit()
+    try:
+        for version, descripcion, migracion in MIGRACIONES:
+            # BEGIN IMMEDIATE toma el bloqueo de escritura antes de releer la
+            # versión, así dos procesos que arrancan a la vez no aplican la misma.
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT 1 FROM version_esquema WHERE version = ?", (version,))
+            if cursor.fetchone():
+                conn.rollback()
+                continue
+            requisito = REQUISITOS.get(version)
+            if requisito is None or requisito(cursor):
+                migracion(cursor)
+                print(f"[INFO] Migración {version} aplicada: {descripcion}")
+            else:
+                print(f"[INFO] Migración {version} anotada sin ejecutar (el esquema ya no la necesita): {descripcion}")
+            cursor.execute(
+                "INSERT INTO version_esquema (version, descripcion, aplicada_en) VALUES (?, ?, ?)",
+                (version, descripcion, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            conn.commit()
+            aplicadas.append(version)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return aplicadas
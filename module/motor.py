@@ -0,0 +1,197 @@
+# module/motor.py
+"""
+Motor asíncrono de tareas periódicas (generación continua con asyncio).
+
+Con el planificador de hilos (module/planificador.py) cada ciclo ocupa un
+trabajador mientras espera la API del clima; con 8 trabajadores y consultas
+lentas, los ciclos se atrasan en cuanto hay más de unos cientos de cultivos.
+Aquí cada tarea es una corrutina de un solo bucle de eventos que corre en su
+propio hilo: esperar la red no ocupa ningún hilo, y miles de cultivos caben en
+el mismo bucle.
+
+Tiene la misma interfaz que Planificador (programar, cancelar, programada,
+claves, detener, estadisticas), así que generacion.Coordinador funciona igual
+con cualquiera de los dos, y las mismas reglas:
+
+- Si la función es una corrutina se espera en el bucle; si no, corre en el
+  grupo de HILOS del motor (p. ej. las escrituras del registro compartido). Si
+  una función normal devuelve algo esperable (un ciclo asíncrono), también se
+  espera.
+- cancelar() da de baja la tarea de inmediato, aunque esté esperando la red.
+- Una tarea no se ejecuta dos veces a la vez y las ejecuciones perdidas no se
+  acumulan. Si la función devuelve False, la tarea se da de baja; si devuelve
+  un número, ese es su intervalo desde ahí.
+"""
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from module.planificador import HILOS, nuevo_intervalo
+
+
+class _Tarea:
+    __slots__ = ("clave", "funcion", "args", "intervalo", "retraso", "corrutina", "activa")
+
+    def __init__(self, clave, funcion, args, intervalo, retraso):
+        self.clave = clave
+        self.funcion = funcion
+        self.args = args
+        self.intervalo = intervalo
+        self.retraso = retraso
+        self.corrutina = None  # asyncio.Task, la crea el bucle
+        self.activa = True
+
+
+class Motor:
+    def __init__(self, hilos=HILOS, nombre="motor"):
+        self.hilos = hilos
+        self.nombre = nombre
+        self._tareas = {}  # clave -> _Tarea
+        self._lock = threading.Lock()
+        self._loop = None
+        self._hilo = None
+        self._ejecutor = None
+        self._en_curso = 0
+        self._estadisticas = {"ejecuciones": 0, "errores": 0, "omitidas": 0, "max_atraso_ms": 0.0,
+                              "max_duracion_ms": 0.0}
+
+    def programar(self, clave, funcion, intervalo, args=(), retraso=0.0):
+        """
+        Ejecuta funcion(*args) cada 'intervalo' segundos, la primera vez tras
+        'retraso'. Si la clave ya estaba programada, la reemplaza.
+        """
+        with self._lock:
+            self._iniciar()
+            self._quitar(clave)
+            tarea = _Tarea(clave, funcion, args, intervalo, retraso)
+            self._tareas[clave] = tarea
+            self._loop.call_soon_threadsafe(self._lanzar, tarea)
+        return tarea
+
+    def cancelar(self, clave):
+        """Da de baja la tarea. Devuelve False si no estaba programada."""
+        with self._lock:
+            return self._quitar(clave)
+
+    def programada(self, clave):
+        return clave in self._tareas
+
+    def claves(self):
+        with self._lock:
+            return list(self._tareas)
+
+    def detener(self, timeout=5):
+        """Cancela todo, detiene el bucle y termina sus hilos."""
+        with self._lock:
+            for clave in list(self._tareas):
+                self._quitar(clave)
+            loop, hilo, ejecutor = self._loop, self._hilo, self._ejecutor
+            self._loop = self._hilo = self._ejecutor = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        hilo.join(timeout)
+        ejecutor.shutdown(wait=False, cancel_futures=True)
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._estadisticas)
+            datos["programadas"] = len(self._tareas)
+            datos["en_curso"] = self._en_curso
+        datos["hilos"] = self.hilos
+        return datos
+
+    # _iniciar y _quitar se llaman con self._lock tomado
+
+    def _iniciar(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._ejecutor = ThreadPoolExecutor(max_workers=max(1, self.hilos), thread_name_prefix=self.nombre)
+        self._loop.set_default_executor(self._ejecutor)
+        listo = threading.Event()
+        self._hilo = threading.Thread(target=self._correr_bucle, args=(self._loop, listo), name=self.nombre, daemon=True)
+        self._hilo.start()
+        listo.wait()
+
+    def _quitar(self, clave):
+        tarea = self._tareas.pop(clave, None)
+        if tarea is None:
+            return False
+        tarea.activa = False
+        self._loop.call_soon_threadsafe(self._cancelar, tarea)
+        return True
+
+    # Lo que sigue corre en el hilo del bucle
+
+    @staticmethod
+    def _correr_bucle(loop, listo):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(listo.set)
+        try:
+            loop.run_forever()
+            pendientes = asyncio.all_tasks(loop)
+            for corrutina in pendientes:
+                corrutina.cancel()
+            loop.run_until_complete(asyncio.gather(*pendientes, return_exceptions=True))
+        finally:
+            loop.close()
+
+    def _lanzar(self, tarea):
+        if tarea.activa:
+            tarea.corrutina = asyncio.get_running_loop().create_task(self._repetir(tarea), name=str(tarea.clave))
+
+    @staticmethod
+    def _cancelar(tarea):
+        if tarea.corrutina is not None:
+            tarea.corrutina.cancel()
+
+    async def _repetir(self, tarea):
+        loop = asyncio.get_running_loop()
+        vence = loop.time() + tarea.retraso
+        while tarea.activa:
+            await asyncio.sleep(max(0.0, vence - loop.time()))
+            inicio = loop.time()
+            seguir = await self._ejecutar(tarea, (inicio - vence) * 1000, loop)
+            with self._lock:
+                duracion = (loop.time() - inicio) * 1000
+                if duracion > self._estadisticas["max_duracion_ms"]:
+                    self._estadisticas["max_duracion_ms"] = duracion
+                if not seguir and self._tareas.get(tarea.clave) is tarea:
+                    self._quitar(tarea.clave)
+                    return
+            # Al siguiente vencimiento que no haya pasado ya
+            vence += tarea.intervalo
+            ahora = loop.time()
+            if vence <= ahora:
+                perdidas = int((ahora - vence) // tarea.intervalo) + 1
+                with self._lock:
+                    self._estadisticas["omitidas"] += perdidas
+                vence += perdidas * tarea.intervalo
+
+    async def _ejecutar(self, tarea, atraso, loop):
+        with self._lock:
+            if atraso > self._estadisticas["max_atraso_ms"]:
+                self._estadisticas["max_atraso_ms"] = atraso
+            self._en_curso += 1
+        seguir = True
+        try:
+            if inspect.iscoroutinefunction(tarea.funcion):
+                resultado = await tarea.funcion(*tarea.args)
+            else:
+                resultado = await loop.run_in_executor(None, tarea.funcion, *tarea.args)
+                if inspect.isawaitable(resultado):
+                    resultado = await resultado
+            seguir = resultado is not False
+            tarea.intervalo = nuevo_intervalo(resultado) or tarea.intervalo
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] {self.nombre}: la tarea {tarea.clave} falló: {e}")
+            with self._lock:
+                self._estadisticas["errores"] += 1
+        finally:
+            with self._lock:
+                self._en_curso -= 1
+                self._estadisticas["ejecuciones"] += 1
+        return seguir
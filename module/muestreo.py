@@ -0,0 +1,135 @@
+# module/muestreo.py
+"""
+Intervalo de muestreo de cada cultivo en la generación continua.
+
+Cada cultivo guarda su intervalo base (cultivos.intervalo_muestreo, en
+segundos; NULL usa INTERVALO_S) y si su muestreo es adaptativo
+(cultivos.muestreo_adaptativo). En modo fijo se genera siempre al intervalo
+base. En modo adaptativo, tras cada lectura se elige el siguiente intervalo:
+
+- a menos de MARGEN del umbral de una alerta activa, o con un valor que
+  cambió más de CAMBIO_RAPIDO desde la lectura anterior, se vuelve al
+  intervalo base: las alertas se ven tan pronto como en modo fijo;
+- si un valor va hacia un umbral, el intervalo no pasa de HORIZONTE veces lo
+  que tardaría en cruzarlo a ese ritmo (sin bajar de MINIMO_S);
+- si nada de eso ocurre, se duplica en cada lectura hasta MAXIMO_S.
+
+Bajar el intervalo es inmediato y subirlo es de a poco. Un salto brusco (el
+pH cuando empieza a llover) no se puede anticipar y se ve a lo más MAXIMO_S
+después: ese tope (ECOSMART_MUESTREO_MAXIMO_S) equilibra escrituras y
+prontitud (ver benchmarks/bench_muestreo.py).
+
+La lectura anterior de cada cultivo se guarda en la memoria del proceso: un
+cultivo que cambia de proceso vuelve a empezar desde su intervalo base.
+"""
+import os
+import threading
+import time
+from module import alertas, eventos
+
+INTERVALO_S = 30
+MINIMO_S = 5
+MAXIMO_S = int(os.environ.get("ECOSMART_MUESTREO_MAXIMO_S", "180"))
+MARGEN = 0.1          # fracción del umbral
+CAMBIO_RAPIDO = 0.05  # fracción del valor anterior, entre dos lecturas
+HORIZONTE = 0.25
+
+_ultimas = {}  # numero_cultivo -> (segundos, valores, intervalo)
+_umbrales = None
+_lock = threading.Lock()
+
+
+def valores(datos):
+    """Valores numéricos de una lectura ({'nutrientes': {'N': ..}} queda como 'N')."""
+    planos = {}
+    for campo, valor in datos.items():
+        if isinstance(valor, dict):
+            planos.update(valores(valor))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            planos[campo] = float(valor)
+    return planos
+
+
+def umbrales():
+    """[(tipo_alerta, umbral)] de las alertas activas; se recarga cuando cambia una regla."""
+    global _umbrales
+    with _lock:
+        if _umbrales is not None:
+            return _umbrales
+    activos = []
+    for regla in alertas.obtener_reglas():
+        try:
+            if regla["activa"]:
+                activos.append((regla["tipo_alerta"], float(regla["umbral"])))
+        except (TypeError, ValueError):
+            continue
+    with _lock:
+        _umbrales = activos
+    return activos
+
+
+def _olvidar_umbrales(evento):
+    global _umbrales
+    with _lock:
+        _umbrales = None
+
+
+def siguiente_intervalo(actual, base, previo, nuevo, reglas):
+    """
+    Intervalo (s) tras la lectura 'nuevo'. 'previo' y 'nuevo' son (segundos,
+    {campo: valor}); 'previo' es None si no hay lectura anterior.
+    """
+    objetivo = MAXIMO_S
+    lectura = nuevo[1]
+    anteriores = previo[1] if previo is not None else {}
+    transcurrido = nuevo[0] - previo[0] if previo is not None else 0
+    for campo, umbral in reglas:
+        valor = lectura.get(campo)
+        if valor is None:
+            continue
+        distancia = abs(umbral - valor)
+        if distancia <= MARGEN * max(abs(umbral), 1.0):
+            objetivo = min(objetivo, base)
+            continue
+        cambio = valor - anteriores.get(campo, valor)
+        if transcurrido > 0 and cambio * (umbral - valor) > 0:
+            # A este ritmo cruza el umbral en distancia / |cambio| intervalos
+            objetivo = min(objetivo, HORIZONTE * transcurrido * distancia / abs(cambio))
+    for campo, valor in lectura.items():
+        anterior = anteriores.get(campo)
+        if anterior is not None and abs(valor - anterior) > CAMBIO_RAPIDO * max(abs(anterior), 1.0):
+            objetivo = min(objetivo, base)
+            break
+    if previo is None:
+        # Sin historia no se sabe si está estable: no se alarga
+        objetivo = min(objetivo, actual)
+    siguiente = objetivo if objetivo < actual else min(objetivo, 2 * actual)
+    return max(MINIMO_S, min(MAXIMO_S, siguiente))
+
+
+def registrar(numero_cultivo, datos, base=None, adaptativo=False, reglas=None):
+    """
+    Anota la lectura del cultivo y devuelve su próximo intervalo en segundos
+    (el base si no es adaptativo; el mismo de antes si no hubo lectura).
+    'reglas' son los umbrales() ya leídos, si se tienen.
+    """
+    base = base or INTERVALO_S
+    if not adaptativo:
+        _ultimas.pop(numero_cultivo, None)
+        return base
+    previo = _ultimas.get(numero_cultivo)
+    actual = previo[2] if previo is not None else base
+    if not datos:
+        return actual
+    nuevo = (time.monotonic(), valores(datos))
+    reglas = umbrales() if reglas is None else reglas
+    intervalo = siguiente_intervalo(actual, base, previo[:2] if previo else None, nuevo, reglas)
+    _ultimas[numero_cultivo] = nuevo + (intervalo,)
+    return intervalo
+
+
+def olvidar(numero_cultivo):
+    _ultimas.pop(numero_cultivo, None)
+
+
+eventos.suscribir(eventos.REGLA_CAMBIADA, _olvidar_umbrales, sincrono=True)
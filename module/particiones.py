@@ -0,0 +1,186 @@
+# module/particiones.py
+"""
+Particiones mensuales de las lecturas de sensores.
+
+Cada mes calendario (hora local) tiene su propia tabla lecturas_sensores_AAAAMM
+con la misma estructura WITHOUT ROWID (cultivo_id, ts). La tabla
+particiones_lecturas registra el rango [desde, hasta) de cada una, así:
+  - guardar_datos inserta siempre en la partición del mes de la lectura,
+  - las consultas por rango solo leen las particiones que se solapan,
+  - borrar un mes antiguo es un DROP TABLE en lugar de un DELETE fila a fila.
+La vista lecturas_sensores (UNION ALL de todas) queda para consultas sueltas.
+"""
+from datetime import datetime
+from module import base_datos
+
+DATABASE = "users.db"
+PREFIJO = "lecturas_sensores_"
+VISTA = "lecturas_sensores"
+COLUMNAS = (
+    "cultivo_id", "ts", "humedad_suelo", "ph_suelo",
+    "temperatura_ambiente", "nitrogeno", "fosforo", "potasio"
+)
+
+
+def crear_tabla_particiones(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS particiones_lecturas (
+            nombre TEXT PRIMARY KEY,
+            desde INTEGER NOT NULL, -- ms desde epoch, inclusive
+            hasta INTEGER NOT NULL  -- ms desde epoch, exclusivo
+        )
+    """)
+
+
+def nombre_particion(ts):
+    """Nombre de la tabla del mes (hora local) al que pertenece ts."""
+    return PREFIJO + datetime.fromtimestamp(ts / 1000).strftime("%Y%m")
+
+
+def limites_mes(ts):
+    """Devuelve (desde, hasta) en ms del mes local que contiene ts."""
+    inicio = datetime.fromtimestamp(ts / 1000).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if inicio.month == 12:
+        fin = inicio.replace(year=inicio.year + 1, month=1)
+    else:
+        fin = inicio.replace(month=inicio.month + 1)
+    return base_datos.epoch_ms(inicio), base_datos.epoch_ms(fin)
+
+
+def asegurar_particion(cursor, ts):
+    """
+    Devuelve la partición donde va una lectura con marca ts, creándola (y
+    actualizando la vista) si es la primera del mes. Se ejecuta en la
+    transacción de quien llama.
+    """
+    nombre = nombre_particion(ts)
+    cursor.execute("SELECT 1 FROM particiones_lecturas WHERE nombre = ?", (nombre,))
+    if cursor.fetchone():
+        return nombre
+    desde, hasta = limites_mes(ts)
+    # sqlite3 no abre transacción antes de un CREATE TABLE; se abre aquí para
+    # que la tabla nueva se confirme o se descarte junto con la lectura.
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {nombre} (
+            cultivo_id INTEGER NOT NULL, -- cultivos.id
+            ts INTEGER NOT NULL DEFAULT ({base_datos.SQL_AHORA_MS}), -- milisegundos desde epoch
+            humedad_suelo REAL,
+            ph_suelo REAL,
+            temperatura_ambiente REAL,
+            nitrogeno REAL,
+            fosforo REAL,
+            potasio REAL,
+            PRIMARY KEY (cultivo_id, ts),
+            FOREIGN KEY (cultivo_id) REFERENCES cultivos(id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(
+        "INSERT OR IGNORE INTO particiones_lecturas (nombre, desde, hasta) VALUES (?, ?, ?)",
+        (nombre, desde, hasta)
+    )
+    actualizar_vista(cursor)
+    return nombre
+
+
+def particiones_en_rango(cursor, desde=None, hasta=None, descendente=False):
+    """Particiones que se solapan con [desde, hasta), en orden cronológico."""
+    cursor.execute(f"""
+        SELECT nombre FROM particiones_lecturas
+        WHERE (? IS NULL OR hasta > ?) AND (? IS NULL OR desde < ?)
+        ORDER BY desde {'DESC' if descendente else 'ASC'}
+    """, (desde, desde, hasta, hasta))
+    return [fila[0] for fila in cursor.fetchall()]
+
+
+def cultivos_en_particion(cursor, nombre):
+    """cultivo_id presentes en la partición, saltando por la clave primaria."""
+    cultivos = []
+    cultivo_id = -1
+    while True:
+        cursor.execute(f"SELECT MIN(cultivo_id) FROM {nombre} WHERE cultivo_id > ?", (cultivo_id,))
+        cultivo_id = cursor.fetchone()[0]
+        if cultivo_id is None:
+            return cultivos
+        cultivos.append(cultivo_id)
+
+
+def actualizar_vista(cursor):
+    """Rehace la vista lecturas_sensores como UNION ALL de las particiones."""
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (VISTA,))
+    existente = cursor.fetchone()
+    if existente and existente[0] == "table":
+        # Base aún sin migrar a particiones: la tabla única sigue siendo la fuente
+        return
+    columnas = ", ".join(COLUMNAS)
+    nombres = particiones_en_rango(cursor)
+    if nombres:
+        cuerpo = " UNION ALL ".join(f"SELECT {columnas} FROM {nombre}" for nombre in nombres)
+    else:
+        cuerpo = "SELECT " + ", ".join(f"NULL AS {c}" for c in COLUMNAS) + " WHERE 0"
+    cursor.execute(f"DROP VIEW IF EXISTS {VISTA}")
+    cursor.execute(f"CREATE VIEW {VISTA} AS {cuerpo}")
+
+
+def consultar_lecturas(cursor, numero_cultivo, columnas, desde=None, hasta=None,
+                       descendente=False, limite=None, condicion=None):
+    """
+    Lecturas de un cultivo en [desde, hasta) ordenadas por ts.
+    Solo consulta las particiones del rango y, con 'limite', se detiene en
+    cuanto tiene suficientes filas (p. ej. las últimas N solo leen el mes actual).
+    """
+    cursor.execute("SELECT id FROM cultivos WHERE numero = ?", (numero_cultivo,))
+    fila = cursor.fetchone()
+    if not fila:
+        return []
+    cultivo_id = fila[0]
+
+    filas = []
+    for nombre in particiones_en_rango(cursor, desde, hasta, descendente):
+        sql = f"SELECT {columnas} FROM {nombre} WHERE cultivo_id = ?"
+        parametros = [cultivo_id]
+        if desde is not None:
+            sql += " AND ts >= ?"
+            parametros.append(desde)
+        if hasta is not None:
+            sql += " AND ts < ?"
+            parametros.append(hasta)
+        if condicion:
+            sql += f" AND {condicion}"
+        sql += f" ORDER BY ts {'DESC' if descendente else 'ASC'}"
+        if limite is not None:
+            sql += " LIMIT ?"
+            parametros.append(limite - len(filas))
+        cursor.execute(sql, parametros)
+        filas.extend(cursor.fetchall())
+        if limite is not None and len(filas) >= limite:
+            break
+    return filas
+
+
+def eliminar_particion(cursor, nombre):
+    cursor.execute(f"DROP TABLE IF EXISTS {nombre}")
+    cursor.execute("DELETE FROM particiones_lecturas WHERE nombre = ?", (nombre,))
+
+
+def eliminar_particiones_anteriores(ts_limite):
+    """
+    Borra las particiones que terminan antes de ts_limite (meses completos).
+    Devuelve los nombres eliminados.
+    """
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    crear_tabla_particiones(cursor)
+    cursor.execute(
+        "SELECT nombre FROM particiones_lecturas WHERE hasta <= ? ORDER BY desde",
+        (ts_limite,)
+    )
+    nombres = [fila[0] for fila in cursor.fetchall()]
+    for nombre in nombres:
+        eliminar_particion(cursor, nombre)
+    if nombres:
+        actualizar_vista(cursor)
+    conn.commit()
+    conn.close()
+    return nombres
@@ -0,0 +1,454 @@
+# module/pasarela.py
+"""
+Pasarela de sensores de campo (asyncio, TCP y UDP).
+
+Los sensores reales no pueden usar las rutas de app.py, que dependen de la
+sesión de Flask. La pasarela escucha un protocolo de líneas compacto y
+autentica cada dispositivo con su propio token (registrar_dispositivo; en la
+tabla dispositivos solo se guarda su SHA-256). Un dispositivo envía lecturas
+de los cultivos que ve su dueño (todos si es admin).
+
+TCP, una conexión por dispositivo:
+
+    -> AUTH <token>
+    <- OK <nombre>                      (o "ERR auth" y se cierra)
+    -> <cultivo>,<ts_ms>,<humedad>,<ph>,<temperatura>,<N>,<P>,<K>
+    -> ...
+    -> SYNC
+    <- OK <n>                           cuando todo hasta la línea n está confirmado
+
+Un ts vacío es la hora de llegada y un valor vacío, sin dato. Solo se
+responde a las líneas con error ("ERR <n> <motivo>") y a SYNC, así que un
+dispositivo puede enviar sin esperar respuesta por cada lectura.
+
+UDP: cada datagrama trae el token en la primera línea y lecturas en las
+siguientes, sin respuesta.
+
+Las lecturas pasan a un escritor con commit agrupado propio de la pasarela
+(sensores.nuevo_escritor; guardar_datos sigue con su modo, ECOSMART_ESCRITOR_MS):
+un hilo las inserta por lotes y las alertas se evalúan en el bus de eventos. El bucle de asyncio solo lee e interpreta,
+así que un núcleo atiende miles de conexiones abiertas.
+
+Si el escritor se satura (cola sobre sensores.COLA_ALTA) la pasarela deja de
+leer los sockets TCP hasta que baja de COLA_BAJA: los buffers del sistema se
+llenan y los dispositivos esperan en su propio envío. Si otro productor llenó
+la cola entre medio, la línea se responde "ERR <n> saturado" (reenviarla). Los
+datagramas UDP no se pueden frenar: se descartan y se cuentan.
+
+Se inicia con la aplicación (ECOSMART_PASARELA=host:puerto[:puerto_udp]) o
+por separado: python -m module.pasarela --puerto 7020 --udp 7021
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from module import base_datos, cultivos, eventos, sensores
+from module.escritor import Saturado
+
+DATABASE = "users.db"
+PUERTO = 7020
+LIMITE_LINEA = 1024           # bytes por línea
+TAMANO_LECTURA = 64 * 1024    # bytes leídos del socket de una vez
+# Commit agrupado del escritor propio de la pasarela (no el de guardar_datos)
+INTERVALO_ESCRITOR_MS = int(os.environ.get("ECOSMART_PASARELA_ESCRITOR_MS", "50"))
+SEGUNDOS_CACHE = 60           # cuánto se recuerdan un token validado y los cultivos de su dueño
+LIMITE_TOKENS = 10000         # tokens válidos recordados (se olvidan los menos usados)
+SEGUNDOS_RECHAZO = 5          # cuánto se recuerda un token inválido
+LIMITE_RECHAZOS = 1000        # tokens inválidos recordados
+ESPERA_SATURADO = 0.05        # segundos entre consultas mientras el escritor está saturado
+
+_hilo = None
+_pasarela = None
+
+
+def crear_tabla_dispositivos():
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dispositivos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL UNIQUE,
+            token_hash TEXT NOT NULL UNIQUE,
+            usuario_id INTEGER NOT NULL,
+            activo INTEGER NOT NULL DEFAULT 1,
+            creado INTEGER NOT NULL,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def registrar_dispositivo(nombre, usuario_id):
+    """Da de alta un dispositivo del usuario y devuelve su token (solo se muestra esta vez)."""
+    token = secrets.token_urlsafe(24)
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO dispositivos (nombre, token_hash, usuario_id, creado) VALUES (?, ?, ?, ?)",
+        (nombre, _hash_token(token), usuario_id, base_datos.epoch_ms())
+    )
+    conn.commit()
+    conn.close()
+    return token
+
+
+def revocar_dispositivo(nombre):
+    """
+    Desactiva el token del dispositivo. Devuelve False si no existe. Una
+    pasarela en marcha deja de aceptarlo en SEGUNDOS_CACHE como mucho.
+    """
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE dispositivos SET activo = 0 WHERE nombre = ?", (nombre,))
+    revocado = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return revocado
+
+
+def autenticar(token):
+    """Dispositivo activo del token como {"id", "nombre", "usuario_id", "tipo_usuario"} o None."""
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT d.id, d.nombre, d.usuario_id, u.tipo_usuario
+        FROM dispositivos d JOIN usuarios u ON u.id = d.usuario_id
+        WHERE d.token_hash = ? AND d.activo = 1
+    """, (_hash_token(token),))
+    fila = cursor.fetchone()
+    conn.close()
+    if fila is None:
+        return None
+    dispositivo_id, nombre, usuario_id, tipo_usuario = fila
+    return {"id": dispositivo_id, "nombre": nombre, "usuario_id": usuario_id, "tipo_usuario": (tipo_usuario or "").lower()}
+
+
+def cultivos_permitidos(usuario_id, tipo_usuario):
+    """Números de cultivo que ve el dueño de un dispositivo (None si es admin: todos)."""
+    if tipo_usuario == "admin":
+        return None
+    return {c["numero"] for c in cultivos.listar_cultivos(usuario_id, tipo_usuario)}
+
+
+def interpretar_linea(texto, ahora_ms, permitidos=None):
+    """'cultivo,ts,humedad,ph,temperatura,N,P,K' -> lectura de guardar_lote, o ValueError."""
+    campos = texto.split(",")
+    if len(campos) != 8:
+        raise ValueError("se esperan 8 campos: cultivo,ts,humedad,ph,temperatura,N,P,K")
+    numero_cultivo = campos[0].strip()
+    if permitidos is not None and numero_cultivo not in permitidos:
+        raise ValueError(f"cultivo inexistente o sin permiso: {numero_cultivo}")
+    ts = campos[1].strip()
+    try:
+        ts = int(ts) if ts else ahora_ms
+        valores = [float(v) if v.strip() else None for v in campos[2:]]
+    except ValueError:
+        raise ValueError("ts debe ser entero (ms) y los valores, números")
+    if any(v is not None and not math.isfinite(v) for v in valores):
+        raise ValueError("valor no finito")
+    humedad, ph, temperatura, n, p, k = valores
+    return {
+        "numero_cultivo": numero_cultivo, "ts": ts,
+        "humedad_suelo": humedad, "ph_suelo": ph, "temperatura_ambiente": temperatura,
+        "nutrientes": {"N": n, "P": p, "K": k},
+    }
+
+
+def _recordar(cache, clave, valor, limite):
+    """Guarda en una caché OrderedDict y descarta las entradas menos recientes sobre 'limite'."""
+    cache[clave] = valor
+    cache.move_to_end(clave)
+    while len(cache) > limite:
+        cache.popitem(last=False)
+
+
+class _ProtocoloUDP(asyncio.DatagramProtocol):
+    def __init__(self, pasarela):
+        self.pasarela = pasarela
+
+    def datagram_received(self, datos, direccion):
+        self.pasarela._tareas.add(asyncio.ensure_future(self.pasarela._procesar_datagrama(datos)))
+
+
+class Pasarela:
+    def __init__(self, host="0.0.0.0", puerto=PUERTO, puerto_udp=None):
+        self.host = host
+        self.puerto = puerto
+        self.puerto_udp = puerto_udp
+        self._servidor = None
+        self._transporte_udp = None
+        self._escritor = None
+        # Cachés con vencimiento: muchos dispositivos del mismo dueño se
+        # conectan a la vez y cada uno necesitaría la lista de sus cultivos.
+        # La de cultivos además se vacía con cada CULTIVO_CAMBIADO. Las de
+        # tokens están acotadas: cualquiera puede presentar tokens al azar.
+        self._tokens = OrderedDict()     # token válido -> (dispositivo, expira)
+        self._rechazados = OrderedDict()  # token inválido -> expira
+        self._permitidos = {}  # usuario_id -> (cultivos, expira)
+        self._tareas = set()
+        self._estadisticas = {
+            "conexiones_activas": 0, "conexiones": 0, "auth_rechazadas": 0,
+            "lineas": 0, "aceptadas": 0, "errores": 0, "datagramas": 0,
+            "descartadas": 0, "pausas": 0,
+        }
+
+    async def iniciar(self):
+        self._escritor = sensores.nuevo_escritor(INTERVALO_ESCRITOR_MS, nombre="escritor-pasarela")
+        eventos.suscribir(eventos.CULTIVO_CAMBIADO, self._olvidar_permitidos, sincrono=True)
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto, limit=LIMITE_LINEA)
+        # Con puerto 0 el sistema elige uno libre
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        if self.puerto_udp is not None:
+            self._transporte_udp, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _ProtocoloUDP(self), local_addr=(self.host, self.puerto_udp)
+            )
+            self.puerto_udp = self._transporte_udp.get_extra_info("sockname")[1]
+        return self
+
+    async def servir(self):
+        await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def cerrar(self):
+        eventos.desuscribir(eventos.CULTIVO_CAMBIADO, self._olvidar_permitidos)
+        if self._transporte_udp is not None:
+            self._transporte_udp.close()
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        for tarea in list(self._tareas):
+            tarea.cancel()
+        if self._escritor is not None:
+            # Confirma lo que quedó en la cola sin bloquear el bucle
+            await asyncio.to_thread(self._escritor.detener)
+
+    def estadisticas(self):
+        datos = dict(self._estadisticas)
+        if self._escritor is not None:
+            datos["escritor"] = self._escritor.estadisticas()
+        return datos
+
+    def _encolar(self, lectura, al_fallar=None):
+        """
+        Entrega la lectura al escritor; 'al_fallar(error)' corre en el bucle si
+        se rechaza. Lanza Saturado si la cola está llena.
+        """
+        futuro = self._escritor.encolar(lectura)
+        if al_fallar is not None:
+            bucle = asyncio.get_running_loop()
+
+            def revisar(f):
+                if f.exception() is not None:
+                    bucle.call_soon_threadsafe(al_fallar, f.exception())
+            futuro.add_done_callback(revisar)
+        return futuro
+
+    def _olvidar_permitidos(self, evento):
+        """Un cultivo creado, reasignado o eliminado cambia los permitidos de sus dueños."""
+        self._permitidos.clear()
+
+    async def _esperar_cola(self):
+        """
+        Contrapresión: la conexión deja de leer (y TCP frena al dispositivo)
+        hasta que la cola del escritor baja de su límite inferior.
+        """
+        self._estadisticas["pausas"] += 1
+        while self._escritor.saturado:
+            await asyncio.sleep(ESPERA_SATURADO)
+
+    async def _autenticar(self, token):
+        """(dispositivo, cultivos permitidos) del token, o (None, None)."""
+        ahora = time.monotonic()
+        bucle = asyncio.get_running_loop()
+        dispositivo, expira = self._tokens.get(token, (None, 0))
+        if expira >= ahora:
+            self._tokens.move_to_end(token)
+        elif self._rechazados.get(token, 0) >= ahora:
+            return None, None
+        else:
+            self._tokens.pop(token, None)
+            dispositivo = await bucle.run_in_executor(None, autenticar, token)
+            if dispositivo is None:
+                _recordar(self._rechazados, token, ahora + SEGUNDOS_RECHAZO, LIMITE_RECHAZOS)
+                return None, None
+            self._rechazados.pop(token, None)
+            _recordar(self._tokens, token, (dispositivo, ahora + SEGUNDOS_CACHE), LIMITE_TOKENS)
+        permitidos, expira = self._permitidos.get(dispositivo["usuario_id"], (None, 0))
+        if expira < ahora:
+            permitidos = await bucle.run_in_executor(
+                None, cultivos_permitidos, dispositivo["usuario_id"], dispositivo["tipo_usuario"]
+            )
+            self._permitidos[dispositivo["usuario_id"]] = (permitidos, ahora + SEGUNDOS_CACHE)
+        return dispositivo, permitidos
+
+    async def _atender(self, lector, escritor):
+        estadisticas = self._estadisticas
+        estadisticas["conexiones"] += 1
+        estadisticas["conexiones_activas"] += 1
+        dispositivo = permitidos = None
+        numero = 0
+        ultimo = None  # Future de la última lectura encolada, para SYNC
+        pendiente = b""
+
+        def responder(texto):
+            if not escritor.is_closing():
+                escritor.write(texto.encode() + b"\n")
+
+        def error_de(linea):
+            def al_fallar(error):
+                estadisticas["errores"] += 1
+                responder(f"ERR {linea} {error}")
+            return al_fallar
+
+        try:
+            while True:
+                datos = await lector.read(TAMANO_LECTURA)
+                if not datos:
+                    break
+                lineas = (pendiente + datos).split(b"\n")
+                pendiente = lineas.pop()
+                if len(pendiente) > LIMITE_LINEA:
+                    responder(f"ERR {numero + 1} línea demasiado larga")
+                    break
+                ahora = base_datos.epoch_ms()
+                for cruda in lineas:
+                    texto = cruda.decode("utf-8", "replace").strip()
+                    if not texto:
+                        continue
+                    if dispositivo is None:
+                        orden, _, token = texto.partition(" ")
+                        if orden == "AUTH":
+                            dispositivo, permitidos = await self._autenticar(token.strip())
+                        if dispositivo is None:
+                            estadisticas["auth_rechazadas"] += 1
+                            responder("ERR auth")
+                            return
+                        responder(f"OK {dispositivo['nombre']}")
+                        continue
+                    if texto == "SYNC":
+                        if ultimo is not None:
+                            await asyncio.wait([asyncio.wrap_future(ultimo)])
+                        responder(f"OK {numero}")
+                        await escritor.drain()
+                        continue
+                    numero += 1
+                    estadisticas["lineas"] += 1
+                    try:
+                        lectura = interpretar_linea(texto, ahora, permitidos)
+                    except ValueError as e:
+                        estadisticas["errores"] += 1
+                        responder(f"ERR {numero} {e}")
+                        continue
+                    if self._escritor.saturado:
+                        await self._esperar_cola()
+                    try:
+                        ultimo = self._encolar(lectura, error_de(numero))
+                    except Saturado:
+                        estadisticas["descartadas"] += 1
+                        responder(f"ERR {numero} saturado")
+                        continue
+                    estadisticas["aceptadas"] += 1
+                await escritor.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            estadisticas["conexiones_activas"] -= 1
+            escritor.close()
+
+    async def _procesar_datagrama(self, datos):
+        estadisticas = self._estadisticas
+        estadisticas["datagramas"] += 1
+        try:
+            token, *lineas = datos.decode("utf-8", "replace").splitlines()
+            dispositivo, permitidos = await self._autenticar(token.strip())
+            if dispositivo is None:
+                estadisticas["auth_rechazadas"] += 1
+                return
+            ahora = base_datos.epoch_ms()
+            for texto in lineas:
+                if not texto.strip():
+                    continue
+                estadisticas["lineas"] += 1
+                try:
+                    lectura = interpretar_linea(texto, ahora, permitidos)
+                except ValueError:
+                    estadisticas["errores"] += 1
+                    continue
+                try:
+                    self._encolar(lectura)
+                except Saturado:
+                    estadisticas["descartadas"] += 1
+                    continue
+                estadisticas["aceptadas"] += 1
+        except ValueError:  # datagrama vacío
+            estadisticas["errores"] += 1
+        finally:
+            self._tareas.discard(asyncio.current_task())
+
+
+def _direccion(texto):
+    """'host:puerto[:puerto_udp]' -> (host, puerto, puerto_udp)."""
+    partes = texto.split(":")
+    host = partes[0] or "0.0.0.0"
+    puerto = int(partes[1]) if len(partes) > 1 and partes[1] else PUERTO
+    puerto_udp = int(partes[2]) if len(partes) > 2 and partes[2] else None
+    return host, puerto, puerto_udp
+
+
+def ejecutar(host="0.0.0.0", puerto=PUERTO, puerto_udp=None):
+    """Atiende la pasarela en este hilo hasta que se interrumpa."""
+    global _pasarela
+    _pasarela = Pasarela(host, puerto, puerto_udp)
+    asyncio.run(_pasarela.servir())
+
+
+def estadisticas():
+    """Estadísticas de la pasarela lanzada con ejecutar (None si no hay ninguna)."""
+    return _pasarela.estadisticas() if _pasarela is not None else None
+
+
+def iniciar_en_segundo_plano(direccion=None):
+    """
+    Lanza (una sola vez) la pasarela en un hilo con su propio bucle de
+    asyncio. 'direccion' es 'host:puerto[:puerto_udp]'; por defecto,
+    ECOSMART_PASARELA (vacía = desactivada).
+    """
+    global _hilo
+    direccion = direccion if direccion is not None else os.environ.get("ECOSMART_PASARELA", "")
+    if not direccion:
+        return None
+    if _hilo is not None and _hilo.is_alive():
+        return _hilo
+
+    def bucle():
+        try:
+            ejecutar(*_direccion(direccion))
+        except OSError as e:  # p. ej. el puerto ya está en uso
+            print(f"[ERROR] No se pudo iniciar la pasarela de sensores en {direccion}: {e}")
+
+    _hilo = threading.Thread(target=bucle, name="pasarela-sensores", daemon=True)
+    _hilo.start()
+    return _hilo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pasarela de sensores de campo (TCP/UDP).")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--udp", type=int, default=None, help="Puerto UDP (por defecto, sin UDP).")
+    argumentos = parser.parse_args()
+    crear_tabla_dispositivos()
+    print(f"Pasarela de sensores en {argumentos.host}:{argumentos.puerto}"
+          + (f", UDP {argumentos.udp}" if argumentos.udp is not None else ""))
+    ejecutar(argumentos.host, argumentos.puerto, argumentos.udp)
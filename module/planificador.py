@@ -0,0 +1,205 @@
+# module/planificador.py
+"""
+Planificador de tareas periódicas (generación continua de los cultivos).
+
+Antes cada cultivo en generación tenía su propio hilo con time.sleep(30):
+2.000 cultivos eran 2.000 hilos del sistema, y detener uno tardaba hasta el
+siguiente despertar. Ahora un solo hilo guarda los vencimientos en un montículo
+(heapq) y entrega las tareas vencidas a un grupo fijo de HILOS trabajadores.
+
+- programar() agrega una tarea (O(log n)) y despierta al planificador si la
+  nueva vence antes que la próxima que esperaba.
+- cancelar() la quita del registro de inmediato (O(1)); su entrada en el
+  montículo se descarta cuando llega arriba, y el montículo se rehace si las
+  entradas canceladas pasan de la mitad. Una ejecución en curso termina,
+  pero no vuelve a programarse.
+- Una tarea no se ejecuta dos veces a la vez: si sigue en curso cuando le
+  toca, la siguiente ejecución se corre al primer vencimiento libre. Si los
+  trabajadores se atrasan, las ejecuciones perdidas no se acumulan.
+- Si la función devuelve False, la tarea se da de baja (p. ej. el usuario
+  perdió el permiso sobre el cultivo). Si devuelve un número, ese es su
+  intervalo desde ahí (muestreo adaptativo, module/muestreo.py).
+"""
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+
+HILOS = int(os.environ.get("ECOSMART_GENERACION_HILOS", "8"))
+
+_FIN = object()
+
+
+def nuevo_intervalo(resultado):
+    """El intervalo que pidió la tarea con su resultado, o None."""
+    if isinstance(resultado, (int, float)) and not isinstance(resultado, bool) and resultado > 0:
+        return resultado
+    return None
+
+
+class _Tarea:
+    __slots__ = ("clave", "funcion", "args", "intervalo", "vence", "en_curso", "activa")
+
+    def __init__(self, clave, funcion, args, intervalo, vence):
+        self.clave = clave
+        self.funcion = funcion
+        self.args = args
+        self.intervalo = intervalo
+        self.vence = vence
+        self.en_curso = False
+        self.activa = True
+
+
+class Planificador:
+    def __init__(self, hilos=HILOS, nombre="planificador"):
+        self.hilos = hilos
+        self.nombre = nombre
+        self._tareas = {}      # clave -> _Tarea
+        self._monticulo = []   # (vence, orden, tarea)
+        self._orden = itertools.count()
+        self._canceladas = 0   # entradas del montículo que ya no valen
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._cambio = threading.Condition(self._lock)
+        self._hilo = None
+        self._trabajadores = []
+        self._detenido = False
+        self._estadisticas = {"ejecuciones": 0, "errores": 0, "omitidas": 0, "max_atraso_ms": 0.0}
+
+    def programar(self, clave, funcion, intervalo, args=(), retraso=0.0):
+        """
+        Ejecuta funcion(*args) cada 'intervalo' segundos, la primera vez tras
+        'retraso'. Si la clave ya estaba programada, la reemplaza.
+        """
+        with self._lock:
+            self._iniciar()
+            self._quitar(clave)
+            tarea = _Tarea(clave, funcion, args, intervalo, time.monotonic() + retraso)
+            self._tareas[clave] = tarea
+            self._empujar(tarea)
+        return tarea
+
+    def cancelar(self, clave):
+        """Da de baja la tarea. Devuelve False si no estaba programada."""
+        with self._lock:
+            return self._quitar(clave)
+
+    def programada(self, clave):
+        return clave in self._tareas
+
+    def claves(self):
+        with self._lock:
+            return list(self._tareas)
+
+    def detener(self, timeout=5):
+        """Cancela todo y termina los hilos (la ejecución en curso de cada trabajador acaba antes)."""
+        with self._lock:
+            for clave in list(self._tareas):
+                self._quitar(clave)
+            self._detenido = True
+            self._cambio.notify()
+            hilo, trabajadores = self._hilo, self._trabajadores
+            self._hilo, self._trabajadores = None, []
+        for _ in trabajadores:
+            self._cola.put(_FIN)
+        for h in ([hilo] if hilo else []) + trabajadores:
+            h.join(timeout)
+        with self._lock:
+            self._monticulo, self._canceladas = [], 0
+            self._detenido = False
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._estadisticas)
+            datos["programadas"] = len(self._tareas)
+            datos["en_curso"] = sum(1 for t in self._tareas.values() if t.en_curso)
+            datos["monticulo"] = len(self._monticulo)
+        datos["hilos"] = self.hilos
+        datos["pendientes"] = self._cola.qsize()
+        return datos
+
+    # Todo lo que sigue se llama con self._lock tomado, salvo los bucles
+
+    def _iniciar(self):
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._bucle, name=self.nombre, daemon=True)
+        self._hilo.start()
+        for i in range(max(1, self.hilos)):
+            trabajador = threading.Thread(target=self._trabajar, name=f"{self.nombre}-{i}", daemon=True)
+            trabajador.start()
+            self._trabajadores.append(trabajador)
+
+    def _empujar(self, tarea):
+        primera = not self._monticulo or tarea.vence < self._monticulo[0][0]
+        heapq.heappush(self._monticulo, (tarea.vence, next(self._orden), tarea))
+        if primera:
+            self._cambio.notify()
+
+    def _quitar(self, clave):
+        tarea = self._tareas.pop(clave, None)
+        if tarea is None:
+            return False
+        tarea.activa = False
+        if not tarea.en_curso:
+            # Su entrada sigue en el montículo hasta que llegue arriba
+            self._canceladas += 1
+            if self._canceladas > len(self._monticulo) // 2:
+                self._monticulo = [e for e in self._monticulo if e[2].activa]
+                heapq.heapify(self._monticulo)
+                self._canceladas = 0
+        return True
+
+    def _bucle(self):
+        with self._lock:
+            while not self._detenido:
+                if not self._monticulo:
+                    self._cambio.wait()
+                    continue
+                vence, _, tarea = self._monticulo[0]
+                ahora = time.monotonic()
+                if vence > ahora:
+                    self._cambio.wait(vence - ahora)
+                    continue
+                heapq.heappop(self._monticulo)
+                if not tarea.activa:
+                    self._canceladas = max(0, self._canceladas - 1)
+                    continue
+                atraso = (ahora - vence) * 1000
+                if atraso > self._estadisticas["max_atraso_ms"]:
+                    self._estadisticas["max_atraso_ms"] = atraso
+                tarea.en_curso = True
+                self._cola.put(tarea)
+
+    def _trabajar(self):
+        while True:
+            tarea = self._cola.get()
+            if tarea is _FIN:
+                return
+            seguir = True
+            if tarea.activa:
+                try:
+                    resultado = tarea.funcion(*tarea.args)
+                    seguir = resultado is not False
+                    tarea.intervalo = nuevo_intervalo(resultado) or tarea.intervalo
+                except Exception as e:
+                    print(f"[ERROR] {self.nombre}: la tarea {tarea.clave} falló: {e}")
+                    with self._lock:
+                        self._estadisticas["errores"] += 1
+            with self._lock:
+                self._estadisticas["ejecuciones"] += 1
+                if not seguir and self._tareas.get(tarea.clave) is tarea:
+                    self._quitar(tarea.clave)
+                tarea.en_curso = False
+                if not tarea.activa:
+                    continue
+                # Al siguiente vencimiento que no haya pasado ya
+                ahora = time.monotonic()
+                tarea.vence += tarea.intervalo
+                if tarea.vence <= ahora:
+                    perdidas = int((ahora - tarea.vence) // tarea.intervalo) + 1
+                    self._estadisticas["omitidas"] += perdidas
+                    tarea.vence += perdidas * tarea.intervalo
+                self._empujar(tarea)
@@ -0,0 +1,165 @@
+# module/relleno.py
+"""
+Relleno de historia: series de lecturas reproducibles entre dos fechas.
+
+Cada cultivo recibe una lectura cada 'intervalo_s' segundos en [desde, hasta).
+La serie depende solo de la semilla, el número del cultivo y las fechas (no
+del orden de los cultivos ni del tamaño de los lotes), así que dos corridas
+con los mismos parámetros producen la misma base. Se usa random.Random y no
+NumPy para que el resultado no cambie según lo que haya instalado.
+
+El modelo es sencillo pero tiene la forma de los datos reales:
+
+- temperatura: media propia del cultivo, ciclo diario con máximo a las 15:00
+  (hora local), un desvío del tiempo que cambia lentamente de un día a otro y
+  ruido de medición;
+- lluvia: episodios que empiezan al azar (unos EPISODIOS_LLUVIA_DIA por día),
+  duran de 1 a 12 horas y tienen su propia intensidad;
+- humedad del suelo: sube con la lluvia y se seca hacia su nivel base, más
+  rápido cuanto más calor hace;
+- pH y N, P, K: las fórmulas de generate_data (sensores.simular_ph y
+  sensores.simular_nutrientes) más una deriva lenta de cada nutriente que
+  vuelve hacia cero, y la lluvia lava parte del nitrógeno.
+
+Las lecturas se escriben con sensores.insertar_registros en bloques de
+TAMANO_LOTE, una transacción por bloque, y los agregados por hora y día se
+actualizan en esa misma transacción. No se evalúan alertas ni se publican
+eventos: es historia, no ingesta. Un cultivo que ya tiene lecturas en el
+rango se omite, así que repetir el relleno no duplica nada en los agregados.
+
+    flask --app app rellenar --desde 2026-01-01 --hasta 2026-04-01 --intervalo 60 --semilla 1
+"""
+import math
+import random
+import time
+from module import base_datos, particiones, repositorios, sensores
+
+DATABASE = "users.db"
+TAMANO_LOTE = 50000  # lecturas por transacción
+EPISODIOS_LLUVIA_DIA = 0.3
+MS_HORA = 3600 * 1000
+MS_DIA = 24 * MS_HORA
+
+
+def serie(numero_cultivo, desde_ms, hasta_ms, intervalo_s=60, semilla=0):
+    """
+    Genera (ts, (humedad, ph, temperatura, N, P, K)) del cultivo en orden de
+    ts, en el orden de agregados.PARAMETROS.
+    """
+    aleatorio = random.Random(f"{semilla}:{numero_cultivo}")
+    intervalo_ms = int(intervalo_s * 1000)
+    horas_paso = intervalo_ms / MS_HORA
+    dias_paso = horas_paso / 24
+
+    # Rasgos del cultivo
+    temperatura_media = aleatorio.uniform(14.0, 24.0)
+    amplitud_diaria = aleatorio.uniform(4.0, 8.0)
+    humedad_base = aleatorio.uniform(35.0, 55.0)
+    # Estado que evoluciona con el tiempo
+    desvio_tiempo = 0.0
+    humedad = humedad_base
+    deriva = [0.0, 0.0, 0.0]
+    lluvia_restante_h = 0.0
+    intensidad = 0.0
+    probabilidad_lluvia = EPISODIOS_LLUVIA_DIA * dias_paso
+    gauss = aleatorio.gauss
+    uniforme = aleatorio.uniform
+
+    ts = desde_ms
+    proxima_hora = anterior = ts
+    while ts < hasta_ms:
+        if ts >= proxima_hora:
+            # La diferencia con UTC solo cambia en horas exactas (horario de verano)
+            desfase = time.localtime(ts / 1000).tm_gmtoff * 1000
+            proxima_hora = ts - ts % MS_HORA + MS_HORA
+            # Lo que cambia lento avanza una vez por hora: el tiempo del día
+            # vuelve a su media en unos 3 días y la deriva de N, P, K en unos 10
+            dias = (ts - anterior) / MS_DIA
+            raiz_dias = math.sqrt(dias)
+            desvio_tiempo += -desvio_tiempo * dias / 3 + gauss(0, 2.0) * raiz_dias
+            for i in range(3):
+                deriva[i] += -deriva[i] * dias / 10 + gauss(0, 3.0) * raiz_dias
+            anterior = ts
+        hora = (ts + desfase) % MS_DIA / MS_HORA
+        temperatura = (temperatura_media + desvio_tiempo
+                       + amplitud_diaria * math.cos(2 * math.pi * (hora - 15) / 24)
+                       + gauss(0, 0.3))
+
+        if lluvia_restante_h <= 0 and aleatorio.random() < probabilidad_lluvia:
+            lluvia_restante_h = uniforme(1.0, 12.0)
+            intensidad = uniforme(2.0, 40.0)
+        if lluvia_restante_h > 0:
+            lluvia = intensidad * uniforme(0.5, 1.25)
+            lluvia_restante_h -= horas_paso
+            # La lluvia enfría
+            temperatura -= 0.05 * lluvia
+        else:
+            lluvia = 0.0
+
+        # Humedad del suelo (por hora): entra con la lluvia, se evapora más con calor
+        secado = 0.12 + 0.024 * max(0.0, temperatura - 10)
+        humedad += (0.9 * lluvia - secado * (humedad - humedad_base)) * horas_paso
+        humedad = min(95.0, max(5.0, humedad))
+
+        # La lluvia lava nitrógeno
+        deriva[0] -= 0.01 * lluvia * horas_paso
+
+        temperatura = round(temperatura, 2)
+        humedad_lectura = round(min(100.0, max(0.0, humedad + gauss(0, 0.5))), 2)
+        lluvia = round(lluvia, 2)
+        n, p, k = sensores.simular_nutrientes(humedad_lectura, temperatura, lluvia)
+        yield ts, (humedad_lectura, sensores.simular_ph(lluvia, temperatura), temperatura,
+                   round(n + deriva[0], 1), round(p + deriva[1], 1), round(k + deriva[2], 1))
+        ts += intervalo_ms
+
+
+def _tiene_lecturas(cursor, cultivo_id, desde_ms, hasta_ms):
+    for nombre in particiones.particiones_en_rango(cursor, desde_ms, hasta_ms):
+        cursor.execute(f"SELECT 1 FROM {nombre} WHERE cultivo_id = ? AND ts >= ? AND ts < ? LIMIT 1",
+                       (cultivo_id, desde_ms, hasta_ms))
+        if cursor.fetchone() is not None:
+            return True
+    return False
+
+
+def rellenar(cultivo_ids, desde_ms, hasta_ms, intervalo_s=60, semilla=0, tamano_lote=None, progreso=None):
+    """
+    Rellena la historia de los cultivos 'cultivo_ids' entre desde_ms y
+    hasta_ms. 'progreso(resultado)' se llama tras cada bloque confirmado.
+    Devuelve cuántas lecturas se insertaron, los cultivos rellenados y los
+    omitidos por tener ya lecturas en el rango.
+    """
+    tamano_lote = tamano_lote or TAMANO_LOTE
+    conn = base_datos.obtener_conexion(DATABASE)
+    cultivos = repositorios.RepositorioCultivos(conn).por_ids(cultivo_ids)
+    cursor = conn.cursor()
+    omitidos = {c for c in cultivo_ids if c in cultivos and _tiene_lecturas(cursor, c, desde_ms, hasta_ms)}
+    conn.close()
+
+    resultado = {"insertadas": 0, "rechazadas": 0, "cultivos": 0,
+                 "omitidos": [cultivos[c]["numero"] for c in cultivo_ids if c in omitidos],
+                 "inexistentes": [c for c in cultivo_ids if c not in cultivos], "segundos": 0.0}
+    inicio = time.perf_counter()
+
+    def confirmar(registros):
+        insertadas, rechazadas, _ = sensores.insertar_registros(registros)
+        resultado["insertadas"] += insertadas
+        resultado["rechazadas"] += len(rechazadas)
+        resultado["segundos"] = time.perf_counter() - inicio
+        if progreso is not None:
+            progreso(resultado)
+
+    registros = []
+    for cultivo_id in cultivo_ids:
+        if cultivo_id not in cultivos or cultivo_id in omitidos:
+            continue
+        resultado["cultivos"] += 1
+        for ts, valores in serie(cultivos[cultivo_id]["numero"], desde_ms, hasta_ms, intervalo_s, semilla):
+            registros.append((cultivo_id, ts, valores))
+            if len(registros) >= tamano_lote:
+                confirmar(registros)
+                registros = []
+    if registros:
+        confirmar(registros)
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,241 @@
+# module/repositorios.py
+"""
+Repositorios de lectura: lecturas de sensores, cultivos, datos avanzados,
+alertas y chat.
+
+Cada consulta es una constante de texto fijo. sqlite3 guarda por conexión las
+sentencias preparadas indexadas por su texto, así que repetir el mismo SQL
+reutiliza la sentencia ya compilada; por eso las listas de valores van en un
+único parámetro JSON (json_each) y no en un "IN (?, ?, ...)" de largo variable.
+Las filas llegan como tuplas y se convierten con un mapeador compilado una
+vez por consulta (un dict literal indexado), en lugar de sqlite3.Row + dict()
+o de copiar campo a campo.
+
+Los repositorios no abren conexiones: reciben la de quien llama, que sigue
+usando su propio DATABASE.
+"""
+import json
+from module import base_datos, particiones
+
+
+def _compilar(expresion):
+    # Las claves son constantes de este módulo (repr) y los valores f[i]
+    return eval(f"lambda f: {expresion}", {})
+
+
+def compilar_mapeador(columnas):
+    """Función tupla -> dict con las claves 'columnas' en ese orden."""
+    return _compilar("{" + ", ".join(f"{c!r}: f[{i}]" for i, c in enumerate(columnas)) + "}")
+
+
+def compilar_mapeador_anidado(estructura, columnas):
+    """
+    Como compilar_mapeador, pero con diccionarios anidados: 'estructura' asocia
+    cada clave de salida a un nombre de 'columnas' o a otro diccionario.
+    """
+    indices = {c: i for i, c in enumerate(columnas)}
+
+    def literal(nodo):
+        if isinstance(nodo, dict):
+            return "{" + ", ".join(f"{k!r}: {literal(v)}" for k, v in nodo.items()) + "}"
+        return f"f[{indices[nodo]}]"
+
+    return _compilar(literal(estructura))
+
+
+class Repositorio:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _cursor(self):
+        cursor = self.conn.cursor()
+        cursor.row_factory = None  # Tuplas: el mapeador ya sabe qué es cada posición
+        return cursor
+
+    def _todas(self, sql, parametros, mapeador):
+        cursor = self._cursor()
+        cursor.execute(sql, parametros)
+        return list(map(mapeador, cursor.fetchall()))
+
+    def _una(self, sql, parametros, mapeador):
+        cursor = self._cursor()
+        cursor.execute(sql, parametros)
+        fila = cursor.fetchone()
+        return mapeador(fila) if fila else None
+
+
+class RepositorioCultivos(Repositorio):
+    COLUMNAS = ("id", "numero", "ciudad", "agricultor", "tipo", "latitud", "longitud", "usuario_id", "agronomist_id",
+                "intervalo_muestreo", "muestreo_adaptativo")
+    _SELECT = f"SELECT {', '.join(COLUMNAS)} FROM cultivos"
+    SQL_TODOS = _SELECT
+    SQL_POR_USUARIO = _SELECT + " WHERE usuario_id = ?"
+    SQL_POR_AGRONOMO = _SELECT + " WHERE agronomist_id = ?"
+    SQL_POR_NUMERO = _SELECT + " WHERE numero = ?"
+    SQL_POR_NUMEROS = _SELECT + " WHERE numero IN (SELECT value FROM json_each(?))"
+    SQL_POR_IDS = _SELECT + " WHERE id IN (SELECT value FROM json_each(?))"
+    mapear = staticmethod(compilar_mapeador(COLUMNAS))
+
+    def todos(self):
+        return self._todas(self.SQL_TODOS, (), self.mapear)
+
+    def por_usuario(self, usuario_id):
+        return self._todas(self.SQL_POR_USUARIO, (usuario_id,), self.mapear)
+
+    def por_agronomo(self, agronomist_id):
+        return self._todas(self.SQL_POR_AGRONOMO, (agronomist_id,), self.mapear)
+
+    def por_numero(self, numero):
+        return self._una(self.SQL_POR_NUMERO, (numero,), self.mapear)
+
+    def por_numeros(self, numeros):
+        """Varios cultivos en una sola consulta: {numero: cultivo}."""
+        filas = self._todas(self.SQL_POR_NUMEROS, (json.dumps(list(numeros)),), self.mapear)
+        return {fila["numero"]: fila for fila in filas}
+
+    def por_ids(self, ids):
+        """Varios cultivos por id en una sola consulta: {id: cultivo}."""
+        filas = self._todas(self.SQL_POR_IDS, (json.dumps(list(ids)),), self.mapear)
+        return {fila["id"]: fila for fila in filas}
+
+    def visibles(self, usuario_id, tipo_usuario):
+        """Cultivos que puede ver el usuario según su rol."""
+        if tipo_usuario == "agricultor":
+            return self.por_usuario(usuario_id)
+        if tipo_usuario == "agronomo":
+            return self.por_agronomo(usuario_id)
+        if tipo_usuario == "admin":
+            return self.todos()
+        return []
+
+
+class RepositorioLecturas(Repositorio):
+    PARAMETROS = ("humedad_suelo", "ph_suelo", "temperatura_ambiente", "nitrogeno", "fosforo", "potasio")
+    COLUMNAS = ("cultivo_id",) + PARAMETROS + ("timestamp",)
+    SQL_COLUMNAS = f"cultivo_id, {', '.join(PARAMETROS)}, {base_datos.sql_fecha_local('ts')} AS timestamp"
+    # Última lectura de cada cultivo de la lista dentro de una partición
+    SQL_ULTIMAS = """
+        SELECT c.numero, {columnas} FROM cultivos c
+        JOIN {particion} p ON p.cultivo_id = c.id
+         AND p.ts = (SELECT MAX(ts) FROM {particion} WHERE cultivo_id = c.id)
+        WHERE c.numero IN (SELECT value FROM json_each(?))
+    """
+    mapear = staticmethod(compilar_mapeador(COLUMNAS))
+    _mapear_con_numero = staticmethod(compilar_mapeador(("numero_cultivo",) + COLUMNAS))
+
+    def ultima(self, numero_cultivo):
+        """Última lectura del cultivo (la partición más reciente que tenga datos) o None."""
+        filas = particiones.consultar_lecturas(
+            self._cursor(), numero_cultivo, self.SQL_COLUMNAS, descendente=True, limite=1
+        )
+        if not filas:
+            return None
+        lectura = self.mapear(filas[0])
+        lectura["numero_cultivo"] = numero_cultivo
+        return lectura
+
+    def ultimas(self, numeros):
+        """Última lectura de varios cultivos: {numero: lectura}; los que no tienen datos no aparecen."""
+        pendientes = list(dict.fromkeys(numeros))
+        resultado = {}
+        cursor = self._cursor()
+        columnas = ", ".join(f"p.{c}" for c in ("cultivo_id",) + self.PARAMETROS)
+        columnas += ", " + base_datos.sql_fecha_local("p.ts") + " AS timestamp"
+        # De la partición más nueva a la más vieja, solo con los cultivos que faltan
+        for nombre in particiones.particiones_en_rango(cursor, descendente=True):
+            if not pendientes:
+                break
+            cursor.execute(self.SQL_ULTIMAS.format(columnas=columnas, particion=nombre), (json.dumps(pendientes),))
+            for fila in cursor.fetchall():
+                resultado[fila[0]] = self._mapear_con_numero(fila)
+            pendientes = [n for n in pendientes if n not in resultado]
+        return resultado
+
+
+# Columnas de datos_avanzados: <prefijo>_<estadística> para cada parámetro
+_PREFIJOS_AVANZADOS = ("humedad", "ph", "temp", "nitrogeno", "fosforo", "potasio")
+_ESTADISTICAS = ("ultimo", "maximo", "minimo", "promedio", "desviacion", "anomalia")
+_ESTRUCTURA_AVANZADOS = {
+    **{p: {e: f"{p}_{e}" for e in _ESTADISTICAS} for p in _PREFIJOS_AVANZADOS},
+    "probabilidad_lluvia": "probabilidad_lluvia",
+    "timestamp": "timestamp",
+}
+
+
+class RepositorioDatosAvanzados(Repositorio):
+    COLUMNAS = tuple(f"{p}_{e}" for p in _PREFIJOS_AVANZADOS for e in _ESTADISTICAS) + ("probabilidad_lluvia", "timestamp")
+    SQL_ULTIMO = f"""
+        SELECT {', '.join(COLUMNAS)} FROM vista_datos_avanzados
+        WHERE numero_cultivo = ?
+        ORDER BY ts DESC
+        LIMIT 1
+    """
+    # {"humedad": {"ultimo": ..., ...}, ..., "probabilidad_lluvia": ..., "timestamp": ...}
+    mapear = staticmethod(compilar_mapeador_anidado(_ESTRUCTURA_AVANZADOS, COLUMNAS))
+
+    def ultimo(self, numero_cultivo):
+        return self._una(self.SQL_ULTIMO, (numero_cultivo,), self.mapear)
+
+
+class RepositorioAlertas(Repositorio):
+    COLUMNAS_REGLA = ("id", "tipo_alerta", "umbral", "condicion", "activa")
+    SQL_REGLAS = f"SELECT {', '.join(COLUMNAS_REGLA)} FROM alertas"
+    COLUMNAS = ("fecha", "tipo_alerta", "umbral", "condicion", "valor_sensor", "numero_cultivo")
+    SQL_HISTORIAL = """
+        SELECT ha.fecha, a.tipo_alerta, a.umbral, a.condicion, ha.valor_sensor, ha.numero_cultivo
+        FROM vista_historial_alertas ha
+        JOIN alertas a ON ha.alerta_id = a.id
+        WHERE ha.usuario_id = ? OR ha.agronomist_id = ?
+        ORDER BY ha.ts DESC
+        LIMIT ?
+    """
+    mapear = staticmethod(compilar_mapeador(COLUMNAS))
+    _mapear_notificacion = staticmethod(compilar_mapeador(COLUMNAS[:3]))
+    _mapear_regla = staticmethod(compilar_mapeador(COLUMNAS_REGLA))
+
+    def reglas(self):
+        """Reglas de alerta configuradas (globales)."""
+        return self._todas(self.SQL_REGLAS, (), self._mapear_regla)
+
+    def historial(self, usuario_id, limite=None):
+        """Alertas disparadas para el usuario (como agricultor o agrónomo), la más reciente primero."""
+        return self._todas(self.SQL_HISTORIAL, (usuario_id, usuario_id, -1 if limite is None else limite), self.mapear)
+
+    def notificaciones(self, usuario_id, limite=10):
+        """Igual que historial() pero solo fecha, tipo_alerta y umbral."""
+        return self._todas(self.SQL_HISTORIAL, (usuario_id, usuario_id, limite), self._mapear_notificacion)
+
+
+class RepositorioChat(Repositorio):
+    # Últimos mensajes activos de una conversación, en orden cronológico
+    SQL_CONVERSACION = """
+        SELECT pregunta, respuesta, fecha, estado FROM (
+            SELECT id, pregunta, respuesta, fecha, estado FROM historial_chat
+            WHERE conversacion_id = ? AND estado = ?
+            ORDER BY fecha DESC, id DESC
+            LIMIT ?
+        ) ORDER BY fecha ASC, id ASC
+    """
+    SQL_POR_USUARIO = """
+        SELECT conversacion_id, pregunta, respuesta, fecha, estado
+        FROM historial_chat
+        WHERE user_id = ? AND estado = ?
+        ORDER BY conversacion_id, fecha ASC
+    """
+    _mapear_mensaje = staticmethod(compilar_mapeador(("pregunta", "respuesta", "fecha", "estado")))
+
+    def conversacion(self, conversacion_id, max_mensajes=10, estado=1):
+        """Tuplas (pregunta, respuesta, fecha, estado), como las espera el contexto del modelo."""
+        cursor = self._cursor()
+        cursor.execute(self.SQL_CONVERSACION, (conversacion_id, estado, max_mensajes))
+        return cursor.fetchall()
+
+    def conversaciones_usuario(self, usuario_id, estado=1):
+        """{conversacion_id: [mensaje, ...]} con los mensajes de cada conversación en orden."""
+        cursor = self._cursor()
+        cursor.execute(self.SQL_POR_USUARIO, (usuario_id, estado))
+        conversaciones = {}
+        mapear = self._mapear_mensaje
+        for fila in cursor.fetchall():
+            conversaciones.setdefault(fila[0], []).append(mapear(fila[1:]))
+        return conversaciones
@@ -0,0 +1,223 @@
+# module/retencion.py
+"""
+Retención de datos históricos.
+
+Cada tabla tiene un plazo en días (RETENCION_DIAS, ajustable con configurar()).
+Las lecturas de sensores más antiguas que su plazo se resumen antes en
+lecturas_15min (promedios cada 15 minutos) y luego se borran; el resto de
+tablas simplemente se purgan. Todo se hace en lotes pequeños, cada uno en su
+propia transacción, para no retener el bloqueo de escritura mucho tiempo: los
+inserts de guardar_datos se intercalan entre lote y lote.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from module import base_datos, particiones, archivo
+
+DATABASE = "users.db"
+MS_DIA = 24 * 3600 * 1000
+MS_15_MIN = 15 * 60 * 1000
+
+# Días que se conserva cada tabla (None = sin límite)
+RETENCION_DIAS = {
+    "lecturas_sensores": 30,   # lecturas crudas; después quedan los promedios de 15 minutos
+    "lecturas_15min": None,
+    "historial_alertas": 365,
+    "historial_chat": 180,
+    "datos_avanzados": 90,
+}
+TAMANO_LOTE = 2000
+PAUSA_ENTRE_LOTES = 0.01  # segundos sin bloqueo entre un lote y el siguiente
+# Cada cuántas horas corre la tarea en segundo plano (0 = desactivada)
+INTERVALO_HORAS = float(os.environ.get("ECOSMART_RETENCION_HORAS", "24"))
+
+# Tablas que se purgan por lotes: (clave de fila, columna de fecha, formato)
+#   "ms"  -> entero en milisegundos desde epoch
+#   "utc" -> texto 'YYYY-MM-DD HH:MM:SS' en UTC (CURRENT_TIMESTAMP de SQLite)
+TABLAS_SIMPLES = {
+    "historial_alertas": ("rowid", "ts", "ms"),
+    "datos_avanzados": ("rowid", "ts", "ms"),
+    "historial_chat": ("rowid", "fecha", "utc"),
+    "lecturas_15min": ("cultivo_id, inicio", "inicio", "ms"),
+}
+
+_hilo_periodico = None
+
+
+def configurar(tamano_lote=None, pausa=None, **dias):
+    """Cambia los plazos (p. ej. configurar(historial_alertas=730)) y el tamaño de lote."""
+    global TAMANO_LOTE, PAUSA_ENTRE_LOTES
+    for tabla, plazo in dias.items():
+        if tabla not in RETENCION_DIAS:
+            raise ValueError(f"Tabla sin política de retención: {tabla}")
+        RETENCION_DIAS[tabla] = plazo
+    if tamano_lote is not None:
+        TAMANO_LOTE = int(tamano_lote)
+    if pausa is not None:
+        PAUSA_ENTRE_LOTES = float(pausa)
+
+
+def crear_tabla_lecturas_15min(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS lecturas_15min (
+            cultivo_id INTEGER NOT NULL,
+            inicio INTEGER NOT NULL, -- ms desde epoch, múltiplo de 15 minutos
+            n INTEGER NOT NULL,
+            humedad_suelo REAL,
+            ph_suelo REAL,
+            temperatura_ambiente REAL,
+            nitrogeno REAL,
+            fosforo REAL,
+            potasio REAL,
+            PRIMARY KEY (cultivo_id, inicio)
+        ) WITHOUT ROWID
+    """)
+
+
+def _bytes_libres(conn):
+    pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+    return conn.execute("PRAGMA freelist_count").fetchone()[0] * pagina
+
+
+def _pausa():
+    if PAUSA_ENTRE_LOTES:
+        time.sleep(PAUSA_ENTRE_LOTES)
+
+
+def _resumir_cultivo(conn, particion, cultivo_id, limite):
+    """Promedios de 15 minutos de las lecturas del cultivo anteriores a 'limite'."""
+    conn.execute(f"""
+        INSERT OR REPLACE INTO lecturas_15min (
+            cultivo_id, inicio, n, humedad_suelo, ph_suelo,
+            temperatura_ambiente, nitrogeno, fosforo, potasio
+        )
+        SELECT cultivo_id, ts - ts % {MS_15_MIN} AS bloque, COUNT(*), AVG(humedad_suelo), AVG(ph_suelo),
+               AVG(temperatura_ambiente), AVG(nitrogeno), AVG(fosforo), AVG(potasio)
+        FROM {particion}
+        WHERE cultivo_id = ? AND ts < ?
+        GROUP BY bloque
+    """, (cultivo_id, limite))
+    conn.commit()
+
+
+def _borrar_cultivo_por_lotes(conn, particion, cultivo_id, limite):
+    """Borra las lecturas del cultivo anteriores a 'limite' en lotes de TAMANO_LOTE."""
+    borradas = 0
+    while True:
+        # ts de la última fila del lote: el tramo del cultivo está ordenado por ts
+        fila = conn.execute(f"""
+            SELECT ts FROM {particion} WHERE cultivo_id = ? AND ts < ?
+            ORDER BY ts LIMIT 1 OFFSET ?
+        """, (cultivo_id, limite, TAMANO_LOTE - 1)).fetchone()
+        tope = fila[0] + 1 if fila else limite
+        cursor = conn.execute(f"DELETE FROM {particion} WHERE cultivo_id = ? AND ts < ?", (cultivo_id, tope))
+        conn.commit()
+        borradas += cursor.rowcount
+        if not fila:
+            return borradas
+        _pausa()
+
+
+def purgar_lecturas(conn, limite):
+    """
+    Resume y borra las lecturas crudas anteriores a 'limite'. Las particiones
+    que quedan enteras antes del límite se eliminan con DROP TABLE después de
+    resumirlas; la que contiene el límite se borra por lotes. Devuelve filas borradas.
+    """
+    crear_tabla_lecturas_15min(conn)
+    conn.commit()
+    # Bloques de 15 minutos completos: el resumen nunca queda a medias
+    limite -= limite % MS_15_MIN
+    borradas = 0
+    for nombre in particiones.particiones_en_rango(conn.cursor(), hasta=limite):
+        hasta = conn.execute("SELECT hasta FROM particiones_lecturas WHERE nombre = ?", (nombre,)).fetchone()[0]
+        completa = hasta <= limite
+        for cultivo_id in particiones.cultivos_en_particion(conn.cursor(), nombre):
+            _resumir_cultivo(conn, nombre, cultivo_id, limite)
+            if completa:
+                borradas += conn.execute(f"SELECT COUNT(*) FROM {nombre} WHERE cultivo_id = ?", (cultivo_id,)).fetchone()[0]
+            else:
+                borradas += _borrar_cultivo_por_lotes(conn, nombre, cultivo_id, limite)
+            _pausa()
+        if completa:
+            cursor = conn.cursor()
+            # DROP TABLE, registro y vista en una sola transacción
+            cursor.execute("BEGIN")
+            particiones.eliminar_particion(cursor, nombre)
+            particiones.actualizar_vista(cursor)
+            conn.commit()
+    return borradas
+
+
+def purgar_tabla(conn, tabla, limite):
+    """Borra por lotes las filas de 'tabla' anteriores a 'limite' (ms). Devuelve cuántas."""
+    clave, columna, formato = TABLAS_SIMPLES[tabla]
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+    if not existe:
+        return 0
+    if formato == "utc":
+        limite = datetime.fromtimestamp(limite / 1000, timezone.utc).strftime(base_datos.FORMATO_FECHA)
+    borradas = 0
+    while True:
+        cursor = conn.execute(f"""
+            DELETE FROM {tabla} WHERE ({clave}) IN (
+                SELECT {clave} FROM {tabla} WHERE {columna} < ? LIMIT ?
+            )
+        """, (limite, TAMANO_LOTE))
+        conn.commit()
+        borradas += cursor.rowcount
+        if cursor.rowcount < TAMANO_LOTE:
+            return borradas
+        _pausa()
+
+
+def aplicar_retencion(ahora=None):
+    """
+    Aplica todas las políticas. Devuelve {"filas": {tabla: n}, "bytes": n}
+    con los bytes que quedaron libres en el archivo (páginas en la freelist,
+    reutilizables por SQLite sin crecer el archivo).
+    """
+    ahora = ahora if ahora is not None else base_datos.epoch_ms()
+    conn = base_datos.obtener_conexion(DATABASE)
+    try:
+        libres_antes = _bytes_libres(conn)
+        filas = {}
+        for tabla, dias in RETENCION_DIAS.items():
+            if dias is None:
+                continue
+            limite = ahora - dias * MS_DIA
+            if tabla == "lecturas_sensores":
+                # Antes de borrar, los días fríos quedan en el archivo columnar
+                archivo.compactar(ahora)
+                filas[tabla] = purgar_lecturas(conn, limite)
+            else:
+                filas[tabla] = purgar_tabla(conn, tabla, limite)
+        liberados = _bytes_libres(conn) - libres_antes
+    finally:
+        conn.close()
+    print(f"[INFO] Retención aplicada: {filas}, {liberados} bytes liberados.")
+    return {"filas": filas, "bytes": max(liberados, 0)}
+
+
+def iniciar_tarea_periodica(intervalo_horas=None, retraso_inicial=60):
+    """Lanza (una sola vez) el hilo que aplica la retención cada 'intervalo_horas'."""
+    global _hilo_periodico
+    intervalo_horas = intervalo_horas if intervalo_horas is not None else INTERVALO_HORAS
+    if intervalo_horas <= 0:
+        return None
+    if _hilo_periodico is not None and _hilo_periodico.is_alive():
+        return _hilo_periodico
+
+    def bucle():
+        time.sleep(retraso_inicial)
+        while True:
+            try:
+                aplicar_retencion()
+            except Exception as e:
+                print(f"[ERROR] Falló la tarea de retención: {e}")
+            time.sleep(intervalo_horas * 3600)
+
+    _hilo_periodico = threading.Thread(target=bucle, name="retencion", daemon=True)
+    _hilo_periodico.start()
+    return _hilo_periodico
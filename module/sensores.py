@@ -1,69 +1,585 @@
+import asyncio
+import math
+import os
 import random
 import sqlite3
-from flask import jsonify
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import jsonify, Response, stream_with_context
 from datetime import datetime
+from operator import itemgetter
 import requests
 import json # Import json to handle dictionary properly
 from module import alertas # Importado para llamar a verificar_alertas
+from module import base_datos
+from module import particiones
+from module import agregados
+from module import archivo
+from module import repositorios
+from module import escritor
+from module import binario
+from module import eventos
 
 DATABASE = "users.db"
 # Tu clave API para OpenWeatherMap (consíguela en https://openweathermap.org/)
 OPENWEATHER_API_KEY = "apikey from openweathermap "
 OPENWEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
+# Plazo de cada consulta del clima (s); vencido, el ciclo usa valores simulados.
+# La generación asíncrona (generar_datos_async) deja a lo más CLIMA_SIMULTANEAS
+# consultas en vuelo a la vez, sin importar cuántos cultivos generen.
+CLIMA_TIMEOUT_S = float(os.environ.get("ECOSMART_CLIMA_TIMEOUT_S", "5"))
+CLIMA_SIMULTANEAS = int(os.environ.get("ECOSMART_CLIMA_SIMULTANEAS", "16"))
+_ejecutor_clima = None
+_lock_clima = threading.Lock()
+_clima = {"consultas": 0, "en_vuelo": 0, "vencidas": 0, "simuladas": 0}
+
+# Máximo de lecturas por petición en POST /api/sensores/batch
+LIMITE_LOTE = 10000
+# POST /api/sensores/stream: lecturas por transacción y tamaño máximo de una línea
+TAMANO_BLOQUE_FLUJO = 1000
+LIMITE_LINEA = 64 * 1024
+
+# Escritor con commit agrupado (ver iniciar_escritor): ECOSMART_ESCRITOR_MS > 0 lo
+# activa al arrancar la aplicación
+ESCRITOR_INTERVALO_MS = int(os.environ.get("ECOSMART_ESCRITOR_MS", "0"))
+ESCRITOR_MAX_FILAS = 500
+_escritor = None
+
+# Contrapresión (ver admitir_ingesta). La cola del escritor deja de aceptar
+# lecturas al llegar a COLA_ALTA pendientes y vuelve a aceptarlas al bajar a
+# COLA_BAJA; sin escritor, guardar_datos y las rutas de lote admiten hasta
+# INGESTA_SIMULTANEAS escrituras a la vez. Lo que excede se rechaza al
+# momento con 503/429 y Retry-After en vez de esperar al bloqueo de SQLite.
+COLA_ALTA = int(os.environ.get("ECOSMART_COLA_ALTA", "20000"))
+COLA_BAJA = int(os.environ.get("ECOSMART_COLA_BAJA", str(COLA_ALTA // 2)))
+INGESTA_SIMULTANEAS = int(os.environ.get("ECOSMART_INGESTA_SIMULTANEAS", "8"))
+SEGUNDOS_REINTENTO = 1
+_lock_ingesta = threading.Lock()
+_ingesta = {"en_curso": 0, "max_en_curso": 0, "rechazadas_429": 0, "rechazadas_503": 0}
 
 # Diccionario global para almacenar el estado de la generación de datos por cultivo.
 data_generation_status = {}
 
 def crear_tabla_datos_sensores():
-    conn = sqlite3.connect(DATABASE)
+    """
+    Crea el registro de particiones mensuales de lecturas. Cada partición es
+    WITHOUT ROWID con clave (cultivo_id, ts) y se crea con la primera lectura
+    del mes (ver module/particiones.py).
+    """
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS datos_sensores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            numero_cultivo TEXT NOT NULL,
-            humedad_suelo REAL,
-            ph_suelo REAL,
-            temperatura_ambiente REAL,
-            nitrogeno REAL,
-            fosforo REAL,
-            potasio REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (numero_cultivo) REFERENCES cultivos(numero)
-        );
-    """)
+    particiones.crear_tabla_particiones(cursor)
     conn.commit()
     conn.close()
 
+# Las fórmulas de simulación sirven igual para números y para arreglos de
+# NumPy (module/simulador.py simula toda la flota de una vez)
+def _redondear(valor, decimales):
+    # round() no acepta arreglos de NumPy, que traen su propio .round()
+    return valor.round(decimales) if hasattr(valor, "round") else round(valor, decimales)
+
 def simular_ph(rain, temperature):
-    return round(7.0 - 0.05 * (rain or 0) + 0.02 * temperature, 2)
+    return _redondear(7.0 - 0.05 * (0 if rain is None else rain) + 0.02 * temperature, 2)
+
+def simular_nutrientes(humidity, temperature, rain):
+    """(N, P, K) a partir del clima."""
+    rain = 0 if rain is None else rain
+    return (
+        _redondear(50 + 0.5 * humidity - 0.3 * temperature, 1),
+        _redondear(30 + 0.2 * temperature - 0.1 * rain, 1),
+        _redondear(100 - 0.4 * rain + 0.2 * humidity, 1),
+    )
+
+def admitir_ingesta():
+    """
+    Reserva un cupo de escritura síncrona; se libera con liberar_ingesta.
+    Lanza escritor.Saturado (503) si la cola del escritor está sobre su límite,
+    o (429) si ya hay INGESTA_SIMULTANEAS escrituras en curso.
+    """
+    if _escritor is not None and _escritor.saturado:
+        with _lock_ingesta:
+            _ingesta["rechazadas_503"] += 1
+        raise escritor.Saturado("La cola de ingesta está llena, reintente más tarde",
+                                _escritor.segundos_para_vaciar(), 503)
+    with _lock_ingesta:
+        if _ingesta["en_curso"] >= INGESTA_SIMULTANEAS:
+            _ingesta["rechazadas_429"] += 1
+            raise escritor.Saturado("Demasiadas cargas de lecturas en curso, reintente más tarde",
+                                    SEGUNDOS_REINTENTO, 429)
+        _ingesta["en_curso"] += 1
+        _ingesta["max_en_curso"] = max(_ingesta["max_en_curso"], _ingesta["en_curso"])
+
+def liberar_ingesta():
+    with _lock_ingesta:
+        _ingesta["en_curso"] -= 1
+
+@contextmanager
+def ingesta_admitida():
+    admitir_ingesta()
+    try:
+        yield
+    finally:
+        liberar_ingesta()
+
+def respuesta_saturada(error):
+    """Respuesta HTTP rápida para un escritor.Saturado, con su Retry-After."""
+    respuesta = jsonify({"message": str(error), "reintentar_en": error.reintentar})
+    respuesta.headers["Retry-After"] = str(error.reintentar)
+    return respuesta, error.estado
+
+def estado_ingesta():
+    """Profundidad de la cola y cuentas de rechazos, para monitoreo."""
+    with _lock_ingesta:
+        datos = dict(_ingesta)
+    datos["limite_simultaneas"] = INGESTA_SIMULTANEAS
+    datos["escritor"] = _escritor.estadisticas() if _escritor is not None else None
+    return datos
 
 def guardar_datos(datos, numero_cultivo):
-    conn = sqlite3.connect(DATABASE)
+    """
+    Guarda una lectura del cultivo. Con el escritor activo la encola y
+    devuelve su Future; si no, la inserta dentro de un cupo de ingesta.
+    Lanza escritor.Saturado si la ingesta está sobre su límite.
+    """
+    if _escritor is not None and _escritor.en_marcha:
+        # Commit agrupado: la lectura se confirma con el próximo lote del escritor
+        lectura = dict(datos, numero_cultivo=numero_cultivo, ts=base_datos.epoch_ms(datetime.now()))
+        return _escritor.encolar(lectura)
+    with ingesta_admitida():
+        _insertar_lectura(datos, numero_cultivo)
+
+def _insertar_lectura(datos, numero_cultivo):
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
-    fecha_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cursor.execute("""
-        INSERT INTO datos_sensores (
-            numero_cultivo, humedad_suelo, ph_suelo,
-            temperatura_ambiente, nitrogeno, fosforo, potasio, timestamp
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ts = base_datos.epoch_ms(datetime.now())
+    particion = particiones.asegurar_particion(cursor, ts)
+    # El id del cultivo se resuelve en la misma sentencia; si el número no
+    # existe no se inserta nada. Dos lecturas del mismo cultivo en el mismo
+    # milisegundo comparten clave y se queda la primera: los agregados son
+    # sumas y no pueden descontar una fila reemplazada.
+    cursor.execute(f"""
+        INSERT INTO {particion} (
+            cultivo_id, ts, humedad_suelo, ph_suelo,
+            temperatura_ambiente, nitrogeno, fosforo, potasio
+        ) SELECT id, ?, ?, ?, ?, ?, ?, ? FROM cultivos WHERE numero = ?
+        ON CONFLICT DO NOTHING
     """, (
-        numero_cultivo,
+        ts,
         datos['humedad_suelo'],
         datos['ph_suelo'],
         datos['temperatura_ambiente'],
         datos['nutrientes']['N'],
         datos['nutrientes']['P'],
         datos['nutrientes']['K'],
-        fecha_hora
+        numero_cultivo
     ))
+    if cursor.rowcount != 1:
+        # Cultivo inexistente o lectura repetida: ni agregados ni evento
+        # (la partición, si se acaba de crear, se confirma igual)
+        conn.commit()
+        conn.close()
+        return
+    # Los agregados por hora y día se actualizan en la misma transacción
+    agregados.actualizar_agregados(cursor, numero_cultivo, ts, {
+        "humedad_suelo": datos['humedad_suelo'],
+        "ph_suelo": datos['ph_suelo'],
+        "temperatura_ambiente": datos['temperatura_ambiente'],
+        "nitrogeno": datos['nutrientes']['N'],
+        "fosforo": datos['nutrientes']['P'],
+        "potasio": datos['nutrientes']['K'],
+    })
     conn.commit()
     conn.close()
-    # Esta línea es crucial y ya estaba bien para el sistema de alertas.
-    alertas.verificar_alertas(numero_cultivo, datos)
+    # Las alertas (y cualquier otro consumidor) se evalúan en el bus de
+    # eventos, fuera del tiempo de la petición
+    eventos.publicar(eventos.LECTURA_GUARDADA, clave=numero_cultivo,
+                     numero_cultivo=numero_cultivo, ts=ts, datos=datos)
+
+# (parámetro, está dentro de 'nutrientes', clave en la lectura)
+_CAMPOS_LECTURA = (
+    ("humedad_suelo", False, 'humedad_suelo'),
+    ("ph_suelo", False, 'ph_suelo'),
+    ("temperatura_ambiente", False, 'temperatura_ambiente'),
+    ("nitrogeno", True, 'N'),
+    ("fosforo", True, 'P'),
+    ("potasio", True, 'K'),
+)
+
+def _validar_lectura(lectura, ids, permitidos, fronteras, ahora):
+    """
+    Devuelve (cultivo_id, ts, valores) de una lectura del lote o lanza
+    ValueError con el motivo del rechazo.
+    """
+    if not isinstance(lectura, dict):
+        raise ValueError("La lectura debe ser un objeto")
+    numero_cultivo = lectura.get('numero_cultivo')
+    if not isinstance(numero_cultivo, str) or numero_cultivo not in ids or (permitidos is not None and numero_cultivo not in permitidos):
+        raise ValueError(f"Cultivo inexistente o sin permiso: {numero_cultivo}")
+    ts = lectura.get('ts', ahora)
+    if isinstance(ts, bool) or not isinstance(ts, int) or ts <= 0:
+        raise ValueError("ts debe ser un entero en milisegundos desde epoch")
+    cultivo_id = ids[numero_cultivo]
+    if ts < fronteras.get(cultivo_id, 0):
+        raise ValueError("La lectura es anterior a los días ya archivados del cultivo")
+    nutrientes = lectura.get('nutrientes')
+    if not isinstance(nutrientes, dict):
+        raise ValueError("Falta el campo nutrientes")
+    valores = {}
+    for parametro, en_nutrientes, clave in _CAMPOS_LECTURA:
+        origen = nutrientes if en_nutrientes else lectura
+        if clave not in origen:
+            raise ValueError(f"Falta el campo {clave}")
+        valor = origen[clave]
+        # float es el caso habitual; bool es subclase de int y no se acepta
+        if valor is not None and type(valor) is not float and (isinstance(valor, bool) or not isinstance(valor, (int, float))):
+            raise ValueError(f"El campo {clave} debe ser numérico")
+        # get_json acepta Infinity y NaN, que envenenarían los agregados
+        if type(valor) is float and not math.isfinite(valor):
+            raise ValueError(f"El campo {clave} debe ser un número finito")
+        valores[parametro] = valor
+    return cultivo_id, ts, valores
+
+def insertar_lote(lecturas, cultivos_permitidos=None, registrar=None):
+    """
+    Valida e inserta un lote de lecturas en una única transacción, sin evaluar
+    alertas. Devuelve (insertadas, rechazadas, aceptadas), con aceptadas como
+    [(numero_cultivo, lectura), ...] para verificar_alertas_lote.
+    'registrar(cursor)' se ejecuta en la misma transacción antes del commit
+    (aunque no haya lecturas válidas), p. ej. para guardar el avance de una
+    importación junto con sus filas.
+    """
+    ahora = base_datos.epoch_ms(datetime.now())
+    numeros = {l.get('numero_cultivo') for l in lecturas if isinstance(l, dict)}
+    numeros = [n for n in numeros if isinstance(n, str)]
+
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    ids = {n: c["id"] for n, c in repositorios.RepositorioCultivos(conn).por_numeros(numeros).items()}
+    fronteras = archivo.fronteras(cursor)
+
+    filas = {}  # (cultivo_id, ts) -> valores; dentro del lote gana la última
+    aceptadas = []
+    rechazadas = []
+    for indice, lectura in enumerate(lecturas):
+        try:
+            cultivo_id, ts, valores = _validar_lectura(lectura, ids, cultivos_permitidos, fronteras, ahora)
+        except ValueError as e:
+            rechazadas.append({"indice": indice, "error": str(e)})
+            continue
+        filas[(cultivo_id, ts)] = valores
+        aceptadas.append((lectura['numero_cultivo'], lectura))
+
+    insertadas = 0
+    try:
+        if filas or registrar is not None:
+            insertadas = _escribir_lecturas(conn, filas, registrar)
+    finally:
+        conn.close()
+    return insertadas, rechazadas, aceptadas
+
+def _escribir_lecturas(conn, filas, registrar=None):
+    """
+    Inserta {(cultivo_id, ts): valores} con un executemany por partición y
+    actualiza los agregados, todo (también 'registrar') en una transacción.
+    Las claves que ya estaban guardadas se omiten (y no suman a los
+    agregados). Devuelve cuántas lecturas se insertaron.
+    """
+    cursor = conn.cursor()
+    por_particion = {}
+    # ts -> partición. Se guarda por marca exacta: con husos de media hora una
+    # misma hora UTC puede caer en dos meses locales. Los lotes de flota
+    # repiten la marca del tick en todos los cultivos.
+    nombres = {}
+    columnas_valores = itemgetter(*agregados.PARAMETROS)
+    for (cultivo_id, ts), valores in filas.items():
+        nombre = nombres.get(ts)
+        if nombre is None:
+            nombre = nombres[ts] = particiones.nombre_particion(ts)
+        por_particion.setdefault(nombre, []).append((cultivo_id, ts) + columnas_valores(valores))
+    columnas = ", ".join(particiones.COLUMNAS)
+    marcadores = ", ".join("?" * len(particiones.COLUMNAS))
+    try:
+        if not conn.in_transaction:
+            # IMMEDIATE: nadie escribe entre la consulta de claves y el insert
+            cursor.execute("BEGIN IMMEDIATE")
+        nuevas = []
+        for filas_particion in por_particion.values():
+            particion = particiones.asegurar_particion(cursor, filas_particion[0][1])
+            cursor.execute(f"""
+                SELECT p.cultivo_id, p.ts FROM json_each(?) AS j
+                JOIN {particion} AS p
+                  ON p.cultivo_id = json_extract(j.value, '$[0]') AND p.ts = json_extract(j.value, '$[1]')
+            """, (json.dumps([fila[:2] for fila in filas_particion]),))
+            existentes = set(cursor.fetchall())
+            if existentes:
+                filas_particion = [fila for fila in filas_particion if fila[:2] not in existentes]
+            cursor.executemany(f"INSERT INTO {particion} ({columnas}) VALUES ({marcadores}) ON CONFLICT DO NOTHING",
+                               filas_particion)
+            nuevas.extend(fila[:2] for fila in filas_particion)
+        agregados.actualizar_agregados_lote(cursor, [(c, ts, filas[(c, ts)]) for c, ts in nuevas])
+        if registrar is not None:
+            registrar(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(nuevas)
+
+def insertar_registros(registros, cultivos_permitidos=None):
+    """
+    Como insertar_lote para registros binarios ya decodificados
+    (binario.decodificar): [(cultivo_id, ts, valores), ...] con el id del
+    cultivo y los seis valores en el orden de agregados.PARAMETROS. No hay
+    campos que revisar uno a uno; solo el cultivo, el ts y que los valores
+    sean finitos (un ±inf, enviado o por desborde del float32, envenenaría
+    las sumas de los agregados).
+    """
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    numeros = {
+        cultivo_id: cultivo["numero"]
+        for cultivo_id, cultivo in repositorios.RepositorioCultivos(conn).por_ids({r[0] for r in registros}).items()
+        if cultivos_permitidos is None or cultivo["numero"] in cultivos_permitidos
+    }
+    fronteras = archivo.fronteras(cursor)
+
+    filas = {}
+    aceptadas = []
+    rechazadas = []
+    for indice, (cultivo_id, ts, valores) in enumerate(registros):
+        numero_cultivo = numeros.get(cultivo_id)
+        if numero_cultivo is None:
+            rechazadas.append({"indice": indice, "error": f"Cultivo inexistente o sin permiso: {cultivo_id}"})
+            continue
+        if ts <= 0:
+            rechazadas.append({"indice": indice, "error": "ts debe ser un entero en milisegundos desde epoch"})
+            continue
+        if ts < fronteras.get(cultivo_id, 0):
+            rechazadas.append({"indice": indice, "error": "La lectura es anterior a los días ya archivados del cultivo"})
+            continue
+        if not all(v is None or math.isfinite(v) for v in valores):
+            rechazadas.append({"indice": indice, "error": "Los valores deben ser números finitos"})
+            continue
+        valores = dict(zip(agregados.PARAMETROS, valores))
+        filas[(cultivo_id, ts)] = valores
+        # Las alertas leen los mismos nombres de parámetro
+        aceptadas.append((numero_cultivo, valores))
+
+    insertadas = 0
+    try:
+        if filas:
+            insertadas = _escribir_lecturas(conn, filas)
+    finally:
+        conn.close()
+    return insertadas, rechazadas, aceptadas
+
+def guardar_registros(registros, cultivos_permitidos=None, origen="binario"):
+    """
+    insertar_registros más las alertas del lote y LOTE_GUARDADO; devuelve lo
+    mismo que guardar_lote. Lo usan el lote binario y el simulador de flota.
+    """
+    insertadas, rechazadas, aceptadas = insertar_registros(registros, cultivos_permitidos)
+    disparadas, avisos = alertas.registrar_alertas_lote(aceptadas)
+    resultado = {"insertadas": insertadas, "rechazadas": rechazadas, "alertas": disparadas}
+    if aceptadas:
+        # Los correos de las alertas se envían en el bus, fuera de la petición
+        eventos.publicar(eventos.LOTE_GUARDADO, lecturas=aceptadas, origen=origen, alertas=disparadas, avisos=avisos)
+    return resultado
+
+def guardar_lote(lecturas, cultivos_permitidos=None):
+    """
+    Guarda un lote de lecturas de varios cultivos. Cada lectura tiene el
+    formato de guardar_datos más 'numero_cultivo' y, opcionalmente, 'ts'
+    (ms desde epoch; por defecto, ahora).
+
+    Los cultivos se resuelven con una sola consulta, las lecturas válidas se
+    insertan con un executemany por partición y los agregados se actualizan,
+    todo en una única transacción; después se registran las alertas del lote
+    completo (la respuesta las informa) y se publica LOTE_GUARDADO, cuyo
+    suscriptor envía los correos. Las
+    lecturas inválidas se informan y no impiden guardar el resto.
+    'cultivos_permitidos' (conjunto de números) limita los cultivos aceptados.
+    Devuelve {"insertadas": n, "rechazadas": [{"indice": i, "error": ...}], "alertas": [...]}.
+    """
+    insertadas, rechazadas, aceptadas = insertar_lote(lecturas, cultivos_permitidos)
+    disparadas, avisos = alertas.registrar_alertas_lote(aceptadas)
+    resultado = {"insertadas": insertadas, "rechazadas": rechazadas, "alertas": disparadas}
+    if aceptadas:
+        # Los correos de las alertas se envían en el bus, fuera de la petición
+        eventos.publicar(eventos.LOTE_GUARDADO, lecturas=aceptadas, origen="lote", alertas=disparadas, avisos=avisos)
+    return resultado
+
+def _volcar_escritor(lecturas):
+    """Un lote del escritor: un resultado por lectura (su ts, o ValueError si se rechazó)."""
+    _, rechazadas, _ = insertar_lote(lecturas)
+    resultados = [lectura['ts'] for lectura in lecturas]
+    for rechazo in rechazadas:
+        resultados[rechazo["indice"]] = ValueError(rechazo["error"])
+    return resultados
+
+def _publicar_escritor(lecturas, resultados):
+    """Tras cada commit del escritor: las alertas del lote se evalúan en el bus de eventos."""
+    aceptadas = [(l['numero_cultivo'], l) for l, r in zip(lecturas, resultados) if not isinstance(r, BaseException)]
+    if aceptadas:
+        eventos.publicar(eventos.LOTE_GUARDADO, lecturas=aceptadas, origen="escritor", alertas=None)
+
+def iniciar_escritor(intervalo_ms=None, max_filas=None):
+    """
+    Activa el escritor con commit agrupado: desde ahí guardar_datos encola la
+    lectura y un solo hilo la confirma junto con las demás cada 'intervalo_ms'
+    o 'max_filas' lecturas. Con intervalo 0 (valor por defecto de
+    ECOSMART_ESCRITOR_MS) queda desactivado y cada lectura hace su commit.
+    La cola queda acotada por COLA_ALTA / COLA_BAJA.
+    """
+    global _escritor
+    intervalo_ms = ESCRITOR_INTERVALO_MS if intervalo_ms is None else intervalo_ms
+    if not intervalo_ms or _escritor is not None:
+        return _escritor
+    _escritor = nuevo_escritor(intervalo_ms, max_filas)
+    return _escritor
+
+def nuevo_escritor(intervalo_ms, max_filas=None, nombre="escritor-lecturas"):
+    """
+    Un escritor de lecturas con commit agrupado, ya iniciado, que no cambia
+    guardar_datos: lo usa quien encola por su cuenta (p. ej. la pasarela).
+    Quien lo crea lo detiene.
+    """
+    return escritor.EscritorLotes(
+        _volcar_escritor, intervalo_ms, max_filas or ESCRITOR_MAX_FILAS,
+        despues=_publicar_escritor, nombre=nombre,
+        limite_alto=COLA_ALTA, limite_bajo=COLA_BAJA
+    ).iniciar()
+
+def detener_escritor():
+    """Confirma las lecturas encoladas y vuelve al commit por lectura."""
+    global _escritor
+    if _escritor is not None:
+        _escritor.detener()
+        _escritor = None
+
+def leer_ndjson(flujo, limite_linea=None):
+    """
+    Lee lecturas NDJSON de un flujo binario línea a línea, sin cargarlo entero.
+    Genera (numero_linea, lectura, error); las líneas en blanco se saltan y
+    las que superan 'limite_linea' bytes se descartan con su error.
+    """
+    limite_linea = limite_linea or LIMITE_LINEA
+    numero = 0
+    while True:
+        linea = flujo.readline(limite_linea + 1)
+        if not linea:
+            return
+        numero += 1
+        if len(linea) > limite_linea and not linea.endswith(b"\n"):
+            # Se descarta el resto de la línea sin guardarlo
+            while linea and not linea.endswith(b"\n"):
+                linea = flujo.readline(limite_linea)
+            yield numero, None, f"La línea supera {limite_linea} bytes"
+            continue
+        if not linea.strip():
+            continue
+        try:
+            yield numero, json.loads(linea), None
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {e}"
+
+def guardar_flujo(flujo, cultivos_permitidos=None, tamano_bloque=None):
+    """
+    Guarda un flujo NDJSON de lecturas en bloques de 'tamano_bloque', cada uno
+    con guardar_lote (una transacción por bloque). Genera un acuse por bloque
+    confirmado y uno final con los totales; la memoria usada depende del
+    tamaño del bloque, no del de la subida. Si la conexión se corta, la
+    pasarela puede reenviar desde la línea siguiente al último acuse.
+    """
+    tamano_bloque = tamano_bloque or TAMANO_BLOQUE_FLUJO
+    totales = {"insertadas": 0, "rechazadas": 0}
+    bloque, lineas, errores = [], [], []
+    numero_bloque = 0
+
+    def confirmar():
+        resultado = guardar_lote(bloque, cultivos_permitidos) if bloque else {"insertadas": 0, "rechazadas": [], "alertas": []}
+        rechazadas = errores + [{"linea": lineas[r["indice"]], "error": r["error"]} for r in resultado["rechazadas"]]
+        rechazadas.sort(key=lambda r: r["linea"])
+        totales["insertadas"] += resultado["insertadas"]
+        totales["rechazadas"] += len(rechazadas)
+        return {
+            "bloque": numero_bloque,
+            "hasta_linea": ultima_linea,
+            "insertadas": resultado["insertadas"],
+            "rechazadas": rechazadas,
+            "alertas": resultado["alertas"],
+        }
+
+    ultima_linea = 0
+    for numero, lectura, error in leer_ndjson(flujo):
+        ultima_linea = numero
+        if error:
+            errores.append({"linea": numero, "error": error})
+        else:
+            bloque.append(lectura)
+            lineas.append(numero)
+        if len(bloque) + len(errores) >= tamano_bloque:
+            yield confirmar()
+            numero_bloque += 1
+            bloque, lineas, errores = [], [], []
+    if bloque or errores:
+        yield confirmar()
+    yield {"fin": True, "lineas": ultima_linea, **totales}
+
+def guardar_flujo_api(flujo, cultivos_permitidos=None):
+    """
+    Respuesta de POST /api/sensores/stream: los acuses en NDJSON, a medida que
+    se confirman. El cupo de ingesta se mantiene hasta cerrar la respuesta.
+    """
+    try:
+        admitir_ingesta()
+    except escritor.Saturado as e:
+        return respuesta_saturada(e)
+    acuses = guardar_flujo(flujo, cultivos_permitidos)
+    respuesta = Response(stream_with_context(json.dumps(acuse) + "\n" for acuse in acuses),
+                         mimetype="application/x-ndjson")
+    respuesta.call_on_close(liberar_ingesta)
+    return respuesta
+
+def guardar_lote_api(cuerpo, cultivos_permitidos=None):
+    """Respuesta de POST /api/sensores/batch: acepta una lista o {"lecturas": [...]}."""
+    lecturas = cuerpo.get('lecturas') if isinstance(cuerpo, dict) else cuerpo
+    if not isinstance(lecturas, list) or not lecturas:
+        return jsonify({"message": "Se esperaba una lista de lecturas no vacía"}), 400
+    if len(lecturas) > LIMITE_LOTE:
+        return jsonify({"message": f"El lote supera el máximo de {LIMITE_LOTE} lecturas"}), 413
+    try:
+        with ingesta_admitida():
+            resultado = guardar_lote(lecturas, cultivos_permitidos)
+    except escritor.Saturado as e:
+        return respuesta_saturada(e)
+    return jsonify(resultado), (200 if resultado["insertadas"] else 400)
+
+def guardar_lote_binario_api(cuerpo, cultivos_permitidos=None):
+    """
+    Respuesta de POST /api/sensores/batch con Content-Type
+    application/octet-stream: registros de module/binario.py, hasta
+    LIMITE_LOTE por petición. Responde igual que el lote JSON.
+    """
+    if not cuerpo:
+        return jsonify({"message": "Se esperaba al menos un registro"}), 400
+    if len(cuerpo) > LIMITE_LOTE * binario.TAMANO_REGISTRO:
+        return jsonify({"message": f"El lote supera el máximo de {LIMITE_LOTE} lecturas"}), 413
+    try:
+        registros = binario.decodificar(cuerpo)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    try:
+        with ingesta_admitida():
+            resultado = guardar_registros(registros, cultivos_permitidos)
+    except escritor.Saturado as e:
+        return respuesta_saturada(e)
+    return jsonify(resultado), (200 if resultado["insertadas"] else 400)
 
 # Función para obtener las coordenadas (latitud y longitud) del cultivo desde la tabla cultivos.
 def obtener_coordenadas_cultivo(numero_cultivo):
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute("SELECT latitud, longitud FROM cultivos WHERE numero = ?", (numero_cultivo,))
     resultado = cursor.fetchone()
@@ -74,7 +590,7 @@ def obtener_coordenadas_cultivo(numero_cultivo):
     return None, None
 
 # Función modificada para obtener datos meteorológicos usando solamente latitud y longitud.
-def get_real_time_weather(lat, lon):
+def get_real_time_weather(lat, lon, timeout=None):
     params = {
         "lat": lat,
         "lon": lon,
@@ -83,7 +599,7 @@ def get_real_time_weather(lat, lon):
         "lang": "es"         # Respuesta en español
     }
     try:
-        response = requests.get(OPENWEATHER_BASE_URL, params=params)
+        response = requests.get(OPENWEATHER_BASE_URL, params=params, timeout=timeout or CLIMA_TIMEOUT_S)
         response.raise_for_status()   # Lanza error si ocurre algún problema en la petición.
         data = response.json()
         
@@ -99,7 +615,7 @@ def get_real_time_weather(lat, lon):
 
 def generate_data(numero_cultivo):
     # Validamos que el cultivo existe.
-    conn = sqlite3.connect(DATABASE)
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
     cursor.execute("SELECT 1 FROM cultivos WHERE numero = ?", (numero_cultivo,))
     if not cursor.fetchone():
@@ -117,6 +633,19 @@ def generate_data(numero_cultivo):
     else:
         temperature, humidity, rain = None, None, None
 
+    datos = _datos_simulados(temperature, humidity, rain)
+    try:
+        guardar_datos(datos, numero_cultivo)
+    except escritor.Saturado as e:
+        # La lectura se descarta: el generador vuelve a intentarlo en su próximo ciclo
+        print(f"Lectura de {numero_cultivo} descartada: {e}")
+        return respuesta_saturada(e)
+    return jsonify({
+        "message": "Datos de sensor generados y guardados exitosamente",
+        "data": datos
+    }), 201
+
+def _datos_simulados(temperature, humidity, rain):
     # En caso de falla en la API o ausencia de coordenadas, se utilizan valores simulados.
     if temperature is None:
         temperature = round(random.uniform(15.0, 35.0), 2)
@@ -128,24 +657,107 @@ def generate_data(numero_cultivo):
         rain = round(random.uniform(0.0, 50.0), 2)
         print("Usando precipitación simulada (no se obtuvieron datos reales).")
 
+    n, p, k = simular_nutrientes(humidity, temperature, rain)
     datos = {
         "humedad_suelo": humidity,
         "ph_suelo": simular_ph(rain, temperature),
         "temperatura_ambiente": temperature,
-        "nutrientes": {
-            "N": round(50 + 0.5 * humidity - 0.3 * temperature, 1),
-            "P": round(30 + 0.2 * temperature - 0.1 * (rain or 0), 1),
-            "K": round(100 - 0.4 * (rain or 0) + 0.2 * humidity, 1)
-        }
+        "nutrientes": {"N": n, "P": p, "K": k}
     }
+    return datos
 
-    guardar_datos(datos, numero_cultivo)
-    return jsonify({
-        "message": "Datos de sensor generados y guardados exitosamente",
-        "data": datos
-    }), 201
+# Generación asíncrona (module/motor.py): muchos cultivos en un solo bucle de
+# eventos. La consulta del clima sigue siendo requests (bloqueante), así que
+# corre en un grupo de CLIMA_SIMULTANEAS hilos; el semáforo limita las consultas
+# en vuelo y el plazo cubre la espera por un cupo más la petición misma.
+
+def _ejecutor_del_clima():
+    global _ejecutor_clima
+    with _lock_clima:
+        if _ejecutor_clima is None:
+            _ejecutor_clima = ThreadPoolExecutor(max_workers=CLIMA_SIMULTANEAS, thread_name_prefix="clima")
+        return _ejecutor_clima
+
+def _contar_clima(campo, cantidad=1):
+    with _lock_clima:
+        _clima[campo] += cantidad
 
-# Funciones para administrar el estado de la generación de datos.
+async def obtener_clima_async(lat, lon, semaforo, plazo=None):
+    """
+    Como get_real_time_weather, pero sin bloquear el bucle de eventos.
+    Devuelve (None, None, None) si vence el plazo: el ciclo sigue con valores
+    simulados y la petición atrasada termina sola (conserva su cupo hasta entonces).
+    Se espera un cupo a lo más la mitad del plazo: una petición que empieza ya
+    casi vencida ocupa el cupo y igual no alcanza a responder.
+    """
+    plazo = plazo or CLIMA_TIMEOUT_S
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + plazo
+    try:
+        await asyncio.wait_for(semaforo.acquire(), plazo / 2)
+    except TimeoutError:
+        _contar_clima("vencidas")
+        return None, None, None
+    _contar_clima("consultas")
+    _contar_clima("en_vuelo")
+
+    def liberar(_):
+        # Corre en el hilo de la consulta
+        _contar_clima("en_vuelo", -1)
+        try:
+            loop.call_soon_threadsafe(semaforo.release)
+        except RuntimeError:
+            pass  # el bucle ya se cerró: no queda nadie esperando el cupo
+
+    consulta = _ejecutor_del_clima().submit(get_real_time_weather, lat, lon, limite - loop.time())
+    consulta.add_done_callback(liberar)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(consulta), max(0.0, limite - loop.time()))
+    except TimeoutError:
+        _contar_clima("vencidas")
+        return None, None, None
+
+async def generar_datos_async(numero_cultivo, semaforo, plazo=None):
+    """
+    Un ciclo de generate_data para el motor asíncrono: devuelve los datos
+    guardados, o None si el cultivo no existe o la ingesta está saturada.
+    """
+    # Una sola consulta: existencia y coordenadas (NULL si no tiene)
+    coordenadas = await asyncio.to_thread(_coordenadas_si_existe, numero_cultivo)
+    if coordenadas is None:
+        print(f"El cultivo con número {numero_cultivo} no existe.")
+        return None
+    lat, lon = coordenadas
+    if lat is not None and lon is not None:
+        temperature, humidity, rain = await obtener_clima_async(lat, lon, semaforo, plazo)
+    else:
+        temperature, humidity, rain = None, None, None
+    if temperature is None:
+        _contar_clima("simuladas")
+
+    datos = _datos_simulados(temperature, humidity, rain)
+    try:
+        await asyncio.to_thread(guardar_datos, datos, numero_cultivo)
+    except escritor.Saturado as e:
+        print(f"Lectura de {numero_cultivo} descartada: {e}")
+        return None
+    return datos
+
+def _coordenadas_si_existe(numero_cultivo):
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    cursor.execute("SELECT latitud, longitud FROM cultivos WHERE numero = ?", (numero_cultivo,))
+    resultado = cursor.fetchone()
+    conn.close()
+    return tuple(resultado) if resultado else None
+
+def estado_clima():
+    """Consultas del clima hechas, en vuelo, vencidas y ciclos con clima simulado."""
+    with _lock_clima:
+        return dict(_clima, limite=CLIMA_SIMULTANEAS, plazo_s=CLIMA_TIMEOUT_S)
+
+# Funciones para administrar el estado de la generación de datos en este proceso.
+# La generación continua de la aplicación usa el registro compartido de module/generacion.py.
 def set_data_generation_status(numero_cultivo, status):
     data_generation_status[numero_cultivo] = status
     return jsonify({"message": f"Generación de datos para el cultivo {numero_cultivo} establecida en {status}"}), 200
@@ -154,62 +766,41 @@ def get_data_generation_status(numero_cultivo):
     return data_generation_status.get(numero_cultivo, 'stopped')
 
 def obtener_datos_por_cultivo_raw(numero_cultivo):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM datos_sensores WHERE numero_cultivo=? ORDER BY timestamp DESC LIMIT 1
-    """, (numero_cultivo,))
-    fila = cursor.fetchone()
+    conn = base_datos.obtener_conexion(DATABASE)
+    # Última lectura: basta con la partición más reciente que tenga datos
+    lectura = repositorios.RepositorioLecturas(conn).ultima(numero_cultivo)
     conn.close()
+    return lectura
 
-    if fila:
-        return {
-            "id": fila["id"],
-            "numero_cultivo": fila["numero_cultivo"],
-            "humedad_suelo": fila["humedad_suelo"],
-            "ph_suelo": fila["ph_suelo"],
-            "temperatura_ambiente": fila["temperatura_ambiente"],
-            "nitrogeno": fila["nitrogeno"],
-            "fosforo": fila["fosforo"],
-            "potasio": fila["potasio"],
-            "timestamp": fila["timestamp"]
-        }
-    return None
+def obtener_ultimas_lecturas(numeros_cultivo):
+    """Última lectura de varios cultivos a la vez: {numero: lectura}."""
+    conn = base_datos.obtener_conexion(DATABASE)
+    lecturas = repositorios.RepositorioLecturas(conn).ultimas(numeros_cultivo)
+    conn.close()
+    return lecturas
 
 def obtener_datos_por_cultivo(numero_cultivo):
     datos = obtener_datos_por_cultivo_raw(numero_cultivo)
     return jsonify(datos if datos else {})
 
 # --- NUEVA FUNCIÓN PARA OBTENER DATOS HISTÓRICOS ---
-def obtener_historial_datos_sensores(numero_cultivo, limit=20):
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+def obtener_historial_datos_sensores(numero_cultivo, limit=20, desde=None, hasta=None):
+    conn = base_datos.obtener_conexion(DATABASE)
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT 
-            timestamp, 
-            humedad_suelo, 
-            ph_suelo, 
-            temperatura_ambiente, 
-            nitrogeno, 
-            fosforo, 
-            potasio 
-        FROM datos_sensores 
-        WHERE numero_cultivo=? 
-        ORDER BY timestamp ASC 
-        LIMIT ?
-    """, (numero_cultivo, limit))
-    filas = cursor.fetchall()
+    # Los días ya archivados se leen del archivo columnar y el resto de las
+    # particiones, en orden y deteniéndose al completar 'limit'
+    filas = archivo.consultar_lecturas(cursor, numero_cultivo, desde=desde, hasta=hasta, limite=limit)
     conn.close()
 
     # Convertir las filas a una lista de diccionarios
     historial = []
-    for fila in filas:
-        historial.append(dict(fila))
+    for ts, *valores in filas:
+        lectura = {"timestamp": base_datos.formatear_epoch_ms(ts)}
+        lectura.update(zip(archivo.PARAMETROS, valores))
+        historial.append(lectura)
     return historial
 
 # Actualiza esta función para manejar las solicitudes de historial
-def obtener_historial_datos_cultivo_api(numero_cultivo):
-    historial_datos = obtener_historial_datos_sensores(numero_cultivo)
+def obtener_historial_datos_cultivo_api(numero_cultivo, **rango):
+    historial_datos = obtener_historial_datos_sensores(numero_cultivo, **rango)
     return jsonify(historial_datos)
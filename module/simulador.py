@@ -0,0 +1,190 @@
+# module/simulador.py
+"""
+Simulador de flota para pruebas de carga.
+
+generate_data simula un cultivo por llamada (random.uniform y, si hay
+coordenadas, una consulta de clima por cultivo). El simulador produce en cada
+tick una lectura para todos los cultivos de la flota a la vez: el clima se
+sortea con arreglos de NumPy en los mismos rangos que el respaldo de
+generate_data y se le aplican las mismas fórmulas (sensores.simular_ph y
+sensores.simular_nutrientes). Sin NumPy se hace cultivo por cultivo con el
+módulo random; el resultado tiene la misma forma.
+
+Las lecturas se escriben por el camino de los lotes (sensores.guardar_registros:
+una transacción por tick, o por varios ticks con --rapido; alertas del lote y
+LOTE_GUARDADO) y respetan la contrapresión de la ingesta: si está saturada, el
+tick espera lo que indica Retry-After y se reintenta.
+
+    flask --app app simular --cultivos 10000 --crear --usuario 1 --ticks 100 --rapido
+"""
+import random
+import time
+from module import base_datos, escritor, sensores
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se simula cultivo por cultivo
+    np = None
+
+DATABASE = "users.db"
+INTERVALO_S = 30  # el mismo periodo que la generación continua (app.GENERACION_INTERVALO_S)
+TAMANO_LOTE = 100000  # lecturas por transacción al simular sin esperar entre ticks
+PREFIJO = "SIM"
+
+
+def crear_cultivos_simulados(cantidad, usuario_id, prefijo=PREFIJO):
+    """
+    Da de alta los cultivos '<prefijo>-<usuario>-1' .. '-<cantidad>' que
+    falten, del agricultor 'usuario_id'. Devuelve sus ids en orden.
+    """
+    numeros = [f"{prefijo}-{usuario_id}-{i}" for i in range(1, cantidad + 1)]
+    aleatorio = random.Random(usuario_id)
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT OR IGNORE INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+        VALUES (?, 'Simulada', 'simulador', 'Simulado', ?, ?, ?)
+    """, [(numero, round(aleatorio.uniform(-45, -18), 4), round(aleatorio.uniform(-73, -68), 4), usuario_id)
+          for numero in numeros])
+    conn.commit()
+    conn.close()
+    return ids_cultivos(prefijo=f"{prefijo}-{usuario_id}-")[:cantidad]
+
+
+def ids_cultivos(prefijo=None, limite=None):
+    """Ids de los cultivos (los que empiezan por 'prefijo', si se indica), en orden de alta."""
+    conn = base_datos.obtener_conexion(DATABASE)
+    cursor = conn.cursor()
+    sql = "SELECT id FROM cultivos"
+    parametros = []
+    if prefijo is not None:
+        sql += " WHERE substr(numero, 1, ?) = ?"
+        parametros += [len(prefijo), prefijo]
+    sql += " ORDER BY id"
+    if limite is not None:
+        sql += " LIMIT ?"
+        parametros.append(limite)
+    cursor.execute(sql, parametros)
+    ids = [fila[0] for fila in cursor.fetchall()]
+    conn.close()
+    return ids
+
+
+def simular_valores(cantidad, semilla=None):
+    """
+    Una lectura por cultivo: columnas (humedad, ph, temperatura, N, P, K) en
+    el orden de agregados.PARAMETROS, cada una con 'cantidad' valores
+    (arreglos de NumPy, o listas sin él).
+    """
+    if np is not None:
+        generador = semilla if isinstance(semilla, np.random.Generator) else np.random.default_rng(semilla)
+        temperatura = np.round(generador.uniform(15.0, 35.0, cantidad), 2)
+        humedad = np.round(generador.uniform(30.0, 80.0, cantidad), 2)
+        lluvia = np.round(generador.uniform(0.0, 50.0, cantidad), 2)
+        return (humedad, sensores.simular_ph(lluvia, temperatura), temperatura,
+                *sensores.simular_nutrientes(humedad, temperatura, lluvia))
+    aleatorio = semilla if isinstance(semilla, random.Random) else random.Random(semilla)
+    columnas = [[] for _ in range(6)]
+    for _ in range(cantidad):
+        temperatura = round(aleatorio.uniform(15.0, 35.0), 2)
+        humedad = round(aleatorio.uniform(30.0, 80.0), 2)
+        lluvia = round(aleatorio.uniform(0.0, 50.0), 2)
+        valores = (humedad, sensores.simular_ph(lluvia, temperatura), temperatura,
+                   *sensores.simular_nutrientes(humedad, temperatura, lluvia))
+        for columna, valor in zip(columnas, valores):
+            columna.append(valor)
+    return tuple(columnas)
+
+
+class Simulador:
+    def __init__(self, cultivo_ids, intervalo_s=INTERVALO_S, semilla=None):
+        self.cultivo_ids = list(cultivo_ids)
+        self.intervalo_s = intervalo_s
+        # Un solo generador para toda la corrida: los ticks no se repiten
+        self._generador = np.random.default_rng(semilla) if np is not None else random.Random(semilla)
+        self._estadisticas = {"ticks": 0, "generadas": 0, "insertadas": 0, "rechazadas": 0,
+                              "esperas": 0, "segundos_generacion": 0.0, "segundos_escritura": 0.0}
+
+    def registros(self, ts):
+        """Las lecturas de un tick como registros de sensores.insertar_registros."""
+        columnas = simular_valores(len(self.cultivo_ids), self._generador)
+        if np is not None:
+            filas = np.column_stack(columnas).tolist()
+        else:
+            filas = zip(*columnas)
+        return [(cultivo_id, ts, tuple(valores)) for cultivo_id, valores in zip(self.cultivo_ids, filas)]
+
+    def tick(self, ts=None):
+        """Genera y guarda una lectura por cultivo; devuelve el resultado de guardar_registros."""
+        ts = base_datos.epoch_ms() if ts is None else ts
+        inicio = time.perf_counter()
+        registros = self.registros(ts)
+        self._estadisticas["segundos_generacion"] += time.perf_counter() - inicio
+        self._estadisticas["ticks"] += 1
+        return self._guardar(registros)
+
+    def ejecutar(self, ticks=None, tiempo_real=True, desde_ms=None, al_tick=None):
+        """
+        Corre 'ticks' ticks (None: hasta interrumpir) separados por intervalo_s.
+        Con tiempo_real=False no espera entre ticks: el ts avanza intervalo_s
+        por tick desde 'desde_ms' (por defecto, lo necesario para terminar
+        ahora) y los ticks se guardan juntos hasta TAMANO_LOTE lecturas por
+        transacción, así se mide cuánto aguanta la ingesta sin límite de ritmo.
+        'al_tick(numero, resultado)' se llama tras cada escritura.
+        """
+        if not tiempo_real:
+            return self._ejecutar_rapido(ticks, desde_ms, al_tick)
+        proximo = time.monotonic()
+        numero = 0
+        try:
+            while ticks is None or numero < ticks:
+                time.sleep(max(0.0, proximo - time.monotonic()))
+                proximo += self.intervalo_s
+                resultado = self.tick()
+                numero += 1
+                if al_tick is not None:
+                    al_tick(numero, resultado)
+        except KeyboardInterrupt:
+            pass
+        return self.estadisticas()
+
+    def _ejecutar_rapido(self, ticks, desde_ms, al_tick):
+        intervalo_ms = int(self.intervalo_s * 1000)
+        if desde_ms is None:
+            desde_ms = base_datos.epoch_ms() - intervalo_ms * (ticks - 1)
+        por_lote = max(1, TAMANO_LOTE // max(1, len(self.cultivo_ids)))
+        for primero in range(0, ticks, por_lote):
+            inicio = time.perf_counter()
+            registros = []
+            for numero in range(primero, min(primero + por_lote, ticks)):
+                registros += self.registros(desde_ms + numero * intervalo_ms)
+                self._estadisticas["ticks"] += 1
+            self._estadisticas["segundos_generacion"] += time.perf_counter() - inicio
+            resultado = self._guardar(registros)
+            if al_tick is not None:
+                al_tick(numero + 1, resultado)
+        return self.estadisticas()
+
+    def _guardar(self, registros):
+        inicio = time.perf_counter()
+        while True:
+            try:
+                with sensores.ingesta_admitida():
+                    resultado = sensores.guardar_registros(registros, origen="simulador")
+                break
+            except escritor.Saturado as e:
+                self._estadisticas["esperas"] += 1
+                time.sleep(e.reintentar)
+        estadisticas = self._estadisticas
+        estadisticas["segundos_escritura"] += time.perf_counter() - inicio
+        estadisticas["generadas"] += len(registros)
+        estadisticas["insertadas"] += resultado["insertadas"]
+        estadisticas["rechazadas"] += len(resultado["rechazadas"])
+        return resultado
+
+    def estadisticas(self):
+        datos = dict(self._estadisticas)
+        datos["cultivos"] = len(self.cultivo_ids)
+        segundos = datos["segundos_generacion"] + datos["segundos_escritura"]
+        datos["lecturas_por_segundo"] = datos["insertadas"] / segundos if segundos else 0.0
+        return datos
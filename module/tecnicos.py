@@ -1,11 +1,12 @@
 from flask import Blueprint, render_template, redirect, url_for, request, session, flash
 import sqlite3
+from module import base_datos, eventos
 
 tecnicos_bp = Blueprint('tecnicos_bp', __name__)
 
 def obtener_conexion():
-    """Retorna una conexión a la base de datos users.db."""
-    conexion = sqlite3.connect("users.db")
+    """Retorna una conexión del pool a users.db; se devuelve al pool al salir del bloque with."""
+    conexion = base_datos.obtener_conexion("users.db")
     conexion.row_factory = sqlite3.Row  # Permite acceder a los datos con nombres de columna en lugar de índices
     return conexion
 
@@ -43,6 +44,7 @@ def eliminar_usuario(id):
             flash("El usuario no existe o ya fue eliminado.", "error")
         else:
             conexion.commit()
+            eventos.publicar(eventos.USUARIO_ELIMINADO, clave=id, usuario_id=id)
             flash("Usuario eliminado correctamente.", "success")
 
     return redirect(url_for('tecnicos_bp.tecnicos_route'))
@@ -1,8 +1,8 @@
 from flask import request, jsonify
-import sqlite3
+from module import base_datos
 
 def crear_base_datos():
-    base = sqlite3.connect("users.db")
+    base = base_datos.obtener_conexion("users.db")
     cursor = base.cursor()
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS usuarios(
@@ -28,7 +28,7 @@ def login_post():
     nombre = datos.get("nombre")
     contrasena = datos.get("contrasena")
 
-    base = sqlite3.connect("users.db")
+    base = base_datos.obtener_conexion("users.db")
     cursor = base.cursor()
     # Cambiado para seleccionar todas las columnas necesarias si el usuario se autentica
     cursor.execute(
@@ -82,7 +82,7 @@ def register_post():
     if not tipo_usuario:
         return jsonify({"message": "El campo 'tipo_usuario' es requerido"}), 400
 
-    base = sqlite3.connect("users.db")
+    base = base_datos.obtener_conexion("users.db")
     cursor = base.cursor()
     cursor.execute("SELECT * FROM usuarios WHERE correo=?", (correo,))
     if cursor.fetchone():
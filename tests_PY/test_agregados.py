@@ -0,0 +1,156 @@
+# tests/test_agregados.py
+#----> TERMINAL: python -m unittest tests_PY/test_agregados.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+from datetime import datetime
+from flask import Flask
+
+from module import base_datos, agregados, comandos, eventos, sensores, cultivos, datos_avanzados
+
+
+def ms(*args):
+    return base_datos.epoch_ms(datetime(*args))
+
+
+class TestAgregados(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_agregados.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.alertas_patcher = patch('module.sensores.alertas.verificar_alertas')
+        self.alertas_patcher.start()
+
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES ('AGRO-1-1', 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        # Let the event bus finish before the patches go away
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        self.alertas_patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def guardar(self, fecha, humedad, ph=6.5):
+        datos = {"humedad_suelo": humedad, "ph_suelo": ph, "temperatura_ambiente": 20.0,
+                 "nutrientes": {"N": 1, "P": 2, "K": 3}}
+        with patch('module.sensores.datetime') as mock_datetime:
+            mock_datetime.now.return_value = fecha
+            sensores.guardar_datos(datos, "AGRO-1-1")
+
+    def filas(self, tabla):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute(f"""
+            SELECT parametro, inicio, n, suma, suma_cuadrados, minimo, maximo, ultimo, ultimo_ts
+            FROM {tabla} ORDER BY parametro, inicio
+        """).fetchall()
+        conn.close()
+        return filas
+
+    def cargar_tres_dias(self):
+        humedades = []
+        for dia in (10, 11, 12):
+            for hora in (0, 6, 12, 18):
+                humedad = float(dia * 2 + hora)
+                humedades.append(humedad)
+                self.guardar(datetime(2025, 6, dia, hora, 30), humedad)
+        return humedades
+
+    def test_hourly_and_daily_rows_updated_on_insert(self):
+        self.guardar(datetime(2025, 6, 10, 8, 5), 40.0)
+        self.guardar(datetime(2025, 6, 10, 8, 50), 30.0)
+        self.guardar(datetime(2025, 6, 10, 9, 10), 50.0)
+
+        horas = [f for f in self.filas('agregados_hora') if f[0] == 'humedad_suelo']
+        self.assertEqual(
+            horas[0],
+            ('humedad_suelo', ms(2025, 6, 10, 8), 2, 70.0, 2500.0, 30.0, 40.0, 30.0, ms(2025, 6, 10, 8, 50))
+        )
+        self.assertEqual(horas[1][2], 1)
+        dias = [f for f in self.filas('agregados_dia') if f[0] == 'humedad_suelo']
+        self.assertEqual(
+            dias,
+            [('humedad_suelo', ms(2025, 6, 10), 3, 120.0, 5000.0, 30.0, 50.0, 50.0, ms(2025, 6, 10, 9, 10))]
+        )
+
+    def test_rollup_is_rolled_back_with_the_reading(self):
+        with patch('module.sensores.agregados.actualizar_agregados', side_effect=sqlite3.OperationalError("fallo")):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.guardar(datetime(2025, 6, 10, 8), 40.0)
+        # The partition created for the reading was rolled back with it
+        self.assertEqual(self.filas('agregados_hora'), [])
+        conn = sqlite3.connect(self.test_db)
+        tablas = conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'lecturas_sensores_%'").fetchall()
+        conn.close()
+        self.assertEqual(tablas, [])
+
+    def test_rebuild_matches_incremental(self):
+        self.cargar_tres_dias()
+        self.guardar(datetime(2025, 7, 1, 3), 12.0)  # Second partition
+        incrementales = (self.filas('agregados_hora'), self.filas('agregados_dia'))
+
+        resultado = agregados.reconstruir_agregados()
+        self.assertEqual((self.filas('agregados_hora'), self.filas('agregados_dia')), incrementales)
+        self.assertEqual(resultado, {"horas": len(incrementales[0]), "dias": len(incrementales[1])})
+
+    def test_window_statistics_match_raw_values(self):
+        humedades = self.cargar_tres_dias()
+        conn = base_datos.obtener_conexion(self.test_db)
+        # Whole days in the middle come from agregados_dia, the edges from agregados_hora
+        stats = agregados.estadisticas_ventana(conn.cursor(), "AGRO-1-1", "humedad_suelo",
+                                               ms(2025, 6, 10, 6), ms(2025, 6, 12, 13))
+        conn.close()
+        esperados = humedades[1:11]
+        ultimo, maximo, minimo, promedio, desviacion = datos_avanzados.calcular_estadisticas(esperados)
+        self.assertEqual(stats['n'], len(esperados))
+        self.assertAlmostEqual(stats['promedio'], promedio)
+        self.assertAlmostEqual(stats['desviacion'], desviacion)
+        self.assertEqual((stats['minimo'], stats['maximo'], stats['ultimo']), (minimo, maximo, ultimo))
+
+    def test_empty_window_returns_none(self):
+        self.guardar(datetime(2025, 6, 10, 8), 40.0)
+        resultado = agregados.obtener_estadisticas("AGRO-1-1", ms(2025, 1, 1), ms(2025, 2, 1))
+        self.assertEqual(set(resultado.values()), {None})
+
+    def test_rebuild_command(self):
+        self.cargar_tres_dias()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("DELETE FROM agregados_hora")
+        conn.execute("DELETE FROM agregados_dia")
+        conn.commit()
+        conn.close()
+
+        app = Flask(__name__)
+        comandos.registrar_comandos(app)
+        resultado = app.test_cli_runner().invoke(args=['reconstruir-agregados', '--desde', '2025-06-11'])
+        self.assertEqual(resultado.exit_code, 0, resultado.output)
+        self.assertIn('filas por hora', resultado.output)
+        # Only the days from 2025-06-11 on were regenerated
+        dias = {f[1] for f in self.filas('agregados_dia')}
+        self.assertEqual(dias, {ms(2025, 6, 11), ms(2025, 6, 12)})
+
+        resultado = app.test_cli_runner().invoke(args=['reconstruir-agregados', '--desde', '11/06/2025'])
+        self.assertNotEqual(resultado.exit_code, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
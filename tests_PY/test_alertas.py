@@ -17,6 +17,7 @@ from module.alertas import (
     DATABASE # Import DATABASE from alertas to use it for testing
 )
 from flask import session, Flask
+from module import base_datos
 
 app = Flask(__name__)
 app.secret_key = 'test_secret_key'
@@ -70,6 +71,8 @@ class TestAlertas(unittest.TestCase):
     def tearDown(self):
         """Clean up after each test: remove the temporary database."""
         self.db_patcher.stop()
+        # Pooled connections keep the file open; close them before deleting it
+        base_datos.cerrar_conexiones()
         if os.path.exists(self.test_db):
             os.remove(self.test_db)
 
@@ -134,7 +137,7 @@ class TestAlertas(unittest.TestCase):
         self.assertIn('alerta_id', columns)
         self.assertIn('usuario_id', columns)
         self.assertIn('agronomist_id', columns)
-        self.assertIn('fecha', columns)
+        self.assertIn('ts', columns)
         self.assertIn('numero_cultivo', columns)
         self.assertIn('valor_sensor', columns)
 
@@ -309,9 +312,9 @@ class TestAlertas(unittest.TestCase):
         conn.commit()
 
         # Insert a recent alert into history (within 15 minutes)
-        recent_time = (datetime.now() - timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S")
+        recent_time = int((datetime.now() - timedelta(minutes=5)).timestamp() * 1000)
         cursor.execute(
-            "INSERT INTO historial_alertas (alerta_id, usuario_id, agronomist_id, fecha, numero_cultivo, valor_sensor) VALUES (?, ?, ?, ?, ?, ?)",
+            "INSERT INTO historial_alertas (alerta_id, usuario_id, agronomist_id, ts, numero_cultivo, valor_sensor) VALUES (?, ?, ?, ?, ?, ?)",
             (alerta_id, farmer_id, agronomist_id, recent_time, numero_cultivo, 26.0)
         )
         conn.commit()
@@ -354,9 +357,9 @@ class TestAlertas(unittest.TestCase):
         conn.commit()
 
         # Insert an old alert into history (more than 15 minutes ago)
-        old_time = (datetime.now() - timedelta(minutes=20)).strftime("%Y-%m-%d %H:%M:%S")
+        old_time = int((datetime.now() - timedelta(minutes=20)).timestamp() * 1000)
         cursor.execute(
-            "INSERT INTO historial_alertas (alerta_id, usuario_id, agronomist_id, fecha, numero_cultivo, valor_sensor) VALUES (?, ?, ?, ?, ?, ?)",
+            "INSERT INTO historial_alertas (alerta_id, usuario_id, agronomist_id, ts, numero_cultivo, valor_sensor) VALUES (?, ?, ?, ?, ?, ?)",
             (alerta_id, farmer_id, agronomist_id, old_time, numero_cultivo, 26.0)
         )
         conn.commit()
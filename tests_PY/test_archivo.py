@@ -0,0 +1,188 @@
+# tests/test_archivo.py
+#----> TERMINAL: python -m unittest tests_PY/test_archivo.py
+
+import unittest
+from unittest.mock import patch
+import math
+import mmap
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from flask import Flask
+
+from module import base_datos, archivo, comandos, eventos, sensores, cultivos, agregados, datos_avanzados
+
+
+def ms(*args):
+    return base_datos.epoch_ms(datetime(*args))
+
+
+AHORA = ms(2025, 7, 20)
+
+
+class TestArchivo(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_archivo.db'
+        self.archivo_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'datos_avanzados', 'archivo')
+        ]
+        self.patchers += [
+            patch('module.archivo.ARCHIVO_DIR', self.archivo_dir),
+            patch('module.sensores.alertas.verificar_alertas'),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        conn = sqlite3.connect(self.test_db)
+        archivo.crear_tabla_archivo(conn)
+        conn.execute("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES ('AGRO-1-1', 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        # Let the event bus finish before the patches go away
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        shutil.rmtree(self.archivo_dir, ignore_errors=True)
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def guardar(self, fecha, humedad):
+        datos = {"humedad_suelo": humedad, "ph_suelo": 6.5, "temperatura_ambiente": 20.3,
+                 "nutrientes": {"N": 1, "P": 2, "K": 3}}
+        with patch('module.sensores.datetime') as mock_datetime:
+            mock_datetime.now.return_value = fecha
+            sensores.guardar_datos(datos, "AGRO-1-1")
+
+    def cargar(self):
+        self.guardar(datetime(2025, 6, 10, 8, 0), 41.1)
+        self.guardar(datetime(2025, 6, 10, 9, 0), 42.2)
+        self.guardar(datetime(2025, 6, 11, 8, 0), 43.3)
+        self.guardar(datetime(2025, 7, 15, 8, 0), 44.4)  # Inside the hot window
+
+    def borrar_lecturas_frias(self):
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("DELETE FROM lecturas_sensores_202506")
+        conn.commit()
+        conn.close()
+
+    def test_compaction_writes_one_column_per_parameter_and_day(self):
+        self.cargar()
+        self.assertEqual(archivo.compactar(AHORA), {"dias": 2, "lecturas": 3})
+        # Only whole days outside the hot window are archived, and only once
+        self.assertEqual(archivo.compactar(AHORA), {"dias": 0, "lecturas": 0})
+
+        ruta = archivo.ruta_dia(1, ms(2025, 6, 10))
+        self.assertEqual(sorted(os.listdir(ruta)), sorted(['ts.i64'] + [f'{p}.f32' for p in archivo.PARAMETROS]))
+        self.assertEqual(os.path.getsize(os.path.join(ruta, 'humedad_suelo.f32')), 2 * 4)
+
+        with archivo.leer_dia(1, ms(2025, 6, 10)) as dia:
+            self.assertEqual(list(dia.ts), [ms(2025, 6, 10, 8), ms(2025, 6, 10, 9)])
+            self.assertAlmostEqual(dia.valores['humedad_suelo'][1], 42.2, places=5)
+            if archivo.np is None:
+                # The columns are views over the mapped file, not copies
+                self.assertIsInstance(dia.ts, memoryview)
+                self.assertIsInstance(dia.ts.obj, mmap.mmap)
+
+    def test_missing_values_are_stored_as_nan(self):
+        self.guardar(datetime(2025, 6, 10, 8, 0), 41.1)
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("INSERT INTO lecturas_sensores_202506 (cultivo_id, ts, humedad_suelo) VALUES (1, ?, NULL)",
+                     (ms(2025, 6, 10, 9),))
+        conn.commit()
+        conn.close()
+        archivo.compactar(AHORA)
+        with archivo.leer_dia(1, ms(2025, 6, 10), ("humedad_suelo",)) as dia:
+            self.assertTrue(math.isnan(dia.valores['humedad_suelo'][1]))
+
+        self.borrar_lecturas_frias()
+        historial = sensores.obtener_historial_datos_sensores("AGRO-1-1")
+        self.assertEqual([h['humedad_suelo'] for h in historial], [41.1, None])
+
+    def test_history_reads_archive_transparently(self):
+        self.cargar()
+        antes = sensores.obtener_historial_datos_sensores("AGRO-1-1")
+        archivo.compactar(AHORA)
+        # Retention may drop the raw rows; the history keeps coming from the archive
+        self.borrar_lecturas_frias()
+        self.assertEqual(sensores.obtener_historial_datos_sensores("AGRO-1-1"), antes)
+        self.assertEqual([h['temperatura_ambiente'] for h in antes], [20.3] * 4)
+
+        # Ranges and limits span the archive/SQLite boundary
+        rango = sensores.obtener_historial_datos_sensores("AGRO-1-1", desde=ms(2025, 6, 10, 9), hasta=ms(2025, 7, 16))
+        self.assertEqual([h['humedad_suelo'] for h in rango], [42.2, 43.3, 44.4])
+        ultimos = datos_avanzados.obtener_ultimos_valores_parametro("AGRO-1-1", "humedad_suelo", limit=2)
+        self.assertEqual(ultimos, [(43.3, '2025-06-11 08:00:00'), (44.4, '2025-07-15 08:00:00')])
+
+    def test_columns_are_slices_of_the_mapped_days(self):
+        self.cargar()
+        archivo.compactar(AHORA)
+        self.borrar_lecturas_frias()
+        conn = base_datos.obtener_conexion(self.test_db)
+        with archivo.consultar_columnas(conn.cursor(), "AGRO-1-1", ("humedad_suelo",),
+                                        desde=ms(2025, 6, 10, 9), hasta=ms(2025, 7, 16)) as lecturas:
+            # One slice per archived day plus the hot part, in ts order
+            self.assertEqual([archivado for _, _, archivado in lecturas.tramos], [True, True, False])
+            self.assertEqual(list(lecturas.ts()), [ms(2025, 6, 10, 9), ms(2025, 6, 11, 8), ms(2025, 7, 15, 8)])
+            columna = lecturas.tramos[0][1]["humedad_suelo"]
+            self.assertAlmostEqual(columna[0], 42.2, places=5)  # float32 as stored
+            if archivo.np is None:
+                self.assertIsInstance(columna, memoryview)
+                self.assertIsInstance(columna.obj, mmap.mmap)
+            # Rounding happens only when rows are built for a response
+            self.assertEqual([f[1] for f in lecturas.filas()], [42.2, 43.3, 44.4])
+            del columna
+        conn.close()
+
+    def test_limit_stops_inside_the_first_day_read(self):
+        for minuto in range(0, 60, 5):
+            self.guardar(datetime(2025, 6, 10, 8, minuto), 40.0 + minuto / 10)
+        archivo.compactar(AHORA)
+        self.borrar_lecturas_frias()
+        conn = base_datos.obtener_conexion(self.test_db)
+        with archivo.consultar_columnas(conn.cursor(), "AGRO-1-1", descendente=True, limite=3) as lecturas:
+            self.assertEqual([len(ts) for ts, _, _ in lecturas.tramos], [3])
+            self.assertEqual(lecturas.ts()[0], ms(2025, 6, 10, 8, 45))
+        conn.close()
+        filas = archivo.consultar_lecturas(base_datos.obtener_conexion(self.test_db).cursor(), "AGRO-1-1",
+                                           ("humedad_suelo",), descendente=True, limite=2)
+        self.assertEqual(filas, [(ms(2025, 6, 10, 8, 55), 45.5), (ms(2025, 6, 10, 8, 50), 45.0)])
+
+    def test_advanced_statistics_read_archived_columns(self):
+        datos_avanzados.crear_tabla_datos_avanzados()
+        self.cargar()
+        archivo.compactar(AHORA)
+        self.borrar_lecturas_frias()
+        with patch('module.datos_avanzados.obtener_pronostico_clima', return_value=[]):
+            datos_avanzados.generar_datos_avanzados("AGRO-1-1")
+        conn = sqlite3.connect(self.test_db)
+        fila = conn.execute("SELECT humedad_ultimo, humedad_maximo, humedad_minimo, temp_promedio FROM datos_avanzados").fetchone()
+        conn.close()
+        self.assertEqual(fila, (44.4, 44.4, 41.1, 20.3))
+
+    def test_compact_command(self):
+        self.cargar()
+        app = Flask(__name__)
+        comandos.registrar_comandos(app)
+        # Relative to the real clock every loaded day is already cold
+        resultado = app.test_cli_runner().invoke(args=['compactar-archivo'])
+        self.assertEqual(resultado.exit_code, 0, resultado.output)
+        self.assertIn('3 días, 4 lecturas', resultado.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+# tests/test_base_datos.py
+#----> TERMINAL: python -m unittest tests_PY/test_base_datos.py
+
+import unittest
+import os
+import sqlite3
+import threading
+
+from module import base_datos
+
+
+class TestBaseDatos(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_base_datos.db'
+        base_datos.configurar(perfil='rendimiento', pool=True)
+        base_datos.reiniciar_estadisticas()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, nombre TEXT)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        base_datos.configurar(perfil='rendimiento', pool=True, lectura=True)
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def test_pragmas_applied_on_open(self):
+        conn = base_datos.obtener_conexion(self.test_db)
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.close()
+        self.assertEqual(journal_mode, 'wal')
+        self.assertEqual(synchronous, 1)  # NORMAL
+        self.assertEqual(busy_timeout, 5000)
+
+    def test_pragma_override(self):
+        base_datos.configurar(busy_timeout=1234)
+        conn = base_datos.obtener_conexion(self.test_db)
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 1234)
+        conn.close()
+
+    def test_unknown_profile_raises(self):
+        with self.assertRaises(ValueError):
+            base_datos.configurar(perfil='inexistente')
+
+    def test_close_returns_connection_to_pool(self):
+        for _ in range(5):
+            conn = base_datos.obtener_conexion(self.test_db)
+            conn.execute("SELECT 1").fetchone()
+            conn.close()
+        stats = base_datos.estadisticas()
+        self.assertEqual(stats['conexiones_abiertas'], 1)
+        self.assertEqual(stats['prestamos'], 5)
+        self.assertEqual(stats['reutilizadas'], 4)
+
+    def test_pool_disabled_opens_per_borrow(self):
+        base_datos.configurar(pool=False)
+        for _ in range(3):
+            conn = base_datos.obtener_conexion(self.test_db)
+            conn.close()
+        self.assertEqual(base_datos.estadisticas()['conexiones_abiertas'], 3)
+
+    def test_nested_borrows_share_connection(self):
+        externa = base_datos.obtener_conexion(self.test_db)
+        externa.execute("INSERT INTO items (nombre) VALUES ('a')")
+        interna = base_datos.obtener_conexion(self.test_db)
+        # The inner borrow sees the outer uncommitted write: same connection
+        self.assertEqual(interna.execute("SELECT COUNT(*) FROM items").fetchone()[0], 1)
+        interna.close()
+        # Releasing the inner borrow must not roll back the outer transaction
+        self.assertTrue(externa.in_transaction)
+        externa.commit()
+        externa.close()
+        self.assertEqual(base_datos.estadisticas()['conexiones_abiertas'], 1)
+
+    def test_uncommitted_work_discarded_on_release(self):
+        conn = base_datos.obtener_conexion(self.test_db)
+        conn.execute("INSERT INTO items (nombre) VALUES ('sin confirmar')")
+        conn.close()
+        conn = base_datos.obtener_conexion(self.test_db)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+        conn.close()
+
+    def test_close_is_idempotent(self):
+        conn = base_datos.obtener_conexion(self.test_db)
+        conn.close()
+        conn.close()
+        otra = base_datos.obtener_conexion(self.test_db)
+        otra.close()
+        self.assertEqual(base_datos.estadisticas()['conexiones_abiertas'], 1)
+
+    def test_lost_borrow_is_released_when_collected(self):
+        def funcion_que_falla():
+            conn = base_datos.obtener_conexion(self.test_db)
+            conn.execute("INSERT INTO items (nombre) VALUES ('a medias')")
+            raise RuntimeError("fallo antes de conn.close()")
+
+        with self.assertRaises(RuntimeError):
+            funcion_que_falla()
+        # The leaked borrow went back to the pool with its transaction rolled back
+        conn = base_datos.obtener_conexion(self.test_db)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+        conn.close()
+        self.assertEqual(base_datos.estadisticas()['reutilizadas'], 1)
+
+    def test_row_factory_is_per_borrow(self):
+        externa = base_datos.obtener_conexion(self.test_db)
+        interna = base_datos.obtener_conexion(self.test_db)
+        interna.row_factory = sqlite3.Row
+        self.assertIsInstance(interna.execute("SELECT 1 AS uno").fetchone(), sqlite3.Row)
+        interna.close()
+        self.assertIsInstance(externa.execute("SELECT 1").fetchone(), tuple)
+        externa.close()
+
+    def test_context_manager_commits_and_releases(self):
+        with base_datos.obtener_conexion(self.test_db) as conn:
+            conn.execute("INSERT INTO items (nombre) VALUES ('b')")
+        directa = sqlite3.connect(self.test_db)
+        self.assertEqual(directa.execute("SELECT COUNT(*) FROM items").fetchone()[0], 1)
+        directa.close()
+        self.assertEqual(base_datos.cerrar_conexiones(), 1)
+
+    def test_threads_get_distinct_connections(self):
+        listo = threading.Barrier(2)
+        ids = []
+
+        def trabajador():
+            conn = base_datos.obtener_conexion(self.test_db)
+            ids.append(conn.execute("SELECT 1").fetchone()[0])
+            listo.wait()  # Both threads hold a borrow at the same time
+            conn.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(2)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(ids, [1, 1])
+        self.assertEqual(base_datos.estadisticas()['conexiones_abiertas'], 2)
+        self.assertEqual(base_datos.cerrar_conexiones(), 2)
+
+    def test_read_lane_is_read_only_and_pooled_separately(self):
+        base_datos.obtener_conexion(self.test_db).close()  # Switch the file to WAL
+        conn = base_datos.obtener_conexion_lectura(self.test_db)
+        self.assertEqual(conn.execute("PRAGMA query_only").fetchone()[0], 1)
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO items (nombre) VALUES ('x')")
+        conn.close()
+        self.assertEqual(base_datos.estadisticas()['conexiones_lectura'], 1)
+        # One idle connection per lane
+        self.assertEqual(base_datos.cerrar_conexiones(), 2)
+
+    def test_solo_lectura_routes_borrows_to_read_lane(self):
+        base_datos.obtener_conexion(self.test_db).close()
+
+        @base_datos.solo_lectura()
+        def consulta():
+            conn = base_datos.obtener_conexion(self.test_db)
+            valor = conn.execute("PRAGMA query_only").fetchone()[0]
+            conn.close()
+            return valor
+
+        self.assertEqual(consulta(), 1)
+        base_datos.configurar(lectura=False)
+        self.assertEqual(consulta(), 0)
+
+    def test_reads_are_not_blocked_by_open_write_transaction(self):
+        escritura = base_datos.obtener_conexion(self.test_db)
+        escritura.execute("INSERT INTO items (nombre) VALUES ('a')")
+        escritura.commit()
+        escritura.execute("BEGIN IMMEDIATE")
+        escritura.execute("INSERT INTO items (nombre) VALUES ('b')")
+
+        resultado = []
+
+        def lector():
+            conn = base_datos.obtener_conexion_lectura(self.test_db)
+            conn.execute("PRAGMA busy_timeout = 0")  # Fail instead of waiting if it were blocked
+            resultado.append(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0])
+            conn.close()
+
+        hilo = threading.Thread(target=lector)
+        hilo.start()
+        hilo.join()
+        escritura.commit()
+        escritura.close()
+        # The reader sees the last committed snapshot while the write is still open
+        self.assertEqual(resultado, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# tests/test_binario.py
+#----> TERMINAL: python -m unittest tests_PY/test_binario.py
+
+import unittest
+from unittest.mock import patch
+import math
+import os
+import sqlite3
+import struct
+from datetime import datetime
+from flask import Flask
+
+from module import base_datos, binario, sensores, cultivos, agregados, alertas, eventos
+
+
+class TestFormatoBinario(unittest.TestCase):
+
+    def test_record_layout_is_fixed(self):
+        self.assertEqual(binario.TAMANO_REGISTRO, 36)
+        datos = binario.empaquetar([(7, 1717250000000, 40.5, 6.5, None, 60.0, 35.0, 90.0)])
+        self.assertEqual(datos[:12], struct.pack("<Iq", 7, 1717250000000))
+        self.assertTrue(math.isnan(struct.unpack_from("<f", datos, 20)[0]))
+
+    def test_round_trip_turns_nan_into_none(self):
+        registros = [(1, 1000, 40.5, 6.5, 20.25, 60.0, None, 90.0), (2, 2000, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0)]
+        self.assertEqual(binario.decodificar(binario.empaquetar(registros)), [
+            (1, 1000, (40.5, 6.5, 20.25, 60.0, None, 90.0)),
+            (2, 2000, (1.0, 2.0, 3.0, 4.0, 5.0, 6.0)),
+        ])
+        self.assertEqual(binario.decodificar(b""), [])
+        with self.assertRaises(ValueError):
+            binario.decodificar(b"\x00" * 35)
+
+    @unittest.skipIf(binario.np is None, "NumPy no está instalado")
+    def test_struct_and_numpy_decoders_agree(self):
+        datos = binario.empaquetar([(i, 1000 + i, 0.5 * i, None, 1.0, 2.0, 3.0, 4.0) for i in range(100)])
+        with_numpy = binario.decodificar(datos)
+        with patch.object(binario, 'np', None):
+            self.assertEqual(binario.decodificar(datos), with_numpy)
+
+
+class TestLoteBinario(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_binario.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'alertas', 'archivo')
+        ]
+        self.patchers.append(patch('module.alertas.enviar_notificacion_email'))
+        for patcher in self.patchers:
+            patcher.start()
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        alertas.crear_tabla_alertas()
+        alertas.crear_tabla_historial_alertas()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.execute("INSERT INTO alertas (tipo_alerta, umbral, condicion, activa) VALUES ('humedad_suelo', 50, '>', 1)")
+        conn.executemany("""
+            INSERT INTO cultivos (id, numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES (?, ?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """, [(1, 'AGRO-1-1'), (2, 'AGRO-1-2')])
+        conn.commit()
+        conn.close()
+        self.ts = base_datos.epoch_ms(datetime(2025, 6, 1, 8))
+
+    def tearDown(self):
+        # The alert emails are sent on the event bus
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def test_binary_batch_is_stored_like_json(self):
+        cuerpo = binario.empaquetar([
+            (1, self.ts, 60.0, 6.5, 20.0, 60.0, 35.0, 90.0),
+            (1, self.ts + 1000, 40.0, None, 20.0, 60.0, 35.0, 90.0),
+            (2, self.ts, 40.0, 6.5, 20.0, 60.0, 35.0, 90.0),
+            (99, self.ts, 40.0, 6.5, 20.0, 60.0, 35.0, 90.0),
+        ])
+        app = Flask(__name__)
+        with app.app_context(), patch('builtins.print'):
+            respuesta, estado = sensores.guardar_lote_binario_api(cuerpo, cultivos_permitidos={'AGRO-1-1'})
+        self.assertEqual(estado, 200)
+        resultado = respuesta.get_json()
+        self.assertEqual(resultado["insertadas"], 2)
+        self.assertEqual([r["indice"] for r in resultado["rechazadas"]], [2, 3])
+        self.assertEqual(resultado["alertas"], ['AGRO-1-1'])
+
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute("SELECT ts, humedad_suelo, ph_suelo FROM lecturas_sensores ORDER BY ts").fetchall()
+        self.assertEqual(filas, [(self.ts, 60.0, 6.5), (self.ts + 1000, 40.0, None)])
+        self.assertEqual(conn.execute("SELECT n FROM agregados_hora WHERE parametro = 'ph_suelo'").fetchall(), [(1,)])
+        conn.close()
+
+    def test_infinite_values_are_rejected(self):
+        cuerpo = binario.empaquetar([
+            (1, self.ts, float("inf"), 6.5, 20.0, 60.0, 35.0, 90.0),
+            (1, self.ts + 1000, 40.0, 6.5, float("-inf"), 60.0, 35.0, 90.0),
+            (1, self.ts + 2000, 40.0, 6.5, 20.0, 60.0, 35.0, 90.0),
+        ])
+        app = Flask(__name__)
+        with app.app_context(), patch('builtins.print'):
+            respuesta, estado = sensores.guardar_lote_binario_api(cuerpo)
+        self.assertEqual(estado, 200)
+        resultado = respuesta.get_json()
+        self.assertEqual(resultado["insertadas"], 1)
+        self.assertEqual([r["indice"] for r in resultado["rechazadas"]], [0, 1])
+        self.assertIn("finitos", resultado["rechazadas"][0]["error"])
+        conn = sqlite3.connect(self.test_db)
+        self.assertEqual(conn.execute("""
+            SELECT n, suma FROM agregados_hora WHERE parametro = 'humedad_suelo'
+        """).fetchall(), [(1, 40.0)])
+        conn.close()
+
+    def test_binary_api_validates_body(self):
+        app = Flask(__name__)
+        with app.app_context():
+            self.assertEqual(sensores.guardar_lote_binario_api(b"")[1], 400)
+            self.assertEqual(sensores.guardar_lote_binario_api(b"\x00" * 40)[1], 400)
+            with patch.object(sensores, 'LIMITE_LOTE', 1):
+                self.assertEqual(sensores.guardar_lote_binario_api(b"\x00" * 72)[1], 413)
+
+
+if __name__ == '__main__':
+    unittest.main()
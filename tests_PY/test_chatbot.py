@@ -19,14 +19,14 @@ app.secret_key = 'test_secret_key'  # Necessary for using session
 
 class TestChatbot(unittest.TestCase):
 
-    @patch('module.chatbot.sqlite3.connect')
+    @patch('module.chatbot.base_datos.obtener_conexion')
     def test_crear_tabla_chat(self, mock_connect):
         mock_conn = MagicMock()
         mock_connect.return_value = mock_conn
         crear_tabla_chat()
         mock_conn.cursor().execute.assert_called_once()
 
-    @patch('module.chatbot.sqlite3.connect')
+    @patch('module.chatbot.base_datos.obtener_conexion')
     def test_cambiar_estado(self, mock_connect):
         mock_conn = MagicMock()
         mock_connect.return_value = mock_conn
@@ -42,14 +42,14 @@ class TestChatbot(unittest.TestCase):
         conversacion_id = nueva_conversacion()
         self.assertIsInstance(conversacion_id, str)
 
-    @patch('module.chatbot.sqlite3.connect')
+    @patch('module.chatbot.base_datos.obtener_conexion')
     def test_guardar_interaccion(self, mock_connect):
         mock_conn = MagicMock()
         mock_connect.return_value = mock_conn
         guardar_interaccion(1, 'test_id', 'pregunta', 'respuesta')
         mock_conn.cursor().execute.assert_called_once()
 
-    @patch('module.chatbot.sqlite3.connect')
+    @patch('module.chatbot.base_datos.obtener_conexion')
     def test_obtener_historial(self, mock_connect):
         mock_conn = MagicMock()
         mock_connect.return_value = mock_conn
@@ -7,6 +7,8 @@ import sqlite3
 import json
 from flask import Flask, session, jsonify, request
 
+from module.repositorios import RepositorioCultivos
+
 # Import the functions to be tested from your module
 from module.cultivos import (
     crear_tabla_cultivos,
@@ -28,7 +30,7 @@ class MockSqliteRow(dict):
             raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
 
     def __getitem__(self, key):
-        keys_order = ['id', 'numero', 'ciudad', 'agricultor', 'tipo', 'latitud', 'longitud', 'usuario_id', 'agronomist_id']
+        keys_order = RepositorioCultivos.COLUMNAS
         if isinstance(key, int):
             if key < len(keys_order):
                 return super().__getitem__(keys_order[key])
@@ -44,8 +46,8 @@ class TestCultivos(unittest.TestCase):
         self.app.secret_key = 'test_secret_key' # Needed for session handling
         self.client = self.app.test_client()
 
-        # Patch sqlite3.connect for the entire test class
-        self.connect_patcher = patch('module.cultivos.sqlite3.connect')
+        # Patch the pooled connection factory for the entire test class
+        self.connect_patcher = patch('module.cultivos.base_datos.obtener_conexion')
         self.mock_connect = self.connect_patcher.start()
 
         self.mock_conn = MagicMock()
@@ -87,8 +89,8 @@ class TestCultivos(unittest.TestCase):
     # --- Test Case: obtener_cultivos ---
     def test_obtener_cultivos(self):
         mock_cultivos_data = [
-            MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10}),
-            MockSqliteRow({'id': 2, 'numero': 'AGRO-1-2', 'ciudad': 'Talca', 'agricultor': 'Maria Lopez', 'tipo': 'Maiz', 'latitud': -35.43, 'longitud': -71.65, 'usuario_id': 2, 'agronomist_id': 10})
+            MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10, 'intervalo_muestreo': None, 'muestreo_adaptativo': 0}),
+            MockSqliteRow({'id': 2, 'numero': 'AGRO-1-2', 'ciudad': 'Talca', 'agricultor': 'Maria Lopez', 'tipo': 'Maiz', 'latitud': -35.43, 'longitud': -71.65, 'usuario_id': 2, 'agronomist_id': 10, 'intervalo_muestreo': None, 'muestreo_adaptativo': 0})
         ]
         self.mock_cursor.fetchall.return_value = mock_cultivos_data
 
@@ -96,13 +98,13 @@ class TestCultivos(unittest.TestCase):
             response = self.client.get('/cultivos')
             self.assertEqual(response.status_code, 200)
             self.assertEqual(json.loads(response.data), [dict(row) for row in mock_cultivos_data])
-            self.mock_cursor.execute.assert_called_once_with("SELECT * FROM cultivos")
+            self.mock_cursor.execute.assert_called_once_with(RepositorioCultivos.SQL_TODOS, ())
             self.mock_conn.close.assert_called_once()
 
     # --- Test Case: obtener_cultivos_por_usuario ---
     def test_obtener_cultivos_por_usuario(self):
         mock_cultivos_data = [
-            MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10})
+            MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10, 'intervalo_muestreo': None, 'muestreo_adaptativo': 0})
         ]
         self.mock_cursor.fetchall.return_value = mock_cultivos_data
 
@@ -110,14 +112,14 @@ class TestCultivos(unittest.TestCase):
             response = self.client.get('/cultivos/user/1')
             self.assertEqual(response.status_code, 200)
             self.assertEqual(json.loads(response.data), [dict(row) for row in mock_cultivos_data])
-            self.mock_cursor.execute.assert_called_once_with("SELECT * FROM cultivos WHERE usuario_id=?", (1,))
+            self.mock_cursor.execute.assert_called_once_with(RepositorioCultivos.SQL_POR_USUARIO, (1,))
             self.mock_conn.close.assert_called_once()
 
     # --- Test Case: obtener_cultivos_por_agronomo ---
     def test_obtener_cultivos_por_agronomo(self):
         mock_cultivos_data = [
-            MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10}),
-            MockSqliteRow({'id': 2, 'numero': 'AGRO-1-2', 'ciudad': 'Talca', 'agricultor': 'Maria Lopez', 'tipo': 'Maiz', 'latitud': -35.43, 'longitud': -71.65, 'usuario_id': 2, 'agronomist_id': 10})
+            MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10, 'intervalo_muestreo': None, 'muestreo_adaptativo': 0}),
+            MockSqliteRow({'id': 2, 'numero': 'AGRO-1-2', 'ciudad': 'Talca', 'agricultor': 'Maria Lopez', 'tipo': 'Maiz', 'latitud': -35.43, 'longitud': -71.65, 'usuario_id': 2, 'agronomist_id': 10, 'intervalo_muestreo': None, 'muestreo_adaptativo': 0})
         ]
         self.mock_cursor.fetchall.return_value = mock_cultivos_data
 
@@ -125,18 +127,20 @@ class TestCultivos(unittest.TestCase):
             response = self.client.get('/cultivos/agronomo/10')
             self.assertEqual(response.status_code, 200)
             self.assertEqual(json.loads(response.data), [dict(row) for row in mock_cultivos_data])
-            self.mock_cursor.execute.assert_called_once_with("SELECT * FROM cultivos WHERE agronomist_id=?", (10,))
+            self.mock_cursor.execute.assert_called_once_with(RepositorioCultivos.SQL_POR_AGRONOMO, (10,))
             self.mock_conn.close.assert_called_once()
 
     # --- Test Case: obtener_datos_cultivo ---
     def test_obtener_datos_cultivo_found(self):
-        mock_cultivo_data = MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10})
+        mock_cultivo_data = MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1', 'ciudad': 'Curico', 'agricultor': 'Juan Perez', 'tipo': 'Trigo', 'latitud': -34.98, 'longitud': -71.22, 'usuario_id': 1, 'agronomist_id': 10, 'intervalo_muestreo': 60, 'muestreo_adaptativo': 1})
         self.mock_cursor.fetchone.return_value = mock_cultivo_data
         self.mock_cursor.execute.reset_mock()
 
         result = obtener_datos_cultivo('AGRO-1-1')
         self.assertEqual(result, dict(mock_cultivo_data))
-        self.mock_cursor.execute.assert_called_once_with("SELECT * FROM cultivos WHERE numero=?", ('AGRO-1-1',))
+        # The crop's sampling settings travel with the rest of its data
+        self.assertEqual((result['intervalo_muestreo'], result['muestreo_adaptativo']), (60, 1))
+        self.mock_cursor.execute.assert_called_once_with(RepositorioCultivos.SQL_POR_NUMERO, ('AGRO-1-1',))
         self.mock_conn.close.assert_called_once()
 
     def test_obtener_datos_cultivo_not_found(self):
@@ -145,7 +149,7 @@ class TestCultivos(unittest.TestCase):
 
         result = obtener_datos_cultivo('NON-EXISTENT')
         self.assertIsNone(result)
-        self.mock_cursor.execute.assert_called_once_with("SELECT * FROM cultivos WHERE numero=?", ('NON-EXISTENT',))
+        self.mock_cursor.execute.assert_called_once_with(RepositorioCultivos.SQL_POR_NUMERO, ('NON-EXISTENT',))
         self.mock_conn.close.assert_called_once()
 
     # --- Test Case: agregar_cultivo ---
@@ -300,6 +304,25 @@ class TestCultivos(unittest.TestCase):
             self.mock_conn.close.assert_called_once()
 
 
+    def test_editar_cultivo_muestreo(self):
+        self.mock_cursor.fetchone.return_value = MockSqliteRow({'id': 1, 'numero': 'AGRO-1-1'})
+        self.mock_cursor.execute.reset_mock()
+
+        with self.app.test_request_context():
+            response = self.client.put('/cultivos/edit/AGRO-1-1',
+                                       json={'intervalo_muestreo': 60, 'muestreo_adaptativo': True})
+            self.assertEqual(response.status_code, 200)
+            actual_sql, actual_params = self.mock_cursor.execute.call_args[0]
+            self.assertIn("intervalo_muestreo=?, muestreo_adaptativo=?", actual_sql)
+            self.assertEqual(actual_params, [60, 1, 'AGRO-1-1'])
+
+            # Out-of-range or non-integer intervals and non-boolean modes are rejected
+            for invalido in ({'intervalo_muestreo': 1}, {'intervalo_muestreo': '60'},
+                             {'intervalo_muestreo': True}, {'muestreo_adaptativo': 'si'}):
+                response = self.client.put('/cultivos/edit/AGRO-1-1', json=invalido)
+                self.assertEqual(response.status_code, 400, invalido)
+            self.mock_conn.commit.assert_called_once()
+
     def test_editar_cultivo_not_found(self):
         self.mock_cursor.fetchone.return_value = None
         self.mock_cursor.execute.reset_mock()
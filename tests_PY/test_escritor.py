@@ -0,0 +1,128 @@
+# tests/test_escritor.py
+#----> TERMINAL: python -m unittest tests_PY/test_escritor.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+import threading
+
+from module import base_datos, escritor, eventos, sensores, cultivos, agregados, alertas
+
+
+class TestEscritorLotes(unittest.TestCase):
+
+    def test_batches_are_capped_by_row_count(self):
+        lotes = []
+        liberar = threading.Event()
+
+        def volcar(elementos):
+            liberar.wait(1)
+            lotes.append(list(elementos))
+            return [e * 10 for e in elementos]
+
+        esc = escritor.EscritorLotes(volcar, intervalo_ms=1000, max_filas=3)
+        futuros = [esc.encolar(i) for i in range(7)]
+        esc.iniciar()
+        liberar.set()
+        self.assertEqual([f.result(timeout=5) for f in futuros], [i * 10 for i in range(7)])
+        esc.detener()
+        self.assertEqual(lotes, [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(esc.estadisticas()["lotes"], 3)
+
+    def test_partial_batch_is_flushed_after_interval(self):
+        esc = escritor.EscritorLotes(lambda elementos: elementos, intervalo_ms=10, max_filas=1000).iniciar()
+        self.assertEqual(esc.encolar("a").result(timeout=5), "a")
+        esc.detener()
+        self.assertFalse(esc.en_marcha)
+
+    def test_failures_reach_the_futures(self):
+        def volcar(elementos):
+            if "todo" in elementos:
+                raise RuntimeError("transacción fallida")
+            return [ValueError("rechazada") if e == "mala" else e for e in elementos]
+
+        despues = []
+        esc = escritor.EscritorLotes(volcar, intervalo_ms=5, despues=lambda e, r: despues.append(list(e))).iniciar()
+        buena, mala = esc.encolar("buena"), esc.encolar("mala")
+        self.assertEqual(buena.result(timeout=5), "buena")
+        with self.assertRaises(ValueError):
+            mala.result(timeout=5)
+        with self.assertRaises(RuntimeError):
+            esc.encolar("todo").result(timeout=5)
+        esc.detener()
+        # The post-commit hook sees every batch
+        self.assertEqual(despues, [["buena", "mala"], ["todo"]])
+
+    def test_stop_flushes_pending_items(self):
+        escritos = []
+        esc = escritor.EscritorLotes(lambda e: escritos.extend(e) or e, intervalo_ms=60000, max_filas=1000).iniciar()
+        futuros = [esc.encolar(i) for i in range(5)]
+        esc.detener(timeout=5)
+        self.assertEqual(escritos, list(range(5)))
+        self.assertTrue(all(f.done() for f in futuros))
+
+
+class TestEscritorSensores(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_escritor.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'alertas', 'archivo')
+        ]
+        self.patchers.append(patch('module.alertas.enviar_notificacion_email'))
+        for patcher in self.patchers:
+            patcher.start()
+
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        alertas.crear_tabla_alertas()
+        alertas.crear_tabla_historial_alertas()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.execute("INSERT INTO alertas (tipo_alerta, umbral, condicion, activa) VALUES ('humedad_suelo', 50, '>', 1)")
+        conn.executemany("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """, [(f'AGRO-1-{i}',) for i in range(1, 4)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        sensores.detener_escritor()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(sensores.iniciar_escritor(intervalo_ms=0))
+
+    def test_guardar_datos_goes_through_the_writer(self):
+        esc = sensores.iniciar_escritor(intervalo_ms=20)
+        datos = {"humedad_suelo": 60.0, "ph_suelo": 6.5, "temperatura_ambiente": 20.0,
+                 "nutrientes": {"N": 1, "P": 2, "K": 3}}
+        with patch('builtins.print'):
+            futuros = [sensores.guardar_datos(datos, f'AGRO-1-{i}') for i in range(1, 4)]
+            futuros.append(sensores.guardar_datos(datos, 'NON-EXISTENT'))
+            for futuro in futuros[:3]:
+                self.assertIsInstance(futuro.result(timeout=5), int)
+            with self.assertRaises(ValueError):
+                futuros[3].result(timeout=5)
+            sensores.detener_escritor()
+            eventos.esperar()
+
+        conn = sqlite3.connect(self.test_db)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM lecturas_sensores").fetchone()[0], 3)
+        # Alerts are evaluated on the event bus for the flushed batch (one per user, per the cooldown)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM historial_alertas").fetchone()[0], 1)
+        conn.close()
+        self.assertEqual(esc.estadisticas()["filas"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# tests/test_eventos.py
+#----> TERMINAL: python -m unittest tests_PY/test_eventos.py
+
+import unittest
+from unittest.mock import patch
+import json
+import threading
+from flask import Flask
+
+from module import eventos, alertas
+
+
+class TestBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = eventos.Bus(hilos=3)
+
+    def tearDown(self):
+        self.bus.detener()
+
+    def test_subscribers_run_off_the_publishing_thread(self):
+        recibidos = []
+        self.bus.suscribir("prueba", lambda e: recibidos.append((e["evento"], e["valor"], threading.current_thread())))
+        self.assertEqual(self.bus.publicar("prueba", valor=1), 1)
+        self.assertEqual(self.bus.publicar("sin_suscriptores", valor=2), 0)
+        self.assertTrue(self.bus.esperar(5))
+        self.assertEqual([r[:2] for r in recibidos], [("prueba", 1)])
+        self.assertIsNot(recibidos[0][2], threading.current_thread())
+        self.assertEqual(self.bus.estadisticas()["publicados"], 2)
+
+    def test_events_with_the_same_key_keep_their_order(self):
+        recibidos = {}
+        self.bus.suscribir("lectura", lambda e: recibidos.setdefault(e["cultivo"], []).append(e["n"]))
+        for n in range(200):
+            for cultivo in ("AGRO-1-1", "AGRO-1-2", "AGRO-1-3"):
+                self.bus.publicar("lectura", clave=cultivo, cultivo=cultivo, n=n)
+        self.bus.esperar(5)
+        self.assertEqual(recibidos, {c: list(range(200)) for c in ("AGRO-1-1", "AGRO-1-2", "AGRO-1-3")})
+
+    def test_failing_subscriber_does_not_stop_the_others(self):
+        recibidos = []
+
+        def falla(evento):
+            raise RuntimeError("suscriptor roto")
+
+        self.bus.suscribir("prueba", falla)
+        self.bus.suscribir("prueba", lambda e: recibidos.append(e["valor"]))
+        with patch('builtins.print'):
+            self.bus.publicar("prueba", valor=1)
+            self.bus.esperar(5)
+        self.assertEqual(recibidos, [1])
+        self.assertEqual(self.bus.estadisticas()["errores"], 1)
+
+    def test_full_bus_and_sync_subscribers_run_in_the_publisher(self):
+        hilos = []
+        self.bus.suscribir("prueba", lambda e: hilos.append(threading.current_thread()), sincrono=True)
+        self.bus.publicar("prueba")
+        lleno = eventos.Bus(hilos=2, limite_pendientes=0)
+        lleno.suscribir("prueba", lambda e: hilos.append(threading.current_thread()))
+        lleno.publicar("prueba")
+        self.assertEqual(hilos, [threading.current_thread()] * 2)
+        self.assertEqual(lleno.estadisticas()["en_linea"], 1)
+
+    def test_unsubscribe(self):
+        recibidos = []
+        funcion = self.bus.suscribir("prueba", recibidos.append, sincrono=True)
+        self.bus.desuscribir("prueba", funcion)
+        self.assertEqual(self.bus.publicar("prueba"), 0)
+        self.assertEqual(recibidos, [])
+
+
+class TestFlujoAlertas(unittest.TestCase):
+
+    def test_sse_stream_only_carries_the_users_alerts(self):
+        app = Flask(__name__)
+        app.add_url_rule('/stream', 'stream', lambda: alertas.flujo_alertas_api(7))
+        respuesta = app.test_client().get('/stream', buffered=False)
+        self.assertEqual(respuesta.mimetype, 'text/event-stream')
+        avisos = respuesta.response
+        self.assertEqual(next(avisos), b"retry: 5000\n\n")
+
+        comun = {"alerta_id": 1, "tipo_alerta": "humedad_suelo", "valor_sensor": 60.0, "ts": 1000}
+        eventos.publicar(eventos.ALERTA_DISPARADA, numero_cultivo="AGRO-2-1", usuario_id=2, agronomist_id=3, **comun)
+        eventos.publicar(eventos.ALERTA_DISPARADA, numero_cultivo="AGRO-7-1", usuario_id=4, agronomist_id=7, **comun)
+        evento, datos = next(avisos).decode().splitlines()[:2]
+        self.assertEqual(evento, "event: alerta")
+        self.assertEqual(json.loads(datos.removeprefix("data: "))["numero_cultivo"], "AGRO-7-1")
+
+        respuesta.close()
+        self.assertNotIn(eventos.ALERTA_DISPARADA, eventos.estadisticas()["suscriptores"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+# tests/test_generacion.py
+#----> TERMINAL: python -m unittest tests_PY/test_generacion.py
+
+import unittest
+import asyncio
+from unittest.mock import patch
+import importlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from module import base_datos, cultivos, eventos, generacion, planificador
+
+
+class TestRegistroGeneracion(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_generacion.db'
+        self.db_patcher = patch('module.generacion.DATABASE', self.test_db)
+        self.db_patcher.start()
+        conn = sqlite3.connect(self.test_db)
+        generacion.crear_tablas(conn.cursor())
+        conn.commit()
+        conn.close()
+        self.ciclos = []
+        self.lock = threading.Lock()
+        self.coordinadores = []
+
+    def tearDown(self):
+        for coordinador in self.coordinadores:
+            coordinador.planificador.detener()
+        self.db_patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def coordinador(self, nombre, plazo_s=60):
+        def ciclo(numero_cultivo, usuario_id, tipo_usuario):
+            with self.lock:
+                self.ciclos.append((nombre, numero_cultivo, usuario_id, tipo_usuario))
+
+        coordinador = generacion.Coordinador(planificador.Planificador(hilos=2, nombre=nombre), ciclo, 3600,
+                                             trabajador=nombre, latido_s=3600, plazo_s=plazo_s)
+        self.coordinadores.append(coordinador)
+        return coordinador
+
+    def esperar_ciclos(self, cantidad, timeout=5):
+        limite = time.monotonic() + timeout
+        while len(self.ciclos) < cantidad:
+            if time.monotonic() > limite:
+                self.fail(f"expected {cantidad} cycles, got {self.ciclos}")
+            time.sleep(0.005)
+
+    def consultar(self, sql, *parametros):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute(sql, parametros).fetchall()
+        conn.close()
+        return filas
+
+    def test_start_runs_here_and_state_is_shared(self):
+        a, b = self.coordinador("a"), self.coordinador("b")
+        self.assertTrue(a.iniciar_cultivo("AGRO-1-1", 1, "agricultor"))
+        self.esperar_ciclos(1)
+        self.assertEqual(self.ciclos, [("a", "AGRO-1-1", 1, "agricultor")])
+        # Another process sees it running and cannot start it twice
+        self.assertEqual(b.estados(["AGRO-1-1", "AGRO-1-2"]), {"AGRO-1-1": "running", "AGRO-1-2": "stopped"})
+        self.assertFalse(b.iniciar_cultivo("AGRO-1-1", 1, "agricultor"))
+
+    def test_stop_from_another_process_fences_the_owner(self):
+        a, b = self.coordinador("a"), self.coordinador("b")
+        a.iniciar_cultivo("AGRO-1-1", 1, "agricultor")
+        self.esperar_ciclos(1)
+        self.assertTrue(b.detener_cultivo("AGRO-1-1"))
+        self.assertEqual(a.estado("AGRO-1-1"), "stopped")
+        # The owner's next cycle finds no lease and unschedules itself
+        self.assertIs(a._ejecutar("AGRO-1-1", 1, "agricultor"), False)
+        self.assertEqual(len(self.ciclos), 1)
+        self.assertFalse(b.detener_cultivo("AGRO-1-1"))
+
+    def test_ownership_changes_stop_only_what_is_no_longer_authorized(self):
+        a, b = self.coordinador("a"), self.coordinador("b")
+        a.iniciar_cultivo("AGRO-1-1", 1, "agricultor")
+        a.iniciar_cultivo("AGRO-1-2", 1, "agricultor")
+        a.iniciar_cultivo("AGRO-2-1", 7, "agronomo")
+        self.esperar_ciclos(3)
+        # Crop reassigned: only the farmer's run stops, from another process too
+        detenidos = b.detener_iniciados(numero_cultivo="AGRO-1-1", sigue=lambda numero, usuario_id, tipo: tipo != "agricultor")
+        self.assertEqual(detenidos, ["AGRO-1-1"])
+        self.assertEqual(b.detener_iniciados(numero_cultivo="AGRO-2-1", sigue=lambda *fila: True), [])
+        self.assertIs(a._ejecutar("AGRO-1-1", 1, "agricultor"), False)
+        # User deleted: everything they started stops and is unscheduled here
+        self.assertEqual(a.detener_iniciados(usuario_id=1), ["AGRO-1-2"])
+        self.assertFalse(a.planificador.programada("AGRO-1-2"))
+        self.assertTrue(a.planificador.programada("AGRO-2-1"))
+        self.assertEqual(self.consultar("SELECT numero_cultivo FROM generacion_cultivos"), [("AGRO-2-1",)])
+        with self.assertRaises(ValueError):
+            a.detener_iniciados()
+
+    def test_next_cycle_is_written_with_the_interval_the_cycle_chose(self):
+        a = generacion.Coordinador(planificador.Planificador(hilos=1, nombre="a"), lambda *args: 120, 3600,
+                                   trabajador="a", latido_s=3600)
+        self.coordinadores.append(a)
+        antes = base_datos.epoch_ms()
+        a.iniciar_cultivo("AGRO-1-1", 1, "agricultor")
+        # proximo starts at the registration time; wait for the cycle to rewrite it
+        limite = time.monotonic() + 5
+        while abs(self.consultar("SELECT proximo FROM generacion_cultivos")[0][0] - antes - 120 * 1000) > 2000:
+            if time.monotonic() > limite:
+                self.fail("proximo was not rewritten with the cycle's interval")
+            time.sleep(0.005)
+
+        # A coroutine cycle (the asyncio engine awaits what _ejecutar returns)
+        async def ciclo(*args):
+            return 900
+
+        a.ciclo = ciclo
+        resultado = a._ejecutar("AGRO-1-1", 1, "agricultor")
+        self.assertEqual(asyncio.run(resultado), 900)
+        (proximo,), = self.consultar("SELECT proximo FROM generacion_cultivos")
+        self.assertAlmostEqual(proximo - base_datos.epoch_ms(), 900 * 1000, delta=2000)
+
+    def test_expired_lease_is_resumed_by_another_process_without_duplicates(self):
+        a, b = self.coordinador("a", plazo_s=0.2), self.coordinador("b", plazo_s=0.2)
+        a.iniciar_cultivo("AGRO-1-1", 7, "agronomo")
+        self.esperar_ciclos(1)
+        # 'a' dies without releasing anything: 'b' must wait for the lease to expire
+        a.planificador.detener()
+        self.assertEqual(b.latir()["tomados"], 0)
+        time.sleep(0.25)
+        estado = b.latir()
+        self.assertEqual((estado["tomados"], estado["programados"]), (1, 1))
+        self.assertEqual(self.consultar("SELECT dueno FROM generacion_cultivos"), [("b",)])
+        # A zombie 'a' cycle is fenced off
+        self.assertIs(a._ejecutar("AGRO-1-1", 7, "agronomo"), False)
+
+    def test_resume_keeps_the_cycle_schedule(self):
+        a, b = self.coordinador("a"), self.coordinador("b")
+        a.iniciar_cultivo("AGRO-1-1", 1, "admin")
+        self.esperar_ciclos(1)
+        a.cerrar()
+        self.assertEqual(self.consultar("SELECT dueno, vence FROM generacion_cultivos"), [(None, 0)])
+        b.latir()
+        # The next cycle is an interval after the last one, not right away
+        self.assertTrue(b.planificador.programada("AGRO-1-1"))
+        time.sleep(0.1)
+        self.assertEqual(len(self.ciclos), 1)
+
+    def test_work_is_shared_between_live_processes(self):
+        a, b = self.coordinador("a"), self.coordinador("b")
+        for i in range(10):
+            a.iniciar_cultivo(f"AGRO-1-{i}", 1, "admin")
+        a.latir()
+        self.assertEqual(b.latir()["tomados"], 0)  # everything still leased by 'a'
+        self.assertEqual(a.latir()["soltados"], 5)
+        self.assertEqual(b.latir()["tomados"], 5)
+        self.assertEqual(self.consultar("SELECT dueno, COUNT(*) FROM generacion_cultivos GROUP BY dueno"),
+                         [("a", 5), ("b", 5)])
+        self.assertEqual(len(a.planificador.claves()), 5)
+        self.assertEqual(len(b.planificador.claves()), 5)
+        self.assertEqual(a.estadisticas()["sin_dueno"], 0)
+
+
+class TestRevisarGeneracion(unittest.TestCase):
+    """app.revisar_generacion: the crop and user events that stop continuous generation."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Import the app from a scratch directory (its startup schema goes there),
+        # without continuous generation or the retention thread
+        cls.directorio = tempfile.mkdtemp()
+        anterior = os.getcwd()
+        os.chdir(cls.directorio)
+        try:
+            with patch.dict(os.environ, {"ECOSMART_GENERACION_CONTINUA": "0"}), \
+                    patch('module.retencion.INTERVALO_HORAS', 0):
+                cls.modulo_app = importlib.import_module("app")
+        finally:
+            os.chdir(anterior)
+            base_datos.cerrar_conexiones()
+
+    @classmethod
+    def tearDownClass(cls):
+        # Later tests publish these events against their own databases
+        eventos.desuscribir(eventos.CULTIVO_CAMBIADO, cls.modulo_app.revisar_generacion)
+        eventos.desuscribir(eventos.USUARIO_ELIMINADO, cls.modulo_app.revisar_generacion)
+        base_datos.cerrar_conexiones()
+        shutil.rmtree(cls.directorio, ignore_errors=True)
+
+    def setUp(self):
+        self.test_db = 'test_revisar_generacion.db'
+        self.patchers = [patch('module.generacion.DATABASE', self.test_db),
+                         patch('module.cultivos.DATABASE', self.test_db)]
+        for patcher in self.patchers:
+            patcher.start()
+        cultivos.crear_tabla_cultivos()
+        conn = sqlite3.connect(self.test_db)
+        generacion.crear_tablas(conn.cursor())
+        conn.executemany("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id, agronomist_id)
+            VALUES (?, 'Curico', 'Juan Perez', 'Trigo', -34.98, -71.22, ?, ?)
+        """, [("AGRO-1-1", 1, 7), ("AGRO-1-2", 1, 7), ("AGRO-2-1", 2, 7), ("AGRO-3-1", 3, None)])
+        conn.commit()
+        conn.close()
+
+        self.coordinador = generacion.Coordinador(planificador.Planificador(hilos=2, nombre="revisar"),
+                                                  lambda *args: None, 3600, trabajador="revisar", latido_s=3600)
+        self.patchers += [patch.object(self.modulo_app, 'coordinador_generacion', self.coordinador),
+                          patch.dict(self.modulo_app.configuraciones_generacion, clear=True)]
+        for patcher in self.patchers[2:]:
+            patcher.start()
+        iniciados = [("AGRO-1-1", 1, "agricultor"), ("AGRO-1-2", 7, "agronomo"),
+                     ("AGRO-2-1", 2, "agricultor"), ("AGRO-3-1", 3, "agricultor")]
+        for numero, usuario_id, tipo_usuario in iniciados:
+            self.coordinador.iniciar_cultivo(numero, usuario_id, tipo_usuario)
+            self.modulo_app.configuraciones_generacion[numero] = (usuario_id, tipo_usuario, None, False, float("inf"))
+
+    def tearDown(self):
+        eventos.esperar()
+        self.coordinador.planificador.detener()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def en_generacion(self):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute("SELECT numero_cultivo FROM generacion_cultivos ORDER BY numero_cultivo").fetchall()
+        conn.close()
+        return [numero for numero, in filas]
+
+    def test_reassigned_crop_stops_only_runs_no_longer_authorized(self):
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("UPDATE cultivos SET usuario_id = 4 WHERE numero IN ('AGRO-1-1', 'AGRO-1-2')")
+        conn.commit()
+        conn.close()
+        for numero in ("AGRO-1-1", "AGRO-1-2"):
+            eventos.publicar(eventos.CULTIVO_CAMBIADO, clave=numero, numero_cultivo=numero,
+                             accion="editado", campos={"usuario_id": 4})
+        # An edit that does not touch the owner stops nothing
+        eventos.publicar(eventos.CULTIVO_CAMBIADO, clave="AGRO-2-1", numero_cultivo="AGRO-2-1",
+                         accion="editado", campos={"ciudad": "Talca"})
+        eventos.esperar()
+
+        # The former farmer's run stops; the agronomist is still authorized on AGRO-1-2
+        self.assertEqual(self.en_generacion(), ["AGRO-1-2", "AGRO-2-1", "AGRO-3-1"])
+        self.assertFalse(self.coordinador.planificador.programada("AGRO-1-1"))
+        self.assertTrue(self.coordinador.planificador.programada("AGRO-1-2"))
+        # Every edited crop drops its cached configuration
+        self.assertEqual(sorted(self.modulo_app.configuraciones_generacion), ["AGRO-3-1"])
+
+    def test_deleted_crop_and_deleted_user_stop_their_runs(self):
+        eventos.publicar(eventos.CULTIVO_CAMBIADO, clave="AGRO-1-2", numero_cultivo="AGRO-1-2",
+                         accion="eliminado", campos={})
+        eventos.publicar(eventos.USUARIO_ELIMINADO, clave=2, usuario_id=2)
+        eventos.esperar()
+
+        self.assertEqual(self.en_generacion(), ["AGRO-1-1", "AGRO-3-1"])
+        for numero, programada in (("AGRO-1-1", True), ("AGRO-1-2", False), ("AGRO-2-1", False), ("AGRO-3-1", True)):
+            self.assertEqual(self.coordinador.planificador.programada(numero), programada, numero)
+        self.assertEqual(sorted(self.modulo_app.configuraciones_generacion), ["AGRO-1-1", "AGRO-3-1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
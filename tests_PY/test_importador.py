@@ -0,0 +1,133 @@
+# tests/test_importador.py
+#----> TERMINAL: python -m unittest tests_PY/test_importador.py
+
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from module import base_datos, importador, sensores, cultivos, agregados
+
+LINEA_SENSOR = "Humedad: {:.2f}%, pH: 6.50, Temperatura: 20.00°C, Nutrientes - N: 10.0, P: 20.0, K: 30.0\n"
+
+
+class TestImportador(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_importador.db'
+        self.carpeta = tempfile.mkdtemp()
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'archivo', 'importador')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES ('AGRO-1-1', 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """)
+        conn.commit()
+        conn.close()
+        self.desde = base_datos.epoch_ms(datetime(2025, 6, 1))
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        shutil.rmtree(self.carpeta)
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def escribir(self, nombre, contenido, modo="wb"):
+        ruta = os.path.join(self.carpeta, nombre)
+        with open(ruta, modo) as f:
+            f.write(contenido)
+        return ruta
+
+    def consultar(self, sql):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute(sql).fetchall()
+        conn.close()
+        return filas
+
+    def test_parsers_accept_the_legacy_formats(self):
+        self.assertEqual(importador.decodificar("Maíz".encode("latin-1")), ("Maíz", "latin-1"))
+        self.assertEqual(importador.decodificar("Maíz".encode("utf-8")), ("Maíz", "utf-8"))
+        self.assertEqual(importador.interpretar_sensor(LINEA_SENSOR.format(38.33).strip())["nutrientes"],
+                         {"N": 10.0, "P": 20.0, "K": 30.0})
+        self.assertEqual(importador.interpretar_clima("Sagrada Familia, Chile, 2025-06-02 10:15:24, 27.18, 85, 17, 1.47, cielo claro")[0],
+                         "Sagrada Familia, Chile")
+        with self.assertRaisesRegex(ValueError, "Longitud"):
+            importador.interpretar_cultivo("20,Curicó,felipe,frutilla,-35.01,-7124990427512292")
+        with self.assertRaises(ValueError):
+            importador.interpretar_sensor("Humedad: alta")
+
+    def test_sensor_import_reports_errors_and_spaces_readings(self):
+        contenido = LINEA_SENSOR.format(10).encode("utf-8") + b"basura\n\n" + LINEA_SENSOR.format(30).encode("latin-1")
+        ruta = self.escribir("datos_sensores.txt", contenido)
+        resultado = importador.importar_sensores(ruta, 'AGRO-1-1', self.desde, intervalo_s=60)
+
+        self.assertEqual(resultado["insertadas"], 2)
+        self.assertEqual(resultado["detalle_errores"], [{"linea": 2, "error": "La línea no tiene el formato de datos_sensores.txt"}])
+        self.assertEqual(resultado["codificaciones"], {"utf-8": 3, "latin-1": 1})
+        # Line n is stored at desde + (n - 1) * intervalo
+        self.assertEqual(self.consultar("SELECT ts, humedad_suelo FROM lecturas_sensores ORDER BY ts"),
+                         [(self.desde, 10.0), (self.desde + 3 * 60000, 30.0)])
+        self.assertEqual(self.consultar("SELECT SUM(n) FROM agregados_hora WHERE parametro = 'humedad_suelo'"), [(2,)])
+        with self.assertRaises(ValueError):
+            importador.importar_sensores(ruta, 'NON-EXISTENT', self.desde)
+
+    def test_interrupted_import_resumes_without_duplicates(self):
+        ruta = self.escribir("datos_sensores.txt", "".join(LINEA_SENSOR.format(i) for i in range(10)).encode())
+        insertar_lote = sensores.insertar_lote
+        llamadas = []
+
+        def fallar_en_el_segundo_bloque(*args, **kwargs):
+            llamadas.append(1)
+            if len(llamadas) == 2:
+                raise sqlite3.OperationalError("disk I/O error")
+            return insertar_lote(*args, **kwargs)
+
+        with patch.object(sensores, 'insertar_lote', side_effect=fallar_en_el_segundo_bloque):
+            with self.assertRaises(sqlite3.OperationalError):
+                importador.importar_sensores(ruta, 'AGRO-1-1', self.desde, tamano_lote=4)
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores"), [(4,)])
+
+        resultado = importador.importar_sensores(ruta, 'AGRO-1-1', self.desde, tamano_lote=4)
+        self.assertEqual((resultado["desde_linea"], resultado["insertadas"]), (5, 6))
+        self.assertEqual(self.consultar("SELECT COUNT(*), MAX(humedad_suelo) FROM lecturas_sensores"), [(10, 9.0)])
+
+        # Appended lines are the only ones loaded on the next run
+        self.escribir("datos_sensores.txt", LINEA_SENSOR.format(50).encode(), modo="ab")
+        resultado = importador.importar_sensores(ruta, 'AGRO-1-1', self.desde, tamano_lote=4)
+        self.assertEqual((resultado["desde_linea"], resultado["insertadas"]), (11, 1))
+
+        # A file whose beginning changed is imported from the start
+        self.escribir("datos_sensores.txt", LINEA_SENSOR.format(99).encode())
+        resultado = importador.importar_sensores(ruta, 'AGRO-1-1', self.desde)
+        self.assertEqual(resultado["desde_linea"], 1)
+
+    def test_crop_and_weather_imports(self):
+        ruta = self.escribir("cultivos.txt", "1,Curicó,Pedro Álvarez,Maíz,-35.004447,-71.226697\n".encode("latin-1"))
+        self.assertEqual(importador.importar_cultivos(ruta, 1)["insertadas"], 1)
+        self.assertEqual(importador.importar_cultivos(ruta, 1, reiniciar=True)["insertadas"], 0)
+        self.assertEqual(self.consultar("SELECT numero, ciudad, agricultor FROM cultivos WHERE numero = 'LEG-1'"),
+                         [('LEG-1', 'Curicó', 'Pedro Álvarez')])
+
+        ruta = self.escribir("clima.txt", "Curicó, 2025-05-21 21:32:53, 13.06, 94, 0, 1.86, muy nuboso\n".encode())
+        resultado = importador.importar_clima(ruta)
+        self.assertEqual(resultado["insertadas"], 1)
+        self.assertEqual(self.consultar("SELECT ciudad, temperatura, descripcion FROM registros_clima"),
+                         [('Curicó', 13.06, 'muy nuboso')])
+
+
+if __name__ == '__main__':
+    unittest.main()
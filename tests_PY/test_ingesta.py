@@ -0,0 +1,98 @@
+# tests/test_ingesta.py
+#----> TERMINAL: python -m unittest tests_PY/test_ingesta.py
+
+import unittest
+from unittest.mock import patch, MagicMock
+import threading
+from flask import Flask, request
+
+from module import escritor, sensores
+
+
+class TestMarcasDeAgua(unittest.TestCase):
+
+    def test_queue_sheds_above_high_watermark_until_low_watermark(self):
+        liberar = threading.Event()
+
+        def volcar(elementos):
+            liberar.wait(5)
+            return elementos
+
+        esc = escritor.EscritorLotes(volcar, intervalo_ms=1, max_filas=2, limite_alto=6, limite_bajo=2)
+        futuros = [esc.encolar(i) for i in range(6)]
+        self.assertTrue(esc.saturado)
+        with self.assertRaises(escritor.Saturado) as contexto:
+            esc.encolar(6)
+        self.assertEqual(contexto.exception.estado, 503)
+        self.assertGreaterEqual(contexto.exception.reintentar, 1)
+
+        # Draining below the high watermark is not enough: the low one must be reached
+        esc._cola.get_nowait()
+        self.assertTrue(esc.saturado)
+
+        esc.iniciar()
+        liberar.set()
+        for futuro in futuros[1:]:
+            futuro.result(timeout=5)
+        self.assertFalse(esc.saturado)
+        self.assertEqual(esc.encolar(7).result(timeout=5), 7)
+        esc.detener()
+
+        estadisticas = esc.estadisticas()
+        self.assertEqual(estadisticas["descartadas"], 1)
+        self.assertEqual(estadisticas["saturaciones"], 1)
+        self.assertFalse(estadisticas["saturado"])
+
+    def test_unbounded_writer_never_saturates(self):
+        esc = escritor.EscritorLotes(lambda e: e)
+        for i in range(100):
+            esc.encolar(i)
+        self.assertFalse(esc.saturado)
+        self.assertIsNone(esc.estadisticas()["limite_alto"])
+
+
+class TestAdmisionIngesta(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.lectura = {"numero_cultivo": "AGRO-1-1", "humedad_suelo": 40}
+
+    def test_batch_gets_429_when_slots_are_taken(self):
+        with patch.object(sensores, 'INGESTA_SIMULTANEAS', 1), patch.object(sensores, 'guardar_lote') as guardar:
+            sensores.admitir_ingesta()
+            try:
+                with self.app.app_context():
+                    respuesta, estado = sensores.guardar_lote_api([self.lectura])
+            finally:
+                sensores.liberar_ingesta()
+        self.assertEqual(estado, 429)
+        self.assertEqual(respuesta.headers["Retry-After"], str(sensores.SEGUNDOS_REINTENTO))
+        guardar.assert_not_called()
+        self.assertEqual(sensores.estado_ingesta()["en_curso"], 0)
+
+    def test_saturated_writer_rejects_batches_and_generated_readings(self):
+        saturado = MagicMock(saturado=True, en_marcha=True)
+        saturado.segundos_para_vaciar.return_value = 7
+        saturado.encolar.side_effect = escritor.Saturado("cola llena", 7)
+        antes = sensores.estado_ingesta()["rechazadas_503"]
+        with patch.object(sensores, '_escritor', saturado), self.app.app_context():
+            respuesta, estado = sensores.guardar_lote_binario_api(b"\x00" * 36)
+            self.assertEqual((estado, respuesta.headers["Retry-After"]), (503, "7"))
+            with self.assertRaises(escritor.Saturado):
+                sensores.guardar_datos({"humedad_suelo": 40}, "AGRO-1-1")
+        self.assertEqual(sensores.estado_ingesta()["rechazadas_503"], antes + 1)
+
+    def test_stream_holds_its_slot_until_the_response_closes(self):
+        self.app.add_url_rule('/stream', 'stream', lambda: sensores.guardar_flujo_api(request.stream), methods=['POST'])
+        cliente = self.app.test_client()
+        with patch.object(sensores, 'INGESTA_SIMULTANEAS', 1):
+            respuesta = cliente.post('/stream', data=b"", content_type='application/x-ndjson', buffered=False)
+            self.assertEqual(sensores.estado_ingesta()["en_curso"], 1)
+            self.assertEqual(cliente.post('/stream', data=b"").status_code, 429)
+            respuesta.get_data()
+            respuesta.close()
+        self.assertEqual(sensores.estado_ingesta()["en_curso"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+# tests/test_lotes.py
+#----> TERMINAL: python -m unittest tests_PY/test_lotes.py
+
+import unittest
+from unittest.mock import patch
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from flask import Flask, request
+
+from module import base_datos, sensores, cultivos, agregados, alertas, eventos
+
+
+def ms(*args):
+    return base_datos.epoch_ms(datetime(*args))
+
+
+def lectura(numero, ts, humedad=40.0, **extra):
+    datos = {"numero_cultivo": numero, "ts": ts, "humedad_suelo": humedad, "ph_suelo": 6.5,
+             "temperatura_ambiente": 20.0, "nutrientes": {"N": 1, "P": 2, "K": 3}}
+    datos.update(extra)
+    return datos
+
+
+class BaseLotes(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_lotes.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'alertas', 'archivo')
+        ]
+        self.patchers.append(patch('module.alertas.enviar_notificacion_email'))
+        for patcher in self.patchers:
+            patcher.start()
+        self.enviar_email = alertas.enviar_notificacion_email
+
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        alertas.crear_tabla_alertas()
+        alertas.crear_tabla_historial_alertas()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.execute("INSERT INTO usuarios (id, email) VALUES (1, 'agri@example.com')")
+        conn.executemany("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """, [('AGRO-1-1',), ('AGRO-1-2',)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        # The alert emails are sent on the event bus
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def consultar(self, sql, params=()):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute(sql, params).fetchall()
+        conn.close()
+        return filas
+
+
+class TestLotes(BaseLotes):
+
+    def test_batch_spans_crops_and_partitions(self):
+        lote = [
+            lectura('AGRO-1-1', ms(2025, 5, 31, 23, 0), 10.0),
+            lectura('AGRO-1-1', ms(2025, 6, 1, 1, 0), 20.0),
+            lectura('AGRO-1-2', ms(2025, 6, 1, 1, 30), 30.0),
+            lectura('AGRO-1-2', ms(2025, 6, 1, 1, 45), None),
+        ]
+        resultado = sensores.guardar_lote(lote)
+        self.assertEqual(resultado, {"insertadas": 4, "rechazadas": [], "alertas": []})
+        self.assertEqual(self.consultar("SELECT nombre FROM particiones_lecturas ORDER BY desde"),
+                         [('lecturas_sensores_202505',), ('lecturas_sensores_202506',)])
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores")[0][0], 4)
+
+        # The in-memory rollup matches a full rebuild from the readings
+        consulta = "SELECT * FROM {} ORDER BY cultivo_id, parametro, inicio"
+        en_lote = {t: self.consultar(consulta.format(t)) for t in ("agregados_hora", "agregados_dia")}
+        agregados.reconstruir_agregados()
+        for tabla, filas in en_lote.items():
+            self.assertEqual(filas, self.consultar(consulta.format(tabla)))
+
+    def test_resent_readings_do_not_count_twice_in_rollups(self):
+        lote = [lectura('AGRO-1-1', ms(2025, 6, 1, 8, minuto), 40.0 + minuto) for minuto in range(3)]
+        self.assertEqual(sensores.guardar_lote(lote)["insertadas"], 3)
+        # Same keys again (one with another value) plus one new reading
+        repetido = [lectura('AGRO-1-1', ms(2025, 6, 1, 8, 0), 99.0), lectura('AGRO-1-1', ms(2025, 6, 1, 8, 5), 50.0)]
+        self.assertEqual(sensores.guardar_lote(repetido)["insertadas"], 1)
+        self.assertEqual(self.consultar("SELECT humedad_suelo FROM lecturas_sensores ORDER BY ts"),
+                         [(40.0,), (41.0,), (42.0,), (50.0,)])
+
+        consulta = "SELECT * FROM {} ORDER BY cultivo_id, parametro, inicio"
+        en_lote = {t: self.consultar(consulta.format(t)) for t in ("agregados_hora", "agregados_dia")}
+        agregados.reconstruir_agregados()
+        for tabla, filas in en_lote.items():
+            self.assertEqual(filas, self.consultar(consulta.format(tabla)))
+        self.assertEqual(self.consultar("SELECT n FROM agregados_dia WHERE parametro = 'humedad_suelo'"), [(4,)])
+
+    def test_month_change_inside_one_utc_hour(self):
+        # India is UTC+5:30: local midnight of July 1st falls at 18:30 UTC
+        tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Asia/Kolkata'
+        time.tzset()
+        try:
+            lote = [
+                lectura('AGRO-1-1', ms(2025, 6, 30, 23, 50)),
+                lectura('AGRO-1-1', ms(2025, 7, 1, 0, 10)),
+            ]
+            self.assertEqual(lote[0]["ts"] // agregados.MS_HORA, lote[1]["ts"] // agregados.MS_HORA)
+            self.assertEqual(sensores.guardar_lote(lote)["insertadas"], 2)
+            self.assertEqual(self.consultar("SELECT ts FROM lecturas_sensores_202506"), [(lote[0]["ts"],)])
+            self.assertEqual(self.consultar("SELECT ts FROM lecturas_sensores_202507"), [(lote[1]["ts"],)])
+        finally:
+            if tz is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = tz
+            time.tzset()
+
+    def test_invalid_readings_are_reported_and_the_rest_saved(self):
+        lote = [
+            lectura('AGRO-1-1', ms(2025, 6, 1, 8)),
+            lectura('NON-EXISTENT', ms(2025, 6, 1, 8)),
+            lectura('AGRO-1-1', "ayer"),
+            lectura('AGRO-1-1', ms(2025, 6, 1, 9), humedad="alta"),
+            {"numero_cultivo": 'AGRO-1-1', "ts": ms(2025, 6, 1, 10)},
+            "no es un objeto",
+            lectura('AGRO-1-2', ms(2025, 6, 1, 8)),
+        ]
+        resultado = sensores.guardar_lote(lote, cultivos_permitidos={'AGRO-1-1'})
+        self.assertEqual(resultado["insertadas"], 1)
+        self.assertEqual([r["indice"] for r in resultado["rechazadas"]], [1, 2, 3, 4, 5, 6])
+        self.assertIn("sin permiso", resultado["rechazadas"][-1]["error"])
+
+    def test_non_finite_values_are_rejected(self):
+        # Flask's get_json (like json.loads) accepts the literals Infinity and NaN
+        texto = json.dumps([lectura('AGRO-1-1', ms(2025, 6, 1, 8, m)) for m in range(3)])
+        lote = json.loads(texto)
+        lote[0]["humedad_suelo"] = json.loads("Infinity")
+        lote[1]["nutrientes"]["K"] = json.loads("NaN")
+        resultado = sensores.guardar_lote(lote)
+        self.assertEqual(resultado["insertadas"], 1)
+        self.assertEqual([r["indice"] for r in resultado["rechazadas"]], [0, 1])
+        self.assertIn("finito", resultado["rechazadas"][0]["error"])
+
+        # The NDJSON stream goes through the same validation
+        cuerpo = b'{"numero_cultivo": "AGRO-1-1", "ts": %d, "humedad_suelo": -Infinity, "ph_suelo": 6.5, ' \
+                 b'"temperatura_ambiente": 20.0, "nutrientes": {"N": 1, "P": 2, "K": 3}}\n' % ms(2025, 6, 1, 9)
+        acuses = list(sensores.guardar_flujo(io.BytesIO(cuerpo)))
+        self.assertEqual(acuses[-1]["rechazadas"], 1)
+        self.assertEqual(self.consultar("SELECT SUM(n), SUM(suma) FROM agregados_hora WHERE parametro = 'humedad_suelo'"),
+                         [(1, 40.0)])
+
+    def test_alerts_are_evaluated_once_per_batch(self):
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("INSERT INTO alertas (tipo_alerta, umbral, condicion, activa) VALUES ('humedad_suelo', 50, '>', 1)")
+        conn.commit()
+        conn.close()
+        lote = [lectura('AGRO-1-1', ms(2025, 6, 1, 8, minuto), 60.0 + minuto) for minuto in range(5)]
+        lote.append(lectura('AGRO-1-2', ms(2025, 6, 1, 8), 10.0))
+
+        hilos = []
+        self.enviar_email.side_effect = lambda *args: hilos.append(threading.get_ident())
+        with patch('builtins.print'):
+            resultado = sensores.guardar_lote(lote)
+            eventos.esperar()
+        self.assertEqual(resultado["alertas"], ['AGRO-1-1'])
+        # The cooldown applies inside the batch too: one record and one email
+        self.assertEqual(self.consultar("SELECT numero_cultivo, valor_sensor FROM historial_alertas"), [('AGRO-1-1', 60.0)])
+        self.assertEqual(self.enviar_email.call_count, 1)
+        # The email goes out on the event bus, not inside the request
+        self.assertNotIn(threading.get_ident(), hilos)
+        self.assertEqual(self.enviar_email.call_args[0][0], 'agri@example.com')
+
+    def test_api_validates_payload(self):
+        app = Flask(__name__)
+        with app.app_context():
+            self.assertEqual(sensores.guardar_lote_api({"lecturas": []})[1], 400)
+            self.assertEqual(sensores.guardar_lote_api(None)[1], 400)
+            with patch.object(sensores, 'LIMITE_LOTE', 1):
+                self.assertEqual(sensores.guardar_lote_api([{}, {}])[1], 413)
+            respuesta, estado = sensores.guardar_lote_api({"lecturas": [lectura('AGRO-1-1', ms(2025, 6, 1, 8))]})
+            self.assertEqual(estado, 200)
+            self.assertEqual(respuesta.get_json()["insertadas"], 1)
+
+
+class FlujoContado(io.BytesIO):
+    """BytesIO that records how many lines have been read so far."""
+
+    def __init__(self, datos):
+        super().__init__(datos)
+        self.lineas_leidas = 0
+
+    def readline(self, limite=-1):
+        linea = super().readline(limite)
+        if linea.endswith(b"\n"):
+            self.lineas_leidas += 1
+        return linea
+
+
+class TestFlujo(BaseLotes):
+
+    def ndjson(self, lecturas):
+        return b"".join(json.dumps(l).encode() + b"\n" for l in lecturas)
+
+    def test_stream_commits_in_chunks_with_line_numbers(self):
+        cuerpo = self.ndjson([lectura('AGRO-1-1', ms(2025, 6, 1, 8, m)) for m in range(3)])
+        cuerpo += b"{no es json\n\n"
+        cuerpo += self.ndjson([lectura('NON-EXISTENT', ms(2025, 6, 1, 9)), lectura('AGRO-1-2', ms(2025, 6, 1, 9))])
+
+        acuses = list(sensores.guardar_flujo(io.BytesIO(cuerpo), tamano_bloque=2))
+        self.assertEqual([a.get("hasta_linea") for a in acuses[:-1]], [2, 4, 7])
+        self.assertEqual([a["insertadas"] for a in acuses[:-1]], [2, 1, 1])
+        self.assertEqual(acuses[1]["rechazadas"][0]["linea"], 4)
+        self.assertEqual(acuses[2]["rechazadas"][0]["linea"], 6)
+        self.assertEqual(acuses[-1], {"fin": True, "lineas": 7, "insertadas": 4, "rechazadas": 2})
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores")[0][0], 4)
+
+    def test_stream_is_read_incrementally(self):
+        flujo = FlujoContado(self.ndjson([lectura('AGRO-1-1', ms(2025, 6, 1, 8, m)) for m in range(50)]))
+        acuses = sensores.guardar_flujo(flujo, tamano_bloque=10)
+        next(acuses)
+        # Only the first chunk has been consumed when its acknowledgement is sent
+        self.assertEqual(flujo.lineas_leidas, 10)
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores")[0][0], 10)
+        self.assertEqual(list(acuses)[-1]["insertadas"], 50)
+
+    def test_oversized_line_is_skipped(self):
+        cuerpo = b'{"x": "' + b"a" * 1000 + b'"}\n' + self.ndjson([lectura('AGRO-1-1', ms(2025, 6, 1, 8))])
+        with patch.object(sensores, 'LIMITE_LINEA', 400):
+            acuses = list(sensores.guardar_flujo(io.BytesIO(cuerpo)))
+        self.assertIn("supera", acuses[0]["rechazadas"][0]["error"])
+        self.assertEqual(acuses[-1]["insertadas"], 1)
+
+    def test_stream_api_returns_ndjson_acknowledgements(self):
+        app = Flask(__name__)
+        app.add_url_rule('/stream', 'stream', lambda: sensores.guardar_flujo_api(request.stream), methods=['POST'])
+        cuerpo = self.ndjson([lectura('AGRO-1-1', ms(2025, 6, 1, 8, m)) for m in range(3)])
+        with patch.object(sensores, 'TAMANO_BLOQUE_FLUJO', 2):
+            respuesta = app.test_client().post('/stream', data=cuerpo, content_type='application/x-ndjson')
+            lineas = [json.loads(l) for l in respuesta.get_data(as_text=True).splitlines()]
+        self.assertEqual(respuesta.mimetype, 'application/x-ndjson')
+        self.assertEqual([l.get("insertadas") for l in lineas], [2, 1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,273 @@
+# tests/test_migraciones.py
+#----> TERMINAL: python -m unittest tests_PY/test_migraciones.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+import builtins
+from datetime import datetime
+
+from module import base_datos, migraciones, particiones, cultivos, sensores, alertas, chatbot, datos_avanzados
+
+
+class TestMigraciones(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_migraciones.db'
+        # Point every module that owns a table at the temporary database
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'alertas', 'chatbot', 'datos_avanzados', 'migraciones')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE IF NOT EXISTS usuarios (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT)")
+        conn.commit()
+        conn.close()
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        alertas.crear_tabla_alertas()
+        alertas.crear_tabla_historial_alertas()
+        chatbot.crear_tabla_chat()
+        datos_avanzados.crear_tabla_datos_avanzados()
+        with patch('builtins.print'):
+            migraciones.aplicar_migraciones(self.test_db)
+
+        self.conn = sqlite3.connect(self.test_db)
+
+    def tearDown(self):
+        self.conn.close()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def plan(self, sql, params):
+        return [fila[3] for fila in self.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+    def assertNoFullScan(self, sql, params, sin_ordenar=False):
+        detalles = self.plan(sql, params)
+        for detalle in detalles:
+            if detalle.startswith('SCAN') and 'INDEX' not in detalle:
+                self.fail(f"Full table scan in plan {detalles} for query: {sql}")
+        if sin_ordenar:
+            self.assertFalse(
+                any('TEMP B-TREE' in detalle for detalle in detalles),
+                f"Query needs a temporary sort: {detalles}"
+            )
+
+    # --- Version bookkeeping ---
+    def test_version_recorded(self):
+        self.assertEqual(migraciones.version_actual(self.test_db), migraciones.MIGRACIONES[-1][0])
+        versiones = [fila[0] for fila in self.conn.execute("SELECT version FROM version_esquema ORDER BY version")]
+        self.assertEqual(versiones, [m[0] for m in migraciones.MIGRACIONES])
+
+    def test_aplicar_migraciones_is_idempotent(self):
+        with patch('builtins.print'):
+            self.assertEqual(migraciones.aplicar_migraciones(self.test_db), [])
+
+    def test_failed_migration_rolls_back(self):
+        def rota(cursor):
+            cursor.execute("CREATE TABLE tabla_temporal (id INTEGER)")
+            raise RuntimeError("fallo a mitad de migración")
+
+        version = migraciones.MIGRACIONES[-1][0] + 1
+        with patch.object(migraciones, 'MIGRACIONES', migraciones.MIGRACIONES + [(version, "rota", rota)]):
+            with self.assertRaises(RuntimeError):
+                migraciones.aplicar_migraciones(self.test_db)
+        self.assertEqual(migraciones.version_actual(self.test_db), version - 1)
+        tablas = [fila[0] for fila in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        self.assertNotIn('tabla_temporal', tablas)
+
+    def test_first_migration_is_recorded_without_running_on_a_ts_schema(self):
+        # Tables created with ts: migration 1 is only recorded, migration 10 adds the indexes
+        indices = {fila[0] for fila in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertNotIn('idx_historial_alertas_usuario_fecha', indices)
+        self.assertLessEqual({'idx_historial_chat_conversacion', 'idx_cultivos_usuario'}, indices)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM version_esquema WHERE version = 1").fetchone()[0], 1)
+
+    def test_legacy_schema_runs_every_migration_as_published(self):
+        antigua = 'test_migraciones_legado.db'
+        self.addCleanup(lambda: [os.remove(antigua + s) for s in ('', '-wal', '-shm') if os.path.exists(antigua + s)])
+        conn = sqlite3.connect(antigua)
+        conn.executescript("""
+            CREATE TABLE datos_sensores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, numero_cultivo TEXT NOT NULL, humedad_suelo REAL,
+                ph_suelo REAL, temperatura_ambiente REAL, nitrogeno REAL, fosforo REAL, potasio REAL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE cultivos (id INTEGER PRIMARY KEY AUTOINCREMENT, numero TEXT NOT NULL UNIQUE,
+                                   usuario_id INTEGER, agronomist_id INTEGER);
+            CREATE TABLE historial_alertas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, alerta_id INTEGER, usuario_id INTEGER, agronomist_id INTEGER,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP, numero_cultivo INTEGER, valor_sensor REAL
+            );
+            CREATE TABLE historial_chat (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, conversacion_id TEXT, pregunta TEXT,
+                respuesta TEXT, estado INTEGER, fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE datos_avanzados (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, numero_cultivo TEXT NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO cultivos (numero) VALUES ('AGRO-1-1');
+            INSERT INTO datos_sensores (numero_cultivo, humedad_suelo, timestamp) VALUES ('AGRO-1-1', 55.0, '2025-06-18 10:00:00');
+            INSERT INTO datos_sensores (numero_cultivo, humedad_suelo, timestamp) VALUES ('AGRO-1-1', 45.0, '2025-07-02 08:00:00');
+        """)
+        conn.commit()
+        conn.close()
+
+        with patch('builtins.print') as mock_print:
+            migraciones.aplicar_migraciones(antigua)
+        self.assertIn(f"[INFO] Migración 1 aplicada: {migraciones.MIGRACIONES[0][1]}",
+                      [llamada.args[0] for llamada in mock_print.call_args_list])
+
+        conn = sqlite3.connect(antigua)
+        self.assertEqual(conn.execute("SELECT nombre FROM particiones_lecturas ORDER BY desde").fetchall(),
+                         [('lecturas_sensores_202506',), ('lecturas_sensores_202507',)])
+        # The frozen rollup rebuild of migration 5
+        self.assertEqual(conn.execute("""
+            SELECT n, suma, ultimo FROM agregados_dia WHERE parametro = 'humedad_suelo' ORDER BY inicio
+        """).fetchall(), [(1, 55.0, 55.0), (1, 45.0, 45.0)])
+        tablas = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertLessEqual({'lecturas_15min', 'archivo_dias', 'generacion_cultivos', 'generacion_trabajadores'}, tablas)
+        conn.close()
+
+    # --- Hot-path queries must stay on an index ---
+    def test_ultimo_dato_sensor_uses_index(self):
+        nombre = particiones.asegurar_particion(self.conn.cursor(), base_datos.epoch_ms())
+        self.conn.commit()
+        self.assertNoFullScan(
+            f"SELECT * FROM {nombre} WHERE cultivo_id = ? ORDER BY ts DESC LIMIT ?",
+            (1, 1), sin_ordenar=True
+        )
+
+    def test_historial_sensores_uses_primary_key(self):
+        cursor = self.conn.cursor()
+        nombre = particiones.asegurar_particion(cursor, base_datos.epoch_ms())
+        self.conn.commit()
+        sql = f"SELECT ts, humedad_suelo FROM {nombre} WHERE cultivo_id = ? AND ts >= ? ORDER BY ts ASC LIMIT ?"
+        self.assertNoFullScan(sql, (1, 0, 20), sin_ordenar=True)
+        # The clustered key itself serves the range: no secondary index lookups
+        self.assertTrue(any('PRIMARY KEY (cultivo_id=? AND ts>?)' in d for d in self.plan(sql, (1, 0, 20))))
+
+    def test_partitions_are_without_rowid(self):
+        cursor = self.conn.cursor()
+        nombre = particiones.asegurar_particion(cursor, base_datos.epoch_ms())
+        self.conn.commit()
+        ddl = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (nombre,)).fetchone()[0]
+        self.assertIn('WITHOUT ROWID', ddl)
+        tipos = dict(self.conn.execute("SELECT name, type FROM sqlite_master WHERE name IN ('datos_sensores', 'lecturas_sensores')"))
+        self.assertEqual(tipos, {'lecturas_sensores': 'view'})
+
+    def test_enfriamiento_alertas_uses_index(self):
+        self.assertNoFullScan(
+            "SELECT ts FROM historial_alertas WHERE alerta_id = ? AND usuario_id = ? ORDER BY ts DESC LIMIT 1",
+            (1, 1), sin_ordenar=True
+        )
+
+    def test_historial_alertas_usuario_uses_index(self):
+        self.assertNoFullScan("""
+            SELECT ha.fecha, a.tipo_alerta, a.umbral
+            FROM vista_historial_alertas ha
+            JOIN alertas a ON ha.alerta_id = a.id
+            WHERE ha.usuario_id = ? OR ha.agronomist_id = ?
+            ORDER BY ha.ts DESC
+        """, (1, 1))
+
+    def test_historial_chat_conversacion_uses_index(self):
+        self.assertNoFullScan(
+            "SELECT pregunta, respuesta, fecha, estado FROM historial_chat WHERE conversacion_id = ? AND estado = ? ORDER BY fecha ASC",
+            ("abc", 1), sin_ordenar=True
+        )
+
+    def test_historial_chat_usuario_uses_index(self):
+        self.assertNoFullScan(
+            "SELECT conversacion_id, pregunta, respuesta, fecha, estado FROM historial_chat WHERE user_id = ? AND estado = ? ORDER BY conversacion_id, fecha ASC",
+            (1, 1), sin_ordenar=True
+        )
+
+    def test_cultivos_por_agronomo_uses_index(self):
+        self.assertNoFullScan("SELECT * FROM cultivos WHERE agronomist_id=?", (1,))
+        self.assertNoFullScan("SELECT id FROM cultivos WHERE numero = ? AND agronomist_id = ?", ("AGRO-1-1", 1))
+
+    def test_cultivos_por_usuario_uses_index(self):
+        self.assertNoFullScan("SELECT * FROM cultivos WHERE usuario_id=?", (1,))
+
+    def test_ultimo_dato_avanzado_uses_index(self):
+        self.assertNoFullScan(
+            "SELECT * FROM vista_datos_avanzados WHERE numero_cultivo = ? ORDER BY ts DESC LIMIT 1",
+            ("AGRO-1-1",), sin_ordenar=True
+        )
+
+
+    # --- Integer timestamps (migration 2) ---
+    def test_sampling_columns_are_added_to_existing_cultivos(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE cultivos (id INTEGER PRIMARY KEY, numero TEXT NOT NULL UNIQUE)")
+        conn.execute("INSERT INTO cultivos (numero) VALUES ('AGRO-1-1')")
+        migraciones._migracion_muestreo_por_cultivo(conn.cursor())
+        migraciones._migracion_muestreo_por_cultivo(conn.cursor())  # already there: nothing to do
+        self.assertEqual(conn.execute("SELECT intervalo_muestreo, muestreo_adaptativo FROM cultivos").fetchall(),
+                         [(None, 0)])
+        conn.close()
+
+    def test_old_text_timestamps_are_converted(self):
+        antigua = 'test_migraciones_antigua.db'
+        self.addCleanup(lambda: [os.remove(antigua + s) for s in ('', '-wal', '-shm') if os.path.exists(antigua + s)])
+        conn = sqlite3.connect(antigua)
+        conn.executescript("""
+            CREATE TABLE datos_sensores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, numero_cultivo TEXT NOT NULL, humedad_suelo REAL,
+                ph_suelo REAL, temperatura_ambiente REAL, nitrogeno REAL, fosforo REAL, potasio REAL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE cultivos (id INTEGER PRIMARY KEY AUTOINCREMENT, numero TEXT NOT NULL UNIQUE);
+            INSERT INTO cultivos (numero) VALUES ('AGRO-1-1');
+            CREATE TABLE historial_alertas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, alerta_id INTEGER, usuario_id INTEGER, agronomist_id INTEGER,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP, numero_cultivo INTEGER, valor_sensor REAL
+            );
+            INSERT INTO datos_sensores (numero_cultivo, humedad_suelo, timestamp) VALUES ('AGRO-1-1', 55.0, '2025-06-18 10:00:00');
+            INSERT INTO datos_sensores (numero_cultivo, humedad_suelo, timestamp) VALUES ('AGRO-9-9', 40.0, '2025-06-18 10:00:00');
+            INSERT INTO historial_alertas (alerta_id, usuario_id, fecha, valor_sensor) VALUES (1, 2, '2025-06-18 10:05:00', 30.0);
+        """)
+        conn.commit()
+        conn.close()
+
+        with patch('builtins.print'):
+            migraciones.aplicar_migraciones(antigua)
+
+        conn = sqlite3.connect(antigua)
+        # Readings move to the clustered table; the one without a crop is dropped
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM lecturas_sensores").fetchone()[0], 1)
+        cultivo_id, ts, humedad = conn.execute("SELECT cultivo_id, ts, humedad_suelo FROM lecturas_sensores").fetchone()
+        self.assertEqual(cultivo_id, 1)
+        # Old text values were written in local time
+        self.assertEqual(ts, base_datos.epoch_ms(datetime(2025, 6, 18, 10, 0, 0)))
+        self.assertEqual(humedad, 55.0)
+        self.assertEqual(
+            conn.execute("SELECT numero_cultivo, timestamp FROM vista_datos_sensores").fetchone(),
+            ('AGRO-1-1', '2025-06-18 10:00:00')
+        )
+        self.assertEqual(conn.execute("SELECT fecha FROM vista_historial_alertas").fetchone()[0], '2025-06-18 10:05:00')
+        columnas = [fila[1] for fila in conn.execute("PRAGMA table_info(historial_alertas)")]
+        self.assertIn('ts', columnas)
+        self.assertNotIn('fecha', columnas)
+        conn.close()
+
+    def test_ts_default_is_current_epoch_ms(self):
+        antes = base_datos.epoch_ms()
+        nombre = particiones.asegurar_particion(self.conn.cursor(), antes)
+        self.conn.execute(f"INSERT INTO {nombre} (cultivo_id) VALUES (1)")
+        ts = self.conn.execute("SELECT ts FROM lecturas_sensores").fetchone()[0]
+        self.assertLessEqual(abs(ts - antes), 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+# tests/test_motor.py
+#----> TERMINAL: python -m unittest tests_PY/test_motor.py
+
+import unittest
+from unittest.mock import patch
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from module import base_datos, motor, sensores
+
+
+class TestMotor(unittest.TestCase):
+
+    def setUp(self):
+        self.motor = motor.Motor(hilos=2, nombre="prueba")
+
+    def tearDown(self):
+        self.motor.detener()
+
+    def esperar(self, condicion, timeout=5):
+        limite = time.monotonic() + timeout
+        while not condicion():
+            if time.monotonic() > limite:
+                self.fail("condition not reached")
+            time.sleep(0.005)
+
+    def test_thousands_of_coroutines_share_one_loop(self):
+        hilos_antes = threading.active_count()
+        hilos_usados = set()
+
+        async def ciclo():
+            hilos_usados.add(threading.current_thread().name)
+            await asyncio.sleep(0.2)  # waiting on the network holds no thread
+
+        for i in range(2000):
+            self.motor.programar(f"AGRO-1-{i}", ciclo, 60)
+        self.esperar(lambda: self.motor.estadisticas()["ejecuciones"] >= 2000)
+        self.assertEqual(hilos_usados, {"prueba"})
+        self.assertEqual(threading.active_count() - hilos_antes, 1)
+        # All started together: none waited for the others' sleep
+        self.assertLess(self.motor.estadisticas()["max_atraso_ms"], 150)
+
+    def test_plain_functions_run_in_the_pool_and_returned_coroutines_are_awaited(self):
+        hilos = []
+
+        async def ciclo():
+            hilos.append(("ciclo", threading.current_thread().name))
+
+        def ejecutar():
+            hilos.append(("ejecutar", threading.current_thread().name))
+            return ciclo()
+
+        self.motor.programar("AGRO-1-1", ejecutar, 60)
+        self.esperar(lambda: len(hilos) == 2)
+        self.assertEqual(hilos[1], ("ciclo", "prueba"))
+        self.assertTrue(hilos[0][1].startswith("prueba_"))
+
+    def test_cancel_interrupts_a_cycle_waiting_on_io(self):
+        terminados = []
+
+        async def lenta():
+            await asyncio.sleep(10)
+            terminados.append(1)
+
+        self.motor.programar("lenta", lenta, 60)
+        self.esperar(lambda: self.motor.estadisticas()["en_curso"] == 1)
+        self.assertTrue(self.motor.cancelar("lenta"))
+        self.esperar(lambda: self.motor.estadisticas()["en_curso"] == 0, timeout=1)
+        self.assertEqual((terminados, self.motor.claves()), ([], []))
+        self.assertFalse(self.motor.cancelar("lenta"))
+
+    def test_returned_number_becomes_the_new_interval(self):
+        ejecuciones = []
+
+        async def adaptativa():
+            ejecuciones.append(time.monotonic())
+            return 0.15 if len(ejecuciones) > 1 else 0.02
+
+        self.motor.programar("adaptativa", adaptativa, 3600)
+        self.esperar(lambda: len(ejecuciones) >= 4)
+        pausas = [b - a for a, b in zip(ejecuciones, ejecuciones[1:])]
+        self.assertLess(pausas[0], 0.1)
+        self.assertTrue(all(p >= 0.13 for p in pausas[1:]), pausas)
+
+    def test_false_unschedules_errors_do_not_and_missed_runs_are_skipped(self):
+        fallos = []
+
+        async def falla():
+            fallos.append(1)
+            raise RuntimeError("clima caído")
+
+        async def lenta():
+            await asyncio.sleep(0.12)
+
+        async def sin_permiso():
+            return False
+
+        with patch('builtins.print'):
+            self.motor.programar("sin_permiso", sin_permiso, 0.01)
+            self.motor.programar("falla", falla, 0.01)
+            self.motor.programar("lenta", lenta, 0.02)
+            self.esperar(lambda: len(fallos) >= 3 and self.motor.estadisticas()["omitidas"] > 0)
+        self.assertEqual(sorted(self.motor.claves()), ["falla", "lenta"])
+        self.assertGreaterEqual(self.motor.estadisticas()["errores"], 3)
+
+
+class TestClimaAsincrono(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_motor.db'
+        self.db_patcher = patch('module.sensores.DATABASE', self.test_db)
+        self.db_patcher.start()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE cultivos (numero TEXT, latitud REAL, longitud REAL)")
+        conn.executemany("INSERT INTO cultivos VALUES (?, ?, ?)",
+                         [(f"AGRO-1-{i}", -33.4, -70.6) for i in range(20)] + [("SIN-GPS", None, None)])
+        conn.commit()
+        conn.close()
+        self.guardadas = []
+        self.guardar_patcher = patch('module.sensores.guardar_datos',
+                                     side_effect=lambda datos, numero: self.guardadas.append(numero))
+        self.guardar_patcher.start()
+
+    def tearDown(self):
+        self.guardar_patcher.stop()
+        self.db_patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def generar(self, numeros, clima, limite=2, plazo=0.3):
+        async def todos():
+            semaforo = asyncio.Semaphore(limite)
+            return await asyncio.gather(*(sensores.generar_datos_async(n, semaforo, plazo) for n in numeros))
+
+        with patch('module.sensores.get_real_time_weather', side_effect=clima), patch('builtins.print'):
+            inicio = time.monotonic()
+            resultado = asyncio.run(todos())
+            return resultado, time.monotonic() - inicio
+
+    def test_in_flight_requests_are_bounded(self):
+        en_vuelo, maximo = [0], [0]
+        lock = threading.Lock()
+
+        def clima(lat, lon, timeout):
+            with lock:
+                en_vuelo[0] += 1
+                maximo[0] = max(maximo[0], en_vuelo[0])
+            time.sleep(0.02)
+            with lock:
+                en_vuelo[0] -= 1
+            return 18.0, 55.0, 0.0
+
+        datos, _ = self.generar([f"AGRO-1-{i}" for i in range(20)], clima, limite=3, plazo=5)
+        self.assertEqual(maximo[0], 3)
+        self.assertTrue(all(d["temperatura_ambiente"] == 18.0 for d in datos))
+        self.assertEqual(len(self.guardadas), 20)
+
+    def test_deadline_falls_back_to_simulated_values(self):
+        def colgado(lat, lon, timeout):
+            time.sleep(1)
+            return 18.0, 55.0, 0.0
+
+        antes = sensores.estado_clima()
+        datos, segundos = self.generar(["AGRO-1-1", "AGRO-1-2", "AGRO-1-3", "SIN-GPS"], colgado, limite=2, plazo=0.2)
+        # Every cycle finished by its deadline, even the ones queued for a slot
+        self.assertLess(segundos, 0.8)
+        self.assertTrue(all(d is not None and d["temperatura_ambiente"] != 18.0 for d in datos))
+        self.assertEqual(len(self.guardadas), 4)
+        despues = sensores.estado_clima()
+        self.assertEqual(despues["vencidas"] - antes["vencidas"], 3)
+        self.assertEqual(despues["simuladas"] - antes["simuladas"], 4)
+
+    def test_missing_crop_is_not_saved(self):
+        datos, _ = self.generar(["NO-EXISTE"], lambda lat, lon, timeout: (18.0, 55.0, 0.0))
+        self.assertEqual((datos, self.guardadas), ([None], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# tests/test_muestreo.py
+#----> TERMINAL: python -m unittest tests_PY/test_muestreo.py
+
+import unittest
+from unittest.mock import patch
+import os
+
+from module import alertas, base_datos, eventos, muestreo
+
+BASE = 30
+REGLAS = [("humedad_suelo", 70.0)]
+
+
+def lectura(segundos, humedad, temperatura=20.0):
+    return segundos, {"humedad_suelo": humedad, "temperatura_ambiente": temperatura}
+
+
+class TestSiguienteIntervalo(unittest.TestCase):
+
+    def test_stable_readings_back_off_gradually_up_to_the_cap(self):
+        intervalos = []
+        actual, previo = BASE, lectura(0, 40.0)
+        for i in range(1, 10):
+            nuevo = lectura(i * 1000, 40.0 + 0.1 * (i % 2))
+            actual = muestreo.siguiente_intervalo(actual, BASE, previo, nuevo, REGLAS)
+            intervalos.append(actual)
+            previo = nuevo
+        self.assertEqual(intervalos[:3], [60, 120, min(240, muestreo.MAXIMO_S)])
+        self.assertEqual(intervalos[-1], muestreo.MAXIMO_S)
+
+    def test_near_a_threshold_goes_back_to_the_base_at_once(self):
+        # 65 is within 10 % of the 70 threshold
+        self.assertEqual(muestreo.siguiente_intervalo(muestreo.MAXIMO_S, BASE, lectura(0, 64.8), lectura(600, 65.0), REGLAS), BASE)
+
+    def test_fast_change_goes_back_to_the_base(self):
+        # 40 -> 46 is a 15 % jump, far from any threshold
+        self.assertEqual(muestreo.siguiente_intervalo(muestreo.MAXIMO_S, BASE, lectura(0, 40.0), lectura(600, 46.0), []), BASE)
+        self.assertEqual(muestreo.siguiente_intervalo(120, BASE, lectura(0, 40.0, 20.0), lectura(120, 40.0, 25.0), []), BASE)
+
+    def test_trend_towards_a_threshold_shortens_the_interval(self):
+        # +1.5 every 60 s with 10 left: crosses in 400 s, sample at most every 100 s
+        self.assertEqual(muestreo.siguiente_intervalo(180, BASE, lectura(0, 58.5), lectura(60, 60.0), REGLAS), 100)
+        # Moving away from it does not
+        self.assertEqual(muestreo.siguiente_intervalo(60, BASE, lectura(0, 60.0), lectura(60, 58.5), REGLAS),
+                         min(120, muestreo.MAXIMO_S))
+        # Never below the minimum
+        self.assertEqual(muestreo.siguiente_intervalo(10, 10, lectura(0, 61.0), lectura(1, 62.9), REGLAS),
+                         muestreo.MINIMO_S)
+
+    def test_first_reading_does_not_back_off(self):
+        self.assertEqual(muestreo.siguiente_intervalo(BASE, BASE, None, lectura(0, 40.0), REGLAS), BASE)
+
+
+class TestRegistrar(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_muestreo.db'
+        self.db_patcher = patch('module.alertas.DATABASE', self.test_db)
+        self.db_patcher.start()
+        alertas.crear_tabla_alertas()
+        conn = base_datos.obtener_conexion(self.test_db)
+        conn.execute("INSERT INTO alertas (tipo_alerta, umbral, condicion, activa) VALUES ('humedad_suelo', 70, '>', 1)")
+        conn.execute("INSERT INTO alertas (tipo_alerta, umbral, condicion, activa) VALUES ('ph_suelo', 5, '<', 0)")
+        conn.commit()
+        conn.close()
+        muestreo._olvidar_umbrales(None)
+
+    def tearDown(self):
+        eventos.esperar()
+        muestreo._olvidar_umbrales(None)
+        muestreo.olvidar("AGRO-1-1")
+        self.db_patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def test_thresholds_are_cached_until_a_rule_changes(self):
+        self.assertEqual(muestreo.umbrales(), [("humedad_suelo", 70.0)])
+        conn = base_datos.obtener_conexion(self.test_db)
+        conn.execute("UPDATE alertas SET activa = 1 WHERE tipo_alerta = 'ph_suelo'")
+        conn.commit()
+        conn.close()
+        self.assertEqual(len(muestreo.umbrales()), 1)
+        eventos.publicar(eventos.REGLA_CAMBIADA, alerta_id=2, accion="creada")
+        self.assertEqual(muestreo.umbrales(), [("humedad_suelo", 70.0), ("ph_suelo", 5.0)])
+
+    def test_fixed_mode_uses_the_crop_interval(self):
+        datos = {"humedad_suelo": 40.0, "nutrientes": {"N": 60.0}}
+        self.assertEqual(muestreo.registrar("AGRO-1-1", datos, 45, adaptativo=False), 45)
+        self.assertEqual(muestreo.registrar("AGRO-1-1", datos, None, adaptativo=False), muestreo.INTERVALO_S)
+
+    def test_adaptive_mode_keeps_state_per_crop(self):
+        datos = {"humedad_suelo": 40.0, "nutrientes": {"N": 60.0, "P": 30.0}}
+        self.assertEqual(muestreo.registrar("AGRO-1-1", datos, 30, adaptativo=True), 30)
+        self.assertEqual(muestreo.registrar("AGRO-1-1", datos, 30, adaptativo=True), 60)
+        # A failed cycle (no reading) keeps the current interval
+        self.assertEqual(muestreo.registrar("AGRO-1-1", None, 30, adaptativo=True), 60)
+        # Nutrients count as values too: N jumping 20 % brings it back to the base
+        datos["nutrientes"]["N"] = 72.0
+        self.assertEqual(muestreo.registrar("AGRO-1-1", datos, 30, adaptativo=True), 30)
+        self.assertEqual(muestreo.valores(datos), {"humedad_suelo": 40.0, "N": 72.0, "P": 30.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
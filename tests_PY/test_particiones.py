@@ -0,0 +1,144 @@
+# tests/test_particiones.py
+#----> TERMINAL: python -m unittest tests_PY/test_particiones.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+from datetime import datetime
+
+from module import base_datos, eventos, particiones, sensores, cultivos, agregados
+
+
+def ms(*args):
+    return base_datos.epoch_ms(datetime(*args))
+
+
+class TestParticiones(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_particiones.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        # Alert checks are out of scope here
+        self.alertas_patcher = patch('module.sensores.alertas.verificar_alertas')
+        self.alertas_patcher.start()
+
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES ('AGRO-1-1', 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        # Let the event bus finish before the patches go away
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        self.alertas_patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def guardar(self, fecha, humedad):
+        datos = {"humedad_suelo": humedad, "ph_suelo": 6.5, "temperatura_ambiente": 20.0,
+                 "nutrientes": {"N": 1, "P": 2, "K": 3}}
+        with patch('module.sensores.datetime') as mock_datetime:
+            mock_datetime.now.return_value = fecha
+            sensores.guardar_datos(datos, "AGRO-1-1")
+
+    def consultar(self, sql, params=()):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute(sql, params).fetchall()
+        conn.close()
+        return filas
+
+    def test_limites_mes(self):
+        self.assertEqual(particiones.limites_mes(ms(2025, 12, 15, 8, 0)), (ms(2025, 12, 1), ms(2026, 1, 1)))
+        self.assertEqual(particiones.nombre_particion(ms(2025, 12, 31, 23, 59)), 'lecturas_sensores_202512')
+
+    def test_inserts_are_routed_to_monthly_partitions(self):
+        self.guardar(datetime(2025, 5, 31, 23, 0), 10.0)
+        self.guardar(datetime(2025, 6, 1, 1, 0), 20.0)
+        self.guardar(datetime(2025, 6, 2, 1, 0), 30.0)
+
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores_202505")[0][0], 1)
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores_202506")[0][0], 2)
+        # The UNION ALL view sees every partition
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores")[0][0], 3)
+
+    def test_reading_for_unknown_crop_is_not_stored(self):
+        with patch('module.sensores.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 6, 1)
+            sensores.guardar_datos({"humedad_suelo": 1, "ph_suelo": 1, "temperatura_ambiente": 1,
+                                    "nutrientes": {"N": 1, "P": 1, "K": 1}}, "AGRO-9-9")
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores")[0][0], 0)
+
+    def test_repeated_timestamp_keeps_the_first_reading_and_its_rollup(self):
+        self.guardar(datetime(2025, 6, 1, 8), 40.0)
+        self.guardar(datetime(2025, 6, 1, 8), 70.0)
+        self.assertEqual(self.consultar("SELECT humedad_suelo FROM lecturas_sensores"), [(40.0,)])
+        self.assertEqual(self.consultar("SELECT n, suma FROM agregados_hora WHERE parametro = 'humedad_suelo'"),
+                         [(1, 40.0)])
+        # Only the stored reading reaches the alerts
+        eventos.esperar()
+        self.assertEqual(sensores.alertas.verificar_alertas.call_count, 1)
+
+    def test_range_query_only_reads_overlapping_partitions(self):
+        for mes in (4, 5, 6):
+            self.guardar(datetime(2025, mes, 10), float(mes))
+        conn = sqlite3.connect(self.test_db)
+        cursor = conn.cursor()
+        self.assertEqual(
+            particiones.particiones_en_rango(cursor, ms(2025, 5, 15), ms(2025, 6, 15)),
+            ['lecturas_sensores_202505', 'lecturas_sensores_202506']
+        )
+        sentencias = []
+        conn.set_trace_callback(sentencias.append)
+        filas = particiones.consultar_lecturas(
+            cursor, "AGRO-1-1", "humedad_suelo", desde=ms(2025, 5, 1), hasta=ms(2025, 6, 1)
+        )
+        conn.close()
+        self.assertEqual([fila[0] for fila in filas], [5.0])
+        self.assertTrue(any('lecturas_sensores_202505' in sql for sql in sentencias))
+        self.assertFalse(any('lecturas_sensores_202504' in sql or 'lecturas_sensores_202506' in sql for sql in sentencias))
+
+    def test_latest_readings_span_partitions_newest_first(self):
+        self.guardar(datetime(2025, 5, 30), 1.0)
+        self.guardar(datetime(2025, 5, 31), 2.0)
+        self.guardar(datetime(2025, 6, 1), 3.0)
+        conn = base_datos.obtener_conexion(self.test_db)
+        filas = particiones.consultar_lecturas(conn.cursor(), "AGRO-1-1", "humedad_suelo", descendente=True, limite=2)
+        conn.close()
+        self.assertEqual([fila[0] for fila in filas], [3.0, 2.0])
+        self.assertEqual([h['humedad_suelo'] for h in sensores.obtener_historial_datos_sensores("AGRO-1-1", limit=2)], [1.0, 2.0])
+        self.assertEqual(sensores.obtener_datos_por_cultivo_raw("AGRO-1-1")['humedad_suelo'], 3.0)
+
+    def test_drop_old_partitions(self):
+        self.guardar(datetime(2025, 4, 10), 4.0)
+        self.guardar(datetime(2025, 5, 10), 5.0)
+        self.guardar(datetime(2025, 6, 10), 6.0)
+
+        # A cutoff in mid-May only drops April: May still has rows to keep
+        eliminadas = particiones.eliminar_particiones_anteriores(ms(2025, 5, 20))
+        self.assertEqual(eliminadas, ['lecturas_sensores_202504'])
+        tablas = [fila[0] for fila in self.consultar("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'lecturas_sensores_%'")]
+        self.assertNotIn('lecturas_sensores_202504', tablas)
+        self.assertEqual([fila[0] for fila in self.consultar("SELECT humedad_suelo FROM lecturas_sensores ORDER BY ts")], [5.0, 6.0])
+
+        particiones.eliminar_particiones_anteriores(ms(2025, 7, 1))
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores")[0][0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
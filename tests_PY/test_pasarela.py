@@ -0,0 +1,171 @@
+# tests/test_pasarela.py
+#----> TERMINAL: python -m unittest tests_PY/test_pasarela.py
+
+import unittest
+from unittest.mock import patch, PropertyMock
+import asyncio
+import os
+import socket
+import sqlite3
+
+from module import base_datos, eventos, pasarela, sensores, cultivos, agregados, alertas
+
+
+class TestPasarela(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.test_db = 'test_pasarela.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'alertas', 'archivo', 'pasarela')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        alertas.crear_tabla_alertas()
+        alertas.crear_tabla_historial_alertas()
+        pasarela.crear_tabla_dispositivos()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, tipo_usuario TEXT, email TEXT)")
+        conn.executemany("INSERT INTO usuarios (id, tipo_usuario) VALUES (?, ?)", [(1, 'Agricultor'), (2, 'agricultor')])
+        conn.executemany("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, ?)
+        """, [('AGRO-1-1', 1), ('AGRO-2-1', 2)])
+        conn.commit()
+        conn.close()
+        self.token = pasarela.registrar_dispositivo('estacion-1', 1)
+
+    async def asyncSetUp(self):
+        self.pasarela = await pasarela.Pasarela('127.0.0.1', 0, puerto_udp=0).iniciar()
+
+    async def asyncTearDown(self):
+        await self.pasarela.cerrar()
+
+    def tearDown(self):
+        sensores.detener_escritor()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def contar_lecturas(self):
+        conn = sqlite3.connect(self.test_db)
+        total = conn.execute("SELECT COUNT(*) FROM lecturas_sensores").fetchone()[0]
+        conn.close()
+        return total
+
+    async def conectar(self, token):
+        lector, escritor = await asyncio.open_connection('127.0.0.1', self.pasarela.puerto)
+        escritor.write(f"AUTH {token}\n".encode())
+        return lector, escritor, (await lector.readline()).decode().strip()
+
+    def test_line_parser(self):
+        lectura = pasarela.interpretar_linea("AGRO-1-1,,40.5,6.5,20,,35,90", 1000)
+        self.assertEqual((lectura["ts"], lectura["humedad_suelo"]), (1000, 40.5))
+        self.assertEqual(lectura["nutrientes"], {"N": None, "P": 35.0, "K": 90.0})
+        for linea in ("AGRO-1-1,1,2", "AGRO-1-1,ayer,1,1,1,1,1,1", "AGRO-1-1,1,nan,1,1,1,1,1"):
+            with self.assertRaises(ValueError):
+                pasarela.interpretar_linea(linea, 1000)
+        with self.assertRaisesRegex(ValueError, "sin permiso"):
+            pasarela.interpretar_linea("AGRO-2-1,1,1,1,1,1,1,1", 1000, permitidos={'AGRO-1-1'})
+
+    async def test_tcp_requires_a_valid_token(self):
+        lector, escritor, respuesta = await self.conectar("token-falso")
+        self.assertEqual(respuesta, "ERR auth")
+        self.assertEqual(await lector.read(), b"")
+        escritor.close()
+
+        pasarela.revocar_dispositivo('estacion-1')
+        _, escritor, respuesta = await self.conectar(self.token)
+        self.assertEqual(respuesta, "ERR auth")
+        escritor.close()
+
+    async def test_tcp_readings_are_committed_by_sync(self):
+        lector, escritor, respuesta = await self.conectar(self.token)
+        self.assertEqual(respuesta, "OK estacion-1")
+        ts = base_datos.epoch_ms() - 60000
+        escritor.write("".join(f"AGRO-1-1,{ts + i},40,6.5,20,60,35,90\n" for i in range(50)).encode())
+        escritor.write(b"AGRO-1-1,1,2\nAGRO-2-1,,40,6.5,20,60,35,90\nSYNC\n")
+        respuestas = [(await lector.readline()).decode().strip() for _ in range(3)]
+        escritor.close()
+
+        self.assertTrue(respuestas[0].startswith("ERR 51 "))
+        self.assertTrue(respuestas[1].startswith("ERR 52 cultivo inexistente o sin permiso"))
+        self.assertEqual(respuestas[2], "OK 52")
+        self.assertEqual(self.contar_lecturas(), 50)
+        estadisticas = self.pasarela.estadisticas()
+        self.assertEqual((estadisticas["aceptadas"], estadisticas["errores"]), (50, 2))
+
+    async def test_udp_datagram_carries_token_and_readings(self):
+        datagrama = f"{self.token}\nAGRO-1-1,,40,6.5,20,60,35,90\nAGRO-2-1,,1,1,1,1,1,1\n".encode()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(datagrama, ('127.0.0.1', self.pasarela.puerto_udp))
+            s.sendto(b"token-falso\nAGRO-1-1,,1,1,1,1,1,1", ('127.0.0.1', self.pasarela.puerto_udp))
+        for _ in range(100):
+            if self.pasarela.estadisticas()["datagramas"] == 2 and self.pasarela.estadisticas()["escritor"]["filas"] == 1:
+                break
+            await asyncio.sleep(0.02)
+        estadisticas = self.pasarela.estadisticas()
+        self.assertEqual((estadisticas["aceptadas"], estadisticas["errores"], estadisticas["auth_rechazadas"]), (1, 1, 1))
+        self.assertEqual(self.contar_lecturas(), 1)
+
+    async def test_gateway_writer_leaves_guardar_datos_alone(self):
+        # With ECOSMART_ESCRITOR_MS=0, guardar_datos keeps committing each reading
+        self.assertIsNone(sensores._escritor)
+        self.assertTrue(self.pasarela._escritor.en_marcha)
+        await self.pasarela.cerrar()
+        self.assertFalse(self.pasarela._escritor.en_marcha)
+
+    async def test_token_caches_are_bounded(self):
+        with patch('module.pasarela.LIMITE_RECHAZOS', 3), patch('module.pasarela.LIMITE_TOKENS', 1):
+            for i in range(10):
+                self.assertEqual(await self.pasarela._autenticar(f"token-al-azar-{i}"), (None, None))
+            # Invalid tokens never reach the valid cache and the rejected one keeps only the newest
+            self.assertEqual(len(self.pasarela._tokens), 0)
+            self.assertEqual(list(self.pasarela._rechazados), [f"token-al-azar-{i}" for i in (7, 8, 9)])
+            with patch('module.pasarela.autenticar') as consulta:
+                await self.pasarela._autenticar("token-al-azar-9")
+            consulta.assert_not_called()
+
+            otro = pasarela.registrar_dispositivo('estacion-2', 1)
+            await self.pasarela._autenticar(self.token)
+            dispositivo, _ = await self.pasarela._autenticar(otro)
+            self.assertEqual(dispositivo["nombre"], 'estacion-2')
+            self.assertEqual(list(self.pasarela._tokens), [otro])
+
+    async def test_crop_changes_clear_the_permission_cache(self):
+        await self.pasarela._autenticar(self.token)
+        self.assertEqual(self.pasarela._permitidos[1][0], {'AGRO-1-1'})
+        eventos.publicar(eventos.CULTIVO_CAMBIADO, numero_cultivo='AGRO-2-1', accion="editado", campos={"usuario_id": 1})
+        self.assertEqual(self.pasarela._permitidos, {})
+
+    async def test_saturated_writer_pauses_tcp_and_drops_udp(self):
+        lector, escritor, _ = await self.conectar(self.token)
+        ts = base_datos.epoch_ms() - 60000
+        linea = b"AGRO-1-1,,40,6.5,20,60,35,90\n"
+        with patch.object(type(self.pasarela._escritor), 'saturado', new_callable=PropertyMock, return_value=True):
+            # The line is held, and the gateway stops reading, until the queue drains
+            escritor.write(f"AGRO-1-1,{ts},40,6.5,20,60,35,90\nAGRO-1-1,{ts + 1},40,6.5,20,60,35,90\n".encode())
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.sendto(self.token.encode() + b"\n" + linea, ('127.0.0.1', self.pasarela.puerto_udp))
+            for _ in range(100):
+                if self.pasarela.estadisticas()["datagramas"] == 1:
+                    break
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.1)
+            estadisticas = self.pasarela.estadisticas()
+            self.assertEqual((estadisticas["lineas"], estadisticas["descartadas"], estadisticas["pausas"]), (2, 1, 1))
+        escritor.write(b"SYNC\n")
+        self.assertEqual((await lector.readline()).decode().strip(), "OK 2")
+        escritor.close()
+        # The datagram was dropped, the held TCP lines were not
+        self.assertEqual(self.contar_lecturas(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# tests/test_planificador.py
+#----> TERMINAL: python -m unittest tests_PY/test_planificador.py
+
+import unittest
+from unittest.mock import patch
+import threading
+import time
+
+from module import planificador
+
+
+class TestPlanificador(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = planificador.Planificador(hilos=2, nombre="prueba")
+
+    def tearDown(self):
+        self.plan.detener()
+
+    def esperar(self, condicion, timeout=5):
+        limite = time.monotonic() + timeout
+        while not condicion():
+            if time.monotonic() > limite:
+                self.fail("condition not reached")
+            time.sleep(0.005)
+
+    def test_task_runs_now_and_then_every_interval(self):
+        ejecuciones = []
+        self.plan.programar("AGRO-1-1", lambda: ejecuciones.append(time.monotonic()), 0.05)
+        self.esperar(lambda: len(ejecuciones) >= 4)
+        self.plan.cancelar("AGRO-1-1")
+        pausas = [b - a for a, b in zip(ejecuciones, ejecuciones[1:])]
+        self.assertTrue(all(0.03 <= p <= 0.5 for p in pausas), pausas)
+
+    def test_many_tasks_share_a_fixed_pool_of_threads(self):
+        hilos_antes = threading.active_count()
+        hilos_usados = set()
+        for i in range(500):
+            self.plan.programar(f"AGRO-1-{i}", lambda: hilos_usados.add(threading.current_thread().name), 60)
+        self.esperar(lambda: self.plan.estadisticas()["ejecuciones"] >= 500)
+        # One scheduler thread plus two workers, however many crops
+        self.assertEqual(threading.active_count() - hilos_antes, 3)
+        self.assertLessEqual(hilos_usados, {"prueba-0", "prueba-1"})
+        self.assertEqual(self.plan.estadisticas()["programadas"], 500)
+
+    def test_cancel_is_immediate_and_start_wakes_the_scheduler(self):
+        ejecuciones = []
+        # A far task makes the scheduler sleep; a near one must wake it up
+        self.plan.programar("lejana", ejecuciones.append, 3600, args=("lejana",), retraso=3600)
+        self.plan.programar("cercana", ejecuciones.append, 0.05, args=("cercana",), retraso=0.05)
+        self.esperar(lambda: "cercana" in ejecuciones)
+        self.assertTrue(self.plan.cancelar("cercana"))
+        self.assertFalse(self.plan.programada("cercana"))
+        total = len(ejecuciones)
+        time.sleep(0.2)
+        self.assertEqual(len(ejecuciones), total)
+        self.assertFalse(self.plan.cancelar("cercana"))
+        self.assertEqual(self.plan.claves(), ["lejana"])
+
+    def test_returning_false_unschedules_and_errors_do_not(self):
+        self.plan.programar("sin_permiso", lambda: False, 0.01)
+        fallos = []
+
+        def falla():
+            fallos.append(1)
+            raise RuntimeError("clima caído")
+
+        with patch('builtins.print'):
+            self.plan.programar("falla", falla, 0.01)
+            self.esperar(lambda: len(fallos) >= 3)
+        self.assertEqual(self.plan.claves(), ["falla"])
+        self.assertGreaterEqual(self.plan.estadisticas()["errores"], 3)
+
+    def test_slow_task_never_overlaps_and_skips_missed_runs(self):
+        en_curso = []
+        solapes = []
+
+        def lenta():
+            if en_curso:
+                solapes.append(1)
+            en_curso.append(1)
+            time.sleep(0.12)
+            en_curso.pop()
+
+        self.plan.programar("lenta", lenta, 0.02)
+        self.esperar(lambda: self.plan.estadisticas()["ejecuciones"] >= 3)
+        self.assertEqual(solapes, [])
+        self.assertGreater(self.plan.estadisticas()["omitidas"], 0)
+
+    def test_returned_number_becomes_the_new_interval(self):
+        ejecuciones = []
+
+        def adaptativa():
+            ejecuciones.append(time.monotonic())
+            return 0.15 if len(ejecuciones) > 1 else 0.02
+
+        self.plan.programar("adaptativa", adaptativa, 3600)
+        self.esperar(lambda: len(ejecuciones) >= 4)
+        pausas = [b - a for a, b in zip(ejecuciones, ejecuciones[1:])]
+        self.assertLess(pausas[0], 0.1)
+        self.assertTrue(all(p >= 0.13 for p in pausas[1:]), pausas)
+
+    def test_cancelled_entries_are_compacted(self):
+        for i in range(100):
+            self.plan.programar(i, lambda: None, 3600, retraso=3600)
+        for i in range(60):
+            self.plan.cancelar(i)
+        self.assertLessEqual(self.plan.estadisticas()["monticulo"], 70)
+        self.assertEqual(self.plan.estadisticas()["programadas"], 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# tests/test_relleno.py
+#----> TERMINAL: python -m unittest tests_PY/test_relleno.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+from datetime import datetime
+
+from module import base_datos, eventos, sensores, cultivos, agregados, simulador, relleno
+
+DESDE = base_datos.epoch_ms(datetime(2026, 3, 1))
+HASTA = base_datos.epoch_ms(datetime(2026, 3, 4))
+
+
+class TestSerie(unittest.TestCase):
+
+    def test_same_seed_same_series(self):
+        primera = list(relleno.serie("AGRO-1-1", DESDE, HASTA, 600, semilla=5))
+        self.assertEqual(primera, list(relleno.serie("AGRO-1-1", DESDE, HASTA, 600, semilla=5)))
+        self.assertNotEqual(primera, list(relleno.serie("AGRO-1-1", DESDE, HASTA, 600, semilla=6)))
+        self.assertNotEqual(primera, list(relleno.serie("AGRO-1-2", DESDE, HASTA, 600, semilla=5)))
+        self.assertEqual(len(primera), 3 * 24 * 6)
+        self.assertEqual([ts for ts, _ in primera[:2]], [DESDE, DESDE + 600_000])
+
+    def test_afternoons_are_warmer_than_nights(self):
+        tarde, noche = [], []
+        for ts, valores in relleno.serie("AGRO-1-1", DESDE, HASTA + 7 * relleno.MS_DIA, 600, semilla=1):
+            hora = datetime.fromtimestamp(ts / 1000).hour
+            if 14 <= hora <= 16:
+                tarde.append(valores[2])
+            elif 2 <= hora <= 4:
+                noche.append(valores[2])
+        self.assertGreater(sum(tarde) / len(tarde), sum(noche) / len(noche) + 4)
+
+    def test_values_stay_in_sensor_ranges(self):
+        for ts, (humedad, ph, temperatura, n, p, k) in relleno.serie("AGRO-1-1", DESDE, HASTA, 300, semilla=2):
+            self.assertTrue(0 <= humedad <= 100)
+            self.assertTrue(4 <= ph <= 9)
+            self.assertTrue(-10 <= temperatura <= 45)
+            self.assertTrue(min(n, p, k) > 0)
+
+
+class TestRellenar(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_relleno.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'simulador', 'relleno')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        self.ids = simulador.crear_cultivos_simulados(3, 1)
+
+    def tearDown(self):
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def consultar(self, sql, *parametros):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute(sql, parametros).fetchall()
+        conn.close()
+        return filas
+
+    def test_backfill_writes_readings_and_rollups_without_alerts(self):
+        with patch('module.sensores.alertas.registrar_alertas_lote') as verificar, \
+                patch('module.relleno.TAMANO_LOTE', 100):
+            avances = []
+            resultado = relleno.rellenar(self.ids, DESDE, HASTA, 600, semilla=1, progreso=lambda r: avances.append(r["insertadas"]))
+        verificar.assert_not_called()
+        self.assertEqual(resultado["insertadas"], 3 * 432)
+        self.assertEqual(resultado["cultivos"], 3)
+        # One transaction per block of TAMANO_LOTE readings
+        self.assertEqual(len(avances), 13)
+        self.assertEqual(self.consultar("SELECT COUNT(*) FROM lecturas_sensores")[0][0], 3 * 432)
+
+        n, suma = self.consultar("""
+            SELECT SUM(n), SUM(suma) FROM agregados_dia WHERE cultivo_id = ? AND parametro = 'temperatura_ambiente'
+        """, self.ids[0])[0]
+        temperaturas = [v[2] for _, v in relleno.serie("SIM-1-1", DESDE, HASTA, 600, semilla=1)]
+        self.assertEqual(n, 432)
+        self.assertAlmostEqual(suma, sum(temperaturas), places=6)
+        self.assertEqual(self.consultar("SELECT COUNT(DISTINCT inicio) FROM agregados_hora")[0][0], 72)
+
+    def test_crops_with_readings_in_the_range_are_skipped(self):
+        relleno.rellenar(self.ids[:1], DESDE, HASTA, 3600, semilla=1)
+        resultado = relleno.rellenar(self.ids + [999], DESDE, HASTA, 3600, semilla=1)
+        self.assertEqual(resultado["omitidos"], ["SIM-1-1"])
+        self.assertEqual(resultado["inexistentes"], [999])
+        self.assertEqual(resultado["insertadas"], 2 * 72)
+        self.assertEqual(self.consultar("SELECT SUM(n) FROM agregados_dia WHERE parametro = 'ph_suelo'")[0][0], 3 * 72)
+
+
+if __name__ == '__main__':
+    unittest.main()
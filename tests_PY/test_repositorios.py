@@ -0,0 +1,129 @@
+# tests/test_repositorios.py
+#----> TERMINAL: python -m unittest tests_PY/test_repositorios.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+from datetime import datetime
+
+from module import base_datos, eventos, repositorios, sensores, cultivos, agregados, datos_avanzados, chatbot
+
+
+class TestMapeadores(unittest.TestCase):
+
+    def test_flat_mapper(self):
+        mapear = repositorios.compilar_mapeador(("id", "numero"))
+        self.assertEqual(mapear((1, "AGRO-1-1")), {"id": 1, "numero": "AGRO-1-1"})
+
+    def test_nested_mapper(self):
+        mapear = repositorios.compilar_mapeador_anidado({"a": {"x": "c2"}, "b": "c1"}, ("c1", "c2"))
+        self.assertEqual(mapear((10, 20)), {"a": {"x": 20}, "b": 10})
+
+
+class TestRepositorios(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_repositorios.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'datos_avanzados', 'chatbot')
+        ]
+        self.patchers.append(patch('module.sensores.alertas.verificar_alertas'))
+        for patcher in self.patchers:
+            patcher.start()
+
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        datos_avanzados.crear_tabla_datos_avanzados()
+        chatbot.crear_tabla_chat()
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("CREATE VIEW vista_datos_avanzados AS SELECT *, ts AS timestamp FROM datos_avanzados")
+        conn.executemany("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id, agronomist_id)
+            VALUES (?, 'Talca', 'agri', 'Maiz', -35.4, -71.6, ?, 2)
+        """, [('AGRO-2-1', 1), ('AGRO-2-2', 1), ('AGRO-2-3', 3)])
+        conn.commit()
+        conn.close()
+        self.conn = base_datos.obtener_conexion(self.test_db)
+
+    def tearDown(self):
+        # Let the event bus finish before the patches go away
+        eventos.esperar()
+        self.conn.close()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def guardar(self, numero, fecha, humedad):
+        datos = {"humedad_suelo": humedad, "ph_suelo": 6.5, "temperatura_ambiente": 20.0,
+                 "nutrientes": {"N": 1, "P": 2, "K": 3}}
+        with patch('module.sensores.datetime') as mock_datetime:
+            mock_datetime.now.return_value = fecha
+            sensores.guardar_datos(datos, numero)
+
+    def test_cultivos_by_role_and_batch(self):
+        repo = repositorios.RepositorioCultivos(self.conn)
+        self.assertEqual([c["numero"] for c in repo.visibles(1, "agricultor")], ['AGRO-2-1', 'AGRO-2-2'])
+        self.assertEqual(len(repo.visibles(2, "agronomo")), 3)
+        self.assertEqual(repo.visibles(1, "desconocido"), [])
+        self.assertEqual(repo.por_numero('AGRO-2-3')["usuario_id"], 3)
+        self.assertIsNone(repo.por_numero('NON-EXISTENT'))
+        self.assertEqual(sorted(repo.por_numeros(['AGRO-2-1', 'AGRO-2-3', 'NON-EXISTENT'])), ['AGRO-2-1', 'AGRO-2-3'])
+
+    def test_latest_readings_across_partitions(self):
+        self.guardar('AGRO-2-1', datetime(2025, 5, 10, 8, 0), 10.0)
+        self.guardar('AGRO-2-1', datetime(2025, 6, 10, 8, 0), 20.0)
+        self.guardar('AGRO-2-2', datetime(2025, 5, 20, 8, 0), 30.0)
+
+        repo = repositorios.RepositorioLecturas(self.conn)
+        self.assertEqual(repo.ultima('AGRO-2-1')["humedad_suelo"], 20.0)
+        self.assertIsNone(repo.ultima('AGRO-2-3'))
+
+        # One query per partition for the whole list; crops without data are left out
+        ultimas = sensores.obtener_ultimas_lecturas(['AGRO-2-1', 'AGRO-2-2', 'AGRO-2-3'])
+        self.assertEqual(sorted(ultimas), ['AGRO-2-1', 'AGRO-2-2'])
+        self.assertEqual(ultimas['AGRO-2-1']["humedad_suelo"], 20.0)
+        self.assertEqual(ultimas['AGRO-2-2']["humedad_suelo"], 30.0)
+        self.assertEqual(ultimas['AGRO-2-2']["numero_cultivo"], 'AGRO-2-2')
+        self.assertEqual(ultimas['AGRO-2-2']["timestamp"], '2025-05-20 08:00:00')
+
+    def test_advanced_data_is_nested(self):
+        self.conn.execute("""
+            INSERT INTO datos_avanzados (numero_cultivo, humedad_ultimo, humedad_anomalia, probabilidad_lluvia, ts)
+            VALUES ('AGRO-2-1', 41.5, 1, 0.3, 1000), ('AGRO-2-1', 42.5, 0, 0.4, 2000)
+        """)
+        self.conn.commit()
+        ultimo = repositorios.RepositorioDatosAvanzados(self.conn).ultimo('AGRO-2-1')
+        self.assertEqual(ultimo["humedad"]["ultimo"], 42.5)
+        self.assertEqual(ultimo["humedad"]["anomalia"], 0)
+        self.assertEqual(set(ultimo["potasio"]), set(repositorios._ESTADISTICAS))
+        self.assertEqual((ultimo["probabilidad_lluvia"], ultimo["timestamp"]), (0.4, 2000))
+
+    def test_chat_keeps_last_messages_in_order(self):
+        self.conn.executemany("""
+            INSERT INTO historial_chat (user_id, conversacion_id, pregunta, respuesta, estado, fecha)
+            VALUES (1, 'c1', ?, 'r', 1, ?)
+        """, [(f'p{i}', f'2025-06-10 08:0{i}:00') for i in range(5)])
+        self.conn.commit()
+        repo = repositorios.RepositorioChat(self.conn)
+        self.assertEqual([m[0] for m in repo.conversacion('c1', max_mensajes=3)], ['p2', 'p3', 'p4'])
+        self.assertEqual([m["pregunta"] for m in repo.conversaciones_usuario(1)['c1']], [f'p{i}' for i in range(5)])
+
+    def test_statement_text_does_not_depend_on_arguments(self):
+        repo = repositorios.RepositorioCultivos(self.conn)
+        with patch.object(repo, '_cursor') as mock_cursor:
+            mock_cursor.return_value.fetchall.return_value = []
+            repo.por_numeros(['AGRO-2-1'])
+            repo.por_numeros(['AGRO-2-1', 'AGRO-2-2', 'AGRO-2-3'])
+        textos = {c.args[0] for c in mock_cursor.return_value.execute.call_args_list}
+        # The same SQL text, so sqlite3 reuses the cached prepared statement
+        self.assertEqual(textos, {repositorios.RepositorioCultivos.SQL_POR_NUMEROS})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+# tests/test_retencion.py
+#----> TERMINAL: python -m unittest tests_PY/test_retencion.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from flask import Flask
+
+from module import base_datos, eventos, retencion, comandos, sensores, cultivos, agregados, alertas, chatbot, datos_avanzados
+
+
+def ms(*args):
+    return base_datos.epoch_ms(datetime(*args))
+
+
+AHORA = ms(2025, 7, 20)
+
+
+class TestRetencion(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_retencion.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'alertas',
+                           'chatbot', 'datos_avanzados', 'retencion', 'archivo')
+        ]
+        self.archivo_dir = tempfile.mkdtemp()
+        self.patchers += [
+            patch('module.archivo.ARCHIVO_DIR', self.archivo_dir),
+            patch('module.sensores.alertas.verificar_alertas'),
+            patch.object(retencion, 'PAUSA_ENTRE_LOTES', 0),
+            patch.dict(retencion.RETENCION_DIAS, {"lecturas_sensores": 30, "lecturas_15min": None,
+                                                  "historial_alertas": 365, "historial_chat": 180,
+                                                  "datos_avanzados": 90}),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+        alertas.crear_tabla_historial_alertas()
+        chatbot.crear_tabla_chat()
+        datos_avanzados.crear_tabla_datos_avanzados()
+        conn = sqlite3.connect(self.test_db)
+        retencion.crear_tabla_lecturas_15min(conn)
+        conn.execute("""
+            INSERT INTO cultivos (numero, ciudad, agricultor, tipo, latitud, longitud, usuario_id)
+            VALUES ('AGRO-1-1', 'Talca', 'agri', 'Maiz', -35.4, -71.6, 1)
+        """)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        # Let the event bus finish before the patches go away
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        base_datos.cerrar_conexiones()
+        shutil.rmtree(self.archivo_dir, ignore_errors=True)
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def guardar(self, fecha, humedad):
+        datos = {"humedad_suelo": humedad, "ph_suelo": 6.5, "temperatura_ambiente": 20.0,
+                 "nutrientes": {"N": 1, "P": 2, "K": 3}}
+        with patch('module.sensores.datetime') as mock_datetime:
+            mock_datetime.now.return_value = fecha
+            sensores.guardar_datos(datos, "AGRO-1-1")
+
+    def consultar(self, sql, params=()):
+        conn = sqlite3.connect(self.test_db)
+        filas = conn.execute(sql, params).fetchall()
+        conn.close()
+        return filas
+
+    def test_old_readings_are_downsampled_then_removed(self):
+        self.guardar(datetime(2025, 5, 10, 10, 2), 10.0)
+        self.guardar(datetime(2025, 5, 10, 10, 7), 20.0)
+        self.guardar(datetime(2025, 6, 10, 8, 0), 30.0)
+        self.guardar(datetime(2025, 6, 25, 8, 0), 40.0)
+        self.guardar(datetime(2025, 7, 15, 8, 0), 50.0)
+
+        with patch.object(retencion, 'TAMANO_LOTE', 1):
+            resultado = retencion.aplicar_retencion(AHORA)
+
+        self.assertEqual(resultado["filas"]["lecturas_sensores"], 3)
+        self.assertGreater(resultado["bytes"], 0)
+        # May was entirely past the cutoff and is dropped; June only loses its old rows
+        tablas = [f[0] for f in self.consultar("SELECT nombre FROM particiones_lecturas ORDER BY desde")]
+        self.assertEqual(tablas, ['lecturas_sensores_202506', 'lecturas_sensores_202507'])
+        self.assertEqual([f[0] for f in self.consultar("SELECT humedad_suelo FROM lecturas_sensores ORDER BY ts")], [40.0, 50.0])
+        self.assertEqual(
+            self.consultar("SELECT inicio, n, humedad_suelo FROM lecturas_15min ORDER BY inicio"),
+            [(ms(2025, 5, 10, 10, 0), 2, 15.0), (ms(2025, 6, 10, 8, 0), 1, 30.0)]
+        )
+
+    def test_rebuilding_rollups_after_retention_keeps_purged_days(self):
+        for dia in range(89):
+            for hora in (6, 20):
+                self.guardar(datetime(2025, 4, 22, hora) + timedelta(days=dia), 10.0 + dia % 7 + hora / 4)
+        dias = "SELECT inicio, n, suma, minimo, maximo, ultimo FROM agregados_dia WHERE parametro = 'humedad_suelo' ORDER BY inicio"
+        antes = self.consultar(dias)
+        self.assertEqual(len(antes), 89)
+
+        # The cutoff falls at noon: June 20th keeps only its evening reading
+        retencion.aplicar_retencion(AHORA + 12 * 3600 * 1000)
+        self.assertEqual(self.consultar("SELECT MIN(ts) FROM lecturas_sensores"), [(ms(2025, 6, 20, 20),)])
+        # Purged days are rebuilt from the columnar archive
+        agregados.reconstruir_agregados()
+        self.assertEqual(self.consultar(dias), antes)
+
+        # Without the archive, the days retention removed keep their rollups
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("DELETE FROM archivo_dias")
+        conn.commit()
+        conn.close()
+        agregados.reconstruir_agregados()
+        self.assertEqual(self.consultar(dias), antes)
+        conn = base_datos.obtener_conexion(self.test_db)
+        stats = agregados.estadisticas_ventana(conn.cursor(), "AGRO-1-1", "humedad_suelo", ms(2025, 4, 1), AHORA)
+        conn.close()
+        self.assertEqual(stats["n"], 178)
+
+    def test_other_tables_are_purged_by_age(self):
+        conn = sqlite3.connect(self.test_db)
+        conn.executemany("INSERT INTO historial_alertas (usuario_id, ts) VALUES (1, ?)",
+                         [(ms(2024, 6, 1),), (ms(2025, 7, 1),)])
+        # historial_chat keeps SQLite's CURRENT_TIMESTAMP text (UTC)
+        conn.executemany("INSERT INTO historial_chat (user_id, pregunta, respuesta, fecha) VALUES (1, 'p', 'r', ?)",
+                         [('2024-12-01 12:00:00',), ('2025-07-01 12:00:00',)])
+        conn.executemany("INSERT INTO datos_avanzados (numero_cultivo, ts) VALUES ('AGRO-1-1', ?)",
+                         [(ms(2025, 3, 1),), (ms(2025, 7, 1),)])
+        conn.commit()
+        conn.close()
+
+        resultado = retencion.aplicar_retencion(AHORA)
+        self.assertEqual(resultado["filas"], {"lecturas_sensores": 0, "historial_alertas": 1,
+                                              "historial_chat": 1, "datos_avanzados": 1})
+        for tabla in ("historial_alertas", "historial_chat", "datos_avanzados"):
+            self.assertEqual(self.consultar(f"SELECT COUNT(*) FROM {tabla}")[0][0], 1)
+
+    def test_deletes_run_in_small_batches(self):
+        conn = sqlite3.connect(self.test_db)
+        conn.executemany("INSERT INTO historial_alertas (usuario_id, ts) VALUES (1, ?)",
+                         [(ms(2024, 1, dia),) for dia in range(1, 6)])
+        conn.commit()
+        conn.close()
+
+        conn = base_datos.obtener_conexion(self.test_db)
+        with patch.object(retencion, 'TAMANO_LOTE', 2), patch.object(retencion, '_pausa') as pausa:
+            borradas = retencion.purgar_tabla(conn, "historial_alertas", AHORA)
+        conn.close()
+        self.assertEqual(borradas, 5)
+        # 2 + 2 + 1: a pause (and a commit) after each full batch
+        self.assertEqual(pausa.call_count, 2)
+
+    def test_configurar_rejects_unknown_table(self):
+        with self.assertRaises(ValueError):
+            retencion.configurar(tabla_inexistente=10)
+        retencion.configurar(historial_alertas=730)
+        self.assertEqual(retencion.RETENCION_DIAS["historial_alertas"], 730)
+
+    def test_command_reports_rows(self):
+        self.guardar(datetime(2020, 1, 1, 8, 0), 10.0)
+        app = Flask(__name__)
+        comandos.registrar_comandos(app)
+        resultado = app.test_cli_runner().invoke(args=['aplicar-retencion', '--lote', '500'])
+        self.assertEqual(resultado.exit_code, 0, resultado.output)
+        self.assertIn('lecturas_sensores: 1 filas eliminadas', resultado.output)
+        self.assertIn('Espacio liberado', resultado.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
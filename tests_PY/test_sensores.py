@@ -11,6 +11,9 @@ from datetime import datetime
 # Import the functions to be tested from your module
 from module import sensores
 from module import alertas
+from module import base_datos
+from module import eventos
+from module import repositorios
 
 OPENWEATHER_API_KEY = "43b0fcbe4e275f6ab76a4d5651092b7e"
 OPENWEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
@@ -24,10 +27,10 @@ class MockSqliteRow(dict):
             raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
 
     def __getitem__(self, key):
-        # Define the expected order of columns for SELECT * FROM datos_sensores
+        # Define the expected order of columns for SELECT * FROM vista_datos_sensores
         # This order must match the order SQLite would return columns
         keys_order = [
-            'id', 'numero_cultivo', 'humedad_suelo', 'ph_suelo',
+            'cultivo_id', 'numero_cultivo', 'humedad_suelo', 'ph_suelo',
             'temperatura_ambiente', 'nitrogeno', 'fosforo', 'potasio', 'timestamp'
         ]
         if isinstance(key, int):
@@ -45,8 +48,8 @@ class TestSensores(unittest.TestCase):
         self.app.secret_key = 'test_secret_key'
         self.client = self.app.test_client()
 
-        # Patch sqlite3.connect for the entire test class
-        self.connect_patcher = patch('module.sensores.sqlite3.connect')
+        # Patch the pooled connection factory for the entire test class
+        self.connect_patcher = patch('module.sensores.base_datos.obtener_conexion')
         self.mock_connect = self.connect_patcher.start()
 
         self.mock_conn = MagicMock()
@@ -114,6 +117,8 @@ class TestSensores(unittest.TestCase):
         return jsonify(status), 200
 
     def tearDown(self):
+        # Let the event bus finish before the patches go away
+        eventos.esperar()
         self.connect_patcher.stop()
         self.requests_get_patcher.stop()
         self.datetime_patcher.stop()
@@ -146,33 +151,41 @@ class TestSensores(unittest.TestCase):
             "nutrientes": {"N": 60, "P": 35, "K": 90}
         }
         numero_cultivo = "AGRO-1-1"
-        expected_timestamp = self.mock_datetime.now.return_value.strftime("%Y-%m-%d %H:%M:%S")
+        expected_ts = int(self.mock_datetime.now.return_value.timestamp() * 1000)
 
-        sensores.guardar_datos(mock_datos, numero_cultivo)
+        # One row inserted: the rollups and the event follow
+        self.mock_cursor.rowcount = 1
+        # The router picks the monthly partition for the reading's timestamp
+        with patch('module.sensores.particiones.asegurar_particion', return_value='lecturas_sensores_202506') as mock_particion:
+            sensores.guardar_datos(mock_datos, numero_cultivo)
+        mock_particion.assert_called_once_with(self.mock_cursor, expected_ts)
 
         # --- FIX: Copy the exact 'Actual:' SQL string from the traceback ---
         expected_sql = """
-        INSERT INTO datos_sensores (
-            numero_cultivo, humedad_suelo, ph_suelo,
-            temperatura_ambiente, nitrogeno, fosforo, potasio, timestamp
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO lecturas_sensores_202506 (
+            cultivo_id, ts, humedad_suelo, ph_suelo,
+            temperatura_ambiente, nitrogeno, fosforo, potasio
+        ) SELECT id, ?, ?, ?, ?, ?, ?, ? FROM cultivos WHERE numero = ?
+        ON CONFLICT DO NOTHING
     """
         # Ensure there are no extra leading/trailing newlines or spaces that are not in the actual code's string
 
         self.mock_cursor.execute.assert_called_once_with(
             expected_sql, (
-                numero_cultivo,
+                expected_ts,
                 mock_datos['humedad_suelo'],
                 mock_datos['ph_suelo'],
                 mock_datos['temperatura_ambiente'],
                 mock_datos['nutrientes']['N'],
                 mock_datos['nutrientes']['P'],
                 mock_datos['nutrientes']['K'],
-                expected_timestamp
+                numero_cultivo
             )
         )
         self.mock_conn.commit.assert_called_once()
         self.mock_conn.close.assert_called_once()
+        # Alerts run on the event bus, after the insert has returned
+        eventos.esperar()
         self.mock_verificar_alertas.assert_called_once_with(numero_cultivo, mock_datos)
 
     # Test Case: obtener_coordenadas_cultivo
@@ -214,7 +227,8 @@ class TestSensores(unittest.TestCase):
                 "appid": OPENWEATHER_API_KEY,
                 "units": "metric",
                 "lang": "es"
-            }
+            },
+            timeout=sensores.CLIMA_TIMEOUT_S
         )
 
     def test_get_real_time_weather_no_rain(self):
@@ -351,53 +365,33 @@ class TestSensores(unittest.TestCase):
 
     # Test Case: obtener_datos_por_cultivo_raw
     def test_obtener_datos_por_cultivo_raw_found(self):
-        mock_data = MockSqliteRow({
-            "id": 1,
-            "numero_cultivo": "AGRO-1-1",
-            "humedad_suelo": 60.5,
-            "ph_suelo": 6.7,
-            "temperatura_ambiente": 23.1,
-            "nitrogeno": 55.0,
-            "fosforo": 32.0,
-            "potasio": 95.0,
+        # Plain tuples in RepositorioLecturas.COLUMNAS order
+        mock_data = (1, 60.5, 6.7, 23.1, 55.0, 32.0, 95.0, "2025-06-18 10:00:00")
+        with patch('module.sensores.particiones.consultar_lecturas', return_value=[mock_data]) as mock_consulta:
+            result = sensores.obtener_datos_por_cultivo_raw("AGRO-1-1")
+        self.assertEqual(result, {
+            "cultivo_id": 1, "numero_cultivo": "AGRO-1-1", "humedad_suelo": 60.5, "ph_suelo": 6.7,
+            "temperatura_ambiente": 23.1, "nitrogeno": 55.0, "fosforo": 32.0, "potasio": 95.0,
             "timestamp": "2025-06-18 10:00:00"
         })
-        self.mock_cursor.fetchone.return_value = mock_data
-        self.mock_cursor.execute.reset_mock()
-
-        result = sensores.obtener_datos_por_cultivo_raw("AGRO-1-1")
-        self.assertEqual(result, dict(mock_data))
-        # --- FIX: Copy the exact 'Actual:' SQL string from the traceback ---
-        expected_sql = """
-        SELECT * FROM datos_sensores WHERE numero_cultivo=? ORDER BY timestamp DESC LIMIT 1
-    """
-        self.mock_cursor.execute.assert_called_once_with(
-            expected_sql, ("AGRO-1-1",)
-        )
+        # Latest reading: newest partition first, stop after one row
+        args, kwargs = mock_consulta.call_args
+        self.assertEqual(args, (self.mock_cursor, "AGRO-1-1", repositorios.RepositorioLecturas.SQL_COLUMNAS))
+        self.assertEqual(kwargs, {"descendente": True, "limite": 1})
         self.mock_conn.close.assert_called_once()
-        self.assertEqual(self.mock_conn.row_factory, sqlite3.Row)
 
 
     def test_obtener_datos_por_cultivo_raw_not_found(self):
-        self.mock_cursor.fetchone.return_value = None
-        self.mock_cursor.execute.reset_mock()
-
-        result = sensores.obtener_datos_por_cultivo_raw("NON-EXISTENT")
+        with patch('module.sensores.particiones.consultar_lecturas', return_value=[]) as mock_consulta:
+            result = sensores.obtener_datos_por_cultivo_raw("NON-EXISTENT")
         self.assertIsNone(result)
-        # --- FIX: Copy the exact 'Actual:' SQL string from the traceback ---
-        expected_sql = """
-        SELECT * FROM datos_sensores WHERE numero_cultivo=? ORDER BY timestamp DESC LIMIT 1
-    """
-        self.mock_cursor.execute.assert_called_once_with(
-            expected_sql, ("NON-EXISTENT",)
-        )
+        self.assertEqual(mock_consulta.call_args[0][1], "NON-EXISTENT")
         self.mock_conn.close.assert_called_once()
-        self.assertEqual(self.mock_conn.row_factory, sqlite3.Row)
 
     # Test Case: obtener_datos_por_cultivo (API Endpoint)
     def test_obtener_datos_por_cultivo_api_found(self):
         mock_data = {
-            "id": 1, "numero_cultivo": "AGRO-1-1", "humedad_suelo": 60.5, "ph_suelo": 6.7,
+            "cultivo_id": 1, "numero_cultivo": "AGRO-1-1", "humedad_suelo": 60.5, "ph_suelo": 6.7,
             "temperatura_ambiente": 23.1, "nitrogeno": 55.0, "fosforo": 32.0, "potasio": 95.0,
             "timestamp": "2025-06-18 10:00:00"
         }
@@ -418,47 +412,29 @@ class TestSensores(unittest.TestCase):
 
     # Test Case: obtener_historial_datos_sensores
     def test_obtener_historial_datos_sensores(self):
+        ts1 = base_datos.epoch_ms(datetime(2025, 6, 18, 9, 0))
+        ts2 = base_datos.epoch_ms(datetime(2025, 6, 18, 10, 0))
         mock_history_data = [
-            MockSqliteRow({"timestamp": "2025-06-18 09:00:00", "humedad_suelo": 50.0, "ph_suelo": 6.0, "temperatura_ambiente": 20.0, "nitrogeno": 40.0, "fosforo": 25.0, "potasio": 80.0, "numero_cultivo": "AGRO-1-1", "id": 1}),
-            MockSqliteRow({"timestamp": "2025-06-18 10:00:00", "humedad_suelo": 60.0, "ph_suelo": 6.5, "temperatura_ambiente": 22.0, "nitrogeno": 45.0, "fosforo": 30.0, "potasio": 85.0, "numero_cultivo": "AGRO-1-1", "id": 2})
+            (ts1, 50.0, 6.0, 20.0, 40.0, 25.0, 80.0),
+            (ts2, 60.0, 6.5, 22.0, 45.0, 30.0, 85.0),
+        ]
+        with patch('module.sensores.archivo.consultar_lecturas', return_value=mock_history_data) as mock_consulta:
+            result = sensores.obtener_historial_datos_sensores("AGRO-1-1", limit=2)
+        expected_result = [
+            {"timestamp": "2025-06-18 09:00:00", "humedad_suelo": 50.0, "ph_suelo": 6.0, "temperatura_ambiente": 20.0, "nitrogeno": 40.0, "fosforo": 25.0, "potasio": 80.0},
+            {"timestamp": "2025-06-18 10:00:00", "humedad_suelo": 60.0, "ph_suelo": 6.5, "temperatura_ambiente": 22.0, "nitrogeno": 45.0, "fosforo": 30.0, "potasio": 85.0},
         ]
-        self.mock_cursor.fetchall.return_value = mock_history_data
-        self.mock_cursor.execute.reset_mock()
-
-        result = sensores.obtener_historial_datos_sensores("AGRO-1-1", limit=2)
-        expected_result = [dict(row) for row in mock_history_data]
         self.assertEqual(result, expected_result)
-        # --- FIX: Copy the exact 'Actual:' SQL string from the traceback ---
-        expected_sql = """
-        SELECT 
-            timestamp, 
-            humedad_suelo, 
-            ph_suelo, 
-            temperatura_ambiente, 
-            nitrogeno, 
-            fosforo, 
-            potasio 
-        FROM datos_sensores 
-        WHERE numero_cultivo=? 
-        ORDER BY timestamp ASC 
-        LIMIT ?
-    """
-        self.mock_cursor.execute.assert_called_once_with(
-            expected_sql, ("AGRO-1-1", 2)
-        )
+        mock_consulta.assert_called_once_with(self.mock_cursor, "AGRO-1-1", desde=None, hasta=None, limite=2)
         self.mock_conn.close.assert_called_once()
-        self.assertEqual(self.mock_conn.row_factory, sqlite3.Row)
 
 
     def test_obtener_historial_datos_sensores_empty(self):
-        self.mock_cursor.fetchall.return_value = []
-        self.mock_cursor.execute.reset_mock()
-
-        result = sensores.obtener_historial_datos_sensores("AGRO-1-1", limit=5)
+        with patch('module.sensores.archivo.consultar_lecturas', return_value=[]) as mock_consulta:
+            result = sensores.obtener_historial_datos_sensores("AGRO-1-1", limit=5)
         self.assertEqual(result, [])
-        self.mock_cursor.execute.assert_called_once()
+        mock_consulta.assert_called_once()
         self.mock_conn.close.assert_called_once()
-        self.assertEqual(self.mock_conn.row_factory, sqlite3.Row)
 
 
     # Test Case: obtener_historial_datos_cultivo_api
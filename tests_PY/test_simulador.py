@@ -0,0 +1,123 @@
+# tests/test_simulador.py
+#----> TERMINAL: python -m unittest tests_PY/test_simulador.py
+
+import unittest
+from unittest.mock import patch
+import os
+import sqlite3
+
+from module import base_datos, escritor, eventos, sensores, cultivos, agregados, simulador
+
+
+class TestSimularValores(unittest.TestCase):
+
+    def test_values_follow_the_sensor_formulas(self):
+        humedad, ph, temperatura, n, p, k = (list(columna) for columna in simulador.simular_valores(50, 3))
+        self.assertEqual(len(humedad), 50)
+        for i in range(50):
+            self.assertTrue(15 <= temperatura[i] <= 35)
+            self.assertTrue(30 <= humedad[i] <= 80)
+            # Nitrogen comes from humidity and temperature; pH gives back a rain in range
+            self.assertAlmostEqual(n[i], round(50 + 0.5 * humedad[i] - 0.3 * temperatura[i], 1), places=6)
+            lluvia = (7.0 + 0.02 * temperatura[i] - ph[i]) / 0.05
+            self.assertTrue(-0.2 <= lluvia <= 50.2)
+            self.assertTrue(p[i] <= 30 + 0.2 * temperatura[i] + 0.01)
+            self.assertTrue(k[i] >= 100 - 0.4 * 50 + 0.2 * humedad[i] - 0.01)
+
+    def test_same_seed_same_values_with_and_without_numpy(self):
+        self.assertEqual([list(c) for c in simulador.simular_valores(10, 7)],
+                         [list(c) for c in simulador.simular_valores(10, 7)])
+        with patch('module.simulador.np', None):
+            columnas = simulador.simular_valores(10, 7)
+            self.assertEqual(len(columnas), 6)
+            self.assertTrue(all(isinstance(c, list) and len(c) == 10 for c in columnas))
+            self.assertEqual(columnas, simulador.simular_valores(10, 7))
+
+
+class TestSimulador(unittest.TestCase):
+
+    def setUp(self):
+        self.test_db = 'test_simulador.db'
+        self.patchers = [
+            patch(f'module.{modulo}.DATABASE', self.test_db)
+            for modulo in ('cultivos', 'sensores', 'particiones', 'agregados', 'simulador')
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.alertas_patcher = patch('module.sensores.alertas.registrar_alertas_lote', return_value=([], []))
+        self.alertas_patcher.start()
+        cultivos.crear_tabla_cultivos()
+        sensores.crear_tabla_datos_sensores()
+        agregados.crear_tablas_agregados()
+
+    def tearDown(self):
+        # Let the event bus finish before the patches go away
+        eventos.esperar()
+        for patcher in self.patchers:
+            patcher.stop()
+        self.alertas_patcher.stop()
+        base_datos.cerrar_conexiones()
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(self.test_db + sufijo):
+                os.remove(self.test_db + sufijo)
+
+    def contar(self, sql):
+        conn = sqlite3.connect(self.test_db)
+        total = conn.execute(sql).fetchone()[0]
+        conn.close()
+        return total
+
+    def test_crops_are_created_once(self):
+        ids = simulador.crear_cultivos_simulados(5, 1)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(simulador.crear_cultivos_simulados(5, 1), ids)
+        self.assertEqual(simulador.crear_cultivos_simulados(3, 1), ids[:3])
+        self.assertEqual(self.contar("SELECT COUNT(*) FROM cultivos WHERE numero LIKE 'SIM-1-%'"), 5)
+
+    def test_tick_writes_one_reading_per_crop(self):
+        ids = simulador.crear_cultivos_simulados(20, 1)
+        publicados = []
+        eventos.suscribir(eventos.LOTE_GUARDADO, publicados.append, sincrono=True)
+        try:
+            resultado = simulador.Simulador(ids, semilla=1).tick(1_700_000_000_000)
+        finally:
+            eventos.desuscribir(eventos.LOTE_GUARDADO, publicados.append)
+        self.assertEqual(resultado["insertadas"], 20)
+        self.assertEqual(self.contar("SELECT COUNT(*) FROM lecturas_sensores"), 20)
+        self.assertEqual(self.contar("SELECT COUNT(DISTINCT cultivo_id) FROM lecturas_sensores"), 20)
+        self.assertEqual([e["origen"] for e in publicados], ["simulador"])
+
+    def test_fast_run_groups_ticks_and_spaces_timestamps(self):
+        ids = simulador.crear_cultivos_simulados(4, 1)
+        escrituras = []
+        with patch('module.simulador.TAMANO_LOTE', 8):
+            estadisticas = simulador.Simulador(ids, intervalo_s=30, semilla=1).ejecutar(
+                5, tiempo_real=False, desde_ms=1_700_000_000_000,
+                al_tick=lambda numero, resultado: escrituras.append((numero, resultado["insertadas"])))
+        # 2 ticks per transaction: 8, 8 and the last 4 readings
+        self.assertEqual(escrituras, [(2, 8), (4, 8), (5, 4)])
+        self.assertEqual(estadisticas["ticks"], 5)
+        self.assertEqual(estadisticas["insertadas"], 20)
+        self.assertEqual(self.contar("SELECT COUNT(DISTINCT ts) FROM lecturas_sensores"), 5)
+        self.assertEqual(self.contar("SELECT MAX(ts) - MIN(ts) FROM lecturas_sensores"), 4 * 30_000)
+
+    def test_saturated_ingestion_is_retried(self):
+        ids = simulador.crear_cultivos_simulados(3, 1)
+        admitir = sensores.admitir_ingesta
+        intentos = []
+
+        def saturada_una_vez():
+            intentos.append(1)
+            if len(intentos) == 1:
+                raise escritor.Saturado("cola llena", reintentar=0)
+            admitir()
+
+        sim = simulador.Simulador(ids, semilla=1)
+        with patch('module.sensores.admitir_ingesta', side_effect=saturada_una_vez):
+            sim.tick()
+        self.assertEqual(sim.estadisticas()["esperas"], 1)
+        self.assertEqual(sim.estadisticas()["insertadas"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()